@@ -0,0 +1,170 @@
+"""
+Caché persistente de análisis de metadatos con IA
+Guarda en la tabla ai_analysis_cache el resultado de analyze_with_gemini, indexado por
+el SHA-256 de la versión del prompt y la muestra de texto enviada. Volver a subir el mismo
+libro (modo local o nube) o reintentar una carga masiva no repite la llamada a Gemini.
+Los resultados del análisis por lotes (otro prompt, con un extracto más corto) se guardan con
+su propia versión: el análisis individual nunca los reutiliza como si fueran suyos.
+"""
+
+import hashlib
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional, Sequence
+import logging
+
+import crud
+import database
+
+logger = logging.getLogger(__name__)
+
+# Cambiar la versión al modificar el prompt invalida las entradas anteriores
+# (v2: la v1 podía contener resultados del prompt por lotes)
+ANALYSIS_PROMPT_VERSION = "book-metadata-v2"
+BATCH_ANALYSIS_PROMPT_VERSION = "book-metadata-batch-v1"
+# Caracteres de texto que recibe el prompt (igual que analyze_with_gemini)
+ANALYSIS_TEXT_SAMPLE = 4000
+# Antigüedad máxima de una entrada antes de descartarla
+AI_CACHE_MAX_AGE_DAYS = int(os.getenv("AI_CACHE_MAX_AGE_DAYS", "90"))
+
+# Resultados que indican un análisis fallido: nunca se guardan
+_FAILED_TITLES = {"Título no detectado", "Sistema ocupado", "Error de análisis"}
+
+@dataclass(frozen=True)
+class PromptKey:
+    """Prompt que produjo un análisis: versión y caracteres de texto que recibe"""
+    version: str
+    sample_chars: int
+
+# Prompt individual de analyze_with_gemini
+SINGLE_PROMPT = PromptKey(ANALYSIS_PROMPT_VERSION, ANALYSIS_TEXT_SAMPLE)
+
+def batch_prompt(excerpt_chars: int) -> PromptKey:
+    """Prompt de analyze_with_gemini_batch (el extracto por libro forma parte de la versión)"""
+    return PromptKey(f"{BATCH_ANALYSIS_PROMPT_VERSION}:{excerpt_chars}", excerpt_chars)
+
+@dataclass
+class CacheStats:
+    """Contadores de uso de la caché (desde el arranque del servidor)"""
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    errors: int = 0
+
+class AnalysisCache:
+    """Caché de análisis de IA respaldada por la base de datos"""
+
+    def __init__(self, max_age_days: int = AI_CACHE_MAX_AGE_DAYS):
+        self.max_age_days = max_age_days
+        self.stats = CacheStats()
+        self.lock = threading.Lock()
+
+    def make_key(self, text: str, prompt: PromptKey = SINGLE_PROMPT) -> str:
+        sample = (text or "")[:prompt.sample_chars]
+        return hashlib.sha256(f"{prompt.version}\n{sample}".encode("utf-8")).hexdigest()
+
+    def _cutoff(self) -> datetime:
+        return datetime.utcnow() - timedelta(days=self.max_age_days)
+
+    def _count(self, field_name: str, amount: int = 1):
+        with self.lock:
+            setattr(self.stats, field_name, getattr(self.stats, field_name) + amount)
+
+    def get(self, text: str, prompts: Sequence[PromptKey] = (SINGLE_PROMPT,)) -> Optional[dict]:
+        """
+        Devuelve el análisis guardado para el texto o None (las entradas caducadas no cuentan).
+        prompts: prompts cuyos resultados se aceptan, en orden de preferencia.
+        """
+        if not text:
+            return None
+        db = database.SessionLocal()
+        try:
+            entry = None
+            for prompt in prompts:
+                entry = crud.get_ai_analysis(db, self.make_key(text, prompt), min_created_at=self._cutoff())
+                if entry is not None:
+                    break
+            if entry is None:
+                self._count("misses")
+                return None
+            crud.touch_ai_analysis(db, entry, datetime.utcnow())
+            self._count("hits")
+            print(f"♻️ Análisis de IA reutilizado de la caché: {entry.title} - {entry.author}")
+            return {"title": entry.title, "author": entry.author, "category": entry.category}
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"Error al consultar la caché de análisis: {e}")
+            return None
+        finally:
+            db.close()
+
+    def put(self, text: str, result: dict, prompt: PromptKey = SINGLE_PROMPT) -> bool:
+        """Guarda un análisis correcto con la versión del prompt que lo produjo; los resultados de error no se guardan"""
+        if not text or not result or result.get("title") in _FAILED_TITLES or result.get("category") == "Error":
+            return False
+        db = database.SessionLocal()
+        try:
+            crud.save_ai_analysis(db, self.make_key(text, prompt), result, datetime.utcnow())
+            self._count("stores")
+            return True
+        except Exception as e:
+            db.rollback()
+            self._count("errors")
+            logger.warning(f"Error al guardar en la caché de análisis: {e}")
+            return False
+        finally:
+            db.close()
+
+    def evict_expired(self, max_age_days: Optional[int] = None) -> int:
+        """Elimina las entradas más antiguas que max_age_days (por defecto, la antigüedad configurada)"""
+        days = self.max_age_days if max_age_days is None else max_age_days
+        db = database.SessionLocal()
+        try:
+            deleted = crud.delete_ai_analyses_older_than(db, datetime.utcnow() - timedelta(days=days))
+            self._count("evictions", deleted)
+            if deleted:
+                print(f"🧹 Caché de análisis: {deleted} entradas con más de {days} días eliminadas")
+            return deleted
+        finally:
+            db.close()
+
+    def clear(self) -> int:
+        """Vacía la caché"""
+        db = database.SessionLocal()
+        try:
+            deleted = crud.clear_ai_analysis_cache(db)
+            self._count("evictions", deleted)
+            return deleted
+        finally:
+            db.close()
+
+    def get_stats(self) -> dict:
+        db = database.SessionLocal()
+        try:
+            entries = crud.count_ai_analyses(db)
+        finally:
+            db.close()
+        with self.lock:
+            lookups = self.stats.hits + self.stats.misses
+            return {
+                "entries": entries,
+                "hits": self.stats.hits,
+                "misses": self.stats.misses,
+                "hit_rate": round(self.stats.hits / lookups, 3) if lookups else 0.0,
+                "stores": self.stats.stores,
+                "evictions": self.stats.evictions,
+                "errors": self.stats.errors,
+                "max_age_days": self.max_age_days,
+                "prompt_version": ANALYSIS_PROMPT_VERSION,
+                "batch_prompt_version": BATCH_ANALYSIS_PROMPT_VERSION
+            }
+
+# Instancia global de la caché
+ai_cache = AnalysisCache()
+
+def get_ai_cache() -> AnalysisCache:
+    """Obtiene la instancia global de la caché de análisis"""
+    return ai_cache
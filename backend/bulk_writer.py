@@ -0,0 +1,163 @@
+"""
+Escritura por lotes de los libros de una importación masiva
+En lugar de un commit (más refresh y el commit de la huella) por libro, la etapa de base de
+datos acumula los libros terminados y los registra en una sola transacción por lote.
+Cada fila pasa por la misma verificación de duplicados que crud.create_book_with_duplicate_check;
+las filas se vuelcan (flush) una a una dentro de la transacción, así que la verificación de
+una fila ve también las anteriores del mismo lote. Si la transacción falla (p. ej. una
+restricción violada por otro escritor), el lote se repite fila por fila para aislar el conflicto.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+import logging
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+import crud
+import models
+
+logger = logging.getLogger(__name__)
+
+# Libros por transacción
+BULK_WRITE_BATCH_SIZE = int(os.getenv("BULK_WRITE_BATCH_SIZE", "50"))
+# Segundos máximos que la etapa de base de datos espera para completar un lote
+BULK_WRITE_MAX_WAIT = float(os.getenv("BULK_WRITE_MAX_WAIT", "2.0"))
+
+@dataclass
+class PendingBook:
+    """Libro listo para registrar"""
+    title: str
+    author: str
+    category: str
+    cover_image_url: Optional[str] = None
+    drive_info: Optional[dict] = None
+    file_path: Optional[str] = None
+    content_hash: Optional[str] = None
+    text_sample: Optional[str] = None
+    isbn: Optional[str] = None
+    key: Any = None  # Identificador del llamante (se devuelve en el resultado)
+
+@dataclass
+class BookWriteResult:
+    """Resultado de una fila: libro registrado, duplicado o error"""
+    key: Any
+    book: Optional[models.Book] = None
+    duplicate_info: Optional[dict] = None  # Resultado de crud.is_duplicate_book
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.book is not None
+
+    @property
+    def message(self) -> str:
+        if self.duplicate_info:
+            return self.duplicate_info["message"]
+        return self.error or ""
+
+@dataclass
+class _WriteStats:
+    rows: int = 0
+    batches: int = 0
+    commits: int = 0
+    duplicates: int = 0
+    errors: int = 0
+    fallbacks: int = 0  # Lotes repetidos fila por fila
+    commit_seconds: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+_stats = _WriteStats()
+
+def _count(**amounts):
+    with _stats.lock:
+        for name, amount in amounts.items():
+            setattr(_stats, name, getattr(_stats, name) + amount)
+
+def get_bulk_write_stats() -> dict:
+    """Filas, lotes y commits de la escritura por lotes (para comparar con un commit por libro)"""
+    with _stats.lock:
+        return {
+            "batch_size": BULK_WRITE_BATCH_SIZE,
+            "rows": _stats.rows,
+            "batches": _stats.batches,
+            "commits": _stats.commits,
+            "duplicates": _stats.duplicates,
+            "errors": _stats.errors,
+            "fallbacks": _stats.fallbacks,
+            "avg_commit_ms": round(_stats.commit_seconds / _stats.commits * 1000, 2) if _stats.commits else 0.0
+        }
+
+def _add_row(db: Session, row: PendingBook) -> BookWriteResult:
+    """Verifica duplicados y añade la fila a la transacción en curso (sin confirmar)"""
+    duplicate_check = crud.is_duplicate_book(
+        db, row.title, row.author, row.file_path, content_hash=row.content_hash,
+        text_sample=row.text_sample, isbn=row.isbn
+    )
+    if duplicate_check["is_duplicate"]:
+        return BookWriteResult(row.key, duplicate_info=duplicate_check)
+
+    book = crud.new_book_row(
+        row.title, row.author, row.category, row.cover_image_url,
+        row.drive_info, row.file_path, row.content_hash, row.isbn
+    )
+    db.add(book)
+    # El flush asigna el id y hace visible la fila a las verificaciones de las siguientes
+    db.flush()
+    crud.index_book_fingerprint(db, book, row.text_sample, commit=False)
+    db.flush()
+    return BookWriteResult(row.key, book=book)
+
+def _write_rows_individually(db: Session, rows: List[PendingBook]) -> List[BookWriteResult]:
+    """Alternativa tras un lote fallido: una transacción por fila para aislar los conflictos"""
+    results = []
+    for row in rows:
+        try:
+            result = _add_row(db, row)
+            db.commit()
+            _count(commits=1)
+        except (IntegrityError, OperationalError, ValueError) as e:
+            db.rollback()
+            result = BookWriteResult(row.key, error=f"Error al crear libro: {e}")
+        results.append(result)
+    return results
+
+def write_books(db: Session, rows: List[PendingBook]) -> List[BookWriteResult]:
+    """
+    Registra los libros en una sola transacción y devuelve un resultado por fila, en el
+    mismo orden. Los duplicados y los errores de validación afectan solo a su fila.
+    """
+    if not rows:
+        return []
+
+    results: List[BookWriteResult] = []
+    single_transaction = True
+    try:
+        for row in rows:
+            try:
+                results.append(_add_row(db, row))
+            except ValueError as e:
+                results.append(BookWriteResult(row.key, error=f"Error al crear libro: {e}"))
+        started = time.time()
+        db.commit()
+        _count(commits=1, commit_seconds=time.time() - started)
+    except (IntegrityError, OperationalError) as e:
+        db.rollback()
+        logger.warning(f"Lote de {len(rows)} libros rechazado ({e.__class__.__name__}), reintentando fila por fila")
+        _count(fallbacks=1)
+        single_transaction = False
+        results = _write_rows_individually(db, rows)
+
+    _count(
+        rows=len(rows),
+        batches=1,
+        duplicates=sum(1 for result in results if result.duplicate_info),
+        errors=sum(1 for result in results if result.error)
+    )
+    created = sum(1 for result in results if result.success)
+    print(f"💾 Lote registrado: {created}/{len(rows)} libros {'en una transacción' if single_transaction else 'fila por fila'}")
+    return results
@@ -0,0 +1,286 @@
+"""
+Subidas por partes reanudables para libros grandes
+El cliente crea una sesión (nombre, tamaño y, opcionalmente, el SHA-256 del archivo) y envía
+el contenido en partes numeradas, cada una con su SHA-256. Las partes se escriben en su
+posición dentro de un único archivo preasignado, así que pueden llegar en cualquier orden
+o repetirse. El estado de la sesión se guarda en disco: tras un corte de conexión (o un
+reinicio del servidor) el cliente consulta qué partes faltan y continúa desde ahí.
+Al finalizar se verifica el archivo completo y se entrega como una subida normal.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import logging
+
+from upload_stream import (
+    _parse_size,
+    safe_upload_filename,
+    StreamedUpload,
+    UploadTooLargeError,
+    MAX_UPLOAD_SIZE,
+    UPLOAD_CHUNK_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+# Directorio de las sesiones en curso (un subdirectorio por sesión)
+CHUNKED_UPLOAD_DIR = os.getenv("CHUNKED_UPLOAD_DIR", "temp_chunked_uploads")
+# Tamaño de parte por defecto y límites aceptados
+CHUNKED_UPLOAD_CHUNK_SIZE = _parse_size(os.getenv("CHUNKED_UPLOAD_CHUNK_SIZE", ""), 8 * 1024 * 1024)
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+# Horas sin actividad tras las que una sesión se descarta
+CHUNKED_UPLOAD_TTL_HOURS = int(os.getenv("CHUNKED_UPLOAD_TTL_HOURS", "24"))
+
+UPLOAD_MODES = ("local", "cloud")
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+_SHA256_HEX = re.compile(r"^[0-9a-f]{64}$")
+
+class ChunkedUploadError(Exception):
+    """Petición no válida para la sesión de subida"""
+
+class UploadSessionNotFoundError(ChunkedUploadError):
+    """La sesión no existe, expiró o ya se finalizó"""
+
+class ChunkChecksumError(ChunkedUploadError):
+    """El contenido recibido no coincide con el SHA-256 declarado"""
+
+class IncompleteUploadError(ChunkedUploadError):
+    """Se intentó finalizar con partes pendientes"""
+    def __init__(self, missing: List[int]):
+        self.missing = missing
+        super().__init__(f"Faltan {len(missing)} partes por subir")
+
+@dataclass
+class UploadSession:
+    id: str
+    filename: str
+    size: int
+    chunk_size: int
+    mode: str
+    created_at: str  # Fechas ISO en UTC
+    updated_at: str
+    sha256: Optional[str] = None  # SHA-256 esperado del archivo completo (opcional)
+    chunks: Dict[int, str] = field(default_factory=dict)  # Parte recibida -> SHA-256
+
+    @property
+    def total_chunks(self) -> int:
+        return (self.size + self.chunk_size - 1) // self.chunk_size
+
+    def chunk_length(self, index: int) -> int:
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def missing_chunks(self) -> List[int]:
+        return [index for index in range(self.total_chunks) if index not in self.chunks]
+
+    def to_dict(self) -> dict:
+        missing = self.missing_chunks()
+        return {
+            "upload_id": self.id,
+            "filename": self.filename,
+            "size": self.size,
+            "chunk_size": self.chunk_size,
+            "mode": self.mode,
+            "total_chunks": self.total_chunks,
+            "received_chunks": len(self.chunks),
+            "received_bytes": sum(self.chunk_length(index) for index in self.chunks),
+            "missing_chunks": missing,
+            "complete": not missing,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+class ChunkedUploadManager:
+    """Sesiones de subida por partes guardadas en disco"""
+
+    def __init__(self, base_dir: str = CHUNKED_UPLOAD_DIR):
+        self.base_dir = base_dir
+        self.lock = threading.Lock()
+        self._session_locks: Dict[str, threading.Lock] = {}
+
+    # --- Almacenamiento ---
+
+    def _session_dir(self, upload_id: str) -> str:
+        if not _SESSION_ID.match(upload_id or ""):
+            raise UploadSessionNotFoundError("Sesión de subida no encontrada")
+        return os.path.join(self.base_dir, upload_id)
+
+    def _data_path(self, upload_id: str) -> str:
+        return os.path.join(self._session_dir(upload_id), "data.part")
+
+    def _session_lock(self, upload_id: str) -> threading.Lock:
+        with self.lock:
+            return self._session_locks.setdefault(upload_id, threading.Lock())
+
+    def _load(self, upload_id: str) -> UploadSession:
+        path = os.path.join(self._session_dir(upload_id), "session.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            raise UploadSessionNotFoundError("Sesión de subida no encontrada")
+        data["chunks"] = {int(index): checksum for index, checksum in data.get("chunks", {}).items()}
+        return UploadSession(**data)
+
+    def _save(self, session: UploadSession):
+        # Escritura atómica: el estado nunca queda a medias tras un corte
+        path = os.path.join(self._session_dir(session.id), "session.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(asdict(session), f)
+        os.replace(path + ".tmp", path)
+
+    # --- Sesiones ---
+
+    def create_session(self, filename: str, size: int, mode: str, chunk_size: Optional[int] = None,
+                       sha256: Optional[str] = None) -> UploadSession:
+        filename = safe_upload_filename(filename)
+        if os.path.splitext(filename)[1].lower() not in (".pdf", ".epub"):
+            raise ChunkedUploadError("Tipo de archivo no soportado.")
+        if mode not in UPLOAD_MODES:
+            raise ChunkedUploadError(f"Modo no válido: {mode}")
+        if size <= 0:
+            raise ChunkedUploadError("El tamaño del archivo debe ser mayor que cero")
+        if MAX_UPLOAD_SIZE and size > MAX_UPLOAD_SIZE:
+            raise UploadTooLargeError(MAX_UPLOAD_SIZE)
+        chunk_size = chunk_size or CHUNKED_UPLOAD_CHUNK_SIZE
+        if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise ChunkedUploadError(f"El tamaño de parte debe estar entre {MIN_CHUNK_SIZE} y {MAX_CHUNK_SIZE} bytes")
+        sha256 = (sha256 or "").strip().lower() or None
+        if sha256 and not _SHA256_HEX.match(sha256):
+            raise ChunkedUploadError("SHA-256 no válido")
+
+        now = datetime.utcnow().isoformat()
+        session = UploadSession(
+            id=uuid.uuid4().hex, filename=filename, size=size, chunk_size=chunk_size,
+            mode=mode, created_at=now, updated_at=now, sha256=sha256
+        )
+        os.makedirs(self._session_dir(session.id), exist_ok=True)
+        # Archivo del tamaño final: cada parte se escribe en su posición
+        with open(self._data_path(session.id), "wb") as f:
+            f.truncate(size)
+        self._save(session)
+        print(f"📦 Sesión de subida {session.id}: {filename} ({size} bytes en {session.total_chunks} partes)")
+        return session
+
+    def get_session(self, upload_id: str) -> UploadSession:
+        return self._load(upload_id)
+
+    def write_chunk(self, upload_id: str, index: int, data: bytes, checksum: Optional[str] = None) -> UploadSession:
+        """Guarda una parte (repetir una parte ya recibida la sobrescribe)"""
+        with self._session_lock(upload_id):
+            session = self._load(upload_id)
+            if not 0 <= index < session.total_chunks:
+                raise ChunkedUploadError(f"Parte fuera de rango: {index} (la sesión tiene {session.total_chunks})")
+            expected_length = session.chunk_length(index)
+            if len(data) != expected_length:
+                raise ChunkedUploadError(f"La parte {index} debe tener {expected_length} bytes (recibidos {len(data)})")
+            digest = hashlib.sha256(data).hexdigest()
+            if checksum and checksum.strip().lower() != digest:
+                raise ChunkChecksumError(f"El SHA-256 de la parte {index} no coincide")
+
+            with open(self._data_path(upload_id), "r+b") as f:
+                f.seek(index * session.chunk_size)
+                f.write(data)
+                f.flush()
+                # La parte se marca como recibida solo cuando ya está en disco
+                os.fsync(f.fileno())
+
+            session.chunks[index] = digest
+            session.updated_at = datetime.utcnow().isoformat()
+            self._save(session)
+            return session
+
+    def finalize(self, upload_id: str, dest_dir: str, prefix: Optional[str] = None) -> StreamedUpload:
+        """
+        Verifica todas las partes y el SHA-256 del archivo completo, y lo mueve a dest_dir
+        con el mismo formato de nombre que stream_upload_to_disk. La sesión se elimina.
+        """
+        with self._session_lock(upload_id):
+            session = self._load(upload_id)
+            missing = session.missing_chunks()
+            if missing:
+                raise IncompleteUploadError(missing)
+
+            # Una sola lectura: hash del archivo completo y comprobación de cada parte
+            data_path = self._data_path(upload_id)
+            file_hasher = hashlib.sha256()
+            with open(data_path, "rb") as f:
+                for index in range(session.total_chunks):
+                    chunk_hasher = hashlib.sha256()
+                    remaining = session.chunk_length(index)
+                    while remaining:
+                        block = f.read(min(UPLOAD_CHUNK_SIZE, remaining))
+                        if not block:
+                            break
+                        remaining -= len(block)
+                        chunk_hasher.update(block)
+                        file_hasher.update(block)
+                    if chunk_hasher.hexdigest() != session.chunks[index]:
+                        # La parte se volverá a pedir
+                        session.chunks.pop(index)
+                        self._save(session)
+                        raise ChunkChecksumError(f"La parte {index} está dañada en el servidor, vuelva a enviarla")
+            sha256 = file_hasher.hexdigest()
+            if session.sha256 and session.sha256 != sha256:
+                raise ChunkChecksumError("El SHA-256 del archivo completo no coincide con el declarado")
+
+            os.makedirs(dest_dir, exist_ok=True)
+            final_path = os.path.join(dest_dir, f"{prefix or uuid.uuid4()}_{session.filename}")
+            shutil.move(data_path, final_path)
+            self._remove(upload_id)
+            print(f"✅ Subida por partes {upload_id} completa: {final_path} ({session.size} bytes, sha256 {sha256[:12]}...)")
+            return StreamedUpload(
+                file_path=final_path,
+                original_filename=session.filename,
+                size=session.size,
+                sha256=sha256
+            )
+
+    def abort(self, upload_id: str) -> bool:
+        with self._session_lock(upload_id):
+            if not os.path.isdir(self._session_dir(upload_id)):
+                return False
+            self._remove(upload_id)
+            return True
+
+    def _remove(self, upload_id: str):
+        shutil.rmtree(self._session_dir(upload_id), ignore_errors=True)
+        with self.lock:
+            self._session_locks.pop(upload_id, None)
+
+    def cleanup_expired(self) -> int:
+        """Elimina las sesiones sin actividad durante más de CHUNKED_UPLOAD_TTL_HOURS"""
+        if not os.path.isdir(self.base_dir):
+            return 0
+        cutoff = datetime.utcnow() - timedelta(hours=CHUNKED_UPLOAD_TTL_HOURS)
+        removed = 0
+        for upload_id in os.listdir(self.base_dir):
+            try:
+                session = self._load(upload_id)
+                expired = datetime.fromisoformat(session.updated_at) < cutoff
+            except UploadSessionNotFoundError:
+                expired = True  # Directorio sin estado (creación interrumpida) o ajeno
+            except Exception as e:
+                logger.warning(f"Sesión de subida {upload_id} ilegible: {e}")
+                expired = True
+            if expired and _SESSION_ID.match(upload_id):
+                self._remove(upload_id)
+                removed += 1
+        if removed:
+            print(f"🧹 {removed} sesiones de subida por partes expiradas eliminadas")
+        return removed
+
+# Instancia global del gestor de subidas por partes
+chunked_upload_manager = ChunkedUploadManager()
+
+def get_chunked_upload_manager() -> ChunkedUploadManager:
+    """Obtiene la instancia global del gestor de subidas por partes"""
+    return chunked_upload_manager
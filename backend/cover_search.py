@@ -21,6 +21,15 @@ class CoverSearchEngine:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
         
+    def search_openlibrary_isbn(self, isbn: str) -> Optional[str]:
+        """
+        Portada de OpenLibrary por ISBN: una sola petición, sin búsqueda por texto
+        """
+        if not isbn:
+            return None
+        # default=false: OpenLibrary responde 404 (la descarga falla) en lugar de una imagen vacía
+        return f"https://covers.openlibrary.org/b/isbn/{quote_plus(isbn)}-L.jpg?default=false"
+    
     def search_google_images(self, title: str, author: str = None) -> Optional[str]:
         """
         Busca portadas usando Google Images
@@ -225,9 +234,9 @@ class CoverSearchEngine:
             logger.warning(f"Error al descargar imagen: {e}")
             return None
     
-    def search_book_cover(self, title: str, author: str = None, static_dir: str = "static/covers") -> Optional[str]:
+    def search_book_cover(self, title: str, author: str = None, static_dir: str = "static/covers", isbn: str = None) -> Optional[str]:
         """
-        Busca una portada de libro usando múltiples fuentes
+        Busca una portada de libro usando múltiples fuentes (primero por ISBN, si se conoce)
         """
         logger.info(f"🔍 Buscando portada online para: '{title}' por '{author}'")
         
@@ -241,6 +250,8 @@ class CoverSearchEngine:
             ("Goodreads", lambda: self.search_goodreads(title, author)),
             ("Amazon", lambda: self.search_amazon(title, author))
         ]
+        if isbn:
+            search_methods.insert(0, ("OpenLibrary ISBN", lambda: self.search_openlibrary_isbn(isbn)))
         
         for method_name, search_func in search_methods:
             try:
@@ -273,8 +284,8 @@ class CoverSearchEngine:
 # Instancia global del motor de búsqueda
 cover_search_engine = CoverSearchEngine()
 
-def search_book_cover_online(title: str, author: str = None, static_dir: str = "static/covers") -> Optional[str]:
+def search_book_cover_online(title: str, author: str = None, static_dir: str = "static/covers", isbn: str = None) -> Optional[str]:
     """
     Función de conveniencia para buscar portadas online
     """
-    return cover_search_engine.search_book_cover(title, author, static_dir)
+    return cover_search_engine.search_book_cover(title, author, static_dir, isbn=isbn)
@@ -1,9 +1,12 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, or_, and_, func
 import models
+import database
 import os
 import logging
+import threading
 from pathlib import Path
+import near_duplicates
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -25,6 +28,34 @@ def get_book_by_filename(db: Session, filename: str):
         )
     ).first()
 
+# Máximo de parámetros por consulta IN (límite de variables de SQLite)
+CONTENT_HASH_QUERY_BATCH = 900
+
+def get_book_by_content_hash(db: Session, content_hash: str):
+    """Busca un libro por el hash SHA-256 de su contenido (búsqueda por índice único)"""
+    if not content_hash:
+        return None
+    return db.query(models.Book).filter(models.Book.content_hash == content_hash).first()
+
+def get_book_by_isbn(db: Session, isbn: str):
+    """Busca un libro por su ISBN-13 normalizado (búsqueda por índice)"""
+    if not isbn:
+        return None
+    return db.query(models.Book).filter(models.Book.isbn == isbn).first()
+
+def get_books_by_content_hashes(db: Session, content_hashes: list[str]) -> dict:
+    """
+    Busca varios hashes de contenido con una consulta IN (...) por lote.
+    Retorna un diccionario {hash: libro} solo con los hashes que ya existen.
+    """
+    unique_hashes = list({h for h in content_hashes if h})
+    found = {}
+    for start in range(0, len(unique_hashes), CONTENT_HASH_QUERY_BATCH):
+        batch = unique_hashes[start:start + CONTENT_HASH_QUERY_BATCH]
+        for book in db.query(models.Book).filter(models.Book.content_hash.in_(batch)).all():
+            found[book.content_hash] = book
+    return found
+
 def get_book_by_title_author(db: Session, title: str, author: str):
     """Busca un libro por título y autor (comparación exacta)"""
     return db.query(models.Book).filter(
@@ -32,8 +63,119 @@ def get_book_by_title_author(db: Session, title: str, author: str):
         models.Book.author == author
     ).first()
 
-def get_book_by_title_author_fuzzy(db: Session, title: str, author: str):
-    """Busca un libro por título y autor (comparación aproximada)"""
+# Máximo de candidatos LSH que se verifican por consulta
+NEAR_DUPLICATE_MAX_CANDIDATES = 200
+
+# Libros por transacción al rellenar las huellas que falten
+FINGERPRINT_BACKFILL_BATCH = 500
+# Espera antes de repetir un relleno que falló
+FINGERPRINT_BACKFILL_RETRY_SECONDS = int(os.getenv("FINGERPRINT_BACKFILL_RETRY_SECONDS", "60"))
+
+_fingerprint_index_ready = False
+_fingerprint_backfill_lock = threading.Lock()
+# Protege el indicador y el contador de libros que no se pudieron indexar al crearlos
+_fingerprint_state_lock = threading.Lock()
+_fingerprint_failures = 0
+
+def index_book_fingerprint(db: Session, book: models.Book, text_sample: str = None, commit: bool = True):
+    """
+    Calcula y guarda la huella de casi-duplicados de un libro y sus buckets LSH.
+    Si ya existía, se reemplaza (por ejemplo, tras editar título o autor).
+    Si no se recibe texto, se conserva el SimHash previo.
+    """
+    existing = db.query(models.BookFingerprint).filter(models.BookFingerprint.book_id == book.id).first()
+    fingerprint = near_duplicates.compute_fingerprint(book.title, book.author, text_sample)
+    if fingerprint.simhash is None and existing and existing.text_simhash:
+        fingerprint.simhash = near_duplicates.decode_simhash(existing.text_simhash)
+        fingerprint.bucket_keys = near_duplicates.lsh_bucket_keys(fingerprint.minhash, fingerprint.simhash)
+    
+    db.query(models.BookLshBucket).filter(models.BookLshBucket.book_id == book.id).delete(synchronize_session=False)
+    if existing:
+        existing.minhash = near_duplicates.encode_signature(fingerprint.minhash)
+        existing.text_simhash = near_duplicates.encode_simhash(fingerprint.simhash)
+    else:
+        db.add(models.BookFingerprint(
+            book_id=book.id,
+            minhash=near_duplicates.encode_signature(fingerprint.minhash),
+            text_simhash=near_duplicates.encode_simhash(fingerprint.simhash)
+        ))
+    db.add_all([models.BookLshBucket(bucket_key=key, book_id=book.id) for key in fingerprint.bucket_keys])
+    if commit:
+        db.commit()
+
+def remove_book_fingerprint(db: Session, book_id: int):
+    """Elimina la huella y los buckets LSH de un libro (sin confirmar la transacción)"""
+    db.query(models.BookLshBucket).filter(models.BookLshBucket.book_id == book_id).delete(synchronize_session=False)
+    db.query(models.BookFingerprint).filter(models.BookFingerprint.book_id == book_id).delete(synchronize_session=False)
+
+def fingerprint_index_ready() -> bool:
+    """True cuando todos los libros tienen huella (relleno inicial terminado en este proceso)"""
+    return _fingerprint_index_ready
+
+def backfill_fingerprint_index(db: Session) -> int:
+    """
+    Genera las huellas que falten (libros registrados antes de existir el índice), en lotes
+    con una transacción cada uno. Se ejecuta en segundo plano al iniciar el servidor; mientras
+    no termina, get_book_by_title_author_fuzzy usa la consulta ILIKE en lugar de bloquear.
+    Retorna el número de libros indexados (0 si ya estaba completo o hay otro relleno en curso).
+    """
+    global _fingerprint_index_ready
+    if _fingerprint_index_ready or not _fingerprint_backfill_lock.acquire(blocking=False):
+        return 0
+    try:
+        total = 0
+        while True:
+            failures = _fingerprint_failures
+            missing = db.query(models.Book).outerjoin(
+                models.BookFingerprint, models.BookFingerprint.book_id == models.Book.id
+            ).filter(models.BookFingerprint.book_id.is_(None)).limit(FINGERPRINT_BACKFILL_BATCH).all()
+            if not missing:
+                with _fingerprint_state_lock:
+                    # Si un libro falló al indexarse durante la última consulta, se repite
+                    if failures == _fingerprint_failures:
+                        _fingerprint_index_ready = True
+                        return total
+                continue
+            for book in missing:
+                index_book_fingerprint(db, book, commit=False)
+            db.commit()
+            total += len(missing)
+    finally:
+        _fingerprint_backfill_lock.release()
+
+def _run_fingerprint_backfill():
+    db = database.SessionLocal()
+    try:
+        indexed = backfill_fingerprint_index(db)
+        if indexed:
+            print(f"🧬 Índice de casi-duplicados completado: {indexed} libros indexados")
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"No se pudo completar el índice de casi-duplicados, se reintentará: {e}")
+        start_fingerprint_backfill(FINGERPRINT_BACKFILL_RETRY_SECONDS)
+    finally:
+        db.close()
+
+def start_fingerprint_backfill(delay: float = 0):
+    """Lanza el relleno de huellas en un hilo en segundo plano (tras delay segundos)"""
+    timer = threading.Timer(delay, _run_fingerprint_backfill)
+    timer.daemon = True
+    timer.name = "fingerprint-backfill"
+    timer.start()
+
+def _mark_fingerprint_missing():
+    """
+    Un libro quedó sin huella: el índice deja de estar completo (las búsquedas vuelven a la
+    consulta ILIKE) y el relleno en segundo plano lo recoge
+    """
+    global _fingerprint_index_ready, _fingerprint_failures
+    with _fingerprint_state_lock:
+        _fingerprint_failures += 1
+        _fingerprint_index_ready = False
+    start_fingerprint_backfill(FINGERPRINT_BACKFILL_RETRY_SECONDS)
+
+def _get_book_by_title_author_ilike(db: Session, title: str, author: str):
+    """Comparación aproximada por ILIKE (recorre la tabla): solo mientras se rellena el índice"""
     return db.query(models.Book).filter(
         or_(
             models.Book.title.ilike(f"%{title}%"),
@@ -45,11 +187,66 @@ def get_book_by_title_author_fuzzy(db: Session, title: str, author: str):
         )
     ).first()
 
-def is_duplicate_book(db: Session, title: str, author: str, file_path: str = None) -> dict:
+def get_book_by_title_author_fuzzy(db: Session, title: str, author: str, text_sample: str = None):
+    """
+    Busca un libro por título y autor (comparación aproximada).
+    Los candidatos salen de los buckets LSH (consulta por índice) y se verifican
+    con la similitud MinHash de título/autor y el SimHash del texto.
+    Mientras el índice no está completo se usa la consulta ILIKE anterior.
+    """
+    if not _fingerprint_index_ready:
+        return _get_book_by_title_author_ilike(db, title, author)
+    fingerprint = near_duplicates.compute_fingerprint(title, author, text_sample)
+    if not fingerprint.bucket_keys:
+        return None
+    
+    candidate_ids = [
+        row[0] for row in db.query(models.BookLshBucket.book_id).filter(
+            models.BookLshBucket.bucket_key.in_(fingerprint.bucket_keys)
+        ).distinct().limit(NEAR_DUPLICATE_MAX_CANDIDATES).all()
+    ]
+    if not candidate_ids:
+        return None
+    
+    best_id, best_score = None, 0.0
+    for stored in db.query(models.BookFingerprint).filter(models.BookFingerprint.book_id.in_(candidate_ids)).all():
+        score = near_duplicates.near_duplicate_score(
+            fingerprint,
+            near_duplicates.decode_signature(stored.minhash),
+            near_duplicates.decode_simhash(stored.text_simhash)
+        )
+        if score > best_score:
+            best_id, best_score = stored.book_id, score
+    
+    return get_book(db, best_id) if best_id is not None else None
+
+def is_duplicate_book(db: Session, title: str, author: str, file_path: str = None, content_hash: str = None, text_sample: str = None, isbn: str = None) -> dict:
     """
     Verifica si un libro es un duplicado basándose en múltiples criterios.
     Retorna un diccionario con información sobre el duplicado encontrado.
     """
+    # Verificar por hash de contenido (mismo archivo, aunque tenga otro nombre)
+    if content_hash:
+        existing_by_hash = get_book_by_content_hash(db, content_hash)
+        if existing_by_hash:
+            return {
+                "is_duplicate": True,
+                "reason": "content_hash",
+                "existing_book": existing_by_hash,
+                "message": f"Ya existe un libro con el mismo contenido: '{existing_by_hash.title}' por {existing_by_hash.author}"
+            }
+    
+    # Verificar por ISBN (la misma edición en otro archivo), antes de las comparaciones de texto
+    if isbn:
+        existing_by_isbn = get_book_by_isbn(db, isbn)
+        if existing_by_isbn:
+            return {
+                "is_duplicate": True,
+                "reason": "isbn",
+                "existing_book": existing_by_isbn,
+                "message": f"Ya existe un libro con el mismo ISBN ({isbn}): '{existing_by_isbn.title}' por {existing_by_isbn.author}"
+            }
+    
     # Verificar por nombre de archivo si se proporciona
     if file_path:
         filename = Path(file_path).name
@@ -73,7 +270,7 @@ def is_duplicate_book(db: Session, title: str, author: str, file_path: str = Non
         }
     
     # Verificar por título y autor aproximado (fuzzy matching)
-    existing_fuzzy = get_book_by_title_author_fuzzy(db, title, author)
+    existing_fuzzy = get_book_by_title_author_fuzzy(db, title, author, text_sample)
     if existing_fuzzy:
         return {
             "is_duplicate": True,
@@ -173,65 +370,125 @@ def get_books(db: Session, category: str | None = None, search: str | None = Non
         }
     }
 
+def _placeholder_metadata_filter(titles: list, authors: list, categories: list):
+    return or_(
+        models.Book.title.in_(titles),
+        models.Book.author.in_(authors),
+        models.Book.category.in_(categories)
+    )
+
+def count_books_with_placeholder_metadata(db: Session, titles: list, authors: list, categories: list) -> int:
+    return db.query(func.count(models.Book.id)).filter(_placeholder_metadata_filter(titles, authors, categories)).scalar()
+
+def get_books_with_placeholder_metadata(db: Session, titles: list, authors: list, categories: list,
+                                        exclude_ids: list = None, limit: int = 20) -> list:
+    """Libros cuyo título, autor o categoría es un valor de relleno de un análisis de IA fallido"""
+    query = db.query(models.Book).filter(_placeholder_metadata_filter(titles, authors, categories))
+    if exclude_ids:
+        query = query.filter(models.Book.id.notin_(exclude_ids))
+    return query.order_by(models.Book.id).limit(limit).all()
+
+def update_books_metadata(db: Session, updates: list, text_samples: dict = None) -> int:
+    """
+    Actualiza título, autor y categoría de varios libros en una sola transacción.
+    updates: lista de {"id", "title", "author", "category"}; las huellas de casi-duplicados
+    se recalculan con los nuevos valores (text_samples: {id: texto} opcional).
+    """
+    if not updates:
+        return 0
+    db.bulk_update_mappings(models.Book, updates)
+    book_ids = [update["id"] for update in updates]
+    for book in db.query(models.Book).filter(models.Book.id.in_(book_ids)).populate_existing():
+        index_book_fingerprint(db, book, (text_samples or {}).get(book.id), commit=False)
+    db.commit()
+    return len(updates)
+
 def get_categories(db: Session) -> list[str]:
     return [c[0] for c in db.query(models.Book.category).distinct().order_by(models.Book.category).all()]
 
-def create_book(db: Session, title: str, author: str, category: str, cover_image_url: str, drive_info: dict, file_path: str = None):
+def _index_new_book(db: Session, book: models.Book, text_sample: str = None):
+    """
+    Indexa la huella de un libro recién creado sin afectar a su creación si falla
+    (en ese caso el relleno en segundo plano lo indexa más tarde)
+    """
+    try:
+        index_book_fingerprint(db, book, text_sample)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"No se pudo indexar la huella del libro {book.id}, se reintentará en segundo plano: {e}")
+        _mark_fingerprint_missing()
+
+def new_book_row(title: str, author: str, category: str, cover_image_url: str, drive_info: dict = None, file_path: str = None, content_hash: str = None, isbn: str = None) -> models.Book:
+    """
+    Construye (sin añadirlo a la sesión) el registro de un libro: de Google Drive si se
+    recibe drive_info, local si solo hay ruta de archivo
+    """
+    if drive_info and drive_info.get('id'):
+        return models.Book(
+            title=title,
+            author=author,
+            category=category,
+            cover_image_url=cover_image_url,
+            file_path=file_path,  # Opcional, solo para archivos temporales
+            drive_file_id=drive_info['id'],
+            drive_web_link=drive_info.get('web_view_link'),
+            drive_letter_folder=drive_info.get('letter_folder'),
+            drive_filename=drive_info.get('filename'),
+            content_hash=content_hash,
+            isbn=isbn
+        )
+    if file_path:
+        return models.Book(
+            title=title,
+            author=author,
+            category=category,
+            cover_image_url=cover_image_url,
+            file_path=file_path,
+            drive_file_id=None,
+            drive_web_link=None,
+            drive_letter_folder=None,
+            drive_filename=None,
+            synced_to_drive=False,
+            content_hash=content_hash,
+            isbn=isbn
+        )
+    raise ValueError("Se requiere información de Google Drive o una ruta de archivo local para crear el libro")
+
+def create_book(db: Session, title: str, author: str, category: str, cover_image_url: str, drive_info: dict, file_path: str = None, content_hash: str = None, text_sample: str = None, isbn: str = None):
     """
     Crea un libro en la base de datos con Google Drive como almacenamiento principal
     """
     if not drive_info or not drive_info.get('id'):
         raise ValueError("Se requiere información de Google Drive para crear el libro")
     
-    db_book = models.Book(
-        title=title,
-        author=author,
-        category=category,
-        cover_image_url=cover_image_url,
-        file_path=file_path,  # Opcional, solo para archivos temporales
-        drive_file_id=drive_info['id'],
-        drive_web_link=drive_info.get('web_view_link'),
-        drive_letter_folder=drive_info.get('letter_folder'),
-        drive_filename=drive_info.get('filename')
-    )
-    
+    db_book = new_book_row(title, author, category, cover_image_url, drive_info, file_path, content_hash, isbn)
     db.add(db_book)
     db.commit()
     db.refresh(db_book)
+    _index_new_book(db, db_book, text_sample)
     return db_book
 
-def create_local_book(db: Session, title: str, author: str, category: str, cover_image_url: str, file_path: str):
+def create_local_book(db: Session, title: str, author: str, category: str, cover_image_url: str, file_path: str, content_hash: str = None, text_sample: str = None, isbn: str = None):
     """
     Crea un libro local en la base de datos sin Google Drive
     """
     if not file_path:
         raise ValueError("Se requiere una ruta de archivo para crear un libro local")
     
-    db_book = models.Book(
-        title=title,
-        author=author,
-        category=category,
-        cover_image_url=cover_image_url,
-        file_path=file_path,
-        drive_file_id=None,
-        drive_web_link=None,
-        drive_letter_folder=None,
-        drive_filename=None,
-        synced_to_drive=False
-    )
-    
+    db_book = new_book_row(title, author, category, cover_image_url, None, file_path, content_hash, isbn)
     db.add(db_book)
     db.commit()
     db.refresh(db_book)
+    _index_new_book(db, db_book, text_sample)
     return db_book
 
-def create_book_with_duplicate_check(db: Session, title: str, author: str, category: str, cover_image_url: str, drive_info: dict = None, file_path: str = None):
+def create_book_with_duplicate_check(db: Session, title: str, author: str, category: str, cover_image_url: str, drive_info: dict = None, file_path: str = None, content_hash: str = None, text_sample: str = None, isbn: str = None):
     """
     Crea un libro verificando duplicados primero.
     Retorna el libro creado o información sobre el duplicado encontrado.
     """
     # Verificar duplicados
-    duplicate_check = is_duplicate_book(db, title, author, file_path)
+    duplicate_check = is_duplicate_book(db, title, author, file_path, content_hash=content_hash, text_sample=text_sample, isbn=isbn)
     
     if duplicate_check["is_duplicate"]:
         return {
@@ -245,10 +502,10 @@ def create_book_with_duplicate_check(db: Session, title: str, author: str, categ
         # Determinar si es un libro local o de Google Drive
         if drive_info and drive_info.get('id'):
             # Libro de Google Drive
-            db_book = create_book(db, title, author, category, cover_image_url, drive_info, file_path)
+            db_book = create_book(db, title, author, category, cover_image_url, drive_info, file_path, content_hash=content_hash, text_sample=text_sample, isbn=isbn)
         elif file_path:
             # Libro local
-            db_book = create_local_book(db, title, author, category, cover_image_url, file_path)
+            db_book = create_local_book(db, title, author, category, cover_image_url, file_path, content_hash=content_hash, text_sample=text_sample, isbn=isbn)
         else:
             raise ValueError("Se requiere información de Google Drive o una ruta de archivo local para crear el libro")
         
@@ -258,6 +515,8 @@ def create_book_with_duplicate_check(db: Session, title: str, author: str, categ
             "book": db_book
         }
     except Exception as e:
+        # Deshacer la transacción (por ejemplo, si otro proceso registró el mismo hash de contenido)
+        db.rollback()
         logger.error(f"Error al crear libro: {e}")
         return {
             "success": False,
@@ -329,7 +588,8 @@ def delete_book(db: Session, book_id: int):
             except OSError as e:
                 logger.warning(f"No se pudo eliminar la imagen de portada {book.cover_image_url}: {e}")
         
-        # Eliminar de la base de datos
+        # Eliminar de la base de datos (incluida la huella de casi-duplicados)
+        remove_book_fingerprint(db, book.id)
         db.delete(book)
         db.commit()
         logger.info(f"Libro eliminado de la base de datos: {book.title}")
@@ -408,6 +668,7 @@ def delete_books_by_category(db: Session, category: str):
                 except OSError as e:
                     logger.warning(f"No se pudo eliminar la imagen de portada {book.cover_image_url}: {e}")
             
+            remove_book_fingerprint(db, book.id)
             db.delete(book)
             deleted_count += 1
         
@@ -734,4 +995,190 @@ def get_library_metrics(db: Session) -> dict:
         "hybrid_books": hybrid_books,
         "total_categories": total_categories,
         "categories": categories_info
-    }
\ No newline at end of file
+    }
+# --- Caché persistente de análisis con IA ---
+
+def get_ai_analysis(db: Session, cache_key: str, min_created_at=None):
+    """Busca un análisis guardado; si se indica min_created_at, ignora los más antiguos"""
+    query = db.query(models.AIAnalysisCache).filter(models.AIAnalysisCache.cache_key == cache_key)
+    if min_created_at is not None:
+        query = query.filter(models.AIAnalysisCache.created_at >= min_created_at)
+    return query.first()
+
+def touch_ai_analysis(db: Session, entry: models.AIAnalysisCache, used_at):
+    """Registra un acierto de caché"""
+    entry.hits = (entry.hits or 0) + 1
+    entry.last_used_at = used_at
+    db.commit()
+
+def save_ai_analysis(db: Session, cache_key: str, result: dict, created_at):
+    """Guarda (o reemplaza) el análisis de IA asociado a una huella de texto"""
+    entry = db.query(models.AIAnalysisCache).filter(models.AIAnalysisCache.cache_key == cache_key).first()
+    if entry is None:
+        entry = models.AIAnalysisCache(cache_key=cache_key, hits=0)
+        db.add(entry)
+    entry.title = result.get("title")
+    entry.author = result.get("author")
+    entry.category = result.get("category")
+    entry.created_at = created_at
+    entry.last_used_at = created_at
+    db.commit()
+    return entry
+
+def delete_ai_analyses_older_than(db: Session, cutoff) -> int:
+    """Elimina los análisis guardados antes de la fecha indicada"""
+    deleted = db.query(models.AIAnalysisCache).filter(
+        models.AIAnalysisCache.created_at < cutoff
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def clear_ai_analysis_cache(db: Session) -> int:
+    """Vacía la caché de análisis de IA"""
+    deleted = db.query(models.AIAnalysisCache).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def count_ai_analyses(db: Session) -> int:
+    return db.query(func.count(models.AIAnalysisCache.cache_key)).scalar() or 0
+
+# --- Trabajos de importación masiva ---
+
+def create_import_job(db: Session, job_id: str, mode: str, items: list, created_at,
+                      source: str = None, work_dir: str = None, move_to_library: bool = False):
+    """Crea un trabajo con un elemento por archivo. items: lista de (file_path, display_name, content_hash)"""
+    job = models.ImportJob(
+        id=job_id,
+        mode=mode,
+        source=source,
+        work_dir=work_dir,
+        move_to_library=move_to_library,
+        status="pending",
+        total_items=len(items),
+        created_at=created_at,
+        updated_at=created_at
+    )
+    db.add(job)
+    db.add_all([
+        models.ImportJobItem(
+            job_id=job_id,
+            file_path=file_path,
+            display_name=display_name,
+            content_hash=content_hash,
+            state="pending",
+            attempts=0,
+            updated_at=created_at
+        )
+        for file_path, display_name, content_hash in items
+    ])
+    db.commit()
+    return job
+
+def get_import_job(db: Session, job_id: str):
+    return db.query(models.ImportJob).filter(models.ImportJob.id == job_id).first()
+
+def get_import_jobs(db: Session, limit: int = 20):
+    """Trabajos de importación más recientes"""
+    return db.query(models.ImportJob).order_by(desc(models.ImportJob.created_at)).limit(limit).all()
+
+def get_import_jobs_by_status(db: Session, statuses: list):
+    return db.query(models.ImportJob).filter(models.ImportJob.status.in_(statuses)).all()
+
+def get_import_job_items(db: Session, job_id: str, unfinished_only: bool = False):
+    query = db.query(models.ImportJobItem).filter(models.ImportJobItem.job_id == job_id)
+    if unfinished_only:
+        query = query.filter(models.ImportJobItem.outcome.is_(None))
+    return query.order_by(models.ImportJobItem.id).all()
+
+def get_import_job_counts(db: Session, job_id: str) -> dict:
+    """Número de elementos por resultado (None = sin terminar)"""
+    rows = db.query(
+        models.ImportJobItem.outcome,
+        func.count(models.ImportJobItem.id)
+    ).filter(models.ImportJobItem.job_id == job_id).group_by(models.ImportJobItem.outcome).all()
+    return {outcome: count for outcome, count in rows}
+
+def update_import_job(db: Session, job_id: str, **fields):
+    db.query(models.ImportJob).filter(models.ImportJob.id == job_id).update(fields, synchronize_session=False)
+    db.commit()
+
+def update_import_job_item(db: Session, item_id: int, **fields):
+    db.query(models.ImportJobItem).filter(models.ImportJobItem.id == item_id).update(fields, synchronize_session=False)
+    db.commit()
+
+def reset_failed_import_job_items(db: Session, job_id: str, updated_at) -> int:
+    """Marca los elementos fallidos como pendientes; conservan su último punto de control"""
+    reset = db.query(models.ImportJobItem).filter(
+        models.ImportJobItem.job_id == job_id,
+        models.ImportJobItem.outcome == "failed"
+    ).update({
+        models.ImportJobItem.outcome: None,
+        models.ImportJobItem.error: None,
+        models.ImportJobItem.result: None,
+        models.ImportJobItem.attempts: models.ImportJobItem.attempts + 1,
+        models.ImportJobItem.updated_at: updated_at
+    }, synchronize_session=False)
+    db.commit()
+    return reset
+
+def delete_import_job(db: Session, job_id: str) -> bool:
+    job = get_import_job(db, job_id)
+    if not job:
+        return False
+    db.query(models.ImportJobItem).filter(models.ImportJobItem.job_id == job_id).delete(synchronize_session=False)
+    db.delete(job)
+    db.commit()
+    return True
+
+# --- Índice de escaneo incremental de carpetas ---
+
+def get_folder_scan_entries(db: Session, root: str) -> dict:
+    """Entradas registradas de una carpeta, indexadas por ruta relativa"""
+    entries = db.query(models.FolderScanEntry).filter(models.FolderScanEntry.root == root).all()
+    return {entry.path: entry for entry in entries}
+
+def save_folder_scan_entries(db: Session, root: str, states: list, job_id: str, scanned_at,
+                             removed_paths: list = None):
+    """
+    Registra el estado de los archivos enviados a un trabajo y elimina los que ya no existen.
+    states: lista de objetos con path, size, mtime y content_hash
+    """
+    existing = get_folder_scan_entries(db, root)
+    # Las entradas ya están cargadas: se borran por el ORM para que no queden en la sesión
+    # (SQLite reutiliza sus ids en las entradas nuevas del mismo commit)
+    for path in removed_paths or []:
+        entry = existing.pop(path, None)
+        if entry is not None:
+            db.delete(entry)
+    db.flush()
+    for state in states:
+        entry = existing.get(state.path)
+        if entry is None:
+            entry = models.FolderScanEntry(root=root, path=state.path)
+            db.add(entry)
+        entry.size = state.size
+        entry.mtime = state.mtime
+        entry.content_hash = state.content_hash
+        entry.job_id = job_id
+        entry.scanned_at = scanned_at
+    db.commit()
+
+def get_folder_scan_entries_for_job(db: Session, job_id: str) -> list:
+    """Entradas del índice registradas al crear un trabajo de importación"""
+    return db.query(models.FolderScanEntry).filter(models.FolderScanEntry.job_id == job_id).all()
+
+def delete_folder_scan_entries_by_id(db: Session, entry_ids: list) -> int:
+    """Elimina entradas concretas del índice (el siguiente escaneo las verá como nuevas)"""
+    deleted = 0
+    for start in range(0, len(entry_ids), CONTENT_HASH_QUERY_BATCH):
+        deleted += db.query(models.FolderScanEntry).filter(
+            models.FolderScanEntry.id.in_(entry_ids[start:start + CONTENT_HASH_QUERY_BATCH])
+        ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def delete_folder_scan_entries(db: Session, root: str) -> int:
+    """Olvida el índice de una carpeta (el siguiente escaneo será completo)"""
+    deleted = db.query(models.FolderScanEntry).filter(models.FolderScanEntry.root == root).delete(synchronize_session=False)
+    db.commit()
+    return deleted
@@ -0,0 +1,366 @@
+"""
+Análisis único de documentos (PDF y EPUB)
+Abre cada archivo una sola vez y obtiene en la misma pasada la muestra de texto,
+la imagen de portada, el número de páginas y los metadatos embebidos.
+El resultado se memoriza por hash de contenido para que las etapas posteriores
+(IA, portada, subida a Drive, base de datos) no vuelvan a parsear el archivo.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+import logging
+
+import fitz
+
+import cover_search
+from epub_reader import EpubReader
+from metadata_extractor import document_isbn
+
+logger = logging.getLogger(__name__)
+
+# Número máximo de análisis memorizados en memoria
+ANALYSIS_CACHE_SIZE = int(os.getenv("DOCUMENT_ANALYSIS_CACHE_SIZE", "32"))
+
+# Caracteres de texto que se extraen para el análisis (IA usa 4000, metadatos embebidos 6000)
+TEXT_SAMPLE_CHARS = int(os.getenv("TEXT_SAMPLE_CHARS", "6000"))
+# Páginas máximas de un PDF que se recorren para completar la muestra
+PDF_TEXT_MAX_PAGES = 10
+
+# Selección de portada en PDF
+COVER_SCAN_PAGES = 3  # Páginas en las que se buscan imágenes
+COVER_MIN_SIDE = 200  # Mínimo 200x200
+# Resolución del renderizado de la primera página cuando no hay imagen válida
+COVER_RENDER_DPI = int(os.getenv("COVER_RENDER_DPI", "100"))
+COVER_RENDER_MAX_SIDE = int(os.getenv("COVER_RENDER_MAX_SIDE", "1200"))
+
+class UnsupportedDocumentError(ValueError):
+    """Tipo de archivo no soportado"""
+    pass
+
+class InsufficientTextError(ValueError):
+    """No se pudo extraer suficiente texto del documento"""
+    pass
+
+@dataclass
+class DocumentAnalysis:
+    """Resultado de abrir y analizar un documento una sola vez"""
+    file_path: str
+    file_type: str  # 'pdf' o 'epub'
+    text: str = ""
+    page_count: int = 0
+    metadata: Dict[str, str] = field(default_factory=dict)
+    cover_bytes: Optional[bytes] = None  # Imagen de portada embebida (sin guardar)
+    cover_ext: str = "png"  # Extensión de la imagen de portada
+    cover_source_name: Optional[str] = None  # Nombre original de la portada dentro del documento
+    cover_image_url: Optional[str] = None  # Nombre del archivo guardado en el directorio estático
+    content_hash: Optional[str] = None
+    isbn: Optional[str] = None  # ISBN-13 de la página de créditos o del OPF (con dígito de control válido)
+    pages_sampled: int = 0  # Páginas (o documentos del spine) leídas para la muestra de texto
+    textless_pages: int = 0  # Páginas sin capa de texto (en blanco o escaneadas)
+    extraction_seconds: float = 0.0  # Tiempo de extracción del documento
+
+    @property
+    def is_scanned(self) -> bool:
+        """PDF cuyas páginas muestreadas no tienen texto (probablemente escaneado)"""
+        return self.file_type == "pdf" and self.pages_sampled > 0 and self.textless_pages == self.pages_sampled
+
+    def as_book_data(self) -> dict:
+        """Formato clásico {'text', 'cover_image_url', 'isbn'} usado por los endpoints"""
+        return {"text": self.text, "cover_image_url": self.cover_image_url, "isbn": self.isbn}
+
+# --- Tiempos de extracción ---
+# Se acumulan en remember_analysis, que también recibe los análisis hechos en el pool de procesos
+_extraction_stats = {"pdf": {"documents": 0, "seconds": 0.0, "scanned": 0}, "epub": {"documents": 0, "seconds": 0.0, "scanned": 0}}
+_extraction_lock = threading.Lock()
+
+def _record_extraction_time(analysis: DocumentAnalysis):
+    with _extraction_lock:
+        stats = _extraction_stats.setdefault(analysis.file_type, {"documents": 0, "seconds": 0.0, "scanned": 0})
+        stats["documents"] += 1
+        stats["seconds"] += analysis.extraction_seconds
+        if analysis.is_scanned:
+            stats["scanned"] += 1
+
+def get_extraction_stats() -> dict:
+    """Documentos extraídos, tiempo medio por documento y PDFs escaneados, por tipo"""
+    with _extraction_lock:
+        return {
+            file_type: {
+                "documents": stats["documents"],
+                "avg_seconds": round(stats["seconds"] / stats["documents"], 3) if stats["documents"] else 0.0,
+                "scanned": stats["scanned"]
+            }
+            for file_type, stats in _extraction_stats.items()
+        }
+
+def _safe_base_name(file_path: str) -> str:
+    """Nombre base del archivo limpio para usarlo en URLs"""
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    safe_base_name = "".join(c for c in base_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+    return safe_base_name.replace(' ', '_')
+
+def _pdf_cover_candidates(doc) -> list:
+    """
+    Imágenes de las primeras páginas ordenadas por área, usando solo las dimensiones de
+    get_page_images (sin decodificar ninguna imagen)
+    """
+    candidates = {}
+    for page_number in range(min(len(doc), COVER_SCAN_PAGES)):
+        # (xref, smask, width, height, bpc, colorspace, alt. colorspace, name, filter, ...)
+        for img in doc.get_page_images(page_number):
+            xref, width, height = img[0], img[2], img[3]
+            if xref in candidates or width < COVER_MIN_SIDE or height < COVER_MIN_SIDE:
+                continue
+            candidates[xref] = (width * height, page_number, img)
+    return sorted(candidates.values(), key=lambda c: (-c[0], c[1]))
+
+def _extract_cover_image(doc, img) -> Optional[tuple]:
+    """
+    Bytes de la imagen ganadora. Los JPEG/PNG RGB o en escala de grises sin máscara se usan tal
+    cual vienen en el PDF; el resto (JPX, JBIG2, CMYK, con transparencia) se decodifica a PNG.
+    Retorna (bytes, extensión) o None.
+    """
+    xref, smask = img[0], img[1]
+    extracted = doc.extract_image(xref)
+    if not extracted:
+        return None
+    ext = extracted.get("ext", "").lower()
+    if ext in ("jpeg", "jpg", "png") and not smask and extracted.get("colorspace", 3) in (1, 3):
+        return extracted["image"], "jpg" if ext == "jpeg" else ext
+    pix = fitz.Pixmap(doc, xref)
+    if pix.n - pix.alpha > 3:
+        # CMYK u otros espacios de color: convertir a RGB para PNG
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    return pix.tobytes("png"), "png"
+
+def _render_first_page(doc) -> bytes:
+    """Renderiza la primera página como portada, con resolución limitada"""
+    page = doc.load_page(0)
+    zoom = COVER_RENDER_DPI / 72
+    longest_side = max(page.rect.width, page.rect.height) * zoom
+    if longest_side > COVER_RENDER_MAX_SIDE:
+        zoom *= COVER_RENDER_MAX_SIDE / longest_side
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    return pix.tobytes("png")
+
+def _select_pdf_cover(doc, analysis: DocumentAnalysis):
+    """Elige la imagen más grande de las primeras páginas y extrae solo esa"""
+    candidates = _pdf_cover_candidates(doc)
+    print(f"🔍 {len(candidates)} imágenes candidatas a portada en las primeras {min(len(doc), COVER_SCAN_PAGES)} páginas")
+    for area, page_number, img in candidates:
+        try:
+            cover = _extract_cover_image(doc, img)
+        except Exception as e:
+            print(f"⚠️ Error al extraer imagen de la página {page_number}: {e}")
+            continue
+        if cover:
+            analysis.cover_bytes, analysis.cover_ext = cover
+            print(f"✅ Portada: imagen {img[2]}x{img[3]} de la página {page_number} ({analysis.cover_ext})")
+            return
+
+    if len(doc) == 0:
+        print("❌ No se encontró ninguna imagen de portada válida")
+        return
+    try:
+        analysis.cover_bytes = _render_first_page(doc)
+        analysis.cover_ext = "png"
+        print(f"🖼️ Sin imágenes válidas: portada renderizada desde la primera página (máx. {COVER_RENDER_MAX_SIDE}px)")
+    except Exception as e:
+        print(f"❌ Error al renderizar la primera página: {e}")
+
+def sample_pdf_text(doc, analysis: DocumentAnalysis, budget: int = TEXT_SAMPLE_CHARS,
+                    max_pages: int = PDF_TEXT_MAX_PAGES, sort: bool = False) -> str:
+    """
+    Extrae texto página a página hasta cubrir el presupuesto de caracteres.
+    Las páginas sin fuentes no tienen capa de texto (en blanco o escaneadas) y se saltan
+    sin llamar a get_text. sort=True reordena por posición (solo si importa el diseño).
+    """
+    parts, total = [], 0
+    for page_number in range(min(len(doc), max_pages)):
+        page = doc.load_page(page_number)
+        analysis.pages_sampled += 1
+        if not page.get_fonts():
+            analysis.textless_pages += 1
+            continue
+        page_text = page.get_text("text", sort=sort)
+        if not page_text.strip():
+            analysis.textless_pages += 1
+            continue
+        parts.append(page_text)
+        total += len(page_text)
+        if total >= budget:
+            break
+    return "".join(parts)
+
+def extract_pdf(file_path: str) -> DocumentAnalysis:
+    """Extrae texto, metadatos y la mejor imagen de portada de un PDF abriéndolo una sola vez"""
+    start = time.perf_counter()
+    doc = fitz.open(file_path)
+    try:
+        analysis = DocumentAnalysis(file_path=file_path, file_type="pdf", page_count=len(doc))
+        analysis.metadata = {k: v for k, v in (doc.metadata or {}).items() if v}
+
+        # Extraer texto solo hasta cubrir la muestra que necesita el análisis
+        analysis.text = sample_pdf_text(doc, analysis)
+        analysis.isbn = document_isbn(analysis.metadata, analysis.text)
+        text_seconds = time.perf_counter() - start
+
+        print(f"📄 PDF procesado: {os.path.basename(file_path)}")
+        print(f"📄 Páginas leídas: {analysis.pages_sampled} de {analysis.page_count} ({analysis.textless_pages} sin texto)")
+        print(f"📄 Longitud del texto: {len(analysis.text)} caracteres en {text_seconds:.2f}s")
+        if analysis.isbn:
+            print(f"📄 ISBN: {analysis.isbn}")
+        if analysis.is_scanned:
+            print("⚠️ Las páginas muestreadas no tienen capa de texto: probablemente es un PDF escaneado")
+
+        _select_pdf_cover(doc, analysis)
+        analysis.extraction_seconds = time.perf_counter() - start
+        print(f"⏱️ Extracción del PDF: {analysis.extraction_seconds:.2f}s")
+        return analysis
+    finally:
+        doc.close()
+
+def extract_epub(file_path: str) -> DocumentAnalysis:
+    """
+    Extrae texto, metadatos DC y la portada de un EPUB leyendo solo el OPF, los primeros
+    documentos del spine y la imagen de portada
+    """
+    start = time.perf_counter()
+    with EpubReader(file_path) as reader:
+        analysis = DocumentAnalysis(file_path=file_path, file_type="epub")
+        analysis.metadata = reader.get_metadata()
+        analysis.page_count = len(reader.spine)
+        analysis.text = reader.read_text(max_chars=TEXT_SAMPLE_CHARS)
+        analysis.pages_sampled = reader.documents_read
+        analysis.isbn = document_isbn(analysis.metadata, analysis.text)
+
+        if len(analysis.text.strip()) < 100:
+            raise InsufficientTextError("No se pudo extraer suficiente texto del EPUB para su análisis.")
+
+        cover = reader.read_cover()
+        if cover:
+            analysis.cover_bytes, analysis.cover_source_name, analysis.cover_ext = cover
+            print(f"✅ Portada encontrada en EPUB: {analysis.cover_source_name} ({len(analysis.cover_bytes)} bytes)")
+
+    analysis.extraction_seconds = time.perf_counter() - start
+    print(f"⏱️ Extracción del EPUB: {analysis.extraction_seconds:.2f}s ({analysis.pages_sampled} documentos leídos)")
+    return analysis
+
+def extract_document(file_path: str) -> DocumentAnalysis:
+    """Parsea un documento según su extensión (sin escribir nada en disco)"""
+    file_ext = os.path.splitext(file_path)[1].lower()
+    if file_ext == ".pdf":
+        return extract_pdf(file_path)
+    if file_ext == ".epub":
+        return extract_epub(file_path)
+    raise UnsupportedDocumentError(f"Tipo de archivo no soportado: {file_ext}")
+
+def save_cover(analysis: DocumentAnalysis, static_dir: str) -> Optional[str]:
+    """
+    Guarda la portada embebida en el directorio estático.
+    Si el documento no tiene portada, intenta una búsqueda online por nombre de archivo.
+    """
+    if analysis.cover_image_url and os.path.exists(os.path.join(static_dir, analysis.cover_image_url)):
+        return analysis.cover_image_url
+
+    cover_path = None
+    if analysis.cover_bytes:
+        try:
+            os.makedirs(static_dir, exist_ok=True)
+            safe_base_name = _safe_base_name(analysis.file_path)
+            timestamp = int(time.time())
+            if analysis.cover_source_name:
+                original_name = analysis.cover_source_name.replace('/', '_').replace('\\', '_')
+                safe_original_name = "".join(c for c in original_name if c.isalnum() or c in ('.', '-', '_'))
+                cover_filename = f"cover_{safe_base_name}_{timestamp}_{safe_original_name}"
+            else:
+                cover_filename = f"cover_{safe_base_name}_{timestamp}.{analysis.cover_ext}"
+            cover_full_path = os.path.join(static_dir, cover_filename)
+
+            with open(cover_full_path, 'wb') as f:
+                f.write(analysis.cover_bytes)
+
+            if os.path.exists(cover_full_path):
+                print(f"✅ Imagen de portada guardada: {cover_filename} ({os.path.getsize(cover_full_path)} bytes)")
+                cover_path = cover_filename  # Solo el nombre del archivo, no la ruta completa
+            else:
+                print(f"❌ Error: El archivo no se guardó correctamente: {cover_full_path}")
+        except Exception as e:
+            print(f"❌ Error al guardar imagen de portada: {e}")
+            cover_path = None
+
+    if not cover_path:
+        # Intentar búsqueda online como fallback
+        print("🔍 Intentando búsqueda de portada online...")
+        try:
+            search_title = _safe_base_name(analysis.file_path).replace('_', ' ').replace('-', ' ')
+            online_cover = cover_search.search_book_cover_online(search_title, static_dir=static_dir, isbn=analysis.isbn)
+            if online_cover:
+                cover_path = online_cover
+                print(f"✅ Portada online encontrada: {online_cover}")
+            else:
+                print("❌ No se pudo encontrar portada online")
+        except Exception as e:
+            print(f"❌ Error en búsqueda de portada online: {e}")
+            cover_path = None
+
+    analysis.cover_image_url = cover_path
+    return cover_path
+
+# --- Memoización por hash de contenido ---
+_analysis_cache: "OrderedDict[str, DocumentAnalysis]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _cache_key(file_path: str, content_hash: Optional[str]) -> str:
+    """Clave de memoización: hash de contenido o, si no se conoce, ruta + tamaño + fecha"""
+    if content_hash:
+        return content_hash
+    stat = os.stat(file_path)
+    return f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+def remember_analysis(analysis: DocumentAnalysis, content_hash: Optional[str] = None) -> DocumentAnalysis:
+    """Guarda un análisis (por ejemplo, calculado en otro proceso) en la memoria compartida"""
+    if content_hash:
+        analysis.content_hash = content_hash
+    key = _cache_key(analysis.file_path, analysis.content_hash)
+    _record_extraction_time(analysis)
+    with _cache_lock:
+        _analysis_cache[key] = analysis
+        _analysis_cache.move_to_end(key)
+        while len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+            _analysis_cache.popitem(last=False)
+    return analysis
+
+def get_cached_analysis(file_path: str, content_hash: Optional[str] = None) -> Optional[DocumentAnalysis]:
+    """Devuelve el análisis memorizado para un archivo, si existe"""
+    try:
+        key = _cache_key(file_path, content_hash)
+    except OSError:
+        return None
+    with _cache_lock:
+        analysis = _analysis_cache.get(key)
+        if analysis is not None:
+            _analysis_cache.move_to_end(key)
+    if analysis is not None and analysis.file_path != file_path:
+        # Mismo contenido en otra ruta: reutilizar el análisis apuntando al archivo actual
+        analysis = DocumentAnalysis(**{**analysis.__dict__, "file_path": file_path})
+    return analysis
+
+def load_document(file_path: str, content_hash: Optional[str] = None) -> DocumentAnalysis:
+    """Parsea el documento una sola vez; las llamadas siguientes reutilizan el resultado"""
+    analysis = get_cached_analysis(file_path, content_hash)
+    if analysis is not None:
+        print(f"♻️ Reutilizando análisis de documento: {os.path.basename(file_path)}")
+        return analysis
+    analysis = extract_document(file_path)
+    return remember_analysis(analysis, content_hash)
+
+def analyze_document(file_path: str, static_dir: str, content_hash: Optional[str] = None) -> DocumentAnalysis:
+    """Parsea el documento (o reutiliza el análisis memorizado) y asegura que la portada esté guardada"""
+    analysis = load_document(file_path, content_hash)
+    save_cover(analysis, static_dir)
+    return analysis
@@ -0,0 +1,279 @@
+"""
+Descarga anticipada de los libros de una carpeta pública de Google Drive
+Un pool acotado de hilos descarga los siguientes archivos mientras los anteriores se
+procesan (parseo, IA, subida). La anticipación está limitada por número de archivos y
+por espacio en disco (tamaños del listado de Drive), y todas las descargas comparten un
+límite de ancho de banda opcional. Cada hilo usa su propio cliente de Drive.
+"""
+
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+import logging
+
+from upload_stream import _parse_size
+
+logger = logging.getLogger(__name__)
+
+# Descargas simultáneas
+DRIVE_PREFETCH_WORKERS = int(os.getenv("DRIVE_PREFETCH_WORKERS", "3"))
+# Archivos descargados (o descargándose) por delante del que se está procesando
+DRIVE_PREFETCH_DEPTH = int(os.getenv("DRIVE_PREFETCH_DEPTH", "6"))
+# Espacio en disco máximo ocupado por las descargas pendientes de procesar
+DRIVE_PREFETCH_MAX_DISK = _parse_size(os.getenv("DRIVE_PREFETCH_MAX_DISK", ""), 2 * 1024 ** 3)
+# Ancho de banda total de las descargas en bytes por segundo ("5MB" = 5 MB/s); 0 = sin límite
+DRIVE_DOWNLOAD_BANDWIDTH = _parse_size(os.getenv("DRIVE_DOWNLOAD_BANDWIDTH", ""), 0)
+# Tamaño de cada bloque pedido a Drive (también es la granularidad del límite de ancho de banda)
+DRIVE_DOWNLOAD_CHUNK_SIZE = _parse_size(os.getenv("DRIVE_DOWNLOAD_CHUNK_SIZE", ""), 1024 * 1024)
+# Importación de carpetas de Drive: "download" (descarga y vuelve a subir) o "copy" (files.copy en el servidor)
+DRIVE_IMPORT_MODES = ("download", "copy")
+DRIVE_FOLDER_IMPORT_MODE = os.getenv("DRIVE_FOLDER_IMPORT_MODE", "download")
+# Muestra parcial (inicio y final) que se descarga de los libros copiados de Drive a Drive
+DRIVE_SAMPLE_HEAD_SIZE = _parse_size(os.getenv("DRIVE_SAMPLE_HEAD_SIZE", ""), 4 * 1024 * 1024)
+DRIVE_SAMPLE_TAIL_SIZE = _parse_size(os.getenv("DRIVE_SAMPLE_TAIL_SIZE", ""), 1024 * 1024)
+
+class BandwidthLimiter:
+    """Limitador compartido entre hilos: espacia las escrituras para no superar bytes_per_second"""
+
+    def __init__(self, bytes_per_second: int, burst_seconds: float = 1.0):
+        self.rate = bytes_per_second
+        self.burst_seconds = burst_seconds
+        self._lock = threading.Lock()
+        self._next_time = time.monotonic()
+        self.waited_seconds = 0.0
+
+    def consume(self, amount: int):
+        if self.rate <= 0 or amount <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            # Se permite una ráfaga de hasta burst_seconds de cuota acumulada
+            start = max(self._next_time, now - self.burst_seconds)
+            self._next_time = start + amount / self.rate
+            wait = self._next_time - now
+            if wait > 0:
+                self.waited_seconds += wait
+        if wait > 0:
+            time.sleep(wait)
+
+class _ThrottledWriter:
+    """Archivo de destino que descuenta del limitador cada bloque escrito"""
+
+    def __init__(self, fileobj, limiter: BandwidthLimiter):
+        self._fileobj = fileobj
+        self._limiter = limiter
+
+    def write(self, data):
+        self._limiter.consume(len(data))
+        return self._fileobj.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._fileobj, name)
+
+class _DiskBudget:
+    """Bytes reservados por las descargas todavía no liberadas por el consumidor"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, amount: int, stop: threading.Event) -> bool:
+        with self._condition:
+            # Un archivo mayor que el límite se admite solo cuando no hay nada más en disco
+            while self.used > 0 and self.used + amount > self.limit:
+                if stop.is_set():
+                    return False
+                self._condition.wait(0.5)
+            if stop.is_set():
+                return False
+            self.used += amount
+            self.peak = max(self.peak, self.used)
+            return True
+
+    def release(self, amount: int):
+        with self._condition:
+            self.used = max(self.used - amount, 0)
+            self._condition.notify_all()
+
+    def wake(self):
+        with self._condition:
+            self._condition.notify_all()
+
+@dataclass
+class PrefetchedFile:
+    """Resultado de la descarga de un libro del listado"""
+    index: int
+    book_info: dict
+    result: dict  # Mismo formato que GoogleDriveManager.download_file_from_drive
+    reserved: int = 0
+    directory: Optional[str] = None
+    released: bool = field(default=False, repr=False)
+
+    @property
+    def success(self) -> bool:
+        return bool(self.result.get("success"))
+
+class DrivePrefetcher:
+    """
+    Descarga los libros de books_info con un pool acotado y los entrega en orden de llegada.
+    Con sample=True solo se descarga el inicio y el final de cada archivo (importación por
+    copia en el servidor, ver GoogleDriveManager.download_file_sample). Cada archivo se libera (se borra y deja de contar para el disco) cuando el consumidor
+    pide el siguiente o llama a release(); close() cancela lo pendiente y limpia el disco.
+    """
+
+    def __init__(
+        self,
+        drive_manager,
+        books_info: List[dict],
+        temp_dir: str,
+        workers: int = DRIVE_PREFETCH_WORKERS,
+        depth: int = DRIVE_PREFETCH_DEPTH,
+        max_disk: int = DRIVE_PREFETCH_MAX_DISK,
+        bandwidth: int = DRIVE_DOWNLOAD_BANDWIDTH,
+        chunk_size: int = DRIVE_DOWNLOAD_CHUNK_SIZE,
+        sample: bool = False
+    ):
+        self.drive_manager = drive_manager
+        self.books_info = list(books_info)
+        self.workers = max(1, workers)
+        self.depth = max(self.workers, depth)
+        self.chunk_size = chunk_size
+        self.sample = sample
+        self.root_dir = os.path.join(temp_dir, f"prefetch_{uuid.uuid4().hex[:12]}")
+        self.limiter = BandwidthLimiter(bandwidth)
+        self._disk = _DiskBudget(max_disk)
+        self._slots = threading.Semaphore(self.depth)
+        self._results: "queue.Queue[PrefetchedFile]" = queue.Queue()
+        self._stop = threading.Event()
+        self._local = threading.local()
+        self._shared_service_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._feeder: Optional[threading.Thread] = None
+        self.downloaded_bytes = 0
+        self._stats_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- Descarga ---
+
+    def _thread_service(self):
+        if not hasattr(self._local, "service"):
+            try:
+                self._local.service = self.drive_manager.create_download_service()
+            except Exception as e:
+                logger.warning(f"No se pudo crear un cliente de Drive para el hilo de descarga: {e}")
+                self._local.service = None
+        return self._local.service
+
+    def _fetch(self, file_id: str, directory: str, service, wrap_file) -> dict:
+        if self.sample:
+            return self.drive_manager.download_file_sample(
+                file_id, directory, service=service, wrap_file=wrap_file,
+                head_size=DRIVE_SAMPLE_HEAD_SIZE, tail_size=DRIVE_SAMPLE_TAIL_SIZE
+            )
+        return self.drive_manager.download_file_from_drive(
+            file_id, directory, service=service, wrap_file=wrap_file, chunk_size=self.chunk_size
+        )
+
+    def _download(self, index: int, book_info: dict, reserved: int):
+        directory = os.path.join(self.root_dir, str(index))
+        try:
+            if self._stop.is_set():
+                result = {"success": False, "error": "Descarga cancelada"}
+            else:
+                os.makedirs(directory, exist_ok=True)
+                wrap_file = (lambda f: _ThrottledWriter(f, self.limiter)) if self.limiter.rate > 0 else None
+                service = self._thread_service()
+                if service is not None:
+                    result = self._fetch(book_info["id"], directory, service, wrap_file)
+                else:
+                    # Sin cliente propio: el cliente compartido no admite uso concurrente
+                    with self._shared_service_lock:
+                        result = self._fetch(book_info["id"], directory, None, wrap_file)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        if result.get("success"):
+            with self._stats_lock:
+                self.downloaded_bytes += result.get("file_size", 0)
+        self._results.put(PrefetchedFile(index, book_info, result or {"success": False, "error": "Sin resultado"}, reserved, directory))
+
+    def _feed(self):
+        for index, book_info in enumerate(self.books_info):
+            while not self._slots.acquire(timeout=0.5):
+                if self._stop.is_set():
+                    return
+            try:
+                size = int(book_info.get("size") or 0)
+            except (TypeError, ValueError):
+                size = 0
+            if self.sample:
+                size = min(size, DRIVE_SAMPLE_HEAD_SIZE + DRIVE_SAMPLE_TAIL_SIZE)
+            if self._stop.is_set() or not self._disk.acquire(size, self._stop):
+                self._slots.release()
+                return
+            try:
+                self._executor.submit(self._download, index, book_info, size)
+            except RuntimeError:
+                # Pool cerrado durante la cancelación
+                self._disk.release(size)
+                self._slots.release()
+                return
+
+    def __iter__(self) -> Iterator[PrefetchedFile]:
+        if self._executor is not None:
+            raise RuntimeError("El prefetcher ya se ha iniciado")
+        os.makedirs(self.root_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="drive-prefetch")
+        self._feeder = threading.Thread(target=self._feed, name="drive-prefetch-feeder", daemon=True)
+        self._feeder.start()
+
+        started = time.time()
+        previous = None
+        for _ in range(len(self.books_info)):
+            item = self._results.get()
+            if previous is not None:
+                self.release(previous)
+            previous = item
+            yield item
+        if previous is not None:
+            self.release(previous)
+
+        elapsed = time.time() - started
+        print(
+            f"📥 Descarga anticipada: {len(self.books_info)} archivos, {self.downloaded_bytes / (1024 * 1024):.1f} MB "
+            f"en {elapsed:.1f}s (máximo en disco {self._disk.peak / (1024 * 1024):.1f} MB, "
+            f"espera por ancho de banda {self.limiter.waited_seconds:.1f}s)"
+        )
+
+    def release(self, item: PrefetchedFile):
+        """Borra el archivo descargado y devuelve su espacio y su hueco al pool"""
+        if item.released:
+            return
+        item.released = True
+        if item.directory and os.path.exists(item.directory):
+            shutil.rmtree(item.directory, ignore_errors=True)
+        self._disk.release(item.reserved)
+        self._slots.release()
+
+    def close(self):
+        """Cancela las descargas pendientes y elimina todo lo descargado"""
+        self._stop.set()
+        self._disk.wake()
+        if self._feeder is not None:
+            self._feeder.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        if os.path.exists(self.root_dir):
+            shutil.rmtree(self.root_dir, ignore_errors=True)
@@ -0,0 +1,260 @@
+"""
+Lector ligero de EPUB basado en zipfile
+A diferencia de ebooklib.epub.read_epub, que carga y parsea todos los elementos del libro,
+solo lee container.xml, el OPF y los documentos del spine que hacen falta para el
+presupuesto de texto. La portada se toma por referencia del manifiesto y, en el último
+recurso, se elige por el tamaño que indica el índice del ZIP (sin leer cada imagen).
+El XHTML se parsea con lxml si está instalado; si no, con html.parser de la biblioteca estándar.
+"""
+
+import os
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote
+import logging
+
+try:
+    import lxml.html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+logger = logging.getLogger(__name__)
+
+_NS = {
+    "container": "urn:oasis:names:tc:opendocument:xmlns:container",
+    "opf": "http://www.idpf.org/2007/opf",
+    "dc": "http://purl.org/dc/elements/1.1/",
+}
+_DOCUMENT_TYPES = {"application/xhtml+xml", "text/html", "application/x-dtbook+xml"}
+# Campos Dublin Core que se leen del OPF
+DC_FIELDS = ("title", "creator", "subject", "language", "identifier", "publisher")
+# Tamaño mínimo de la imagen elegida como portada cuando el manifiesto no la indica
+MIN_FALLBACK_COVER_SIZE = 10000
+
+_SKIPPED_TAGS = {"script", "style", "head", "title"}
+_BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "blockquote"}
+
+class EpubError(ValueError):
+    """El archivo no es un EPUB válido"""
+    pass
+
+@dataclass
+class ManifestItem:
+    id: str
+    href: str  # Ruta dentro del ZIP
+    media_type: str
+    properties: str = ""
+
+class _TextExtractor(HTMLParser):
+    """Extracción de texto con html.parser cuando lxml no está disponible"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+def _clean_text(text: str) -> str:
+    text = re.sub(r"[ \t\r\f\v\xa0]+", " ", text)
+    return re.sub(r"\s*\n\s*", "\n", text).strip()
+
+def html_to_text(content: bytes) -> str:
+    """Texto visible de un documento XHTML (sin scripts ni estilos)"""
+    if not content:
+        return ""
+    if HAS_LXML:
+        try:
+            document = lxml.html.document_fromstring(content)
+            for element in list(document.iter(*_SKIPPED_TAGS)):
+                element.drop_tree()
+            for element in document.iter(*_BLOCK_TAGS):
+                element.tail = "\n" + (element.tail or "")
+            return _clean_text(document.text_content())
+        except Exception as e:
+            logger.debug(f"lxml no pudo parsear el documento, usando html.parser: {e}")
+    parser = _TextExtractor()
+    parser.feed(content.decode("utf-8", errors="replace"))
+    parser.close()
+    return _clean_text("".join(parser.parts))
+
+class EpubReader:
+    """Acceso perezoso al contenido de un EPUB: solo se lee lo que se pide"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        try:
+            self._zip = zipfile.ZipFile(file_path, "r")
+        except zipfile.BadZipFile as e:
+            raise EpubError(f"El EPUB no es un ZIP válido: {e}")
+        try:
+            self._names = set(self._zip.namelist())
+            self.opf_path = self._find_opf()
+            self._opf_dir = posixpath.dirname(self.opf_path)
+            self._opf = self._parse_xml(self.opf_path)
+            self.manifest = self._read_manifest()
+            self.spine = self._read_spine()
+            self.documents_read = 0
+        except Exception:
+            self._zip.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._zip.close()
+
+    # --- Estructura ---
+
+    def _parse_xml(self, name: str) -> ET.Element:
+        try:
+            return ET.fromstring(self._zip.read(name))
+        except KeyError:
+            raise EpubError(f"Falta {name} en el EPUB")
+        except ET.ParseError as e:
+            raise EpubError(f"XML no válido en {name}: {e}")
+
+    def _find_opf(self) -> str:
+        if "META-INF/container.xml" in self._names:
+            container = self._parse_xml("META-INF/container.xml")
+            rootfile = container.find(".//container:rootfile", _NS)
+            if rootfile is not None and rootfile.get("full-path") in self._names:
+                return rootfile.get("full-path")
+        # EPUB sin container.xml válido: usar el primer .opf
+        opf = next((name for name in sorted(self._names) if name.lower().endswith(".opf")), None)
+        if not opf:
+            raise EpubError("No se encontró el archivo OPF del EPUB")
+        return opf
+
+    def _resolve(self, href: str) -> str:
+        href = unquote(href.split("#", 1)[0])
+        return posixpath.normpath(posixpath.join(self._opf_dir, href)) if self._opf_dir else posixpath.normpath(href)
+
+    def _read_manifest(self) -> Dict[str, ManifestItem]:
+        manifest = {}
+        for item in self._opf.findall("opf:manifest/opf:item", _NS):
+            item_id, href = item.get("id"), item.get("href")
+            if not item_id or not href:
+                continue
+            manifest[item_id] = ManifestItem(
+                id=item_id,
+                href=self._resolve(href),
+                media_type=(item.get("media-type") or "").lower(),
+                properties=item.get("properties") or ""
+            )
+        return manifest
+
+    def _read_spine(self) -> List[ManifestItem]:
+        spine = []
+        for itemref in self._opf.findall("opf:spine/opf:itemref", _NS):
+            item = self.manifest.get(itemref.get("idref"))
+            if item and item.media_type in _DOCUMENT_TYPES and item.href in self._names:
+                spine.append(item)
+        if not spine:
+            # Spine vacío o roto: documentos del manifiesto en su orden
+            spine = [i for i in self.manifest.values() if i.media_type in _DOCUMENT_TYPES and i.href in self._names]
+        return spine
+
+    # --- Metadatos ---
+
+    def get_metadata(self) -> Dict[str, str]:
+        """Primer valor no vacío de cada campo Dublin Core"""
+        metadata = {}
+        container = self._opf.find("opf:metadata", _NS)
+        if container is None:
+            return metadata
+        for key in DC_FIELDS:
+            for element in container.findall(f"dc:{key}", _NS):
+                value = "".join(element.itertext()).strip()
+                if value:
+                    metadata[key] = value
+                    break
+        return metadata
+
+    # --- Texto ---
+
+    def iter_document_texts(self) -> Iterator[str]:
+        """Texto de cada documento del spine, en orden de lectura (se leen a medida que se piden)"""
+        for item in self.spine:
+            try:
+                text = html_to_text(self._zip.read(item.href))
+                self.documents_read += 1
+            except Exception as e:
+                logger.warning(f"No se pudo leer {item.href} de {self.file_path}: {e}")
+                continue
+            if text:
+                yield text
+
+    def read_text(self, max_chars: Optional[int] = None) -> str:
+        """Texto del libro; con max_chars deja de leer documentos al alcanzar el presupuesto"""
+        parts, total = [], 0
+        for text in self.iter_document_texts():
+            parts.append(text)
+            total += len(text) + 1
+            if max_chars and total > max_chars:
+                break
+        return "\n".join(parts)
+
+    # --- Portada ---
+
+    def _image_items(self) -> List[ManifestItem]:
+        return [i for i in self.manifest.values() if i.media_type.startswith("image/") and i.href in self._names]
+
+    def find_cover_item(self) -> Optional[ManifestItem]:
+        """Portada según el manifiesto (EPUB3 cover-image, meta cover de EPUB2), el nombre o el tamaño"""
+        for item in self._image_items():
+            if "cover-image" in item.properties.split():
+                return item
+
+        for meta in self._opf.findall("opf:metadata/opf:meta", _NS):
+            if meta.get("name") == "cover":
+                item = self.manifest.get(meta.get("content"))
+                if item and item.media_type.startswith("image/") and item.href in self._names:
+                    return item
+
+        images = self._image_items()
+        for item in images:
+            if "cover" in item.id.lower() or "cover" in posixpath.basename(item.href).lower():
+                return item
+
+        # Último recurso: la imagen más grande según el índice del ZIP
+        sized = [(self._zip.getinfo(item.href).file_size, item) for item in images]
+        sized = [entry for entry in sized if entry[0] > MIN_FALLBACK_COVER_SIZE]
+        return max(sized, key=lambda entry: entry[0])[1] if sized else None
+
+    def read_cover(self) -> Optional[Tuple[bytes, str, str]]:
+        """(bytes, ruta en el EPUB, extensión) de la portada o None"""
+        item = self.find_cover_item()
+        if not item:
+            return None
+        ext = os.path.splitext(item.href)[1].lstrip(".").lower() or "jpg"
+        return self._zip.read(item.href), item.href, ext
+
+def read_epub_text(file_path: str, max_chars: Optional[int] = None) -> str:
+    """Texto de un EPUB (todo o hasta max_chars caracteres aproximadamente)"""
+    with EpubReader(file_path) as reader:
+        return reader.read_text(max_chars)
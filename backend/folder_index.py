@@ -0,0 +1,283 @@
+"""
+Escaneo incremental de carpetas locales
+Guarda en folder_scan_entries el estado (ruta, tamaño, fecha de modificación y hash) de cada
+archivo enviado a importar desde una carpeta. Los escaneos siguientes solo devuelven los
+archivos nuevos o modificados, sin volver a calcular hashes ni consultar duplicados del resto.
+Cuando el trabajo termina, se olvidan los archivos cuya importación falló, para que el
+siguiente escaneo los vuelva a intentar.
+El modo vigilancia repite el escaneo por sondeo periódico e importa lo que vaya llegando.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+import logging
+
+import crud
+import database
+from import_jobs import get_import_job_manager, ItemOutcome, JobStatus
+from upload_stream import compute_file_sha256
+from zip_stream import MEMBER_SEPARATOR
+
+logger = logging.getLogger(__name__)
+
+# Archivos que se registran en el índice (los ZIP se recorren al importarlos)
+INDEXED_EXTENSIONS = ('.pdf', '.epub', '.zip')
+# Segundos entre escaneos del modo vigilancia
+FOLDER_WATCH_INTERVAL = int(os.getenv("FOLDER_WATCH_INTERVAL", "30"))
+# Antigüedad mínima de un archivo para importarlo en modo vigilancia (evita copias a medias)
+FOLDER_WATCH_SETTLE_SECONDS = int(os.getenv("FOLDER_WATCH_SETTLE_SECONDS", "10"))
+
+@dataclass
+class FileState:
+    path: str  # Relativa a la carpeta escaneada
+    full_path: str
+    size: int
+    mtime: float
+    content_hash: Optional[str] = None
+
+@dataclass
+class ScanResult:
+    root: str
+    changed: List[FileState] = field(default_factory=list)  # Nuevos o modificados
+    removed: List[str] = field(default_factory=list)  # Registrados pero ya no presentes
+    unchanged: int = 0
+    deferred: int = 0  # Modificados hace muy poco: se dejan para el siguiente escaneo
+    seconds: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "root": self.root,
+            "changed": len(self.changed),
+            "removed": len(self.removed),
+            "unchanged": self.unchanged,
+            "deferred": self.deferred,
+            "seconds": round(self.seconds, 3)
+        }
+
+def normalize_root(folder_path: str) -> str:
+    """Ruta absoluta y sin enlaces simbólicos: la clave de la carpeta en el índice"""
+    return os.path.realpath(os.path.abspath(folder_path))
+
+def iter_folder_files(root: str) -> Iterator[FileState]:
+    """Archivos indexables de la carpeta (recursivo), con un solo stat por archivo"""
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if not filename.lower().endswith(INDEXED_EXTENSIONS):
+                continue
+            full_path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                continue  # Borrado entre el listado y el stat
+            yield FileState(
+                path=os.path.relpath(full_path, root).replace(os.sep, "/"),
+                full_path=full_path,
+                size=stat.st_size,
+                mtime=stat.st_mtime
+            )
+
+class FolderWatcher:
+    """Sondea una carpeta y envía sus archivos nuevos a on_changes (que devuelve el id del trabajo)"""
+
+    def __init__(self, index: "FolderIndex", root: str, on_changes: Callable[[ScanResult], Optional[str]],
+                 interval: int = FOLDER_WATCH_INTERVAL, settle_seconds: int = FOLDER_WATCH_SETTLE_SECONDS):
+        self.index = index
+        self.root = root
+        self.on_changes = on_changes
+        self.interval = max(1, interval)
+        self.settle_seconds = settle_seconds
+        self.scans = 0
+        self.jobs_started = 0
+        self.last_job_id: Optional[str] = None
+        self.last_scan: Optional[dict] = None
+        self.last_scan_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name=f"folder-watch-{os.path.basename(root)}")
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.poll()
+            self._stop.wait(self.interval)
+
+    def poll(self):
+        # Un trabajo por carpeta a la vez: lo que llegue mientras tanto se importa en la siguiente pasada
+        if self.last_job_id and get_import_job_manager().is_running(self.last_job_id):
+            return
+        try:
+            with self.index.lock_root(self.root):
+                result = self.index.scan(self.root, min_age_seconds=self.settle_seconds)
+                job_id = self.on_changes(result) if (result.changed or result.removed) else None
+            self.scans += 1
+            self.last_scan = result.to_dict()
+            self.last_scan_at = datetime.utcnow()
+            self.last_error = None
+            if job_id:
+                self.last_job_id = job_id
+                self.jobs_started += 1
+                print(f"👀 {self.root}: {len(result.changed)} archivos nuevos o modificados, trabajo {job_id}")
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning(f"Error al vigilar la carpeta {self.root}: {e}")
+
+    def to_dict(self) -> dict:
+        return {
+            "root": self.root,
+            "interval_seconds": self.interval,
+            "settle_seconds": self.settle_seconds,
+            "scans": self.scans,
+            "jobs_started": self.jobs_started,
+            "last_job_id": self.last_job_id,
+            "last_scan": self.last_scan,
+            "last_scan_at": self.last_scan_at.isoformat() if self.last_scan_at else None,
+            "last_error": self.last_error
+        }
+
+class FolderIndex:
+    """Índice persistente de archivos por carpeta y vigilantes activos"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._root_locks: Dict[str, threading.Lock] = {}
+        self._watchers: Dict[str, FolderWatcher] = {}
+        get_import_job_manager().add_finished_listener(self._release_failed_entries)
+
+    def lock_root(self, root: str) -> threading.Lock:
+        """Lock de la carpeta: escaneo, creación del trabajo y registro deben ir juntos"""
+        with self.lock:
+            return self._root_locks.setdefault(root, threading.Lock())
+
+    def scan(self, root: str, min_age_seconds: int = 0) -> ScanResult:
+        """Compara la carpeta con el índice (sin modificarlo) y calcula el hash de lo que cambió"""
+        started = time.time()
+        db = database.SessionLocal()
+        try:
+            known = {
+                path: (entry.size, entry.mtime)
+                for path, entry in crud.get_folder_scan_entries(db, root).items()
+            }
+        finally:
+            db.close()
+
+        result = ScanResult(root=root)
+        seen = set()
+        for state in iter_folder_files(root):
+            seen.add(state.path)
+            if known.get(state.path) == (state.size, state.mtime):
+                result.unchanged += 1
+                continue
+            if min_age_seconds and started - state.mtime < min_age_seconds:
+                result.deferred += 1
+                continue
+            try:
+                state.content_hash = compute_file_sha256(state.full_path)
+            except OSError as e:
+                logger.warning(f"No se pudo leer {state.full_path}: {e}")
+                continue
+            result.changed.append(state)
+        result.removed = [path for path in known if path not in seen]
+        result.seconds = time.time() - started
+        return result
+
+    def record(self, result: ScanResult, job_id: Optional[str] = None):
+        """Guarda el estado de los archivos enviados al trabajo y olvida los que desaparecieron"""
+        if not result.changed and not result.removed:
+            return
+        db = database.SessionLocal()
+        try:
+            crud.save_folder_scan_entries(
+                db, result.root, result.changed, job_id, datetime.utcnow(), removed_paths=result.removed
+            )
+        finally:
+            db.close()
+
+    def _release_failed_entries(self, job_id: str, status: str):
+        """
+        Olvida las entradas de los archivos del trabajo que no se importaron (fallidos, o sin
+        terminar si el trabajo falló). Los registros se hacen al crear el trabajo para que la
+        vigilancia no los encole dos veces; sin esto, un fallo pasajero (cuota de Gemini,
+        tiempo de parseo, Drive) dejaría el archivo como "sin cambios" para siempre.
+        """
+        if status == JobStatus.PENDING.value:
+            return  # Se reanudará: sus archivos siguen en curso
+        db = database.SessionLocal()
+        try:
+            entries = crud.get_folder_scan_entries_for_job(db, job_id)
+            if not entries:
+                return
+            imported = (ItemOutcome.SUCCESS.value, ItemOutcome.DUPLICATE.value)
+            failed = [item for item in crud.get_import_job_items(db, job_id) if item.outcome not in imported]
+            if not failed:
+                return
+            failed_files = {os.path.normcase(os.path.normpath(item.file_path)) for item in failed}
+            # Libros dentro de un ZIP: su nombre mostrado empieza por la ruta relativa del ZIP
+            failed_members = [(item.display_name or "").replace(os.sep, "/") for item in failed]
+            entry_ids = [
+                entry.id for entry in entries
+                if os.path.normcase(os.path.normpath(os.path.join(entry.root, entry.path))) in failed_files
+                or any(name.startswith(f"{entry.path}{MEMBER_SEPARATOR}") for name in failed_members)
+            ]
+            if entry_ids:
+                crud.delete_folder_scan_entries_by_id(db, entry_ids)
+                print(f"🔎 {len(entry_ids)} archivos del trabajo {job_id} se reintentarán en el próximo escaneo")
+        finally:
+            db.close()
+
+    def forget(self, root: str) -> int:
+        db = database.SessionLocal()
+        try:
+            return crud.delete_folder_scan_entries(db, root)
+        finally:
+            db.close()
+
+    # --- Modo vigilancia ---
+
+    def watch(self, root: str, on_changes: Callable[[ScanResult], Optional[str]],
+              interval: int = FOLDER_WATCH_INTERVAL) -> FolderWatcher:
+        """Empieza a vigilar la carpeta (si ya se vigilaba, devuelve el vigilante existente)"""
+        with self.lock:
+            watcher = self._watchers.get(root)
+            if watcher is not None:
+                return watcher
+            watcher = FolderWatcher(self, root, on_changes, interval=interval)
+            self._watchers[root] = watcher
+        watcher.start()
+        print(f"👀 Vigilando la carpeta {root} (cada {watcher.interval}s)")
+        return watcher
+
+    def unwatch(self, root: str) -> bool:
+        with self.lock:
+            watcher = self._watchers.pop(root, None)
+        if watcher is None:
+            return False
+        watcher.stop()
+        return True
+
+    def list_watchers(self) -> List[dict]:
+        with self.lock:
+            watchers = list(self._watchers.values())
+        return [watcher.to_dict() for watcher in watchers]
+
+    def stop_all(self):
+        with self.lock:
+            watchers = list(self._watchers.values())
+            self._watchers.clear()
+        for watcher in watchers:
+            watcher.stop()
+
+# Instancia global del índice de carpetas
+folder_index = FolderIndex()
+
+def get_folder_index() -> FolderIndex:
+    """Obtiene la instancia global del índice de carpetas"""
+    return folder_index
@@ -68,6 +68,14 @@ RATE_LIMIT_CONFIG = {
     }
 }
 
+# Configuración del análisis de metadatos por lotes (varios libros por llamada)
+BATCH_ANALYSIS_CONFIG = {
+    "batch_size": int(os.getenv("GEMINI_BATCH_SIZE", "5")),  # Libros por llamada a Gemini
+    "max_wait_seconds": 2.0,      # Espera máxima para completar un lote en la carga masiva
+    "excerpt_chars": 4000,        # Caracteres de texto por libro (igual que el análisis individual)
+    "output_tokens_per_book": 150,  # Tokens de salida reservados por libro
+}
+
 # Configuración de procesamiento RAG
 RAG_PROCESSING_CONFIG = {
     "chunk_size": 1000,           # Tamaño de chunk en tokens
@@ -95,6 +103,10 @@ def get_rate_limit_config() -> Dict[str, Any]:
     """Obtiene la configuración de rate limiting"""
     return RATE_LIMIT_CONFIG
 
+def get_batch_analysis_config() -> Dict[str, Any]:
+    """Obtiene la configuración del análisis de metadatos por lotes"""
+    return BATCH_ANALYSIS_CONFIG
+
 def get_rag_config() -> Dict[str, Any]:
     """Obtiene la configuración de procesamiento RAG"""
     return RAG_PROCESSING_CONFIG
@@ -76,6 +76,7 @@ class GoogleDriveManager:
     
     def __init__(self):
         self.service = None
+        self.credentials = None
         self.root_folder_id = None
         self.categories_cache = {}
         self.storage_cache = None
@@ -137,6 +138,9 @@ class GoogleDriveManager:
                 with open(TOKEN_FILE, 'w') as token:
                     token.write(creds.to_json())
             
+            # Se conservan para crear clientes adicionales (las descargas concurrentes)
+            self.credentials = creds
+            
             # Configurar SSL para evitar errores de versión
             try:
                 # Intentar con configuración estándar primero
@@ -1189,14 +1193,28 @@ class GoogleDriveManager:
             logger.error(f"❌ Error al listar carpeta pública: {e}")
             return {"success": False, "error": f"Error al listar carpeta: {str(e)}"}
 
+    def create_download_service(self):
+        """
+        Crea un cliente de Drive independiente para descargar desde otro hilo
+        (el cliente de googleapiclient y su httplib2.Http no son seguros entre hilos)
+        """
+        self._ensure_service_connection()
+        if self.credentials is None:
+            return None
+        return build('drive', 'v3', credentials=self.credentials, cache_discovery=False)
+
     @retry_on_error()
-    def download_file_from_drive(self, file_id, temp_dir):
+    def download_file_from_drive(self, file_id, temp_dir, service=None, wrap_file=None, chunk_size=None):
         """
-        Descarga un archivo desde Google Drive a un directorio temporal
+        Descarga un archivo desde Google Drive a un directorio temporal.
+        service permite usar un cliente propio del hilo, wrap_file envolver el archivo
+        de destino (p. ej. para limitar el ancho de banda) y chunk_size fijar el tamaño
+        de cada bloque descargado.
         """
+        service = service or self.service
         try:
             # Obtener información del archivo
-            file_info = self.service.files().get(
+            file_info = service.files().get(
                 fileId=file_id,
                 fields='id,name,mimeType,size'
             ).execute()
@@ -1208,10 +1226,14 @@ class GoogleDriveManager:
             temp_file_path = os.path.join(temp_dir, file_name)
             
             # Descargar archivo
-            request = self.service.files().get_media(fileId=file_id)
+            request = service.files().get_media(fileId=file_id)
             
             with open(temp_file_path, 'wb') as f:
-                downloader = MediaIoBaseDownload(f, request)
+                target = wrap_file(f) if wrap_file else f
+                if chunk_size:
+                    downloader = MediaIoBaseDownload(target, request, chunksize=chunk_size)
+                else:
+                    downloader = MediaIoBaseDownload(target, request)
                 done = False
                 while done is False:
                     status, done = downloader.next_chunk()
@@ -1230,6 +1252,114 @@ class GoogleDriveManager:
             logger.error(f"❌ Error al descargar archivo {file_id}: {e}")
             return {"success": False, "error": str(e)}
 
+    @retry_on_error()
+    def download_file_sample(self, file_id, temp_dir, service=None, wrap_file=None,
+                             head_size=4 * 1024 * 1024, tail_size=1024 * 1024):
+        """
+        Descarga solo el inicio y el final de un archivo con peticiones Range.
+        Se escriben en sus posiciones dentro de un archivo disperso del tamaño real:
+        el final contiene el xref/trailer del PDF o el directorio central del EPUB (ZIP)
+        y el inicio las primeras páginas, el OPF y la portada en la mayoría de los libros.
+        Los archivos pequeños se descargan completos.
+        """
+        service = service or self.service
+        try:
+            file_info = service.files().get(
+                fileId=file_id,
+                fields='id,name,mimeType,size,sha256Checksum,capabilities/canCopy'
+            ).execute()
+            
+            file_name = file_info.get('name', 'unknown_file')
+            file_size = int(file_info.get('size', 0))
+            sample_info = {
+                "sha256": file_info.get('sha256Checksum'),
+                "can_copy": file_info.get('capabilities', {}).get('canCopy', True)
+            }
+            
+            if not file_size or file_size <= head_size + tail_size:
+                result = self.download_file_from_drive(file_id, temp_dir, service=service, wrap_file=wrap_file)
+                if result.get("success"):
+                    result.update(sample_info, partial=False)
+                return result
+            
+            def read_range(start, end):
+                request = service.files().get_media(fileId=file_id)
+                request.headers['Range'] = f'bytes={start}-{end}'
+                return request.execute()
+            
+            temp_file_path = os.path.join(temp_dir, file_name)
+            with open(temp_file_path, 'wb') as f:
+                target = wrap_file(f) if wrap_file else f
+                f.truncate(file_size)
+                target.write(read_range(0, head_size - 1))
+                f.seek(file_size - tail_size)
+                target.write(read_range(file_size - tail_size, file_size - 1))
+            
+            logger.info(f"✅ Muestra descargada: {file_name} ({head_size + tail_size} de {file_size} bytes)")
+            return {
+                "success": True,
+                "file_path": temp_file_path,
+                "file_name": file_name,
+                "file_size": file_size,
+                "partial": True,
+                **sample_info
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ Error al descargar la muestra de {file_id}: {e}")
+            return {"success": False, "error": str(e)}
+
+    @retry_on_error()
+    def copy_book_to_drive(self, source_file_id, file_name, title, author, category):
+        """
+        Copia un libro de otra carpeta de Drive a la carpeta de categoría/letra con files.copy.
+        La copia la hace Drive en el servidor: el archivo no pasa por este equipo.
+        Devuelve la misma estructura que upload_book_to_drive.
+        """
+        try:
+            self._ensure_service_connection()
+            
+            category_folder_id = self.get_or_create_category_folder(category)
+            if not category_folder_id:
+                return {'success': False, 'error': 'No se pudo crear la carpeta de categoría'}
+            
+            letter_folder_id = self.get_letter_folder(category_folder_id, title)
+            if not letter_folder_id:
+                return {'success': False, 'error': 'No se pudo crear la carpeta de letra'}
+            
+            file = self.service.files().copy(
+                fileId=source_file_id,
+                body={
+                    'name': file_name,
+                    'parents': [letter_folder_id],
+                    'description': f'Título: {title}\nAutor: {author}\nCategoría: {category}'
+                },
+                fields='id, name, webViewLink',
+                supportsAllDrives=True
+            ).execute()
+            
+            drive_file_info = {
+                'id': file.get('id'),
+                'name': file.get('name'),
+                'web_view_link': file.get('webViewLink'),
+                'category': category,
+                'letter_folder': self.get_first_letter(title)
+            }
+            
+            self._clear_cache()
+            
+            logger.info(f"Libro copiado en Drive: {title} ({source_file_id} -> {file.get('id')})")
+            return {
+                'success': True,
+                'file_id': file.get('id'),
+                'file_path': file.get('name'),
+                'drive_info': drive_file_info
+            }
+            
+        except HttpError as e:
+            logger.error(f"Error al copiar {source_file_id} en Google Drive: {e}")
+            return {'success': False, 'error': str(e)}
+
     def process_public_folder_recursively(self, folder_url, temp_dir):
         """
         Procesa recursivamente una carpeta pública de Google Drive (incluyendo carpetas de otros usuarios)
@@ -0,0 +1,334 @@
+"""
+Trabajos de importación masiva reanudables
+Cada importación se guarda en import_jobs con una fila por archivo en import_job_items.
+Las etapas del pipeline registran puntos de control (parsed, analyzed, uploaded, committed),
+de modo que tras un reinicio o un corte del cliente el trabajo continúa donde quedó,
+sin repetir análisis con IA ni subidas a Drive ya realizadas.
+"""
+
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+import crud
+import database
+from job_events import get_job_event_bus
+
+logger = logging.getLogger(__name__)
+
+class JobStatus(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    COMPLETED_WITH_ERRORS = "completed_with_errors"
+    FAILED = "failed"
+
+class ItemState(Enum):
+    """Último punto de control alcanzado por un archivo"""
+    PENDING = "pending"
+    PARSED = "parsed"
+    ANALYZED = "analyzed"
+    UPLOADED = "uploaded"
+    COMMITTED = "committed"
+
+class ItemOutcome(Enum):
+    SUCCESS = "success"
+    DUPLICATE = "duplicate"
+    FAILED = "failed"
+
+# Estados de trabajo que deben reanudarse al iniciar el servidor
+UNFINISHED_STATUSES = [JobStatus.PENDING.value, JobStatus.RUNNING.value]
+
+def _outcome_for(result: dict) -> ItemOutcome:
+    if result.get("success"):
+        return ItemOutcome.SUCCESS
+    if result.get("error", "").startswith("Duplicado detectado"):
+        return ItemOutcome.DUPLICATE
+    return ItemOutcome.FAILED
+
+class ImportJobManager:
+    """Persistencia y ejecución de los trabajos de importación"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._running: Dict[str, threading.Thread] = {}
+        self._runner: Optional[Callable[[str], None]] = None
+        self._finished_listeners: List[Callable[[str, str], None]] = []
+
+    def set_runner(self, runner: Callable[[str], None]):
+        """Función que procesa los elementos pendientes de un trabajo (definida en main)"""
+        self._runner = runner
+
+    def add_finished_listener(self, listener: Callable[[str, str], None]):
+        """listener(job_id, estado) se llama cada vez que termina una ejecución del trabajo"""
+        self._finished_listeners.append(listener)
+
+    def _notify_finished(self, job_id: str, status: str):
+        for listener in self._finished_listeners:
+            try:
+                listener(job_id, status)
+            except Exception as e:
+                logger.warning(f"Error al notificar el fin del trabajo {job_id}: {e}")
+
+    # --- Creación y ejecución ---
+
+    def create_job(self, mode: str, files: List[Tuple[str, str, Optional[str]]], source: str = None,
+                   work_dir: str = None, move_to_library: bool = False) -> str:
+        """Registra un trabajo. files: lista de (file_path, display_name, content_hash)"""
+        job_id = str(uuid.uuid4())
+        db = database.SessionLocal()
+        try:
+            crud.create_import_job(
+                db, job_id, mode, files, datetime.utcnow(),
+                source=source, work_dir=work_dir, move_to_library=move_to_library
+            )
+        finally:
+            db.close()
+        print(f"🗂️ Trabajo de importación {job_id} creado: {len(files)} archivos ({mode})")
+        return job_id
+
+    def is_running(self, job_id: str) -> bool:
+        with self.lock:
+            thread = self._running.get(job_id)
+            return thread is not None and thread.is_alive()
+
+    def start_job(self, job_id: str, wait: bool = False) -> bool:
+        """Procesa los elementos pendientes del trabajo. Retorna False si ya estaba en ejecución"""
+        if self._runner is None:
+            raise RuntimeError("No hay función de procesamiento registrada para los trabajos de importación")
+        with self.lock:
+            thread = self._running.get(job_id)
+            if thread is not None and thread.is_alive():
+                return False
+            thread = threading.Thread(target=self._run, args=(job_id,), daemon=True, name=f"import-job-{job_id[:8]}")
+            self._running[job_id] = thread
+            thread.start()
+        if wait:
+            thread.join()
+        return True
+
+    def _run(self, job_id: str):
+        self._update_job(job_id, status=JobStatus.RUNNING.value, error=None)
+        self._publish_started(job_id)
+        try:
+            self._runner(job_id)
+        except Exception as e:
+            logger.error(f"Error en el trabajo de importación {job_id}: {e}")
+            self._update_job(job_id, status=JobStatus.FAILED.value, error=str(e))
+            get_job_event_bus().job_finished(job_id, JobStatus.FAILED.value, error=str(e))
+            self._notify_finished(job_id, JobStatus.FAILED.value)
+            return
+        finally:
+            with self.lock:
+                self._running.pop(job_id, None)
+        self._finalize(job_id)
+
+    def _finalize(self, job_id: str):
+        db = database.SessionLocal()
+        try:
+            job = crud.get_import_job(db, job_id)
+            counts = crud.get_import_job_counts(db, job_id)
+            work_dir = job.work_dir if job else None
+        finally:
+            db.close()
+
+        pending = counts.get(None, 0)
+        failed = counts.get(ItemOutcome.FAILED.value, 0)
+        if pending:
+            # Quedaron elementos sin procesar (p. ej. error inesperado): se reanudarán
+            status = JobStatus.PENDING.value
+        elif failed:
+            status = JobStatus.COMPLETED_WITH_ERRORS.value
+        else:
+            status = JobStatus.COMPLETED.value
+        self._update_job(job_id, status=status, finished_at=datetime.utcnow() if not pending else None)
+        get_job_event_bus().job_finished(job_id, status)
+        print(f"🏁 Trabajo de importación {job_id}: {status} {counts}")
+        self._notify_finished(job_id, status)
+
+        # Los archivos temporales se conservan mientras haya elementos que reintentar
+        if status == JobStatus.COMPLETED.value:
+            self._remove_work_dir(work_dir)
+
+    def _publish_started(self, job_id: str):
+        db = database.SessionLocal()
+        try:
+            job = crud.get_import_job(db, job_id)
+            counts = crud.get_import_job_counts(db, job_id)
+        finally:
+            db.close()
+        outcomes = {outcome: count for outcome, count in counts.items() if outcome is not None}
+        get_job_event_bus().job_started(
+            job_id, job.total_items if job else 0, completed=sum(outcomes.values()), outcomes=outcomes
+        )
+
+    def _remove_work_dir(self, work_dir: Optional[str]):
+        if work_dir and os.path.isdir(work_dir):
+            shutil.rmtree(work_dir, ignore_errors=True)
+            print(f"🗑️ Directorio de trabajo eliminado: {work_dir}")
+
+    def _update_job(self, job_id: str, **fields):
+        fields["updated_at"] = datetime.utcnow()
+        db = database.SessionLocal()
+        try:
+            crud.update_import_job(db, job_id, **fields)
+        finally:
+            db.close()
+
+    # --- Puntos de control de los elementos ---
+
+    def checkpoint(self, item_id: int, state: ItemState, **fields):
+        """Guarda el avance de un elemento (y los datos necesarios para no repetir la etapa)"""
+        if "drive_info" in fields and fields["drive_info"] is not None:
+            fields["drive_info"] = json.dumps(fields["drive_info"])
+        fields["state"] = state.value
+        fields["updated_at"] = datetime.utcnow()
+        db = database.SessionLocal()
+        try:
+            crud.update_import_job_item(db, item_id, **fields)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"No se pudo guardar el punto de control del elemento {item_id}: {e}")
+        finally:
+            db.close()
+
+    def finish_item(self, item_id: int, result: dict) -> ItemOutcome:
+        """Registra el resultado final de un elemento y devuelve su desenlace"""
+        outcome = _outcome_for(result)
+        fields = {
+            "outcome": outcome.value,
+            "result": json.dumps(result, default=str),
+            "error": None if outcome == ItemOutcome.SUCCESS else result.get("error"),
+            "updated_at": datetime.utcnow()
+        }
+        if outcome == ItemOutcome.SUCCESS:
+            fields["state"] = ItemState.COMMITTED.value
+            fields["book_id"] = (result.get("book") or {}).get("id")
+        db = database.SessionLocal()
+        try:
+            crud.update_import_job_item(db, item_id, **fields)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"No se pudo guardar el resultado del elemento {item_id}: {e}")
+        finally:
+            db.close()
+        return outcome
+
+    # --- Reanudación y consulta ---
+
+    def retry_failed(self, job_id: str) -> int:
+        """Vuelve a poner en cola solo los elementos fallidos (desde su último punto de control)"""
+        db = database.SessionLocal()
+        try:
+            reset = crud.reset_failed_import_job_items(db, job_id, datetime.utcnow())
+        finally:
+            db.close()
+        if reset:
+            self._update_job(job_id, status=JobStatus.PENDING.value, finished_at=None)
+        return reset
+
+    def resume_unfinished_jobs(self) -> List[str]:
+        """Reanuda en segundo plano los trabajos que quedaron sin terminar (p. ej. tras un reinicio)"""
+        db = database.SessionLocal()
+        try:
+            job_ids = [job.id for job in crud.get_import_jobs_by_status(db, UNFINISHED_STATUSES)]
+        finally:
+            db.close()
+        for job_id in job_ids:
+            print(f"🔁 Reanudando trabajo de importación {job_id}")
+            self.start_job(job_id)
+        return job_ids
+
+    def _job_to_dict(self, db, job) -> dict:
+        counts = crud.get_import_job_counts(db, job.id)
+        return {
+            "job_id": job.id,
+            "mode": job.mode,
+            "source": job.source,
+            "status": job.status,
+            "running": self.is_running(job.id),
+            "total_items": job.total_items,
+            "pending": counts.get(None, 0),
+            "successful": counts.get(ItemOutcome.SUCCESS.value, 0),
+            "duplicates": counts.get(ItemOutcome.DUPLICATE.value, 0),
+            "failed": counts.get(ItemOutcome.FAILED.value, 0),
+            "error": job.error,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None
+        }
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        db = database.SessionLocal()
+        try:
+            job = crud.get_import_job(db, job_id)
+            return self._job_to_dict(db, job) if job else None
+        finally:
+            db.close()
+
+    def list_jobs(self, limit: int = 20) -> List[dict]:
+        db = database.SessionLocal()
+        try:
+            return [self._job_to_dict(db, job) for job in crud.get_import_jobs(db, limit)]
+        finally:
+            db.close()
+
+    def get_items(self, job_id: str) -> List[dict]:
+        """Estado de cada archivo del trabajo"""
+        db = database.SessionLocal()
+        try:
+            return [
+                {
+                    "id": item.id,
+                    "file": item.display_name or item.file_path,
+                    "state": item.state,
+                    "outcome": item.outcome,
+                    "title": item.title,
+                    "author": item.author,
+                    "book_id": item.book_id,
+                    "error": item.error,
+                    "attempts": item.attempts
+                }
+                for item in crud.get_import_job_items(db, job_id)
+            ]
+        finally:
+            db.close()
+
+    def get_results(self, job_id: str) -> List[dict]:
+        """Resultados finales guardados de los elementos terminados"""
+        db = database.SessionLocal()
+        try:
+            return [
+                json.loads(item.result)
+                for item in crud.get_import_job_items(db, job_id)
+                if item.outcome and item.result
+            ]
+        finally:
+            db.close()
+
+    def delete_job(self, job_id: str) -> bool:
+        """Elimina el trabajo, sus elementos y su directorio temporal"""
+        if self.is_running(job_id):
+            raise RuntimeError("El trabajo está en ejecución")
+        db = database.SessionLocal()
+        try:
+            job = crud.get_import_job(db, job_id)
+            work_dir = job.work_dir if job else None
+            deleted = crud.delete_import_job(db, job_id)
+        finally:
+            db.close()
+        if deleted:
+            self._remove_work_dir(work_dir)
+        return deleted
+
+# Instancia global del gestor de trabajos
+import_job_manager = ImportJobManager()
+
+def get_import_job_manager() -> ImportJobManager:
+    """Obtiene la instancia global del gestor de trabajos de importación"""
+    return import_job_manager
@@ -0,0 +1,233 @@
+"""
+Pipeline de ingesta por etapas con colas acotadas
+Cada etapa (parseo → IA → portada → Drive → base de datos) tiene su propia cola y su
+propio número de hilos. Las colas acotadas aplican contrapresión: si una etapa se atrasa,
+las anteriores esperan en lugar de acumular trabajo en memoria, y una etapa lenta
+(por ejemplo Gemini) no deja inactiva a otra (por ejemplo la subida a Drive).
+"""
+
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Número de pipelines terminados que se conservan para consultar estadísticas
+PIPELINE_HISTORY_SIZE = 20
+
+_STOP = object()
+
+@dataclass
+class PipelineStage:
+    """Definición de una etapa del pipeline"""
+    name: str
+    handler: Callable[[Dict[str, Any]], Any]  # Recibe el contexto del libro y lo modifica
+    concurrency: int = 1  # Hilos dedicados a la etapa
+    queue_size: int = 8  # Capacidad de la cola de entrada (contrapresión)
+    batch_size: int = 1  # Con más de 1, el handler recibe una lista de contextos
+    batch_wait: float = 0.0  # Segundos máximos de espera para completar un lote
+
+@dataclass
+class StageStats:
+    """Estadísticas de una etapa"""
+    processed: int = 0
+    failed: int = 0
+    busy_workers: int = 0
+    total_seconds: float = 0.0
+
+class IngestionPipeline:
+    """
+    Pipeline de etapas conectadas por colas acotadas.
+    Cada elemento es un diccionario de contexto; una etapa puede terminar el elemento
+    anticipadamente asignando context["result"] (duplicado, error, etc.).
+    """
+
+    def __init__(self, name: str, stages: List[PipelineStage],
+                 on_item_done: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 on_stage_done: Optional[Callable[[str, Dict[str, Any], float], None]] = None):
+        if not stages:
+            raise ValueError("El pipeline necesita al menos una etapa")
+        self.pipeline_id = str(uuid.uuid4())
+        self.name = name
+        self.stages = stages
+        self.on_item_done = on_item_done
+        self.on_stage_done = on_stage_done  # (etapa, contexto, segundos) tras cada etapa
+        self._queues = [queue.Queue(maxsize=max(1, stage.queue_size)) for stage in stages]
+        self._stats = {stage.name: StageStats() for stage in stages}
+        self._lock = threading.Lock()
+        self._results: List[Dict[str, Any]] = []
+        self._workers_alive = [0] * len(stages)
+        self.total_items = 0
+        self.completed_items = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        _register_pipeline(self)
+
+    def _finish_item(self, context: Dict[str, Any]):
+        with self._lock:
+            self._results.append(context["result"])
+            self.completed_items += 1
+        if self.on_item_done:
+            try:
+                self.on_item_done(context)
+            except Exception as e:
+                logger.warning(f"Error en callback de pipeline: {e}")
+
+    def _next_batch(self, stage: PipelineStage, input_queue: queue.Queue) -> tuple:
+        """Toma el siguiente elemento (o lote) de la cola. Retorna (contextos, detener)"""
+        first = input_queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.time() + stage.batch_wait
+        while len(batch) < stage.batch_size:
+            remaining = deadline - time.time()
+            try:
+                context = input_queue.get(timeout=remaining) if remaining > 0 else input_queue.get_nowait()
+            except queue.Empty:
+                break
+            if context is _STOP:
+                return batch, True
+            batch.append(context)
+        return batch, False
+
+    def _worker(self, index: int):
+        stage = self.stages[index]
+        stats = self._stats[stage.name]
+        input_queue = self._queues[index]
+        is_last = index == len(self.stages) - 1
+
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch(stage, input_queue)
+            if not batch:
+                break
+
+            with self._lock:
+                stats.busy_workers += 1
+            start = time.time()
+            try:
+                stage.handler(batch if stage.batch_size > 1 else batch[0])
+            except Exception as e:
+                logger.error(f"Error en etapa '{stage.name}' para {[c.get('file') for c in batch]}: {e}")
+                for context in batch:
+                    if context.get("result") is None:
+                        context["result"] = {
+                            "success": False,
+                            "file": context.get("file"),
+                            "error": f"Error en etapa {stage.name}: {str(e)}"
+                        }
+                with self._lock:
+                    stats.failed += len(batch)
+            finally:
+                elapsed = time.time() - start
+                with self._lock:
+                    stats.busy_workers -= 1
+                    stats.processed += len(batch)
+                    stats.total_seconds += elapsed
+            
+            if self.on_stage_done:
+                for context in batch:
+                    try:
+                        self.on_stage_done(stage.name, context, elapsed / len(batch))
+                    except Exception as e:
+                        logger.warning(f"Error en callback de etapa: {e}")
+
+            for context in batch:
+                if is_last and context.get("result") is None:
+                    context["result"] = {"success": False, "file": context.get("file"), "error": "El pipeline terminó sin resultado"}
+                if context.get("result") is not None:
+                    self._finish_item(context)
+                else:
+                    # Bloquea si la siguiente etapa está llena: contrapresión
+                    self._queues[index + 1].put(context)
+
+        # El último hilo de la etapa propaga la parada a la siguiente
+        with self._lock:
+            self._workers_alive[index] -= 1
+            last_worker = self._workers_alive[index] == 0
+        if last_worker and not is_last:
+            for _ in range(self.stages[index + 1].concurrency):
+                self._queues[index + 1].put(_STOP)
+
+    def run(self, items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Procesa todos los elementos y devuelve la lista de resultados (bloqueante)"""
+        self.started_at = time.time()
+        threads = []
+        for index, stage in enumerate(self.stages):
+            self._workers_alive[index] = stage.concurrency
+            for n in range(stage.concurrency):
+                thread = threading.Thread(
+                    target=self._worker, args=(index,), daemon=True,
+                    name=f"pipeline-{self.name}-{stage.name}-{n}"
+                )
+                thread.start()
+                threads.append(thread)
+
+        print(f"🏭 Pipeline '{self.name}' iniciado: " + " → ".join(f"{s.name}({s.concurrency})" for s in self.stages))
+        for item in items:
+            with self._lock:
+                self.total_items += 1
+            self._queues[0].put(item)
+        for _ in range(self.stages[0].concurrency):
+            self._queues[0].put(_STOP)
+
+        for thread in threads:
+            thread.join()
+        self.finished_at = time.time()
+        print(f"🏁 Pipeline '{self.name}' terminado: {self.completed_items} libros en {self.finished_at - self.started_at:.1f}s")
+        return list(self._results)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Profundidad de cola, hilos ocupados y rendimiento por etapa"""
+        now = self.finished_at or time.time()
+        elapsed = (now - self.started_at) if self.started_at else 0.0
+        with self._lock:
+            stages = []
+            for index, stage in enumerate(self.stages):
+                stats = self._stats[stage.name]
+                stages.append({
+                    "name": stage.name,
+                    "concurrency": stage.concurrency,
+                    "queue_depth": self._queues[index].qsize(),
+                    "queue_capacity": self._queues[index].maxsize,
+                    "busy_workers": stats.busy_workers,
+                    "processed": stats.processed,
+                    "failed": stats.failed,
+                    "batch_size": stage.batch_size,
+                    "avg_seconds": round(stats.total_seconds / stats.processed, 3) if stats.processed else 0.0,
+                    "throughput_per_minute": round(stats.processed / elapsed * 60, 2) if elapsed > 0 else 0.0
+                })
+            return {
+                "pipeline_id": self.pipeline_id,
+                "name": self.name,
+                "status": "finished" if self.finished_at else ("running" if self.started_at else "pending"),
+                "total_items": self.total_items,
+                "completed_items": self.completed_items,
+                "elapsed_seconds": round(elapsed, 1),
+                "stages": stages
+            }
+
+# --- Registro global de pipelines para estadísticas ---
+_pipelines: "OrderedDict[str, IngestionPipeline]" = OrderedDict()
+_registry_lock = threading.Lock()
+
+def _register_pipeline(pipeline: IngestionPipeline):
+    with _registry_lock:
+        _pipelines[pipeline.pipeline_id] = pipeline
+        while len(_pipelines) > PIPELINE_HISTORY_SIZE:
+            oldest_id, oldest = next(iter(_pipelines.items()))
+            if not oldest.finished_at:
+                break
+            _pipelines.pop(oldest_id)
+
+def get_pipeline_stats() -> List[Dict[str, Any]]:
+    """Estadísticas de los pipelines activos y de los últimos terminados"""
+    with _registry_lock:
+        pipelines = list(_pipelines.values())
+    return [pipeline.get_stats() for pipeline in reversed(pipelines)]
@@ -0,0 +1,62 @@
+"""
+Motor de ingesta masiva con pool de procesos
+El parseo de documentos (PyMuPDF / epub_reader, limitado por CPU) se ejecuta en procesos
+separados dimensionados según los núcleos disponibles, supervisados por parse_sandbox
+(límites de tiempo y memoria, reciclado de procesos). Las llamadas a Gemini, Google Drive
+y la base de datos se ejecutan en las etapas de hilos de ingestion_pipeline, cada una
+con su propia concurrencia.
+"""
+
+import os
+import threading
+from typing import Optional
+import logging
+
+from document_analysis import DocumentAnalysis, remember_analysis
+from parse_sandbox import ParseSupervisor, DocumentParseError
+
+logger = logging.getLogger(__name__)
+
+# Procesos de parseo: por defecto uno por núcleo disponible
+PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", "0")) or (os.cpu_count() or 2)
+# Hilos por etapa del pipeline de ingesta masiva
+AI_WORKERS = int(os.getenv("INGEST_AI_WORKERS", "2"))  # Llamadas a Gemini (limitadas por el rate limiter)
+COVER_WORKERS = int(os.getenv("INGEST_COVER_WORKERS", "2"))  # Guardado y búsqueda online de portadas
+DRIVE_WORKERS = int(os.getenv("INGEST_DRIVE_WORKERS", "3"))  # Subidas a Google Drive
+DB_WORKERS = 1  # SQLite admite un solo escritor: las inserciones se serializan
+# Capacidad de cada cola entre etapas (contrapresión)
+STAGE_QUEUE_SIZE = int(os.getenv("INGEST_STAGE_QUEUE_SIZE", "8"))
+
+_parse_supervisor: Optional[ParseSupervisor] = None
+_executor_lock = threading.Lock()
+
+def get_parse_supervisor() -> ParseSupervisor:
+    """Obtiene (o crea) el pool global de procesos de parseo supervisados"""
+    global _parse_supervisor
+    with _executor_lock:
+        if _parse_supervisor is None:
+            _parse_supervisor = ParseSupervisor(workers=PARSE_WORKERS)
+            logger.info(f"Pool de parseo iniciado con {PARSE_WORKERS} procesos")
+        return _parse_supervisor
+
+def shutdown_parse_executor():
+    """Detiene el pool de procesos (al apagar la aplicación)"""
+    global _parse_supervisor
+    with _executor_lock:
+        if _parse_supervisor is not None:
+            _parse_supervisor.close()
+            _parse_supervisor = None
+
+def get_parse_stats() -> dict:
+    """Documentos parseados, fallidos por límites y procesos reciclados"""
+    with _executor_lock:
+        supervisor = _parse_supervisor
+    return supervisor.get_stats() if supervisor else {"workers": PARSE_WORKERS, "parsed": 0}
+
+def parse_document(file_path: str, content_hash: Optional[str] = None) -> DocumentAnalysis:
+    """
+    Parsea un documento en un proceso supervisado y memoriza el resultado en este proceso.
+    Lanza DocumentParseError (o una subclase) si el parseo falla, se cuelga o agota la memoria.
+    """
+    document = get_parse_supervisor().parse(file_path)
+    return remember_analysis(document, content_hash)
@@ -0,0 +1,186 @@
+"""
+Eventos de progreso de los trabajos de importación masiva
+Cada trabajo tiene un canal con el historial reciente de eventos y las colas de sus
+suscriptores (conexiones SSE). Los eventos informan del estado de cada archivo, el tiempo
+de cada etapa del pipeline, el rendimiento y el tiempo estimado restante.
+"""
+
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Eventos que se conservan por trabajo para los clientes que se conectan tarde o reconectan
+JOB_EVENT_HISTORY = 1000
+# Canales de trabajos que se mantienen en memoria
+JOB_CHANNEL_LIMIT = 50
+# Eventos pendientes por suscriptor antes de desconectarlo (cliente demasiado lento)
+SUBSCRIBER_QUEUE_SIZE = 2000
+
+FINISHED_EVENT = "finished"
+
+class _JobChannel:
+    def __init__(self):
+        self.history = deque(maxlen=JOB_EVENT_HISTORY)
+        self.subscribers = []
+        self.next_id = 1
+        self.total = 0
+        self.completed = 0
+        self.outcomes: Dict[str, int] = {}
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.started_at: Optional[float] = None
+        self.processed_this_run = 0
+        self.finished = False
+
+class JobEventBus:
+    """Publica y distribuye los eventos de progreso de los trabajos de importación"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._channels: "OrderedDict[str, _JobChannel]" = OrderedDict()
+
+    def _channel(self, job_id: str) -> _JobChannel:
+        channel = self._channels.get(job_id)
+        if channel is None:
+            channel = _JobChannel()
+            self._channels[job_id] = channel
+            while len(self._channels) > JOB_CHANNEL_LIMIT:
+                oldest_id, oldest = next(iter(self._channels.items()))
+                if not oldest.finished or oldest.subscribers:
+                    break
+                self._channels.pop(oldest_id)
+        return channel
+
+    def _publish(self, job_id: str, channel: _JobChannel, event_type: str, data: Dict[str, Any]):
+        # Se llama con el lock tomado
+        event = {"id": channel.next_id, "event": event_type, "data": data}
+        channel.next_id += 1
+        channel.history.append(event)
+        for subscriber in list(channel.subscribers):
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                logger.warning(f"Suscriptor del trabajo {job_id} desconectado: no consume los eventos")
+                channel.subscribers.remove(subscriber)
+
+    def _progress(self, channel: _JobChannel) -> Dict[str, Any]:
+        elapsed = time.time() - channel.started_at if channel.started_at else 0.0
+        remaining = max(channel.total - channel.completed, 0)
+        rate = channel.processed_this_run / elapsed if elapsed > 0 else 0.0
+        return {
+            "total": channel.total,
+            "completed": channel.completed,
+            "remaining": remaining,
+            "outcomes": dict(channel.outcomes),
+            "elapsed_seconds": round(elapsed, 1),
+            "throughput_per_minute": round(rate * 60, 2),
+            "eta_seconds": round(remaining / rate, 1) if rate > 0 else None
+        }
+
+    # --- Publicación ---
+
+    def job_started(self, job_id: str, total: int, completed: int = 0, outcomes: Dict[str, int] = None):
+        with self.lock:
+            channel = self._channel(job_id)
+            # Nueva ejecución (reanudación o reintento): el historial anterior ya no aplica
+            channel.history.clear()
+            channel.stages.clear()
+            channel.total = total
+            channel.completed = completed
+            channel.outcomes = dict(outcomes or {})
+            channel.started_at = time.time()
+            channel.processed_this_run = 0
+            channel.finished = False
+            self._publish(job_id, channel, "started", self._progress(channel))
+
+    def item_finished(self, job_id: str, file: str, outcome: str, error: Optional[str] = None, book: dict = None):
+        with self.lock:
+            channel = self._channel(job_id)
+            channel.completed += 1
+            channel.processed_this_run += 1
+            channel.outcomes[outcome] = channel.outcomes.get(outcome, 0) + 1
+            self._publish(job_id, channel, "item", {"file": file, "outcome": outcome, "error": error, "book": book})
+            self._publish(job_id, channel, "progress", self._progress(channel))
+
+    def stage_done(self, job_id: str, file: str, stage: str, seconds: float):
+        with self.lock:
+            channel = self._channel(job_id)
+            stats = channel.stages.setdefault(stage, {"count": 0, "total_seconds": 0.0})
+            stats["count"] += 1
+            stats["total_seconds"] += seconds
+            self._publish(job_id, channel, "stage", {
+                "file": file,
+                "stage": stage,
+                "seconds": round(seconds, 3),
+                "avg_seconds": round(stats["total_seconds"] / stats["count"], 3)
+            })
+
+    def job_finished(self, job_id: str, status: str, error: Optional[str] = None):
+        with self.lock:
+            channel = self._channel(job_id)
+            channel.finished = True
+            data = self._progress(channel)
+            data.update({"status": status, "error": error})
+            self._publish(job_id, channel, FINISHED_EVENT, data)
+
+    # --- Suscripción ---
+
+    def subscribe(self, job_id: str, last_event_id: int = 0) -> queue.Queue:
+        """Cola con los eventos posteriores a last_event_id y los que vayan llegando"""
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE + JOB_EVENT_HISTORY)
+        with self.lock:
+            channel = self._channel(job_id)
+            for event in channel.history:
+                if event["id"] > last_event_id:
+                    subscriber.put_nowait(event)
+            channel.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, job_id: str, subscriber: queue.Queue):
+        with self.lock:
+            channel = self._channels.get(job_id)
+            if channel and subscriber in channel.subscribers:
+                channel.subscribers.remove(subscriber)
+
+    def is_subscribed(self, job_id: str, subscriber: queue.Queue) -> bool:
+        """False si el suscriptor fue desconectado por no consumir sus eventos"""
+        with self.lock:
+            channel = self._channels.get(job_id)
+            return bool(channel) and subscriber in channel.subscribers
+
+    def has_channel(self, job_id: str) -> bool:
+        with self.lock:
+            return job_id in self._channels
+
+    def get_progress(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Progreso, rendimiento y tiempos medios por etapa del trabajo"""
+        with self.lock:
+            channel = self._channels.get(job_id)
+            if channel is None:
+                return None
+            progress = self._progress(channel)
+            progress["finished"] = channel.finished
+            progress["stages"] = {
+                name: {
+                    "count": stats["count"],
+                    "avg_seconds": round(stats["total_seconds"] / stats["count"], 3) if stats["count"] else 0.0
+                }
+                for name, stats in channel.stages.items()
+            }
+            return progress
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Serializa un evento en formato text/event-stream"""
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+# Instancia global del bus de eventos
+job_event_bus = JobEventBus()
+
+def get_job_event_bus() -> JobEventBus:
+    """Obtiene la instancia global del bus de eventos de trabajos"""
+    return job_event_bus
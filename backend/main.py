@@ -1,19 +1,17 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Response, Query, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Response, Query, Form, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import shutil
 import os
 import io
 import fitz
-import ebooklib
-from ebooklib import epub
-from bs4 import BeautifulSoup
 import google.generativeai as genai
 from dotenv import load_dotenv
 import json
-from typing import List
+from typing import List, Optional
 import asyncio
 import aiofiles
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -22,13 +20,25 @@ import zipfile
 from pathlib import Path
 import time
 import threading
+import queue
 import uuid
 from googleapiclient.http import MediaIoBaseDownload
 import hashlib
+import re
 from datetime import datetime
 
 import crud, models, database, schemas
 import cover_search
+from document_analysis import (
+    DocumentAnalysis,
+    analyze_document,
+    load_document,
+    save_cover,
+    UnsupportedDocumentError,
+    InsufficientTextError,
+    get_extraction_stats
+)
+from upload_stream import StreamedUpload, stream_upload_to_disk, discard_upload, compute_file_sha256, UploadTooLargeError, MAX_UPLOAD_SIZE
 import logging
 
 # Configurar logging
@@ -57,23 +67,49 @@ os.makedirs(BOOKS_PATH, exist_ok=True)
 models.Base.metadata.create_all(bind=database.engine)
 
 # Rate limiting para llamadas a APIs de IA
+from gemini_config import get_batch_analysis_config
 from rate_limiter import (
     call_gemini_with_limit_sync,
     get_all_rate_limit_stats,
     RateLimitExceeded
 )
 from rag_queue import get_rag_queue, TaskPriority
+from ingestion_pool import (
+    parse_document,
+    shutdown_parse_executor,
+    get_parse_stats,
+    DocumentParseError,
+    PARSE_WORKERS,
+    AI_WORKERS,
+    COVER_WORKERS,
+    DRIVE_WORKERS,
+    DB_WORKERS,
+    STAGE_QUEUE_SIZE
+)
+from ingestion_pipeline import IngestionPipeline, PipelineStage, get_pipeline_stats
+from bulk_writer import write_books, PendingBook, get_bulk_write_stats, BULK_WRITE_BATCH_SIZE, BULK_WRITE_MAX_WAIT
+from near_duplicates import normalize_text
+from metadata_extractor import EmbeddedMetadata, extract_embedded_metadata
+from ai_cache import get_ai_cache, batch_prompt, SINGLE_PROMPT
+from import_jobs import get_import_job_manager, ItemState
+from reanalysis import get_metadata_reanalyzer, BookSnapshot, REANALYSIS_ENABLED
+from folder_index import get_folder_index, normalize_root, ScanResult, FOLDER_WATCH_INTERVAL
+from chunked_upload import (
+    get_chunked_upload_manager,
+    ChunkedUploadError,
+    UploadSessionNotFoundError,
+    ChunkChecksumError,
+    IncompleteUploadError,
+    MAX_CHUNK_SIZE
+)
+from job_events import get_job_event_bus, format_sse, FINISHED_EVENT
+from epub_reader import EpubReader, read_epub_text
+from drive_prefetch import DrivePrefetcher, DRIVE_IMPORT_MODES, DRIVE_FOLDER_IMPORT_MODE
+from zip_stream import extract_zip_books, MEMBER_SEPARATOR, ZipExtractLimitError
 
 # --- Funciones de IA y Procesamiento ---
-def analyze_with_gemini(text: str, max_retries: int = 3) -> dict:
-    """
-    Analiza texto con Gemini AI con manejo robusto de errores y retry logic
-    """
-    try:
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        prompt = f"""
-    Eres un bibliotecario experto. Analiza el siguiente texto extraído de las primeras páginas de un libro.
-    Tu tarea es identificar el título, el autor y la categoría principal del libro.
+# Instrucciones comunes del análisis de metadatos (individual y por lotes)
+BOOK_ANALYSIS_GUIDELINES = """    Tu tarea es identificar el título, el autor y la categoría principal del libro.
     
     INSTRUCCIONES ESPECÍFICAS:
     1. Para el TÍTULO: Busca el título principal del libro, generalmente en mayúsculas o al inicio del texto. El título debe guardarse en la base de datos en formato capitalizado, nunca todo en mayúsculas.
@@ -85,7 +121,22 @@ def analyze_with_gemini(text: str, max_retries: int = 3) -> dict:
     CATEGORÍAS COMUNES EN ESPAÑOL:
     - Psicología, Literatura, Ciencia, Historia, Tecnología, Medicina, Filosofía, Economía, Política, Arte, Música, Deportes, Cocina, Viajes, Biografía, Autoayuda, Religión, Educación, Derecho, Marketing, Administración, Contabilidad, Ingeniería, Arquitectura, Diseño, Fotografía, Cine, Teatro, Danza, Moda, Jardinería, Manualidades, etc.
     
-    Devuelve ÚNICAMENTE un objeto JSON con las claves "title", "author" y "category".
+"""
+
+def analyze_with_gemini(text: str, max_retries: int = 3, use_cache: bool = True) -> dict:
+    """
+    Analiza texto con Gemini AI con manejo robusto de errores y retry logic.
+    Los resultados correctos se guardan en la caché persistente de análisis.
+    """
+    if use_cache:
+        cached = get_ai_cache().get(text)
+        if cached:
+            return cached
+    try:
+        model = genai.GenerativeModel('gemini-2.0-flash')
+        prompt = f"""
+    Eres un bibliotecario experto. Analiza el siguiente texto extraído de las primeras páginas de un libro.
+{BOOK_ANALYSIS_GUIDELINES}    Devuelve ÚNICAMENTE un objeto JSON con las claves "title", "author" y "category".
     Si no puedes determinar un valor específico, usa "Desconocido".
     
     Ejemplo: {{'title': 'El nombre del viento', 'author': 'Patrick Rothfuss', 'category': 'Fantasía'}}
@@ -149,6 +200,7 @@ def analyze_with_gemini(text: str, max_retries: int = 3) -> dict:
                 
                 # Si la IA devuelve "Desconocido", mantenerlo (no es un error)
                 # Solo cambiar si realmente hay un error en el procesamiento
+                get_ai_cache().put(text, result)
                 return result
                 
             except json.JSONDecodeError as e:
@@ -187,212 +239,241 @@ def analyze_with_gemini(text: str, max_retries: int = 3) -> dict:
         print(f"❌ Error inesperado en análisis: {e}")
         return {"title": "Error de análisis", "author": "Error de análisis", "category": "Error"}
 
-def process_pdf(file_path: str, static_dir: str) -> dict:
-    doc = fitz.open(file_path)
-    text = ""
+def _strip_json_fences(text: str) -> str:
+    """Quita los bloques ```json ... ``` que a veces envuelven la respuesta de la IA"""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    elif text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+def analyze_with_gemini_batch(items: List[tuple], max_retries: int = 2) -> dict:
+    """
+    Analiza varios libros en una sola llamada a Gemini.
+    items: lista de (clave, texto, nombre_de_archivo). Devuelve {clave: {"title", "author", "category"}}.
+    Los libros ya analizados se toman de la caché persistente; los elementos ausentes
+    o mal formados en la respuesta se analizan con llamadas individuales.
+    """
+    results = {}
+    batch_config = get_batch_analysis_config()
+    excerpt_chars = batch_config["excerpt_chars"]
+    # Libros ya analizados anteriormente (caché persistente): vale un análisis individual
+    # o uno por lotes con el mismo extracto
+    cache_prompts = (SINGLE_PROMPT, batch_prompt(excerpt_chars))
+    pending = []
+    for key, text, file_name in items:
+        cached = get_ai_cache().get(text, prompts=cache_prompts)
+        if cached:
+            results[key] = cached
+        else:
+            pending.append((key, text, file_name))
+    items = pending
+    if not items:
+        return results
+    if len(items) == 1:
+        key, text, _ = items[0]
+        results[key] = analyze_with_gemini(text, use_cache=False)
+        return results
     
-    # Extraer texto de más páginas para mejor análisis
-    max_pages = min(len(doc), 10)  # Aumentar de 5 a 10 páginas
-    for i in range(max_pages): 
-        text += doc.load_page(i).get_text("text", sort=True)
+    books_section = "\n".join(
+        f'=== LIBRO id="{index}" (archivo: {file_name}) ===\n{text[:excerpt_chars]}\n=== FIN LIBRO id="{index}" ==='
+        for index, (_, text, file_name) in enumerate(items)
+    )
+    prompt = f"""
+    Eres un bibliotecario experto. Analiza los textos extraídos de las primeras páginas de {len(items)} libros distintos.
+    Para CADA libro, por separado:
+{BOOK_ANALYSIS_GUIDELINES}
+    Devuelve ÚNICAMENTE un arreglo JSON con un objeto por libro, con las claves "id", "title", "author" y "category".
+    El valor de "id" debe ser exactamente el id del libro indicado en su encabezado.
+    Si no puedes determinar un valor específico, usa "Desconocido".
     
-    # Agregar información de depuración
-    print(f"📄 PDF procesado: {os.path.basename(file_path)}")
-    print(f"📄 Páginas extraídas: {max_pages}")
-    print(f"📄 Longitud del texto: {len(text)} caracteres")
-    print(f"📄 Primeros 200 caracteres: {text[:200]}...")
+    Ejemplo: [{{"id": "0", "title": "El nombre del viento", "author": "Patrick Rothfuss", "category": "Fantasía"}}]
     
-    cover_path = None
-    best_image = None
-    best_size = 0
+    Libros a analizar:
+{books_section}
+    """
     
-    # Buscar la mejor imagen de portada (la más grande)
-    print(f"🔍 Buscando imágenes en las primeras {min(len(doc), 3)} páginas...")
-    for i in range(min(len(doc), 3)):  # Solo revisar las primeras 3 páginas
-        page_images = doc.get_page_images(i)
-        print(f"📄 Página {i}: {len(page_images)} imágenes encontradas")
-        
-        for img in page_images:
-            xref = img[0]
+    analyzed = 0
+    try:
+        model = genai.GenerativeModel('gemini-2.0-flash')
+        for attempt in range(max_retries):
             try:
-                pix = fitz.Pixmap(doc, xref)
-                print(f"🖼️ Imagen en página {i}: {pix.width}x{pix.height} (tamaño: {pix.width * pix.height})")
+                def _generate_batch_analysis():
+                    return model.generate_content(
+                        prompt,
+                        generation_config=genai.types.GenerationConfig(
+                            temperature=0.1,
+                            max_output_tokens=batch_config["output_tokens_per_book"] * len(items),
+                            top_p=0.8,
+                            top_k=40
+                        ),
+                        safety_settings=[
+                            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+                            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+                            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+                            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
+                        ]
+                    )
                 
-                if pix.width > 200 and pix.height > 200:  # Mínimo 200x200
-                    size = pix.width * pix.height
-                    if size > best_size:
-                        best_size = size
-                        best_image = pix
-                        print(f"✅ Nueva mejor imagen: {pix.width}x{pix.height}")
-            except Exception as e:
-                print(f"⚠️ Error al procesar imagen en página {i}: {e}")
-                continue
-    
-    # Guardar la mejor imagen encontrada
-    if best_image:
-        try:
-            # Crear directorio si no existe
-            os.makedirs(static_dir, exist_ok=True)
-            
-            # Generar nombre único para la imagen (URL-safe)
-            base_name = os.path.splitext(os.path.basename(file_path))[0]
-            # Limpiar el nombre para que sea URL-safe
-            safe_base_name = "".join(c for c in base_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            safe_base_name = safe_base_name.replace(' ', '_')
-            timestamp = int(time.time())
-            cover_filename = f"cover_{safe_base_name}_{timestamp}.png"
-            cover_full_path = os.path.join(static_dir, cover_filename)
-            
-            # Guardar imagen
-            best_image.save(cover_full_path)
-            cover_path = cover_filename  # Solo el nombre del archivo, no la ruta completa
-            
-            # Verificar que el archivo se guardó correctamente
-            if os.path.exists(cover_full_path):
-                file_size = os.path.getsize(cover_full_path)
-                print(f"✅ Imagen de portada guardada: {cover_filename} ({file_size} bytes)")
-            else:
-                print(f"❌ Error: El archivo no se guardó correctamente: {cover_full_path}")
-                cover_path = None
-            
-            print(f"✅ Imagen de portada guardada: {cover_filename}")
-            print(f"✅ Tamaño de imagen: {best_image.width}x{best_image.height}")
-            print(f"✅ Ruta completa: {cover_full_path}")
-            
-        except Exception as e:
-            print(f"❌ Error al guardar imagen de portada: {e}")
-            cover_path = None
-        finally:
-            if best_image:
-                best_image = None
-    else:
-        print("❌ No se encontró ninguna imagen de portada válida")
-        # Intentar búsqueda online como fallback
-        print("🔍 Intentando búsqueda de portada online...")
-        try:
-            # Extraer título del nombre del archivo para la búsqueda
-            base_name = os.path.splitext(os.path.basename(file_path))[0]
-            # Limpiar el nombre para la búsqueda
-            search_title = "".join(c for c in base_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            search_title = search_title.replace('_', ' ').replace('-', ' ')
+                response = call_gemini_with_limit_sync(_generate_batch_analysis)
+                parsed = json.loads(_strip_json_fences(response.text))
+                if isinstance(parsed, dict):
+                    parsed = parsed.get("books") or parsed.get("libros") or [parsed]
+                if not isinstance(parsed, list):
+                    raise ValueError("La respuesta del lote no es un arreglo JSON")
+                
+                for entry in parsed:
+                    if not isinstance(entry, dict) or not all(key in entry for key in ["id", "title", "author", "category"]):
+                        continue
+                    try:
+                        index = int(str(entry["id"]).strip())
+                    except ValueError:
+                        continue
+                    if 0 <= index < len(items) and items[index][0] not in results:
+                        result = {
+                            "title": entry["title"],
+                            "author": entry["author"],
+                            "category": translate_category_to_spanish(entry["category"]) if entry["category"] else entry["category"]
+                        }
+                        results[items[index][0]] = result
+                        get_ai_cache().put(items[index][1], result, prompt=cache_prompts[1])
+                        analyzed += 1
+                print(f"📦 Análisis por lotes: {analyzed}/{len(items)} libros en una llamada")
+                break
             
-            online_cover = cover_search.search_book_cover_online(search_title, static_dir=static_dir)
-            if online_cover:
-                cover_path = online_cover
-                print(f"✅ Portada online encontrada: {online_cover}")
-            else:
-                print("❌ No se pudo encontrar portada online")
-        except Exception as e:
-            print(f"❌ Error en búsqueda de portada online: {e}")
-            cover_path = None
-    
-    return {"text": text, "cover_image_url": cover_path}
-
-def process_epub(file_path: str, static_dir: str) -> dict:
-    """ Lógica de procesamiento de EPUB muy mejorada con fallbacks para la portada. """
-    book = epub.read_epub(file_path)
-    text = ""
-    for item in book.get_items_of_type(ebooklib.ITEM_DOCUMENT):
-        soup = BeautifulSoup(item.get_content(), 'html.parser')
-        text += soup.get_text(separator=' ') + "\n"
-        if len(text) > 4500: break
+            except Exception as e:
+                print(f"Error en análisis por lotes (intento {attempt + 1}): {e}")
+                if attempt < max_retries - 1:
+                    time.sleep(1)
+    except RateLimitExceeded as e:
+        print(f"⚠️ Rate limit global alcanzado en análisis por lotes: {e}")
+    except Exception as e:
+        print(f"❌ Error inesperado en análisis por lotes: {e}")
     
-    if len(text.strip()) < 100:
-        raise HTTPException(status_code=422, detail="No se pudo extraer suficiente texto del EPUB para su análisis.")
-
-    cover_path = None
-    cover_item = None
+    # Elementos que faltan o vinieron mal formados: llamada individual
+    for key, text, _ in items:
+        if key not in results:
+            print(f"🔁 Análisis individual para {key} (no incluido en la respuesta del lote)")
+            results[key] = analyze_with_gemini(text, use_cache=False)
+    return results
 
-    # Intento 1: Buscar la portada oficial en metadatos
-    cover_items = list(book.get_items_of_type(ebooklib.ITEM_COVER))
-    if cover_items:
-        cover_item = cover_items[0]
-        print(f"✅ Portada oficial encontrada en EPUB: {cover_item.get_name()}")
+def analyze_category_with_gemini(title: str, author: str, text: str, max_retries: int = 3) -> str:
+    """
+    Pide a Gemini solo la categoría (título y autor ya son conocidos): prompt y respuesta mínimos.
+    Reintenta como analyze_with_gemini; si todos los intentos fallan devuelve "Error", el valor
+    de relleno que recoge el reanálisis en segundo plano (no "Sin categoría", que es una respuesta válida).
+    """
+    try:
+        model = genai.GenerativeModel('gemini-2.0-flash')
+        prompt = f"""
+    Eres un bibliotecario experto. Indica la categoría principal del libro "{title}" de {author}.
+    La categoría DEBE estar en español (ej: Psicología, Literatura, Ciencia, Historia, Tecnología, Medicina, Filosofía, Economía, etc.).
+    Devuelve ÚNICAMENTE el nombre de la categoría, sin explicaciones.
     
-    # Intento 2: Si no hay portada oficial, buscar por nombre de archivo "cover"
-    if not cover_item:
-        for item in book.get_items_of_type(ebooklib.ITEM_IMAGE):
-            if 'cover' in item.get_name().lower():
-                cover_item = item
-                print(f"✅ Portada encontrada por nombre: {item.get_name()}")
-                break
-
-    # Intento 3: Si no hay portada, buscar la primera imagen grande
-    if not cover_item:
-        largest_image = None
-        largest_size = 0
-        for item in book.get_items_of_type(ebooklib.ITEM_IMAGE):
+    Inicio del libro: --- {text[:1500]} ---
+    """
+        
+        def _generate_category():
+            return model.generate_content(
+                prompt,
+                generation_config=genai.types.GenerationConfig(temperature=0.1, max_output_tokens=20)
+            )
+        
+        for attempt in range(max_retries):
             try:
-                content = item.get_content()
-                if len(content) > 10000:  # Mínimo 10KB
-                    if len(content) > largest_size:
-                        largest_size = len(content)
-                        largest_image = item
+                response = call_gemini_with_limit_sync(_generate_category)
+                lines = response.text.strip().strip('".').splitlines()
+                if not lines or not lines[0].strip():
+                    raise ValueError("Respuesta de IA vacía")
+                return translate_category_to_spanish(lines[0].strip())
+            except RateLimitExceeded:
+                raise
             except Exception as e:
-                print(f"⚠️ Error al procesar imagen {item.get_name()}: {e}")
-                continue
+                error_msg = str(e).lower()
+                print(f"Error de IA al obtener la categoría en intento {attempt + 1}: {e}")
+                
+                if attempt == max_retries - 1:
+                    print(f"Error final de categoría después de {max_retries} intentos: {e}")
+                    break
+                if any(keyword in error_msg for keyword in ["quota", "rate", "limit", "too many", "429", "resource exhausted"]):
+                    time.sleep((attempt + 1) * 3)  # Espera progresiva: 3s, 6s
+                elif "timeout" in error_msg or "deadline" in error_msg:
+                    time.sleep((attempt + 1) * 2)
+                else:
+                    time.sleep(1)
         
-        if largest_image:
-            cover_item = largest_image
-            print(f"✅ Imagen más grande encontrada: {largest_image.get_name()} ({largest_size} bytes)")
+        return "Error"
+    
+    except RateLimitExceeded as e:
+        print(f"⚠️ Rate limit global alcanzado al obtener la categoría: {e}")
+        return "Error"
+    except Exception as e:
+        print(f"❌ Error al obtener la categoría con IA: {e}")
+        return "Error"
 
-    # Si encontramos una portada por cualquiera de los métodos
-    if cover_item:
-        try:
-            # Crear directorio si no existe
-            os.makedirs(static_dir, exist_ok=True)
-            
-            # Generar nombre único para la imagen (URL-safe)
-            base_name = os.path.splitext(os.path.basename(file_path))[0]
-            # Limpiar el nombre para que sea URL-safe
-            safe_base_name = "".join(c for c in base_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            safe_base_name = safe_base_name.replace(' ', '_')
-            timestamp = int(time.time())
-            original_name = cover_item.get_name().replace('/', '_').replace('\\', '_')
-            # Limpiar también el nombre original
-            safe_original_name = "".join(c for c in original_name if c.isalnum() or c in ('.', '-', '_'))
-            cover_filename = f"cover_{safe_base_name}_{timestamp}_{safe_original_name}"
-            cover_full_path = os.path.join(static_dir, cover_filename)
-            
-            # Guardar imagen
-            with open(cover_full_path, 'wb') as f:
-                f.write(cover_item.get_content())
-            
-            cover_path = cover_filename  # Solo el nombre del archivo, no la ruta completa
-            
-            # Verificar que el archivo se guardó correctamente
-            if os.path.exists(cover_full_path):
-                file_size = os.path.getsize(cover_full_path)
-                print(f"✅ Imagen de portada EPUB guardada: {cover_filename} ({file_size} bytes)")
-            else:
-                print(f"❌ Error: El archivo EPUB no se guardó correctamente: {cover_full_path}")
-                cover_path = None
-            
-        except Exception as e:
-            print(f"❌ Error al guardar imagen de portada EPUB: {e}")
-            cover_path = None
+def _embedded_metadata_for(document: DocumentAnalysis) -> EmbeddedMetadata:
+    """Evalúa los metadatos embebidos (PDF / OPF) e ISBN del documento"""
+    embedded = extract_embedded_metadata(document.file_type, document.metadata, document.text, document.file_path)
+    print(f"🏷️ Metadatos embebidos de {os.path.basename(document.file_path)}: confianza {embedded.confidence} ({', '.join(embedded.reasons) or 'sin datos útiles'})")
+    return embedded
 
-    # Si no se encontró portada, intentar búsqueda online
-    if not cover_path:
-        print("🔍 Intentando búsqueda de portada online para EPUB...")
-        try:
-            # Extraer título del nombre del archivo para la búsqueda
-            base_name = os.path.splitext(os.path.basename(file_path))[0]
-            # Limpiar el nombre para la búsqueda
-            search_title = "".join(c for c in base_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            search_title = search_title.replace('_', ' ').replace('-', ' ')
-            
-            online_cover = cover_search.search_book_cover_online(search_title, static_dir=static_dir)
-            if online_cover:
-                cover_path = online_cover
-                print(f"✅ Portada online encontrada para EPUB: {online_cover}")
-            else:
-                print("❌ No se pudo encontrar portada online para EPUB")
-        except Exception as e:
-            print(f"❌ Error en búsqueda de portada online para EPUB: {e}")
-            cover_path = None
+def _metadata_result(embedded: EmbeddedMetadata, isbn: str = None, analysis: dict = None, category: str = None) -> dict:
+    """
+    Combina metadatos embebidos fiables con el análisis de IA (si lo hubo).
+    isbn: el del documento (document.isbn), el mismo que se guarda y se usa para los duplicados
+    """
+    if embedded.is_trustworthy:
+        return {
+            "title": embedded.title,
+            "author": embedded.author,
+            "category": category or (analysis or {}).get("category") or "Sin categoría",
+            "isbn": isbn,
+            "metadata_source": "embedded" if category else "embedded+ai_category"
+        }
+    result = dict(analysis)
+    result["isbn"] = isbn
+    result["metadata_source"] = "ai"
+    return result
+
+def resolve_book_metadata(document: DocumentAnalysis) -> dict:
+    """
+    Título, autor y categoría de un documento.
+    Usa los metadatos embebidos cuando son fiables: si además traen tema (dc:subject / Subject)
+    no se llama a la IA; si no, solo se le pide la categoría. En otro caso, análisis completo.
+    """
+    embedded = _embedded_metadata_for(document)
+    if embedded.is_trustworthy:
+        if embedded.subject:
+            print(f"⚡ Metadatos embebidos fiables, sin llamada a la IA: {embedded.title} - {embedded.author}")
+            return _metadata_result(embedded, document.isbn, category=translate_category_to_spanish(embedded.subject))
+        print(f"⚡ Metadatos embebidos fiables, solo se consulta la categoría: {embedded.title} - {embedded.author}")
+        return _metadata_result(embedded, document.isbn, analysis={
+            "category": analyze_category_with_gemini(embedded.title, embedded.author, document.text)
+        })
+    return _metadata_result(embedded, document.isbn, analysis=analyze_with_gemini(document.text))
+
+def get_document_analysis(file_path: str, static_dir: str, content_hash: str = None) -> DocumentAnalysis:
+    """
+    Abre el documento una sola vez (o reutiliza el análisis memorizado por hash de contenido)
+    y devuelve texto, portada, páginas y metadatos para todas las etapas siguientes.
+    """
+    try:
+        return analyze_document(file_path, static_dir, content_hash=content_hash)
+    except UnsupportedDocumentError:
+        raise HTTPException(status_code=400, detail="Tipo de archivo no soportado.")
+    except InsufficientTextError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
-    return {"text": text, "cover_image_url": cover_path}
+def process_pdf(file_path: str, static_dir: str) -> dict:
+    """Extrae texto y portada de un PDF (usa el análisis único de document_analysis)"""
+    return get_document_analysis(file_path, static_dir).as_book_data()
+
+def process_epub(file_path: str, static_dir: str) -> dict:
+    """ Extrae texto y portada de un EPUB (usa el análisis único de document_analysis) """
+    return get_document_analysis(file_path, static_dir).as_book_data()
 
 def translate_category_to_spanish(category: str) -> str:
     """
@@ -542,44 +623,288 @@ def get_db():
     try: yield db
     finally: db.close()
 
+@app.on_event("shutdown")
+def shutdown_ingestion_workers():
+    """Detiene el pool de procesos de parseo al apagar el servidor"""
+    shutdown_parse_executor()
+
+@app.on_event("startup")
+def start_fingerprint_backfill():
+    """Rellena en segundo plano las huellas de casi-duplicados que falten (sin bloquear las subidas)"""
+    crud.start_fingerprint_backfill()
+
+@app.on_event("startup")
+def evict_expired_ai_analyses():
+    """Descarta los análisis de IA en caché que superan la antigüedad máxima"""
+    try:
+        get_ai_cache().evict_expired()
+    except Exception as e:
+        logger.warning(f"No se pudo limpiar la caché de análisis: {e}")
+
+@app.get("/api/ai-cache/stats")
+def get_ai_cache_stats():
+    """Aciertos, fallos y tamaño de la caché persistente de análisis con IA"""
+    return get_ai_cache().get_stats()
+
+@app.post("/api/ai-cache/evict")
+def evict_ai_cache(max_age_days: int = Query(None, ge=0)):
+    """Elimina entradas de la caché más antiguas que max_age_days (por defecto, la antigüedad configurada)"""
+    deleted = get_ai_cache().evict_expired(max_age_days)
+    return {"success": True, "deleted": deleted}
+
+@app.delete("/api/ai-cache")
+def clear_ai_cache():
+    """Vacía la caché de análisis con IA"""
+    deleted = get_ai_cache().clear()
+    return {"success": True, "deleted": deleted}
+
+@app.get("/api/ingestion/stats")
+def get_ingestion_stats():
+    """Profundidad de cola y rendimiento por etapa de los pipelines de ingesta masiva, tiempo medio de extracción, procesos de parseo y escritura por lotes"""
+    return {
+        "pipelines": get_pipeline_stats(),
+        "extraction": get_extraction_stats(),
+        "parse": get_parse_stats(),
+        "db_writes": get_bulk_write_stats()
+    }
+
+@app.on_event("startup")
+def resume_import_jobs():
+    """Reanuda los trabajos de importación que quedaron sin terminar (p. ej. tras un reinicio)"""
+    try:
+        get_import_job_manager().resume_unfinished_jobs()
+    except Exception as e:
+        logger.warning(f"No se pudieron reanudar los trabajos de importación: {e}")
+
+def _load_book_for_reanalysis(book: BookSnapshot) -> Optional[DocumentAnalysis]:
+    """Documento analizado de un libro ya registrado (local o muestra descargada de Drive)"""
+    file_path = get_book_file_path(book)
+    if file_path:
+        return parse_document(file_path)
+    if not book.drive_file_id:
+        return None
+    try:
+        from google_drive_manager import get_drive_manager
+    except ImportError:
+        return None
+    drive_manager = get_drive_manager()
+    if not drive_manager.service:
+        return None
+    temp_dir = tempfile.mkdtemp()
+    try:
+        result = drive_manager.download_file_sample(book.drive_file_id, temp_dir)
+        if not result.get("success"):
+            return None
+        return parse_document(result["file_path"])
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def _reanalyze_documents(documents: dict) -> dict:
+    """Igual que la etapa ai de la importación masiva: metadatos embebidos y análisis por lotes"""
+    embedded = {book_id: _embedded_metadata_for(document) for book_id, document in documents.items()}
+    analyses = analyze_with_gemini_batch([
+        (book_id, document.text, os.path.basename(document.file_path))
+        for book_id, document in documents.items()
+        if not (embedded[book_id].is_trustworthy and embedded[book_id].subject)
+    ])
+    results = {}
+    for book_id, metadata in embedded.items():
+        if book_id in analyses:
+            results[book_id] = _metadata_result(metadata, documents[book_id].isbn, analysis=analyses[book_id])
+        else:
+            results[book_id] = _metadata_result(metadata, documents[book_id].isbn, category=translate_category_to_spanish(metadata.subject))
+    return results
+
+@app.on_event("startup")
+def start_metadata_reanalysis():
+    """Arranca el reanálisis en segundo plano de los libros con metadatos de relleno"""
+    reanalyzer = get_metadata_reanalyzer()
+    reanalyzer.configure(_load_book_for_reanalysis, _reanalyze_documents)
+    if REANALYSIS_ENABLED:
+        reanalyzer.start()
+
+@app.on_event("shutdown")
+def stop_metadata_reanalysis():
+    """Detiene el reanálisis de metadatos al apagar el servidor"""
+    get_metadata_reanalyzer().stop()
+
+@app.get("/api/reanalysis")
+def get_reanalysis_status():
+    """Libros pendientes de reanálisis, cuota libre de Gemini y resultado de la última pasada"""
+    return get_metadata_reanalyzer().get_status()
+
+@app.post("/api/reanalysis/run")
+def run_reanalysis(reset: bool = Query(False)):
+    """Lanza una pasada de reanálisis ahora; reset=true vuelve a intentar también los libros descartados"""
+    reanalyzer = get_metadata_reanalyzer()
+    if reset:
+        reanalyzer.reset_attempts()
+    reanalyzer.trigger()
+    return {"success": True, "message": "Pasada de reanálisis lanzada (solo procesa lotes si Gemini tiene cuota libre)"}
+
+@app.get("/api/import-jobs")
+def list_import_jobs(limit: int = Query(20, ge=1, le=200)):
+    """Últimos trabajos de importación masiva con su progreso"""
+    return {"jobs": get_import_job_manager().list_jobs(limit)}
+
+@app.get("/api/import-jobs/{job_id}")
+def get_import_job(job_id: str):
+    """Estado de un trabajo de importación y de cada uno de sus archivos"""
+    manager = get_import_job_manager()
+    job = manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo de importación no encontrado")
+    job["items"] = manager.get_items(job_id)
+    job["progress"] = get_job_event_bus().get_progress(job_id)
+    return job
+
+@app.get("/api/import-jobs/{job_id}/summary", response_model=schemas.BulkUploadResponse)
+def get_import_job_summary(job_id: str):
+    """Resumen final (o parcial, si sigue en curso) de un trabajo de importación"""
+    if not get_import_job_manager().get_job(job_id):
+        raise HTTPException(status_code=404, detail="Trabajo de importación no encontrado")
+    return _import_job_summary(job_id)
+
+# Intervalo de los comentarios "ping" que mantienen viva la conexión SSE a través de proxies
+SSE_HEARTBEAT_SECONDS = 15
+# Cada cuánto revisa el stream la cola del suscriptor
+SSE_POLL_SECONDS = 0.25
+
+async def _import_job_event_stream(job_id: str, last_event_id: int):
+    # Generador asíncrono: la cola se consulta sin bloquear y la espera es un asyncio.sleep,
+    # así una conexión abierta no ocupa un hilo del pool durante todo el trabajo
+    manager = get_import_job_manager()
+    event_bus = get_job_event_bus()
+    if not event_bus.has_channel(job_id) and not manager.is_running(job_id):
+        # Trabajo de una ejecución anterior del servidor: solo queda su estado final
+        job = await run_in_threadpool(manager.get_job, job_id)
+        yield format_sse({"id": last_event_id + 1, "event": FINISHED_EVENT, "data": job})
+        return
+    
+    subscriber = event_bus.subscribe(job_id, last_event_id)
+    try:
+        idle_seconds = 0.0
+        while True:
+            try:
+                event = subscriber.get_nowait()
+            except queue.Empty:
+                if idle_seconds >= SSE_HEARTBEAT_SECONDS:
+                    if not event_bus.is_subscribed(job_id, subscriber):
+                        return  # Desconectado por lento: el navegador reconecta con Last-Event-ID
+                    yield ": ping\n\n"
+                    idle_seconds = 0.0
+                await asyncio.sleep(SSE_POLL_SECONDS)
+                idle_seconds += SSE_POLL_SECONDS
+                continue
+            idle_seconds = 0.0
+            yield format_sse(event)
+            if event["event"] == FINISHED_EVENT:
+                return
+    finally:
+        event_bus.unsubscribe(job_id, subscriber)
+
+@app.get("/api/import-jobs/{job_id}/events")
+def stream_import_job_events(job_id: str, last_event_id: str = Header(None)):
+    """
+    Progreso del trabajo en tiempo real (Server-Sent Events): estado de cada archivo,
+    tiempos por etapa, rendimiento y tiempo estimado restante. Termina con el evento "finished";
+    el resumen completo se obtiene en /api/import-jobs/{job_id}/summary.
+    """
+    if not get_import_job_manager().get_job(job_id):
+        raise HTTPException(status_code=404, detail="Trabajo de importación no encontrado")
+    try:
+        last_id = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        last_id = 0
+    return StreamingResponse(
+        _import_job_event_stream(job_id, last_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/import-jobs/{job_id}/resume", status_code=202)
+def resume_import_job(job_id: str):
+    """Continúa un trabajo interrumpido desde el último punto de control de cada archivo"""
+    manager = get_import_job_manager()
+    if not manager.get_job(job_id):
+        raise HTTPException(status_code=404, detail="Trabajo de importación no encontrado")
+    started = manager.start_job(job_id)
+    return {"success": True, "job_id": job_id, "started": started}
+
+@app.post("/api/import-jobs/{job_id}/retry-failed", status_code=202)
+def retry_failed_import_items(job_id: str):
+    """Reintenta solo los archivos fallidos del trabajo"""
+    manager = get_import_job_manager()
+    if not manager.get_job(job_id):
+        raise HTTPException(status_code=404, detail="Trabajo de importación no encontrado")
+    if manager.is_running(job_id):
+        raise HTTPException(status_code=409, detail="El trabajo está en ejecución")
+    retried = manager.retry_failed(job_id)
+    started = manager.start_job(job_id) if retried else False
+    return {"success": True, "job_id": job_id, "retried": retried, "started": started}
+
+@app.delete("/api/import-jobs/{job_id}")
+def delete_import_job(job_id: str):
+    """Elimina un trabajo terminado, sus elementos y sus archivos temporales"""
+    try:
+        deleted = get_import_job_manager().delete_job(job_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Trabajo de importación no encontrado")
+    return {"success": True, "job_id": job_id}
+
 # --- Rutas de la API ---
-@app.post("/api/upload-book-local/", response_model=schemas.Book)
-async def upload_book_local(db: Session = Depends(get_db), book_file: UploadFile = File(...)):
+# Los endpoints de carga son síncronos (def): FastAPI los ejecuta en su pool de hilos, así el
+# parseo, Gemini y Google Drive no bloquean el bucle de eventos ni el resto de peticiones.
+def _receive_upload(book_file: UploadFile, dest_dir: str, prefix: str = None) -> StreamedUpload:
     """
-    Sube un libro para almacenamiento local
+    Guarda el archivo subido en una sola pasada (hash + control de tamaño + escritura)
+    y valida la extensión antes de leer el contenido.
     """
-    print(f"📥 Iniciando upload local para: {book_file.filename}")
-    print(f"📚 BOOKS_PATH configurado como: {BOOKS_PATH}")
-    print(f"📁 BOOKS_PATH absoluto: {os.path.abspath(BOOKS_PATH)}")
-    # Crear archivo temporal para procesamiento
-    temp_file_path = None
+    file_ext = os.path.splitext(book_file.filename or "")[1].lower()
+    if file_ext not in (".pdf", ".epub"):
+        raise HTTPException(status_code=400, detail="Tipo de archivo no soportado.")
     try:
-        # Crear archivo temporal
-        temp_dir = "temp_processing"
-        print(f"📂 Creando directorio temporal: {os.path.abspath(temp_dir)}")
-        os.makedirs(temp_dir, exist_ok=True)
-        temp_file_path = os.path.join(temp_dir, f"temp_{uuid.uuid4()}_{book_file.filename}")
-        print(f"📄 Archivo temporal será: {os.path.abspath(temp_file_path)}")
-        
-        # Guardar archivo temporalmente para procesamiento
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(book_file.file, buffer)
-        
-        # Procesar el archivo para extraer texto Y generar portada en una sola pasada
-        file_ext = os.path.splitext(book_file.filename)[1].lower()
+        return stream_upload_to_disk(book_file.file, dest_dir, book_file.filename, prefix=prefix)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+def _raise_if_content_duplicate(db: Session, content_hash: str) -> None:
+    """Lanza 409 si ya existe un libro con el mismo hash de contenido (búsqueda por índice)"""
+    existing = crud.get_book_by_content_hash(db, content_hash)
+    if existing:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Libro duplicado detectado: Ya existe un libro con el mismo contenido: '{existing.title}' por {existing.author}"
+        )
+
+def _raise_if_isbn_duplicate(db: Session, isbn: str) -> None:
+    """Lanza 409 si ya existe un libro con el mismo ISBN (se comprueba antes de llamar a la IA)"""
+    existing = crud.get_book_by_isbn(db, isbn)
+    if existing:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Libro duplicado detectado: Ya existe un libro con el mismo ISBN ({isbn}): '{existing.title}' por {existing.author}"
+        )
+
+def _ingest_local_upload(db: Session, upload: StreamedUpload) -> models.Book:
+    """
+    Procesa un libro ya guardado en su ubicación definitiva dentro de BOOKS_PATH.
+    Si es duplicado o falla el procesamiento, el archivo se elimina.
+    """
+    try:
+        # Duplicado exacto por hash de contenido: se detecta antes de parsear o llamar a la IA
+        _raise_if_content_duplicate(db, upload.sha256)
         
-        if file_ext == ".pdf":
-            book_data = process_pdf(temp_file_path, STATIC_COVERS_DIR)
-        elif file_ext == ".epub":
-            book_data = process_epub(temp_file_path, STATIC_COVERS_DIR)
-        else:
-            raise HTTPException(status_code=400, detail="Tipo de archivo no soportado.")
+        # Abrir el documento una sola vez: texto, portada, páginas y metadatos
+        document = get_document_analysis(upload.file_path, STATIC_COVERS_DIR, content_hash=upload.sha256)
         
-        # Usar el texto extraído para análisis con IA
-        temp_text = book_data["text"]
+        # Misma edición por ISBN: tampoco hace falta la IA
+        _raise_if_isbn_duplicate(db, document.isbn)
         
-        # Analizar con IA
-        gemini_result = analyze_with_gemini(temp_text)
+        # Metadatos embebidos fiables primero; la IA solo cuando hace falta
+        gemini_result = resolve_book_metadata(document)
         
         # Usar resultados de IA o valores por defecto
         title = gemini_result.get("title", "Título no detectado")
@@ -588,19 +913,22 @@ async def upload_book_local(db: Session = Depends(get_db), book_file: UploadFile
         
         # Si la IA devuelve "Desconocido", mantenerlo (no es un error)
         if title == "Título no detectado" and author == "Autor no detectado":
-            title = os.path.splitext(book_file.filename)[0]
+            title = os.path.splitext(upload.original_filename)[0]
         elif title == "Desconocido":
-            title = os.path.splitext(book_file.filename)[0]
+            title = os.path.splitext(upload.original_filename)[0]
         
-        # La portada ya fue generada en process_pdf/process_epub, no necesitamos process_book_with_cover
-        cover_image_url = book_data.get("cover_image_url")
+        # La portada ya fue generada en el análisis del documento, no necesitamos process_book_with_cover
+        cover_image_url = document.cover_image_url
         
         # VERIFICACIÓN DE DUPLICADOS
         duplicate_check = crud.is_duplicate_book(
             db=db,
             title=title,
             author=author,
-            file_path=temp_file_path
+            file_path=upload.file_path,
+            content_hash=upload.sha256,
+            text_sample=document.text,
+            isbn=document.isbn
         )
         
         if duplicate_check["is_duplicate"]:
@@ -609,85 +937,65 @@ async def upload_book_local(db: Session = Depends(get_db), book_file: UploadFile
                 detail=f"Libro duplicado detectado: {duplicate_check['message']}"
             )
         
-        # Mover archivo a ubicación permanente
-        permanent_dir = BOOKS_PATH
-        print(f"📚 Directorio permanente: {os.path.abspath(permanent_dir)}")
-        os.makedirs(permanent_dir, exist_ok=True)
-        permanent_file_path = os.path.join(permanent_dir, f"{uuid.uuid4()}_{book_file.filename}")
-        print(f"🎯 Ruta final del archivo: {os.path.abspath(permanent_file_path)}")
-        print(f"📋 Moviendo de {temp_file_path} a {permanent_file_path}")
-        shutil.move(temp_file_path, permanent_file_path)
-        
-        # Crear registro en base de datos
+        # El archivo ya está en su ubicación permanente: solo se registra
+        print(f"🎯 Ruta final del archivo: {os.path.abspath(upload.file_path)}")
         db_book = crud.create_local_book(
             db=db,
             title=title,
             author=author,
             category=category,
             cover_image_url=cover_image_url,
-            file_path=permanent_file_path
+            file_path=upload.file_path,
+            content_hash=upload.sha256,
+            text_sample=document.text,
+            isbn=document.isbn
         )
         
         print(f"✅ Libro subido localmente: {title}")
         return db_book
         
     except HTTPException:
+        discard_upload(upload.file_path)
         raise
     except Exception as e:
-        # Limpiar archivo temporal si existe
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-            except:
-                pass
+        discard_upload(upload.file_path)
         raise HTTPException(status_code=500, detail=f"Error al subir libro: {str(e)}")
 
-@app.post("/upload-book/", response_model=schemas.Book)
-async def upload_book(db: Session = Depends(get_db), book_file: UploadFile = File(...)):
+@app.post("/api/upload-book-local/", response_model=schemas.Book)
+def upload_book_local(db: Session = Depends(get_db), book_file: UploadFile = File(...)):
     """
-    Sube un libro directamente a Google Drive sin almacenamiento local permanente.
+    Sube un libro para almacenamiento local.
+    El archivo se escribe directamente en BOOKS_PATH en una sola pasada.
     """
-    # Verificar que Google Drive esté configurado
+    print(f"📥 Iniciando upload local para: {book_file.filename}")
+    print(f"📚 BOOKS_PATH configurado como: {BOOKS_PATH}")
+    print(f"📁 BOOKS_PATH absoluto: {os.path.abspath(BOOKS_PATH)}")
     try:
-        from google_drive_manager import get_drive_manager
-        drive_manager = get_drive_manager()
-        if not drive_manager.service:
-            raise HTTPException(
-                status_code=503, 
-                detail="Google Drive no está configurado. Configure Google Drive antes de subir libros."
-            )
-    except ImportError:
-        raise HTTPException(
-            status_code=503, 
-            detail="Google Drive no está disponible. Instale las dependencias necesarias."
-        )
+        upload = _receive_upload(book_file, BOOKS_PATH)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al subir libro: {str(e)}")
+    
+    return _ingest_local_upload(db, upload)
 
-    # Crear archivo temporal para procesamiento
-    temp_file_path = None
+def _ingest_cloud_upload(db: Session, upload: StreamedUpload, drive_manager) -> models.Book:
+    """
+    Procesa un libro recibido en temp_processing y lo sube a Google Drive.
+    El archivo de trabajo se elimina siempre al terminar.
+    """
     try:
-        # Crear archivo temporal
-        temp_dir = "temp_processing"
-        os.makedirs(temp_dir, exist_ok=True)
-        temp_file_path = os.path.join(temp_dir, f"temp_{uuid.uuid4()}_{book_file.filename}")
+        # Duplicado exacto por hash de contenido: se detecta antes de parsear o llamar a la IA
+        _raise_if_content_duplicate(db, upload.sha256)
         
-        # Guardar archivo temporalmente para procesamiento
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(book_file.file, buffer)
+        # Abrir el documento una sola vez: texto, portada, páginas y metadatos
+        document = get_document_analysis(upload.file_path, STATIC_COVERS_DIR, content_hash=upload.sha256)
         
-        # Analizar con IA primero para obtener título y autor
-        file_ext = os.path.splitext(book_file.filename)[1].lower()
-        try:
-            if file_ext == ".pdf":
-                temp_book_data = process_pdf(temp_file_path, STATIC_COVERS_DIR)
-            elif file_ext == ".epub":
-                temp_book_data = process_epub(temp_file_path, STATIC_COVERS_DIR)
-            else:
-                raise HTTPException(status_code=400, detail="Tipo de archivo no soportado.")
-        except HTTPException as e:
-            raise e
+        # Misma edición por ISBN: tampoco hace falta la IA
+        _raise_if_isbn_duplicate(db, document.isbn)
         
-        # Analizar con IA
-        gemini_result = analyze_with_gemini(temp_book_data["text"])
+        # Metadatos embebidos fiables primero; la IA solo cuando hace falta
+        gemini_result = resolve_book_metadata(document)
         
         # Usar resultados de IA o valores por defecto
         title = gemini_result.get("title", "Título no detectado")
@@ -697,19 +1005,22 @@ async def upload_book(db: Session = Depends(get_db), book_file: UploadFile = Fil
         # Si la IA devuelve "Desconocido", mantenerlo (no es un error)
         # Solo usar valores por defecto si realmente hay un error
         if title == "Título no detectado" and author == "Autor no detectado":
-            title = os.path.splitext(book_file.filename)[0]
+            title = os.path.splitext(upload.original_filename)[0]
         elif title == "Desconocido":
-            title = os.path.splitext(book_file.filename)[0]
+            title = os.path.splitext(upload.original_filename)[0]
         
         # Procesar libro con manejo de portada
-        book_data = process_book_with_cover(temp_file_path, STATIC_COVERS_DIR, title, author, should_upload_cover_to_drive=False)
+        book_data = process_book_with_cover(upload.file_path, STATIC_COVERS_DIR, title, author, should_upload_cover_to_drive=False, document=document)
         
         # VERIFICACIÓN DE DUPLICADOS ANTES DE SUBIR A GOOGLE DRIVE
         duplicate_check = crud.is_duplicate_book(
             db=db,
             title=title,
             author=author,
-            file_path=temp_file_path
+            file_path=upload.file_path,
+            content_hash=upload.sha256,
+            text_sample=document.text,
+            isbn=document.isbn
         )
         
         if duplicate_check["is_duplicate"]:
@@ -720,7 +1031,7 @@ async def upload_book(db: Session = Depends(get_db), book_file: UploadFile = Fil
         
         # Subir a Google Drive
         drive_result = drive_manager.upload_book_to_drive(
-            file_path=temp_file_path,
+            file_path=upload.file_path,
             title=title,
             author=author,
             category=category
@@ -746,7 +1057,10 @@ async def upload_book(db: Session = Depends(get_db), book_file: UploadFile = Fil
             category=category, 
             cover_image_url=book_data.get("cover_image_url"), 
             drive_info=drive_info,
-            file_path=None  # No guardar ruta local
+            file_path=None,  # No guardar ruta local
+            content_hash=upload.sha256,
+            text_sample=document.text,
+            isbn=document.isbn
         )
         
         if not result["success"]:
@@ -763,49 +1077,204 @@ async def upload_book(db: Session = Depends(get_db), book_file: UploadFile = Fil
         print(f"❌ Error durante la carga: {e}")
         raise HTTPException(status_code=500, detail=f"Error durante la carga: {str(e)}")
     finally:
-        # Limpiar archivo temporal
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.remove(temp_file_path)
-            except OSError:
-                pass  # Ignorar errores de limpieza
-
-@app.get("/api/books/")
-def read_books(
-    category: str | None = None, 
-    search: str | None = None, 
-    page: int = Query(1, ge=1, description="Número de página"),
-    per_page: int = Query(20, ge=1, le=100, description="Libros por página"),
-    db: Session = Depends(get_db)
-):
-    return crud.get_books(db, category=category, search=search, page=page, per_page=per_page)
-
-@app.get("/api/categories/", response_model=List[str])
-def read_categories(db: Session = Depends(get_db)):
-    return crud.get_categories(db)
+        # Limpiar archivo de trabajo
+        discard_upload(upload.file_path)
 
-@app.delete("/books/bulk")
-def delete_multiple_books(book_ids: dict, db: Session = Depends(get_db)):
+@app.post("/upload-book/", response_model=schemas.Book)
+def upload_book(db: Session = Depends(get_db), book_file: UploadFile = File(...)):
     """
-    Elimina múltiples libros por sus IDs.
+    Sube un libro directamente a Google Drive sin almacenamiento local permanente.
+    El archivo se recibe en una sola pasada y ese mismo archivo se procesa y se sube.
     """
-    if not book_ids or "book_ids" not in book_ids:
-        raise HTTPException(status_code=400, detail="Se debe proporcionar al menos un ID de libro.")
-    
-    ids_to_delete = book_ids["book_ids"]
-    if not ids_to_delete:
-        raise HTTPException(status_code=400, detail="Se debe proporcionar al menos un ID de libro.")
-    
-    deleted_books = []
-    failed_deletions = []
-    
-    for book_id in ids_to_delete:
-        try:
-            # Convertir book_id a entero
-            try:
-                book_id_int = int(book_id)
-            except (ValueError, TypeError):
-                failed_deletions.append(f"ID de libro inválido: {book_id}")
+    # Verificar que Google Drive esté configurado
+    try:
+        from google_drive_manager import get_drive_manager
+        drive_manager = get_drive_manager()
+        if not drive_manager.service:
+            raise HTTPException(
+                status_code=503, 
+                detail="Google Drive no está configurado. Configure Google Drive antes de subir libros."
+            )
+    except ImportError:
+        raise HTTPException(
+            status_code=503, 
+            detail="Google Drive no está disponible. Instale las dependencias necesarias."
+        )
+
+    try:
+        upload = _receive_upload(book_file, "temp_processing", prefix=f"temp_{uuid.uuid4()}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error durante la carga: {e}")
+        raise HTTPException(status_code=500, detail=f"Error durante la carga: {str(e)}")
+    
+    return _ingest_cloud_upload(db, upload, drive_manager)
+
+# --- Subida por partes reanudable ---
+
+def _chunked_upload_http_error(e: Exception) -> HTTPException:
+    if isinstance(e, UploadSessionNotFoundError):
+        return HTTPException(status_code=404, detail=str(e))
+    if isinstance(e, IncompleteUploadError):
+        return HTTPException(status_code=409, detail={"message": str(e), "missing_chunks": e.missing})
+    if isinstance(e, ChunkChecksumError):
+        return HTTPException(status_code=422, detail=str(e))
+    if isinstance(e, UploadTooLargeError):
+        return HTTPException(status_code=413, detail=str(e))
+    return HTTPException(status_code=400, detail=str(e))
+
+@app.on_event("startup")
+def cleanup_expired_chunked_uploads():
+    """Descarta las sesiones de subida por partes abandonadas"""
+    try:
+        get_chunked_upload_manager().cleanup_expired()
+    except Exception as e:
+        logger.warning(f"No se pudieron limpiar las sesiones de subida: {e}")
+
+@app.post("/api/uploads", status_code=201)
+def create_chunked_upload(request: schemas.ChunkedUploadCreate):
+    """
+    Crea una sesión de subida por partes. El cliente envía cada parte con
+    PUT /api/uploads/{upload_id}/chunks/{index} (cabecera X-Chunk-SHA256 opcional)
+    y termina con POST /api/uploads/{upload_id}/finalize.
+    """
+    manager = get_chunked_upload_manager()
+    try:
+        manager.cleanup_expired()
+        session = manager.create_session(
+            request.filename, request.size, request.mode,
+            chunk_size=request.chunk_size, sha256=request.sha256
+        )
+    except (ChunkedUploadError, UploadTooLargeError) as e:
+        raise _chunked_upload_http_error(e)
+    return session.to_dict()
+
+@app.get("/api/uploads/{upload_id}")
+def get_chunked_upload(upload_id: str):
+    """Estado de la sesión: partes recibidas y pendientes (para reanudar tras un corte)"""
+    try:
+        return get_chunked_upload_manager().get_session(upload_id).to_dict()
+    except ChunkedUploadError as e:
+        raise _chunked_upload_http_error(e)
+
+@app.put("/api/uploads/{upload_id}/chunks/{index}")
+async def put_chunked_upload_part(
+    upload_id: str,
+    index: int,
+    request: Request,
+    x_chunk_sha256: Optional[str] = Header(None, description="SHA-256 (hex) del contenido de la parte")
+):
+    """Recibe una parte (cuerpo binario). Repetir una parte la sobrescribe"""
+    try:
+        session = await run_in_threadpool(get_chunked_upload_manager().get_session, upload_id)
+    except ChunkedUploadError as e:
+        raise _chunked_upload_http_error(e)
+    # Tamaño exacto que debe tener la parte (el rango lo valida write_chunk)
+    limit = session.chunk_length(index) if 0 <= index < session.total_chunks else MAX_CHUNK_SIZE
+    too_large = HTTPException(status_code=413, detail=f"La parte supera el tamaño esperado ({limit} bytes)")
+    
+    # Rechazo inmediato por Content-Length; el cuerpo se lee por trozos y se corta al pasar el límite
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise too_large
+    buffer = bytearray()
+    async for piece in request.stream():
+        buffer.extend(piece)
+        if len(buffer) > limit:
+            raise too_large
+    data = bytes(buffer)
+    try:
+        # Escritura y fsync fuera del bucle de eventos
+        session = await run_in_threadpool(get_chunked_upload_manager().write_chunk, upload_id, index, data, x_chunk_sha256)
+    except ChunkedUploadError as e:
+        raise _chunked_upload_http_error(e)
+    status = session.to_dict()
+    status.pop("missing_chunks")
+    return status
+
+@app.post("/api/uploads/{upload_id}/finalize", response_model=schemas.Book)
+def finalize_chunked_upload(upload_id: str, db: Session = Depends(get_db)):
+    """
+    Ensambla y verifica el archivo, y lo procesa igual que una subida individual:
+    modo local en BOOKS_PATH, modo nube a Google Drive.
+    """
+    manager = get_chunked_upload_manager()
+    try:
+        session = manager.get_session(upload_id)
+    except ChunkedUploadError as e:
+        raise _chunked_upload_http_error(e)
+    
+    drive_manager = None
+    if session.mode == "cloud":
+        # Verificar Google Drive antes de consumir la sesión
+        try:
+            from google_drive_manager import get_drive_manager
+            drive_manager = get_drive_manager()
+        except ImportError:
+            raise HTTPException(status_code=503, detail="Google Drive no está disponible. Instale las dependencias necesarias.")
+        if not drive_manager.service:
+            raise HTTPException(status_code=503, detail="Google Drive no está configurado. Configure Google Drive antes de subir libros.")
+    
+    try:
+        if session.mode == "local":
+            upload = manager.finalize(upload_id, BOOKS_PATH)
+        else:
+            upload = manager.finalize(upload_id, "temp_processing", prefix=f"temp_{uuid.uuid4()}")
+    except ChunkedUploadError as e:
+        raise _chunked_upload_http_error(e)
+    
+    if session.mode == "local":
+        return _ingest_local_upload(db, upload)
+    return _ingest_cloud_upload(db, upload, drive_manager)
+
+@app.delete("/api/uploads/{upload_id}")
+def abort_chunked_upload(upload_id: str):
+    """Cancela la sesión y elimina las partes recibidas"""
+    try:
+        aborted = get_chunked_upload_manager().abort(upload_id)
+    except ChunkedUploadError as e:
+        raise _chunked_upload_http_error(e)
+    if not aborted:
+        raise HTTPException(status_code=404, detail="Sesión de subida no encontrada")
+    return {"success": True, "upload_id": upload_id}
+
+@app.get("/api/books/")
+def read_books(
+    category: str | None = None, 
+    search: str | None = None, 
+    page: int = Query(1, ge=1, description="Número de página"),
+    per_page: int = Query(20, ge=1, le=100, description="Libros por página"),
+    db: Session = Depends(get_db)
+):
+    return crud.get_books(db, category=category, search=search, page=page, per_page=per_page)
+
+@app.get("/api/categories/", response_model=List[str])
+def read_categories(db: Session = Depends(get_db)):
+    return crud.get_categories(db)
+
+@app.delete("/books/bulk")
+def delete_multiple_books(book_ids: dict, db: Session = Depends(get_db)):
+    """
+    Elimina múltiples libros por sus IDs.
+    """
+    if not book_ids or "book_ids" not in book_ids:
+        raise HTTPException(status_code=400, detail="Se debe proporcionar al menos un ID de libro.")
+    
+    ids_to_delete = book_ids["book_ids"]
+    if not ids_to_delete:
+        raise HTTPException(status_code=400, detail="Se debe proporcionar al menos un ID de libro.")
+    
+    deleted_books = []
+    failed_deletions = []
+    
+    for book_id in ids_to_delete:
+        try:
+            # Convertir book_id a entero
+            try:
+                book_id_int = int(book_id)
+            except (ValueError, TypeError):
+                failed_deletions.append(f"ID de libro inválido: {book_id}")
                 continue
             
             # Obtener el libro de la base de datos
@@ -1012,112 +1481,54 @@ async def convert_epub_to_pdf(file: UploadFile = File(...)):
     epub_content = await file.read()
 
     try:
-        import tempfile
-        import zipfile
-        import pathlib
-        from bs4 import BeautifulSoup
         import uuid
         import fitz  # PyMuPDF para crear PDFs
 
         with tempfile.TemporaryDirectory() as temp_dir:
-            # 1. Extraer el EPUB a una carpeta temporal
-            with zipfile.ZipFile(io.BytesIO(epub_content), 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-
-            # 2. Encontrar el archivo .opf (el "manifiesto" del libro)
-            opf_path = next(Path(temp_dir).rglob('*.opf'), None)
-            if not opf_path:
-                raise Exception("No se pudo encontrar el archivo .opf en el EPUB.")
-            content_root = opf_path.parent
-
-            # 3. Leer y analizar el manifiesto .opf
-            with open(opf_path, 'r', encoding='utf-8') as f:
-                opf_content = f.read()
-            opf_soup = BeautifulSoup(opf_content, 'xml')
-
-            # 4. Extraer metadatos del libro
-            title = "Libro EPUB"
-            author = "Autor Desconocido"
-            
-            # Buscar título y autor en los metadatos
-            dc_title = opf_soup.find('dc:title')
-            if dc_title:
-                title = dc_title.get_text().strip()
-            
-            dc_creator = opf_soup.find('dc:creator')
-            if dc_creator:
-                author = dc_creator.get_text().strip()
-
-            # 5. Encontrar el orden de lectura (spine) y extraer contenido
-            spine = opf_soup.find('spine')
-            if not spine:
-                raise Exception("No se pudo encontrar el spine en el EPUB.")
-
-            # Mapear IDs a archivos HTML
-            manifest = opf_soup.find('manifest')
-            html_files = {}
-            for item in manifest.find_all('item'):
-                if item.get('media-type') == 'application/xhtml+xml':
-                    html_files[item.get('id')] = item.get('href')
-
-            # 6. Crear un nuevo PDF usando PyMuPDF
-            pdf_doc = fitz.open()
-            
-            # Agregar página de título
-            title_page = pdf_doc.new_page()
-            title_page.insert_text(
-                fitz.Point(50, 300),
-                title,
-                fontsize=24
-            )
-            title_page.insert_text(
-                fitz.Point(50, 350),
-                f"por {author}",
-                fontsize=16
-            )
+            # 1. Guardar el EPUB y leer su OPF (sin extraer el ZIP completo)
+            epub_path = os.path.join(temp_dir, "libro.epub")
+            with open(epub_path, "wb") as f:
+                f.write(epub_content)
 
-            # 7. Procesar cada capítulo en el orden del spine
-            spine_items = spine.find_all('itemref')
-            for itemref in spine_items:
-                chapter_id = itemref.get('idref')
-                if chapter_id in html_files:
-                    html_file = html_files[chapter_id]
-                    html_path = content_root / html_file
-                    
-                    if html_path.exists():
-                        # Leer el contenido HTML
-                        with open(html_path, 'r', encoding='utf-8') as f:
-                            html_content = f.read()
-                        
-                        # Parsear HTML y extraer texto
-                        soup = BeautifulSoup(html_content, 'html.parser')
-                        
-                        # Remover scripts y estilos
-                        for script in soup(["script", "style"]):
-                            script.decompose()
-                        
-                        # Extraer texto
-                        text = soup.get_text()
-                        
-                        # Limpiar texto
-                        lines = (line.strip() for line in text.splitlines())
-                        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                        text = ' '.join(chunk for chunk in chunks if chunk)
+            with EpubReader(epub_path) as reader:
+                # 2. Extraer metadatos del libro
+                metadata = reader.get_metadata()
+                title = metadata.get("title") or "Libro EPUB"
+                author = metadata.get("creator") or "Autor Desconocido"
+
+                # 3. Crear un nuevo PDF usando PyMuPDF
+                pdf_doc = fitz.open()
+                
+                # Agregar página de título
+                title_page = pdf_doc.new_page()
+                title_page.insert_text(
+                    fitz.Point(50, 300),
+                    title,
+                    fontsize=24
+                )
+                title_page.insert_text(
+                    fitz.Point(50, 350),
+                    f"por {author}",
+                    fontsize=16
+                )
+
+                # 4. Procesar cada capítulo en el orden del spine (sin scripts ni estilos)
+                for text in reader.iter_document_texts():
+                    text = ' '.join(text.split())
+                    if text:
+                        # Crear nueva página para el capítulo
+                        page = pdf_doc.new_page()
                         
-                        if text.strip():
-                            # Crear nueva página para el capítulo
-                            page = pdf_doc.new_page()
-                            
-                            # Insertar texto en la página
-                            text_rect = fitz.Rect(50, 50, 550, 750)
-                            page.insert_textbox(
-                                text_rect,
-                                text,
-                                fontsize=12,
-                                align=fitz.TEXT_ALIGN_LEFT
-                            )
-
-            # 8. Guardar el PDF
+                        # Insertar texto en la página
+                        text_rect = fitz.Rect(50, 50, 550, 750)
+                        page.insert_textbox(
+                            text_rect,
+                            text,
+                            fontsize=12,
+                            align=fitz.TEXT_ALIGN_LEFT
+                        )
+
+            # 5. Guardar el PDF
             pdf_bytes = pdf_doc.write()
             pdf_doc.close()
 
@@ -1155,323 +1566,515 @@ def find_book_files(directory: str) -> List[str]:
     
     return book_files
 
-def extract_books_from_zip(zip_path: str, extract_dir: str) -> List[str]:
-    """Extrae libros de un archivo ZIP y retorna las rutas de los libros encontrados"""
-    extracted_books = []
-    
-    try:
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            # Extraer todos los archivos directamente al directorio de extracción
-            zip_ref.extractall(extract_dir)
-            
-            # Buscar archivos PDF y EPUB en el contenido extraído
-            for extracted_file in Path(extract_dir).rglob('*'):
-                if extracted_file.is_file() and extracted_file.suffix.lower() in {'.pdf', '.epub'}:
-                    # Verificar que el archivo existe y es accesible
-                    if os.path.exists(extracted_file) and os.access(extracted_file, os.R_OK):
-                        extracted_books.append(str(extracted_file))
-                        print(f"Archivo extraído: {extracted_file}")
-                    else:
-                        print(f"Archivo no accesible: {extracted_file}")
-                    
-    except Exception as e:
-        print(f"Error al extraer ZIP {zip_path}: {e}")
-    
-    return extracted_books
+def _add_zip_books(zip_books: list, collected: tuple):
+    book_files, file_hashes, display_names = collected
+    for book in zip_books:
+        book_files.append(book.file_path)
+        file_hashes[book.file_path] = book.sha256
+        display_names[book.file_path] = book.member_path
 
-def process_zip_containing_books(zip_path: str, temp_dir: str) -> List[str]:
-    """Procesa un ZIP que puede contener libros y retorna las rutas de los libros encontrados"""
-    books_found = []
-    
-    try:
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            # Verificar si el ZIP contiene archivos PDF o EPUB
-            zip_contents = zip_ref.namelist()
-            has_books = any(name.lower().endswith(('.pdf', '.epub')) for name in zip_contents)
-            
-            if has_books:
-                # Extraer y procesar los libros del ZIP
-                extracted_books = extract_books_from_zip(zip_path, temp_dir)
-                books_found.extend(extracted_books)
-                
-    except Exception as e:
-        print(f"Error al procesar ZIP {zip_path}: {e}")
-    
-    return books_found
+def _collect_zip_upload(zip_file, zip_name: str, extract_dir: str) -> tuple:
+    """
+    Libros de un ZIP subido, leídos miembro a miembro (incluidos los de ZIPs anidados).
+    Retorna (archivos, hashes por archivo, nombre mostrado por archivo)
+    """
+    collected = ([], {}, {})
+    _add_zip_books(extract_zip_books(zip_file, extract_dir, f"{zip_name}{MEMBER_SEPARATOR}"), collected)
+    return collected
 
-def process_single_book_async(file_path: str, static_dir: str, db: Session) -> dict:
-    """Procesa un libro individual de forma asíncrona con verificación rápida de duplicados"""
-    try:
-        file_extension = Path(file_path).suffix.lower()
-        
-        # VERIFICACIÓN RÁPIDA DE DUPLICADOS (SIN IA) - ANTES DE CUALQUIER PROCESAMIENTO
-        quick_check = quick_duplicate_check(file_path, db)
-        if quick_check["is_duplicate"]:
-            return {
-                "success": False,
-                "file": file_path,
-                "error": "Duplicado detectado (verificación rápida)",
-                "duplicate_info": {
-                    "is_duplicate": True,
-                    "reason": quick_check["reason"],
-                    "existing_book": {
-                        "id": quick_check["existing_book"].id,
-                        "title": quick_check["existing_book"].title,
-                        "author": quick_check["existing_book"].author,
-                        "category": quick_check["existing_book"].category
-                    } if quick_check["existing_book"] else None,
-                    "message": quick_check["message"]
-                }
+def _collect_book_files(root_dir: str, extract_dir: str, file_paths: List[str] = None) -> tuple:
+    """
+    Libros PDF/EPUB de una carpeta, incluidos los que vienen dentro de ZIPs (que se leen
+    miembro a miembro hacia extract_dir, sin tocar la carpeta de origen).
+    Con file_paths solo se consideran esos archivos (escaneo incremental).
+    Retorna (archivos, hashes por archivo, nombre mostrado por archivo)
+    """
+    collected = ([], {}, {})
+    for file_path in (find_book_files(root_dir) if file_paths is None else file_paths):
+        if Path(file_path).suffix.lower() == '.zip':
+            relative = os.path.relpath(file_path, root_dir)
+            try:
+                _add_zip_books(extract_zip_books(file_path, extract_dir, f"{relative}{MEMBER_SEPARATOR}"), collected)
+            except zipfile.BadZipFile as e:
+                print(f"Error al procesar ZIP {file_path}: {e}")
+        else:
+            collected[0].append(file_path)
+    return collected
+
+def _prefilter_duplicate_results(duplicate_files: list) -> list:
+    """Convierte los duplicados de la verificación previa al formato de resultado de carga masiva"""
+    results = []
+    for duplicate in duplicate_files:
+        existing_book_dict = None
+        if duplicate.get("existing_book"):
+            existing_book = duplicate["existing_book"]
+            existing_book_dict = {
+                "id": existing_book.id,
+                "title": existing_book.title,
+                "author": existing_book.author,
+                "category": existing_book.category
             }
         
-        # Verificar que el archivo existe antes de procesarlo
-        if not os.path.exists(file_path):
-            return {
-                "success": False,
-                "file": file_path,
-                "error": f"Archivo no encontrado: {file_path}"
+        results.append({
+            "success": False,
+            "file": duplicate["file"],
+            "error": "Duplicado detectado (verificación previa)",
+            "duplicate_info": {
+                "is_duplicate": True,
+                "reason": duplicate.get("reason", "Archivo ya existe en la base de datos"),
+                "existing_book": existing_book_dict,
+                "message": duplicate.get("message", "Este archivo ya ha sido procesado anteriormente")
             }
-        
-        # Procesar el archivo según su tipo
-        if file_extension == '.pdf':
-            temp_result = process_pdf(file_path, static_dir)
-        elif file_extension == '.epub':
-            temp_result = process_epub(file_path, static_dir)
-        else:
-            return {"success": False, "file": file_path, "error": "Tipo de archivo no soportado"}
-        
-        # Analizar con IA (solo si pasó la verificación rápida)
-        analysis = analyze_with_gemini(temp_result["text"])
-        
-        # Procesar libro con manejo de portada
-        result = process_book_with_cover(file_path, static_dir, analysis["title"], analysis["author"], should_upload_cover_to_drive=False)
+        })
+    return results
+
+# Títulos que devuelve el análisis cuando no pudo identificar el libro
+AI_PLACEHOLDER_TITLES = {"Título no detectado", "Desconocido", "Sistema ocupado", "Error de análisis"}
+
+def _existing_book_info(book) -> dict:
+    """Resumen del libro existente para los resultados de duplicados"""
+    if not book:
+        return None
+    return {
+        "id": book.id,
+        "title": book.title,
+        "author": book.author,
+        "category": book.category
+    }
+
+def _is_inside_dir(file_path: str, directory: str) -> bool:
+    directory = os.path.abspath(directory)
+    return os.path.commonpath([os.path.abspath(file_path), directory]) == directory
+
+def _build_bulk_pipeline(mode: str, move_from_dir: str = None,
+                         on_checkpoint=None, on_finished=None, on_stage_done=None) -> IngestionPipeline:
+    """
+    Crea el pipeline de ingesta masiva: parseo → IA → portada → Drive → base de datos.
+    En modo "local" no hay etapa de Drive. Cada etapa abre su propia sesión de base de datos.
+    on_checkpoint(context, estado, **datos) registra el avance de cada libro; las etapas ya
+    superadas en una ejecución anterior (análisis, portada, Drive) se saltan si el contexto
+    trae sus resultados. on_finished(context) recibe cada libro terminado.
+    Los libros registrados cuyo archivo está dentro de move_from_dir (extracción temporal)
+    se mueven a BOOKS_PATH.
+    """
+    upload_to_drive = mode == "cloud"
+    
+    def checkpoint(context: dict, state: ItemState, **fields):
+        if on_checkpoint:
+            on_checkpoint(context, state, **fields)
+    # Libros (título/autor normalizados) ya reclamados por otro archivo del mismo lote
+    claimed_books = set()
+    claimed_lock = threading.Lock()
+    
+    def _isbn_duplicate_result(context: dict) -> bool:
+        # Misma edición ya registrada (por ISBN): se descarta antes de la etapa de IA
+        isbn = context["document"].isbn
+        if not isbn:
+            return False
+        db = database.SessionLocal()
+        try:
+            existing = crud.get_book_by_isbn(db, isbn)
+            existing_book = _existing_book_info(existing)
+        finally:
+            db.close()
+        if not existing:
+            return False
+        context["result"] = {
+            "success": False,
+            "file": context["file"],
+            "error": "Duplicado detectado (ISBN)",
+            "duplicate_info": {
+                "is_duplicate": True,
+                "reason": "isbn",
+                "existing_book": existing_book,
+                "message": f"Ya existe un libro con el mismo ISBN ({isbn}): '{existing_book['title']}' por {existing_book['author']}"
+            }
+        }
+        return True
+    
+    def parse_stage(context: dict):
+        file_path = context["file"]
+        if not os.path.exists(file_path):
+            context["result"] = {"success": False, "file": file_path, "error": f"Archivo no encontrado: {file_path}"}
+            return
+        try:
+            context["document"] = parse_document(file_path, context.get("content_hash"))
+            if not context.get("analysis"):
+                if _isbn_duplicate_result(context):
+                    return
+                checkpoint(context, ItemState.PARSED)
+        except UnsupportedDocumentError:
+            context["result"] = {"success": False, "file": file_path, "error": "Tipo de archivo no soportado"}
+        except InsufficientTextError as e:
+            context["result"] = {"success": False, "file": file_path, "error": str(e)}
+        except DocumentParseError as e:
+            # Documento colgado, sin memoria o que tumbó el proceso: falla solo este archivo
+            context["result"] = {"success": False, "file": file_path, "error": f"Error al parsear el documento: {e}"}
+    
+    def check_analyzed_book(context: dict):
+        file_path = context["file"]
+        document = context["document"]
+        analysis = context["analysis"]
         
         # Verificación final de duplicados con metadatos extraídos
-        duplicate_check = crud.is_duplicate_book(
-            db=db,
-            title=analysis["title"],
-            author=analysis["author"],
-            file_path=file_path
-        )
+        db = database.SessionLocal()
+        try:
+            duplicate_check = crud.is_duplicate_book(
+                db=db,
+                title=analysis["title"],
+                author=analysis["author"],
+                file_path=file_path,
+                content_hash=context.get("content_hash"),
+                text_sample=document.text,
+                isbn=document.isbn
+            )
+            existing_book = _existing_book_info(duplicate_check["existing_book"])
+        finally:
+            db.close()
         
         if duplicate_check["is_duplicate"]:
-            return {
+            context["result"] = {
                 "success": False,
                 "file": file_path,
                 "error": "Duplicado detectado (verificación final)",
                 "duplicate_info": {
                     "is_duplicate": True,
                     "reason": duplicate_check["reason"],
-                    "existing_book": {
-                        "id": duplicate_check["existing_book"].id,
-                        "title": duplicate_check["existing_book"].title,
-                        "author": duplicate_check["existing_book"].author,
-                        "category": duplicate_check["existing_book"].category
-                    } if duplicate_check["existing_book"] else None,
+                    "existing_book": existing_book,
                     "message": duplicate_check["message"]
                 }
             }
+            return
         
-        # Subir a Google Drive (obligatorio)
-        try:
-            from google_drive_manager import get_drive_manager
-            drive_manager = get_drive_manager()
-            if not drive_manager.service:
-                return {
-                    "success": False,
-                    "file": file_path,
-                    "error": "Google Drive no está configurado"
-                }
-            
-            drive_info = drive_manager.upload_book_to_drive(
-                file_path=file_path,
-                title=analysis["title"],
-                author=analysis["author"],
-                category=analysis["category"]
-            )
-            
-            if not drive_info or not drive_info.get('success'):
-                error_msg = drive_info.get('error', 'Error desconocido') if drive_info else 'No se pudo subir a Google Drive'
-                return {
-                    "success": False,
-                    "file": file_path,
-                    "error": f"Error al subir a Google Drive: {error_msg}"
-                }
-            
-            print(f"✅ Libro subido a Google Drive: {analysis['title']}")
-            
-        except Exception as e:
-            return {
+        # Dos archivos del mismo lote con el mismo libro: solo el primero sigue adelante
+        # (los títulos de relleno de un análisis fallido no identifican ningún libro)
+        if analysis["title"] in AI_PLACEHOLDER_TITLES:
+            return
+        claim_key = (normalize_text(analysis["title"]), normalize_text(analysis["author"]))
+        with claimed_lock:
+            already_claimed = claim_key in claimed_books
+            if not already_claimed:
+                claimed_books.add(claim_key)
+        if already_claimed:
+            context["result"] = {
                 "success": False,
                 "file": file_path,
-                "error": f"Error al subir a Google Drive: {str(e)}"
+                "error": "Duplicado detectado (mismo lote)",
+                "duplicate_info": {
+                    "is_duplicate": True,
+                    "reason": "title_author_batch",
+                    "existing_book": None,
+                    "message": f"El libro '{analysis['title']}' ya se está procesando en este lote"
+                }
             }
+            return
+        context["claim_key"] = claim_key
         
-        # Verificar que drive_info tiene la estructura correcta
-        if not drive_info or not drive_info.get('drive_info') or not drive_info['drive_info'].get('id'):
-            return {
-                "success": False,
-                "file": file_path,
-                "error": "Información de Google Drive incompleta o inválida"
-            }
+        if not context.get("resumed_analysis"):
+            checkpoint(context, ItemState.ANALYZED, title=analysis["title"], author=analysis["author"], category=analysis["category"])
+    
+    def ai_stage(batch: list):
+        # Metadatos embebidos fiables con tema: sin IA. El resto comparte llamadas por lotes
+        # (los fiables sin tema solo aprovechan la categoría del lote)
+        # Los libros analizados en una ejecución anterior del trabajo reutilizan su resultado
+        embedded = [None if context.get("analysis") else _embedded_metadata_for(context["document"]) for context in batch]
+        analyses = analyze_with_gemini_batch([
+            (index, context["document"].text, os.path.basename(context["file"]))
+            for index, context in enumerate(batch)
+            if embedded[index] is not None and not (embedded[index].is_trustworthy and embedded[index].subject)
+        ])
+        for index, context in enumerate(batch):
+            if embedded[index] is None:
+                context["resumed_analysis"] = True
+            elif index in analyses:
+                context["analysis"] = _metadata_result(embedded[index], context["document"].isbn, analysis=analyses[index])
+            else:
+                context["analysis"] = _metadata_result(embedded[index], context["document"].isbn, category=translate_category_to_spanish(embedded[index].subject))
+            try:
+                check_analyzed_book(context)
+            except Exception as e:
+                context["result"] = {"success": False, "file": context["file"], "error": f"Error en etapa ai: {str(e)}"}
+    
+    def cover_stage(context: dict):
+        if context.get("drive_info"):
+            return  # Ya subido a Drive en una ejecución anterior, con su portada
+        document = context["document"]
+        save_cover(document, STATIC_COVERS_DIR)
+        if upload_to_drive:
+            analysis = context["analysis"]
+            result = process_book_with_cover(context["file"], STATIC_COVERS_DIR, analysis["title"], analysis["author"], should_upload_cover_to_drive=False, document=document)
+            context["cover_image_url"] = result.get("cover_image_url")
+        else:
+            context["cover_image_url"] = document.cover_image_url
+    
+    def drive_stage(context: dict):
+        if context.get("drive_info"):
+            return  # Subido en una ejecución anterior del trabajo
+        from google_drive_manager import get_drive_manager
+        file_path = context["file"]
+        analysis = context["analysis"]
+        drive_manager = get_drive_manager()
+        if not drive_manager.service:
+            context["result"] = {"success": False, "file": file_path, "error": "Google Drive no está configurado"}
+            return
         
-        # Guardar en base de datos
-        book_result = crud.create_book_with_duplicate_check(
-            db=db,
+        drive_result = drive_manager.upload_book_to_drive(
+            file_path=file_path,
             title=analysis["title"],
             author=analysis["author"],
-            category=analysis["category"],
-            cover_image_url=result.get("cover_image_url"),
-            drive_info=drive_info['drive_info'],  # Usar la estructura correcta
-            file_path=None  # No guardar ruta local
+            category=analysis["category"]
         )
+        if not drive_result or not drive_result.get('success'):
+            error_msg = drive_result.get('error', 'Error desconocido') if drive_result else 'No se pudo subir a Google Drive'
+            context["result"] = {"success": False, "file": file_path, "error": f"Error al subir a Google Drive: {error_msg}"}
+            return
+        if not drive_result.get('drive_info') or not drive_result['drive_info'].get('id'):
+            context["result"] = {"success": False, "file": file_path, "error": "Información de Google Drive incompleta o inválida"}
+            return
         
-        if book_result["success"]:
-            return {
-                "success": True,
-                "file": file_path,
-                "book": {
-                    "id": book_result["book"].id,
-                    "title": book_result["book"].title,
-                    "author": book_result["book"].author,
-                    "category": book_result["book"].category,
-                    "is_in_drive": True
-                }
-            }
-        else:
-            return {
-                "success": False,
-                "file": file_path,
-                "error": book_result.get("duplicate_info", {}).get("message", "Error desconocido")
-            }
-            
-    except Exception as e:
-        return {
-            "success": False,
-            "file": file_path,
-            "error": f"Error durante el procesamiento: {str(e)}"
+        print(f"✅ Libro subido a Google Drive: {analysis['title']}")
+        context["drive_info"] = drive_result['drive_info']
+        checkpoint(context, ItemState.UPLOADED, drive_info=context["drive_info"], cover_image_url=context.get("cover_image_url"))
+    
+    def db_stage(batch: list):
+        # Los libros terminados se registran por lotes: una transacción por lote en vez de por libro
+        db = database.SessionLocal()
+        try:
+            results = write_books(db, [
+                PendingBook(
+                    title=context["analysis"]["title"],
+                    author=context["analysis"]["author"],
+                    category=context["analysis"]["category"],
+                    cover_image_url=context.get("cover_image_url"),
+                    drive_info=context.get("drive_info"),
+                    # En modo local solo se guarda el nombre del archivo; en modo nube no hay ruta local
+                    file_path=None if upload_to_drive else os.path.basename(context["file"]),
+                    content_hash=context.get("content_hash"),
+                    text_sample=context["document"].text,
+                    isbn=context["document"].isbn,
+                    key=index
+                )
+                for index, context in enumerate(batch)
+            ])
+            for result in results:
+                context = batch[result.key]
+                file_path = context["file"]
+                if result.success:
+                    context["result"] = {
+                        "success": True,
+                        "file": file_path,
+                        "book": {
+                            "id": result.book.id,
+                            "title": result.book.title,
+                            "author": result.book.author,
+                            "category": result.book.category,
+                            "is_in_drive": upload_to_drive
+                        }
+                    }
+                elif result.duplicate_info:
+                    context["result"] = {
+                        "success": False,
+                        "file": file_path,
+                        "error": "Duplicado detectado (al registrar)",
+                        "duplicate_info": {
+                            "is_duplicate": True,
+                            "reason": result.duplicate_info["reason"],
+                            "existing_book": _existing_book_info(result.duplicate_info["existing_book"]),
+                            "message": result.message
+                        }
+                    }
+                else:
+                    context["result"] = {"success": False, "file": file_path, "error": result.message or "Error desconocido"}
+        finally:
+            db.close()
+        
+        # Modo local: el libro se registra por nombre de archivo dentro de BOOKS_PATH
+        for context in batch:
+            file_path = context["file"]
+            if move_from_dir and context["result"]["success"] and _is_inside_dir(file_path, move_from_dir):
+                destination = os.path.join(BOOKS_PATH, os.path.basename(file_path))
+                if not os.path.exists(destination):
+                    shutil.move(file_path, destination)
+    
+    def on_item_done(context: dict):
+        # Liberar el libro reclamado si no llegó a registrarse (p. ej. fallo al subir a Drive)
+        if context.get("claim_key") and not context["result"].get("success"):
+            with claimed_lock:
+                claimed_books.discard(context["claim_key"])
+        if on_finished:
+            on_finished(context)
+    
+    batch_config = get_batch_analysis_config()
+    stages = [
+        PipelineStage("parse", parse_stage, concurrency=PARSE_WORKERS, queue_size=max(STAGE_QUEUE_SIZE, PARSE_WORKERS * 2)),
+        PipelineStage("ai", ai_stage, concurrency=AI_WORKERS, queue_size=max(STAGE_QUEUE_SIZE, batch_config["batch_size"] * AI_WORKERS),
+                      batch_size=max(1, batch_config["batch_size"]), batch_wait=batch_config["max_wait_seconds"]),
+        PipelineStage("cover", cover_stage, concurrency=COVER_WORKERS, queue_size=STAGE_QUEUE_SIZE),
+    ]
+    if upload_to_drive:
+        stages.append(PipelineStage("drive", drive_stage, concurrency=DRIVE_WORKERS, queue_size=STAGE_QUEUE_SIZE))
+    stages.append(PipelineStage("db", db_stage, concurrency=DB_WORKERS, queue_size=max(STAGE_QUEUE_SIZE, BULK_WRITE_BATCH_SIZE),
+                                batch_size=max(1, BULK_WRITE_BATCH_SIZE), batch_wait=BULK_WRITE_MAX_WAIT))
+    return IngestionPipeline(f"bulk-{mode}", stages, on_item_done=on_item_done, on_stage_done=on_stage_done)
+
+def _result_from_job_item(item, file_path: str, existing_book) -> dict:
+    """Libro registrado en una ejecución anterior que se cortó antes de guardar su resultado"""
+    return {
+        "success": True,
+        "file": file_path,
+        "book": {
+            "id": existing_book.id,
+            "title": existing_book.title,
+            "author": existing_book.author,
+            "category": existing_book.category,
+            "is_in_drive": bool(existing_book.drive_file_id)
         }
+    }
 
-def process_single_book_local_async(file_path: str, static_dir: str, db: Session) -> dict:
+def run_import_job(job_id: str):
     """
-    Procesa un solo libro de forma asíncrona para carga masiva local
+    Procesa los elementos pendientes de un trabajo de importación: verificación previa por hash
+    y pipeline por etapas, con puntos de control en import_job_items.
     """
+    manager = get_import_job_manager()
+    event_bus = get_job_event_bus()
+    
+    def finish(item_id: int, display_name: str, result: dict):
+        outcome = manager.finish_item(item_id, result)
+        event_bus.item_finished(job_id, display_name, outcome.value, error=result.get("error"), book=result.get("book"))
+    
+    db = database.SessionLocal()
     try:
-        file_extension = os.path.splitext(file_path)[1].lower()
-        
-        # Verificación rápida de duplicados por nombre de archivo
-        quick_check = quick_duplicate_check(file_path, db)
-        if quick_check["is_duplicate"]:
-            return {
-                "success": False,
-                "file": file_path,
-                "error": "Duplicado detectado (verificación rápida)",
-                "duplicate_info": {
-                    "is_duplicate": True,
-                    "reason": quick_check["reason"],
-                    "existing_book": {
-                        "id": quick_check["existing_book"].id,
-                        "title": quick_check["existing_book"].title,
-                        "author": quick_check["existing_book"].author,
-                        "category": quick_check["existing_book"].category
-                    } if quick_check["existing_book"] else None,
-                    "message": quick_check["message"]
-                }
-            }
-        
-        # Verificar que el archivo existe antes de procesarlo
-        if not os.path.exists(file_path):
-            return {
-                "success": False,
-                "file": file_path,
-                "error": f"Archivo no encontrado: {file_path}"
-            }
-        
-        # Procesar el archivo para extraer texto Y generar portada en una sola pasada
-        if file_extension == '.pdf':
-            book_data = process_pdf(file_path, static_dir)
-        elif file_extension == '.epub':
-            book_data = process_epub(file_path, static_dir)
-        else:
-            return {"success": False, "file": file_path, "error": "Tipo de archivo no soportado"}
-        
-        # Usar el texto extraído para análisis con IA
-        temp_text = book_data["text"]
-        
-        # Analizar con IA
-        analysis = analyze_with_gemini(temp_text)
-        
-        # La portada ya fue generada en process_pdf/process_epub
-        cover_image_url = book_data.get("cover_image_url")
+        job = crud.get_import_job(db, job_id)
+        if not job:
+            raise ValueError(f"Trabajo de importación no encontrado: {job_id}")
+        mode = job.mode
+        move_from_dir = job.work_dir if job.move_to_library else None
+        items = {item.file_path: item for item in crud.get_import_job_items(db, job_id, unfinished_only=True)}
+        if not items:
+            return
+        print(f"🗂️ Trabajo {job_id}: {len(items)} archivos pendientes")
         
-        # Verificación final de duplicados con metadatos extraídos
-        duplicate_check = crud.is_duplicate_book(
-            db=db,
-            title=analysis["title"],
-            author=analysis["author"],
-            file_path=file_path
+        bulk_check_result = bulk_quick_check(
+            list(items), db,
+            file_hashes={path: item.content_hash for path, item in items.items() if item.content_hash}
         )
-        
-        if duplicate_check["is_duplicate"]:
-            return {
-                "success": False,
+        for duplicate, result in zip(bulk_check_result["duplicate_files"], _prefilter_duplicate_results(bulk_check_result["duplicate_files"])):
+            item = items[duplicate["file"]]
+            existing_book = duplicate.get("existing_book")
+            # Si el libro existente lo registró este mismo trabajo antes de cortarse, es un éxito
+            if (existing_book is not None and item.state in (ItemState.ANALYZED.value, ItemState.UPLOADED.value)
+                    and existing_book.content_hash == item.content_hash and existing_book.title == item.title):
+                result = _result_from_job_item(item, duplicate["file"], existing_book)
+            finish(item.id, item.display_name, result)
+        
+        contexts = []
+        for file_path in bulk_check_result["unique_files"]:
+            item = items[file_path]
+            context = {
                 "file": file_path,
-                "error": "Duplicado detectado (verificación final)",
-                "duplicate_info": {
-                    "is_duplicate": True,
-                    "reason": duplicate_check["reason"],
-                    "existing_book": {
-                        "id": duplicate_check["existing_book"].id,
-                        "title": duplicate_check["existing_book"].title,
-                        "author": duplicate_check["existing_book"].author,
-                        "category": duplicate_check["existing_book"].category
-                    } if duplicate_check["existing_book"] else None,
-                    "message": duplicate_check["message"]
-                }
+                "item_id": item.id,
+                "display_name": item.display_name,
+                "content_hash": bulk_check_result["file_hashes"].get(file_path) or item.content_hash
             }
-        
-        # Guardar en base de datos (modo local)
-        # Solo guardar el nombre del archivo, no la ruta completa de la carpeta
-        filename_only = os.path.basename(file_path)
-        book_result = crud.create_book_with_duplicate_check(
-            db=db,
-            title=analysis["title"],
-            author=analysis["author"],
-            category=analysis["category"],
-            cover_image_url=cover_image_url,
-            drive_info=None,  # No hay información de Drive en modo local
-            file_path=filename_only  # Guardar solo el nombre del archivo
-        )
-        
-        if book_result["success"]:
-            return {
-                "success": True,
-                "file": file_path,
-                "book": {
-                    "id": book_result["book"].id,
-                    "title": book_result["book"].title,
-                    "author": book_result["book"].author,
-                    "category": book_result["book"].category,
-                    "is_in_drive": False
-                }
-            }
-        else:
-            return {
-                "success": False,
-                "file": file_path,
-                "error": book_result.get("duplicate_info", {}).get("message", "Error desconocido")
-            }
-            
-    except Exception as e:
-        return {
-            "success": False,
-            "file": file_path,
-            "error": f"Error durante el procesamiento local: {str(e)}"
+            # Reanudar desde el último punto de control
+            if item.state in (ItemState.ANALYZED.value, ItemState.UPLOADED.value) and item.title:
+                context["analysis"] = {"title": item.title, "author": item.author, "category": item.category}
+            if item.state == ItemState.UPLOADED.value and item.drive_info:
+                context["drive_info"] = json.loads(item.drive_info)
+                context["cover_image_url"] = item.cover_image_url
+            contexts.append(context)
+    finally:
+        db.close()
+    
+    if not contexts:
+        return
+    pipeline = _build_bulk_pipeline(
+        mode,
+        move_from_dir=move_from_dir,
+        on_checkpoint=lambda context, state, **fields: manager.checkpoint(context["item_id"], state, **fields),
+        on_finished=lambda context: finish(context["item_id"], context["display_name"], context["result"]),
+        on_stage_done=lambda stage, context, seconds: event_bus.stage_done(job_id, context["display_name"], stage, seconds)
+    )
+    pipeline.run(iter(contexts))
+
+def _create_bulk_import_job(book_files: List[str], mode: str, source: str = None, work_dir: str = None,
+                            move_to_library: bool = False, file_hashes: dict = None,
+                            display_names: dict = None) -> str:
+    """Registra un trabajo de importación reanudable con un elemento por archivo"""
+    file_hashes = file_hashes or {}
+    display_names = display_names or {}
+    return get_import_job_manager().create_job(
+        mode,
+        [
+            (file_path, display_names.get(file_path) or os.path.basename(file_path), file_hashes.get(file_path))
+            for file_path in book_files
+        ],
+        source=source,
+        work_dir=work_dir,
+        move_to_library=move_to_library
+    )
+
+def _import_job_summary(job_id: str) -> dict:
+    """Respuesta BulkUploadResponse de un trabajo a partir de los resultados guardados"""
+    manager = get_import_job_manager()
+    job = manager.get_job(job_id)
+    results = manager.get_results(job_id)
+    prefiltered = sum(1 for r in results if r.get("error") == "Duplicado detectado (verificación previa)")
+    summary = _bulk_upload_summary(results, job["total_items"], {
+        "unique_files": job["total_items"] - prefiltered,
+        "duplicate_files": prefiltered,
+        "saved_ai_calls": prefiltered
+    })
+    summary["job_id"] = job_id
+    if job["pending"]:
+        summary["message"] += f" {job['pending']} archivos pendientes (el trabajo se puede reanudar)."
+    return summary
+
+def _run_bulk_import(job_id: str, background: bool = False):
+    """
+    Ejecuta el trabajo y devuelve el resumen. En segundo plano responde 202 de inmediato con
+    las rutas del flujo de eventos y del resumen.
+    """
+    if background:
+        get_import_job_manager().start_job(job_id)
+        return JSONResponse(status_code=202, content={
+            "job_id": job_id,
+            "events_url": f"/api/import-jobs/{job_id}/events",
+            "summary_url": f"/api/import-jobs/{job_id}/summary"
+        })
+    get_import_job_manager().start_job(job_id, wait=True)
+    return _import_job_summary(job_id)
+
+get_import_job_manager().set_runner(run_import_job)
+
+def _bulk_upload_summary(results: list, total_files: int, stats: dict) -> dict:
+    """Arma la respuesta BulkUploadResponse a partir de los resultados individuales"""
+    successful = [r for r in results if r.get("success")]
+    duplicates = [r for r in results if not r.get("success") and r.get("error", "").startswith("Duplicado detectado")]
+    failed = [r for r in results if not r.get("success") and not r.get("error", "").startswith("Duplicado detectado")]
+    
+    return {
+        "message": f"Procesamiento completado. {len(successful)} libros procesados exitosamente, {len(failed)} fallaron, {len(duplicates)} duplicados detectados.",
+        "total_files": total_files,
+        "successful": len(successful),
+        "failed": len(failed),
+        "duplicates": len(duplicates),
+        "successful_books": successful,
+        "failed_files": failed,
+        "duplicate_files": duplicates,
+        "optimization_stats": {
+            "total_files": total_files,
+            "unique_files": stats.get("unique_files", len(successful)),
+            "duplicate_files": len(duplicates),
+            "saved_ai_calls": stats.get("saved_ai_calls", 0) + (len(duplicates) - stats.get("duplicate_files", 0))
         }
+    }
 
 @app.post("/upload-bulk/", response_model=schemas.BulkUploadResponse)
-async def upload_bulk_books(
+def upload_bulk_books(
     folder_zip: UploadFile = File(...),
+    background: bool = Query(False, description="Responder 202 de inmediato y seguir el progreso por /api/import-jobs/{job_id}/events"),
     db: Session = Depends(get_db)
 ):
     """
@@ -1496,6 +2099,7 @@ async def upload_bulk_books(
         )
     
     temp_extract_dir = None
+    job_id = None
     try:
         # Crear directorio temporal para extraer el ZIP
         temp_dir = "temp_bulk_upload"
@@ -1507,116 +2111,45 @@ async def upload_bulk_books(
         temp_extract_dir = os.path.join(temp_dir, f"{zip_name}_{timestamp}")
         os.makedirs(temp_extract_dir, exist_ok=True)
         
-        # Leer y extraer el ZIP
-        zip_content = await folder_zip.read()
-        
-        with zipfile.ZipFile(io.BytesIO(zip_content), 'r') as zip_ref:
-            zip_ref.extractall(temp_extract_dir)
-        
-        # Encontrar todos los archivos de libros y ZIPs que contengan libros
-        all_files = find_book_files(temp_extract_dir)
-        
-        # Separar archivos directos de libros y ZIPs
-        direct_books = [f for f in all_files if Path(f).suffix.lower() in {'.pdf', '.epub'}]
-        zip_files = [f for f in all_files if Path(f).suffix.lower() == '.zip']
-        
-        # Procesar ZIPs que contengan libros
-        books_from_zips = []
-        for zip_file in zip_files:
-            extracted_books = process_zip_containing_books(zip_file, temp_extract_dir)
-            books_from_zips.extend(extracted_books)
-        
-        # Combinar todos los libros encontrados
-        book_files = direct_books + books_from_zips
+        # Leer el ZIP miembro a miembro desde el archivo temporal de la subida: solo se copian
+        # los PDF/EPUB (con su hash) y los ZIPs anidados se recorren de uno en uno
+        try:
+            book_files, file_hashes, display_names = _collect_zip_upload(folder_zip.file, folder_zip.filename, temp_extract_dir)
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="El archivo ZIP no es válido.")
+        except ZipExtractLimitError as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
         if not book_files:
             raise HTTPException(
-                status_code=400, 
-                detail="No se encontraron archivos PDF o EPUB válidos en el ZIP principal ni en los ZIPs contenidos."
-            )
-        
-        # VERIFICACIÓN PREVIA MASIVA DE DUPLICADOS
-        bulk_check_result = bulk_quick_check(book_files, db)
-        unique_files = bulk_check_result["unique_files"]
-        duplicate_files = bulk_check_result["duplicate_files"]
-        stats = bulk_check_result["stats"]
-        
-        # Procesar solo archivos únicos concurrentemente
-        results = []
-        if unique_files:
-            # Reducir workers para evitar rate limiting de la API de IA
-            max_workers = min(2, len(unique_files))  # Máximo 2 workers concurrentes
-            
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # Crear tareas para cada libro único usando la función específica para carga masiva de ZIP en modo nube
-                future_to_file = {
-                    executor.submit(process_single_book_bulk_cloud_async, file_path, STATIC_COVERS_DIR, db): file_path
-                    for file_path in unique_files
-                }
-                
-                # Recolectar resultados con delay entre procesamientos
-                for future in as_completed(future_to_file):
-                    result = future.result()
-                    results.append(result)
-                    
-                    # Pequeño delay entre procesamientos para evitar rate limiting
-                    time.sleep(0.5)
-        
-        # Agregar resultados de duplicados detectados en verificación previa
-        for duplicate in duplicate_files:
-            existing_book_dict = None
-            if duplicate.get("existing_book"):
-                existing_book = duplicate["existing_book"]
-                existing_book_dict = {
-                    "id": existing_book.id,
-                    "title": existing_book.title,
-                    "author": existing_book.author,
-                    "category": existing_book.category
-                }
-            
-            results.append({
-                "success": False,
-                "file": duplicate["file"],
-                "error": "Duplicado detectado (verificación previa)",
-                "duplicate_info": {
-                    "is_duplicate": True,
-                    "reason": duplicate.get("reason", "Archivo ya existe en la base de datos"),
-                    "existing_book": existing_book_dict,
-                    "message": duplicate.get("message", "Este archivo ya ha sido procesado anteriormente")
-                }
-            })
+                status_code=400, 
+                detail="No se encontraron archivos PDF o EPUB válidos en el ZIP principal ni en los ZIPs contenidos."
+            )
         
-        # Limpiar archivos temporales
-        cleanup_temp_files(temp_extract_dir)
-        
-        # Preparar respuesta
-        successful_uploads = [r for r in results if r.get("success")]
-        failed_uploads = [r for r in results if not r.get("success")]
-        
-        return schemas.BulkUploadResponse(
-            success=True,
-            message=f"Carga masiva completada. {len(successful_uploads)} libros subidos exitosamente, {len(failed_uploads)} fallaron.",
-            total_files=len(book_files),
-            successful_uploads=len(successful_uploads),
-            failed_uploads=len(failed_uploads),
-            results=results,
-            stats=stats
+        # Trabajo reanudable: verificación previa por hash + pipeline por etapas con puntos de control
+        job_id = _create_bulk_import_job(
+            book_files, "cloud", source=folder_zip.filename, work_dir=temp_extract_dir,
+            file_hashes=file_hashes, display_names=display_names
         )
+        return _run_bulk_import(job_id, background)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        # Limpiar archivos temporales en caso de error
-        if temp_extract_dir and os.path.exists(temp_extract_dir):
-            cleanup_temp_files(temp_extract_dir)
-        
         logger.error(f"Error en carga masiva: {str(e)}")
         raise HTTPException(
             status_code=500, 
             detail=f"Error interno del servidor durante la carga masiva: {str(e)}"
         )
+    finally:
+        # Sin trabajo creado se limpia aquí; si no, el trabajo conserva los archivos hasta completarse
+        if job_id is None and temp_extract_dir and os.path.exists(temp_extract_dir):
+            shutil.rmtree(temp_extract_dir, ignore_errors=True)
 
 @app.post("/api/upload-bulk-local/", response_model=schemas.BulkUploadResponse)
-async def upload_bulk_books_local(
+def upload_bulk_books_local(
     folder_zip: UploadFile = File(...),
+    background: bool = Query(False, description="Responder 202 de inmediato y seguir el progreso por /api/import-jobs/{job_id}/events"),
     db: Session = Depends(get_db)
 ):
     """
@@ -1626,6 +2159,7 @@ async def upload_bulk_books_local(
         raise HTTPException(status_code=400, detail="El archivo debe ser un ZIP.")
     
     temp_extract_dir = None
+    job_id = None
     try:
         # Crear directorio temporal para extraer el ZIP
         temp_dir = "temp_bulk_upload"
@@ -1637,27 +2171,14 @@ async def upload_bulk_books_local(
         temp_extract_dir = os.path.join(temp_dir, f"{zip_name}_{timestamp}")
         os.makedirs(temp_extract_dir, exist_ok=True)
         
-        # Leer y extraer el ZIP
-        zip_content = await folder_zip.read()
-        
-        with zipfile.ZipFile(io.BytesIO(zip_content), 'r') as zip_ref:
-            zip_ref.extractall(temp_extract_dir)
-        
-        # Encontrar todos los archivos de libros y ZIPs que contengan libros
-        all_files = find_book_files(temp_extract_dir)
-        
-        # Separar archivos directos de libros y ZIPs
-        direct_books = [f for f in all_files if Path(f).suffix.lower() in {'.pdf', '.epub'}]
-        zip_files = [f for f in all_files if Path(f).suffix.lower() == '.zip']
-        
-        # Procesar ZIPs que contengan libros
-        books_from_zips = []
-        for zip_file in zip_files:
-            extracted_books = process_zip_containing_books(zip_file, temp_extract_dir)
-            books_from_zips.extend(extracted_books)
-        
-        # Combinar todos los libros encontrados
-        book_files = direct_books + books_from_zips
+        # Leer el ZIP miembro a miembro desde el archivo temporal de la subida: solo se copian
+        # los PDF/EPUB (con su hash) y los ZIPs anidados se recorren de uno en uno
+        try:
+            book_files, file_hashes, display_names = _collect_zip_upload(folder_zip.file, folder_zip.filename, temp_extract_dir)
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="El archivo ZIP no es válido.")
+        except ZipExtractLimitError as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
         if not book_files:
             raise HTTPException(
@@ -1665,88 +2186,30 @@ async def upload_bulk_books_local(
                 detail="No se encontraron archivos PDF o EPUB válidos en el ZIP principal ni en los ZIPs contenidos."
             )
         
-        # VERIFICACIÓN PREVIA MASIVA DE DUPLICADOS
-        bulk_check_result = bulk_quick_check(book_files, db)
-        unique_files = bulk_check_result["unique_files"]
-        duplicate_files = bulk_check_result["duplicate_files"]
-        stats = bulk_check_result["stats"]
-        
-        # Procesar solo archivos únicos concurrentemente
-        results = []
-        if unique_files:
-            # Reducir workers para evitar rate limiting de la API de IA
-            max_workers = min(2, len(unique_files))  # Máximo 2 workers concurrentes
-            
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # Crear tareas para cada libro único (MODO LOCAL)
-                future_to_file = {
-                    executor.submit(process_single_book_local_async, file_path, STATIC_COVERS_DIR, db): file_path
-                    for file_path in unique_files
-                }
-                
-                # Recolectar resultados con delay entre procesamientos
-                for future in as_completed(future_to_file):
-                    result = future.result()
-                    results.append(result)
-                    
-                    # Pequeño delay entre procesamientos para evitar rate limiting
-                    time.sleep(0.5)
-        
-        # Agregar resultados de duplicados detectados en verificación previa
-        for duplicate in duplicate_files:
-            existing_book_dict = None
-            if duplicate.get("existing_book"):
-                existing_book = duplicate["existing_book"]
-                existing_book_dict = {
-                    "id": existing_book.id,
-                    "title": existing_book.title,
-                    "author": existing_book.author,
-                    "category": existing_book.category
-                }
-            
-            results.append({
-                "success": False,
-                "file": duplicate["file"],
-                "error": "Duplicado detectado (verificación previa)",
-                "duplicate_info": {
-                    "is_duplicate": True,
-                    "reason": duplicate.get("reason", "Archivo ya existe en la base de datos"),
-                    "existing_book": existing_book_dict,
-                    "message": duplicate.get("message", "Este archivo ya ha sido procesado anteriormente")
-                }
-            })
-        
-        # Limpiar archivos temporales
-        cleanup_temp_files(temp_extract_dir)
-        
-        # Preparar respuesta
-        successful_uploads = [r for r in results if r.get("success")]
-        failed_uploads = [r for r in results if not r.get("success")]
-        
-        return schemas.BulkUploadResponse(
-            success=True,
-            message=f"Carga masiva local completada. {len(successful_uploads)} libros procesados exitosamente, {len(failed_uploads)} fallaron.",
-            total_files=len(book_files),
-            successful_uploads=len(successful_uploads),
-            failed_uploads=len(failed_uploads),
-            results=results,
-            stats=stats
+        # Trabajo reanudable; en modo local los libros registrados se mueven a BOOKS_PATH
+        job_id = _create_bulk_import_job(
+            book_files, "local", source=folder_zip.filename, work_dir=temp_extract_dir, move_to_library=True,
+            file_hashes=file_hashes, display_names=display_names
         )
+        return _run_bulk_import(job_id, background)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        # Limpiar archivos temporales en caso de error
-        if temp_extract_dir and os.path.exists(temp_extract_dir):
-            cleanup_temp_files(temp_extract_dir)
-        
         logger.error(f"Error en carga masiva local: {str(e)}")
         raise HTTPException(
             status_code=500, 
             detail=f"Error interno del servidor durante la carga masiva local: {str(e)}"
         )
+    finally:
+        # Sin trabajo creado se limpia aquí; si no, el trabajo conserva los archivos hasta completarse
+        if job_id is None and temp_extract_dir and os.path.exists(temp_extract_dir):
+            shutil.rmtree(temp_extract_dir, ignore_errors=True)
 
 @app.post("/upload-folder/", response_model=schemas.BulkUploadResponse)
-async def upload_folder_books(
+def upload_folder_books(
     folder_path: str = Query(..., description="Ruta de la carpeta a procesar"),
+    background: bool = Query(False, description="Responder 202 de inmediato y seguir el progreso por /api/import-jobs/{job_id}/events"),
     db: Session = Depends(get_db)
 ):
     """
@@ -1767,6 +2230,8 @@ async def upload_folder_books(
             detail="Google Drive no está disponible. Instale las dependencias necesarias."
         )
     
+    work_dir = None
+    job_id = None
     try:
         # Verificar que la carpeta existe
         if not os.path.exists(folder_path) or not os.path.isdir(folder_path):
@@ -1775,21 +2240,9 @@ async def upload_folder_books(
                 detail=f"La carpeta especificada no existe o no es un directorio válido: {folder_path}"
             )
         
-        # Encontrar todos los archivos de libros y ZIPs que contengan libros
-        all_files = find_book_files(folder_path)
-        
-        # Separar archivos directos de libros y ZIPs
-        direct_books = [f for f in all_files if Path(f).suffix.lower() in {'.pdf', '.epub'}]
-        zip_files = [f for f in all_files if Path(f).suffix.lower() == '.zip']
-        
-        # Procesar ZIPs que contengan libros
-        books_from_zips = []
-        for zip_file in zip_files:
-            extracted_books = process_zip_containing_books(zip_file, folder_path)
-            books_from_zips.extend(extracted_books)
-        
-        # Combinar todos los libros encontrados
-        book_files = direct_books + books_from_zips
+        # Encontrar todos los libros; los de ZIPs contenidos se copian a un directorio de trabajo
+        work_dir = os.path.join("temp_bulk_upload", f"folder_{uuid.uuid4()}")
+        book_files, file_hashes, display_names = _collect_book_files(folder_path, work_dir)
         
         if not book_files:
             raise HTTPException(
@@ -1797,59 +2250,63 @@ async def upload_folder_books(
                 detail="No se encontraron archivos PDF o EPUB válidos en la carpeta ni en los ZIPs contenidos."
             )
         
-        # Configurar el procesamiento concurrente
-        max_workers = min(2, len(book_files))  # Máximo 2 workers concurrentes
-        results = []
-        
-        # Procesar libros en paralelo usando ThreadPoolExecutor
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Crear tareas para cada libro
-            future_to_file = {
-                executor.submit(process_single_book_async, file_path, STATIC_COVERS_DIR, db): file_path
-                for file_path in book_files
-            }
-            
-            # Recolectar resultados
-            for future in as_completed(future_to_file):
-                result = future.result()
-                results.append(result)
-        
-        # Resumen de resultados
-        successful = [r for r in results if r["success"]]
-        failed = [r for r in results if not r["success"] and r.get("error") != "Duplicado detectado (verificación rápida)" and r.get("error") != "Duplicado detectado (verificación final)"]
-        duplicates = [r for r in results if not r["success"] and (r.get("error") == "Duplicado detectado (verificación rápida)" or r.get("error") == "Duplicado detectado (verificación final)")]
-        
-        return {
-            "message": f"Procesamiento completado. {len(successful)} libros procesados exitosamente, {len(failed)} fallaron, {len(duplicates)} duplicados detectados.",
-            "total_files": len(book_files),
-            "successful": len(successful),
-            "failed": len(failed),
-            "duplicates": len(duplicates),
-            "successful_books": successful,
-            "failed_files": failed,
-            "duplicate_files": duplicates,
-            "optimization_stats": {
-                "total_files": len(book_files),
-                "unique_files": len(successful),
-                "duplicate_files": len(duplicates),
-                "saved_ai_calls": len(duplicates)
-            }
-        }
+        # Trabajo reanudable: verificación previa por hash + pipeline por etapas con puntos de control
+        job_id = _create_bulk_import_job(
+            book_files, "cloud", source=folder_path, work_dir=work_dir,
+            file_hashes=file_hashes, display_names=display_names
+        )
+        return _run_bulk_import(job_id, background)
         
     except HTTPException:
         raise
+    except ZipExtractLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         print(f"❌ Error durante la carga de carpeta: {e}")
         raise HTTPException(status_code=500, detail=f"Error durante la carga de carpeta: {str(e)}")
+    finally:
+        # Sin trabajo creado se limpia aquí; si no, el trabajo conserva los archivos hasta completarse
+        if job_id is None and work_dir and os.path.exists(work_dir):
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def _create_incremental_folder_job(scan: ScanResult, work_dir: str) -> Optional[str]:
+    """
+    Crea el trabajo de importación con los archivos nuevos o modificados de un escaneo
+    incremental y los registra en el índice de la carpeta (los que fallen se olvidan al
+    terminar el trabajo, ver FolderIndex._release_failed_entries). Retorna None si no hay libros.
+    """
+    book_files, file_hashes, display_names = _collect_book_files(
+        scan.root, work_dir, [state.full_path for state in scan.changed]
+    )
+    # El escaneo ya calculó el hash de los PDF/EPUB: la verificación previa no lo repite
+    collected = set(book_files)
+    for state in scan.changed:
+        if state.full_path in collected:
+            file_hashes[state.full_path] = state.content_hash
+    
+    job_id = None
+    if book_files:
+        job_id = _create_bulk_import_job(
+            book_files, "local", source=scan.root, work_dir=work_dir, move_to_library=True,
+            file_hashes=file_hashes, display_names=display_names
+        )
+    get_folder_index().record(scan, job_id)
+    return job_id
 
 @app.post("/api/upload-folder-local/", response_model=schemas.BulkUploadResponse)
-async def upload_folder_books_local(
+def upload_folder_books_local(
     folder_path: str = Query(..., description="Ruta de la carpeta a procesar"),
+    background: bool = Query(False, description="Responder 202 de inmediato y seguir el progreso por /api/import-jobs/{job_id}/events"),
+    incremental: bool = Query(False, description="Procesar solo los archivos nuevos o modificados desde el último escaneo de la carpeta"),
     db: Session = Depends(get_db)
 ):
     """
     Carga masiva de libros desde una carpeta específica del sistema (MODO LOCAL)
+    En modo incremental se compara la carpeta con su índice (ruta, tamaño, fecha y hash)
+    y solo se importan los archivos nuevos o modificados.
     """
+    work_dir = None
+    job_id = None
     try:
         # Verificar que la carpeta existe
         if not os.path.exists(folder_path) or not os.path.isdir(folder_path):
@@ -1858,21 +2315,23 @@ async def upload_folder_books_local(
                 detail=f"La carpeta especificada no existe o no es un directorio válido: {folder_path}"
             )
         
-        # Encontrar todos los archivos de libros y ZIPs que contengan libros
-        all_files = find_book_files(folder_path)
-        
-        # Separar archivos directos de libros y ZIPs
-        direct_books = [f for f in all_files if Path(f).suffix.lower() in {'.pdf', '.epub'}]
-        zip_files = [f for f in all_files if Path(f).suffix.lower() == '.zip']
+        # Encontrar todos los libros; los de ZIPs contenidos se copian a un directorio de trabajo
+        work_dir = os.path.join("temp_bulk_upload", f"folder_{uuid.uuid4()}")
         
-        # Procesar ZIPs que contengan libros
-        books_from_zips = []
-        for zip_file in zip_files:
-            extracted_books = process_zip_containing_books(zip_file, folder_path)
-            books_from_zips.extend(extracted_books)
+        if incremental:
+            root = normalize_root(folder_path)
+            folder_index = get_folder_index()
+            with folder_index.lock_root(root):
+                scan = folder_index.scan(root)
+                job_id = _create_incremental_folder_job(scan, work_dir)
+            print(f"🔎 Escaneo incremental de {root}: {scan.to_dict()}")
+            if job_id is None:
+                summary = _bulk_upload_summary([], 0, {})
+                summary["message"] = f"Sin libros nuevos ni modificados desde el último escaneo ({scan.unchanged} archivos sin cambios)."
+                return summary
+            return _run_bulk_import(job_id, background)
         
-        # Combinar todos los libros encontrados
-        book_files = direct_books + books_from_zips
+        book_files, file_hashes, display_names = _collect_book_files(folder_path, work_dir)
         
         if not book_files:
             raise HTTPException(
@@ -1880,50 +2339,84 @@ async def upload_folder_books_local(
                 detail="No se encontraron archivos PDF o EPUB válidos en la carpeta ni en los ZIPs contenidos."
             )
         
-        # Configurar el procesamiento concurrente
-        max_workers = min(2, len(book_files))  # Máximo 2 workers concurrentes
-        results = []
-        
-        # Procesar libros en paralelo usando ThreadPoolExecutor
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Crear tareas para cada libro (MODO LOCAL)
-            future_to_file = {
-                executor.submit(process_single_book_local_async, file_path, STATIC_COVERS_DIR, db): file_path
-                for file_path in book_files
-            }
-            
-            # Recolectar resultados
-            for future in as_completed(future_to_file):
-                result = future.result()
-                results.append(result)
-        
-        # Resumen de resultados
-        successful = [r for r in results if r["success"]]
-        failed = [r for r in results if not r["success"] and r.get("error") != "Duplicado detectado (verificación rápida)" and r.get("error") != "Duplicado detectado (verificación final)"]
-        duplicates = [r for r in results if not r["success"] and (r.get("error") == "Duplicado detectado (verificación rápida)" or r.get("error") == "Duplicado detectado (verificación final)")]
-        
-        return {
-            "message": f"Procesamiento completado. {len(successful)} libros procesados exitosamente, {len(failed)} fallaron, {len(duplicates)} duplicados detectados.",
-            "total_files": len(book_files),
-            "successful": len(successful),
-            "failed": len(failed),
-            "duplicates": len(duplicates),
-            "successful_books": successful,
-            "failed_files": failed,
-            "duplicate_files": duplicates,
-            "optimization_stats": {
-                "total_files": len(book_files),
-                "unique_files": len(successful),
-                "duplicate_files": len(duplicates),
-                "saved_ai_calls": len(duplicates)
-            }
-        }
+        # Trabajo reanudable: verificación previa por hash + pipeline por etapas con puntos de control
+        job_id = _create_bulk_import_job(
+            book_files, "local", source=folder_path, work_dir=work_dir, move_to_library=True,
+            file_hashes=file_hashes, display_names=display_names
+        )
+        return _run_bulk_import(job_id, background)
         
     except HTTPException:
         raise
+    except ZipExtractLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         print(f"❌ Error durante la carga de carpeta local: {e}")
         raise HTTPException(status_code=500, detail=f"Error durante la carga de carpeta local: {str(e)}")
+    finally:
+        # Sin trabajo creado se limpia aquí; si no, el trabajo conserva los archivos hasta completarse
+        if job_id is None and work_dir and os.path.exists(work_dir):
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def _on_watched_folder_changes(scan: ScanResult) -> Optional[str]:
+    """Importa en segundo plano lo que el vigilante encontró en la carpeta"""
+    work_dir = os.path.join("temp_bulk_upload", f"folder_{uuid.uuid4()}")
+    job_id = None
+    try:
+        job_id = _create_incremental_folder_job(scan, work_dir)
+        if job_id:
+            get_import_job_manager().start_job(job_id)
+        return job_id
+    finally:
+        if job_id is None and os.path.exists(work_dir):
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+@app.on_event("startup")
+def start_folder_watches():
+    """Vigila las carpetas de FOLDER_WATCH_PATHS (separadas por el separador de rutas del sistema)"""
+    for folder_path in filter(None, os.getenv("FOLDER_WATCH_PATHS", "").split(os.pathsep)):
+        if os.path.isdir(folder_path):
+            get_folder_index().watch(normalize_root(folder_path), _on_watched_folder_changes)
+        else:
+            logger.warning(f"FOLDER_WATCH_PATHS: {folder_path} no es un directorio")
+
+@app.on_event("shutdown")
+def stop_folder_watches():
+    """Detiene los vigilantes de carpetas al apagar el servidor"""
+    get_folder_index().stop_all()
+
+@app.get("/api/folder-watches")
+def list_folder_watches():
+    """Carpetas vigiladas y el resultado de su último escaneo"""
+    return {"watches": get_folder_index().list_watchers()}
+
+@app.post("/api/folder-watches", status_code=201)
+def start_folder_watch(
+    folder_path: str = Query(..., description="Carpeta a vigilar"),
+    interval: int = Query(FOLDER_WATCH_INTERVAL, ge=5, le=86400, description="Segundos entre escaneos")
+):
+    """Importa continuamente (modo local) los libros nuevos o modificados de la carpeta"""
+    if not os.path.isdir(folder_path):
+        raise HTTPException(status_code=400, detail=f"La carpeta especificada no existe o no es un directorio válido: {folder_path}")
+    watcher = get_folder_index().watch(normalize_root(folder_path), _on_watched_folder_changes, interval=interval)
+    return watcher.to_dict()
+
+@app.delete("/api/folder-watches")
+def stop_folder_watch(folder_path: str = Query(..., description="Carpeta vigilada")):
+    """Deja de vigilar la carpeta (el trabajo en curso, si lo hay, termina normalmente)"""
+    root = normalize_root(folder_path)
+    if not get_folder_index().unwatch(root):
+        raise HTTPException(status_code=404, detail="La carpeta no está siendo vigilada")
+    return {"success": True, "root": root}
+
+@app.delete("/api/folder-index")
+def reset_folder_index(folder_path: str = Query(..., description="Carpeta escaneada")):
+    """Olvida el índice de la carpeta: el siguiente escaneo incremental la recorre completa"""
+    root = normalize_root(folder_path)
+    folder_index = get_folder_index()
+    with folder_index.lock_root(root):
+        deleted = folder_index.forget(root)
+    return {"success": True, "root": root, "deleted_entries": deleted}
 
 def cleanup_orphaned_files():
     """Limpia archivos en el directorio de libros que no están referenciados en la base de datos"""
@@ -1987,48 +2480,31 @@ def validate_book_file(file_path: str) -> bool:
     except Exception:
         return False
 
-def quick_duplicate_check(file_path: str, db: Session) -> dict:
+def quick_duplicate_check(file_path: str, db: Session, content_hash: str = None) -> dict:
     """
     Verificación rápida de duplicados sin análisis de IA.
-    Retorna información sobre si el archivo ya existe.
+    Usa el hash SHA-256 del contenido: una sola búsqueda por índice único.
+    Retorna información sobre si el archivo ya existe (incluye el hash calculado).
     """
     try:
-        filename = Path(file_path).name
-        file_size = os.path.getsize(file_path)
+        if not content_hash:
+            content_hash = compute_file_sha256(file_path)
         
-        # Verificar por nombre de archivo exacto
-        existing_by_filename = crud.get_book_by_filename(db, filename)
-        if existing_by_filename:
+        existing_by_hash = crud.get_book_by_content_hash(db, content_hash)
+        if existing_by_hash:
             return {
                 "is_duplicate": True,
-                "reason": "filename_exact",
-                "existing_book": existing_by_filename,
-                "message": f"Ya existe un libro con el mismo nombre: {filename}"
+                "reason": "content_hash",
+                "existing_book": existing_by_hash,
+                "content_hash": content_hash,
+                "message": f"Ya existe un libro con el mismo contenido: {Path(file_path).name}"
             }
         
-        # Verificar por tamaño de archivo (aproximado)
-        # Buscar libros con tamaño similar (±1KB de tolerancia)
-        similar_size_books = db.query(models.Book).filter(
-            models.Book.file_path.like(f"%{filename}%")
-        ).all()
-        
-        for book in similar_size_books:
-            # Construir ruta completa para verificar existencia
-            book_file_path = get_book_file_path(book) if hasattr(book, 'id') else book.file_path
-            if book_file_path and os.path.exists(book_file_path):
-                existing_size = os.path.getsize(book_file_path)
-                if abs(existing_size - file_size) <= 1024:  # ±1KB
-                    return {
-                        "is_duplicate": True,
-                        "reason": "filename_size_similar",
-                        "existing_book": book,
-                        "message": f"Posible duplicado: {filename} (tamaño similar)"
-                    }
-        
         return {
             "is_duplicate": False,
             "reason": None,
             "existing_book": None,
+            "content_hash": content_hash,
             "message": "No se encontraron duplicados en verificación rápida"
         }
         
@@ -2037,16 +2513,20 @@ def quick_duplicate_check(file_path: str, db: Session) -> dict:
             "is_duplicate": False,
             "reason": "error",
             "existing_book": None,
+            "content_hash": content_hash,
             "message": f"Error en verificación rápida: {str(e)}"
         }
 
-def bulk_quick_check(book_files: List[str], db: Session) -> dict:
+def bulk_quick_check(book_files: List[str], db: Session, file_hashes: dict = None) -> dict:
     """
     Verificación previa masiva de duplicados para optimizar el procesamiento.
-    Retorna archivos únicos y duplicados detectados.
+    Calcula el hash de cada archivo y consulta todos los hashes con una sola consulta IN (...).
+    También detecta archivos repetidos dentro del mismo lote.
+    Retorna archivos únicos, duplicados detectados y el hash de cada archivo.
     """
     unique_files = []
     duplicate_files = []
+    file_hashes = dict(file_hashes or {})
     stats = {
         "total_files": len(book_files),
         "unique_files": 0,
@@ -2054,24 +2534,49 @@ def bulk_quick_check(book_files: List[str], db: Session) -> dict:
         "saved_ai_calls": 0
     }
     
+    # Calcular hashes que falten (lectura secuencial por bloques)
     for file_path in book_files:
-        quick_check = quick_duplicate_check(file_path, db)
-        if quick_check["is_duplicate"]:
+        if not file_hashes.get(file_path):
+            try:
+                file_hashes[file_path] = compute_file_sha256(file_path)
+            except OSError as e:
+                print(f"⚠️ No se pudo calcular el hash de {file_path}: {e}")
+                file_hashes[file_path] = None
+    
+    # Una sola consulta para todos los hashes del lote
+    existing_books = crud.get_books_by_content_hashes(db, list(file_hashes.values()))
+    
+    seen_in_batch = {}
+    for file_path in book_files:
+        content_hash = file_hashes.get(file_path)
+        existing_book = existing_books.get(content_hash) if content_hash else None
+        if existing_book:
+            duplicate_files.append({
+                "file": file_path,
+                "reason": "content_hash",
+                "message": f"Ya existe un libro con el mismo contenido: {Path(file_path).name}",
+                "existing_book": existing_book
+            })
+        elif content_hash and content_hash in seen_in_batch:
             duplicate_files.append({
                 "file": file_path,
-                "reason": quick_check["reason"],
-                "message": quick_check["message"],
-                "existing_book": quick_check["existing_book"]
+                "reason": "content_hash_batch",
+                "message": f"Archivo repetido en la misma carga: {Path(file_path).name} (igual a {Path(seen_in_batch[content_hash]).name})",
+                "existing_book": None
             })
-            stats["duplicate_files"] += 1
-            stats["saved_ai_calls"] += 1
         else:
+            if content_hash:
+                seen_in_batch[content_hash] = file_path
             unique_files.append(file_path)
             stats["unique_files"] += 1
+            continue
+        stats["duplicate_files"] += 1
+        stats["saved_ai_calls"] += 1
     
     return {
         "unique_files": unique_files,
         "duplicate_files": duplicate_files,
+        "file_hashes": file_hashes,
         "stats": stats
     }
 
@@ -2256,7 +2761,7 @@ def get_drive_books(
         raise HTTPException(status_code=500, detail=f"Error al obtener libros de Drive: {str(e)}")
 
 @app.post("/api/drive/books/upload")
-async def upload_book_to_drive(book_file: UploadFile = File(...), db: Session = Depends(get_db)):
+def upload_book_to_drive(book_file: UploadFile = File(...), db: Session = Depends(get_db)):
     """
     Sube un libro a Google Drive
     """
@@ -2275,30 +2780,31 @@ async def upload_book_to_drive(book_file: UploadFile = File(...), db: Session =
         if book_file.filename.lower().endswith('.zip'):
             raise HTTPException(status_code=400, detail="Para archivos ZIP, use el endpoint /upload-bulk/")
         
-        # Crear archivo temporal
-        temp_file_path = f"temp_downloads/{uuid.uuid4()}_{book_file.filename}"
-        os.makedirs("temp_downloads", exist_ok=True)
+        if not book_file.filename.lower().endswith(('.pdf', '.epub')):
+            raise HTTPException(status_code=400, detail="Formato de archivo no soportado. Solo se aceptan PDF y EPUB")
         
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(book_file.file, buffer)
+        # Guardar archivo temporal en una sola pasada (calcula el hash del contenido)
+        upload = _receive_upload(book_file, "temp_downloads")
+        temp_file_path = upload.file_path
         
         try:
+            # Duplicado exacto por hash de contenido, antes de parsear
+            _raise_if_content_duplicate(db, upload.sha256)
+            
             # Procesar el archivo para extraer metadatos
             static_dir = "static/covers"
             os.makedirs(static_dir, exist_ok=True)
             
-            if book_file.filename.lower().endswith('.pdf'):
-                book_info = process_pdf(temp_file_path, static_dir)
-            elif book_file.filename.lower().endswith('.epub'):
-                book_info = process_epub(temp_file_path, static_dir)
-            else:
-                raise HTTPException(status_code=400, detail="Formato de archivo no soportado. Solo se aceptan PDF y EPUB")
+            document = get_document_analysis(temp_file_path, static_dir, content_hash=upload.sha256)
             
-            # Analizar el texto con IA para extraer metadatos
-            analysis = analyze_with_gemini(book_info['text'])
+            # Misma edición por ISBN: tampoco hace falta la IA
+            _raise_if_isbn_duplicate(db, document.isbn)
+            
+            # Metadatos embebidos fiables primero; la IA solo cuando hace falta
+            analysis = resolve_book_metadata(document)
             
             # Procesar libro con manejo de portada
-            book_data = process_book_with_cover(temp_file_path, static_dir, analysis['title'], analysis['author'], should_upload_cover_to_drive=False)
+            book_data = process_book_with_cover(temp_file_path, static_dir, analysis['title'], analysis['author'], should_upload_cover_to_drive=False, document=document)
             
             # Subir a Google Drive
             drive_result = drive_manager.upload_book_to_drive(
@@ -2335,7 +2841,10 @@ async def upload_book_to_drive(book_file: UploadFile = File(...), db: Session =
                 category=analysis['category'],
                 cover_image_url=book_data.get("cover_image_url"), 
                 drive_info=drive_info,
-                file_path=None  # No guardar ruta local
+                file_path=None,  # No guardar ruta local
+                content_hash=upload.sha256,
+                text_sample=document.text,
+                isbn=document.isbn
             )
             
             if not result["success"]:
@@ -2546,15 +3055,8 @@ def get_drive_book_content(book_id: str, db: Session = Depends(get_db)):
                     }
                 )
             elif temp_file_path.lower().endswith('.epub'):
-                # Para EPUBs, extraer texto
-                book_epub = epub.read_epub(temp_file_path)
-                text_content = ""
-                
-                for item in book_epub.get_items():
-                    if item.get_type() == ebooklib.ITEM_DOCUMENT:
-                        soup = BeautifulSoup(item.get_content(), 'html.parser')
-                        text_content += soup.get_text() + "\n"
-                
+                # Para EPUBs, extraer texto en orden de lectura
+                text_content = read_epub_text(temp_file_path)
                 return {"content": text_content, "file_path": temp_file_path}
             else:
                 raise HTTPException(status_code=400, detail="Formato de archivo no soportado para lectura")
@@ -2949,7 +3451,7 @@ def upload_cover_to_drive(cover_path: str, title: str, author: str) -> str:
         print("⚠️ Manteniendo imagen local como fallback")
         return cover_path
 
-def process_book_with_cover(file_path: str, static_dir: str, title: str, author: str, should_upload_cover_to_drive: bool = False) -> dict:
+def process_book_with_cover(file_path: str, static_dir: str, title: str, author: str, should_upload_cover_to_drive: bool = False, document: DocumentAnalysis = None) -> dict:
     """
     Procesa un libro y maneja la imagen de portada manteniendo solo las portadas locales
     
@@ -2959,6 +3461,7 @@ def process_book_with_cover(file_path: str, static_dir: str, title: str, author:
         title: Título del libro
         author: Autor del libro
         should_upload_cover_to_drive: Por defecto False para evitar errores SSL
+        document: Análisis ya calculado del documento (evita volver a parsear el archivo)
     """
     print(f"🔄 Procesando libro: {os.path.basename(file_path)}")
     print(f"📁 Directorio estático: {static_dir}")
@@ -2969,18 +3472,12 @@ def process_book_with_cover(file_path: str, static_dir: str, title: str, author:
     file_ext = os.path.splitext(file_path)[1].lower()
     print(f"📄 Extensión del archivo: {file_ext}")
     
-    # Procesar el archivo según su tipo
-    if file_ext == ".pdf":
-        print("📚 Procesando PDF...")
-        book_data = process_pdf(file_path, static_dir)
-    elif file_ext == ".epub":
-        print("📚 Procesando EPUB...")
-        book_data = process_epub(file_path, static_dir)
-    else:
-        raise HTTPException(status_code=400, detail="Tipo de archivo no soportado.")
+    # Reutilizar el análisis del documento (o calcularlo una sola vez si no se recibió)
+    if document is None:
+        document = get_document_analysis(file_path, static_dir)
     
     # Manejar la imagen de portada
-    cover_image_url = book_data.get("cover_image_url")
+    cover_image_url = document.cover_image_url
     print(f"🖼️ URL de portada inicial: {cover_image_url}")
     
     if cover_image_url:
@@ -3002,7 +3499,7 @@ def process_book_with_cover(file_path: str, static_dir: str, title: str, author:
     if not cover_image_url and title and title != "Desconocido":
         print("🔍 Intentando búsqueda de portada online con información de la IA...")
         try:
-            online_cover = cover_search.search_book_cover_online(title, author, static_dir)
+            online_cover = cover_search.search_book_cover_online(title, author, static_dir, isbn=document.isbn)
             if online_cover:
                 cover_image_url = online_cover
                 print(f"✅ Portada online encontrada con IA: {online_cover}")
@@ -3014,7 +3511,7 @@ def process_book_with_cover(file_path: str, static_dir: str, title: str, author:
     print(f"🖼️ URL final de portada: {cover_image_url}")
     
     return {
-        "text": book_data["text"],
+        "text": document.text,
         "cover_image_url": cover_image_url
     }
 
@@ -3084,16 +3581,23 @@ def test_endpoint():
     """
     return {"message": "Endpoint de prueba funcionando correctamente"}
 
-def process_single_book_bulk_cloud_async(file_path: str, static_dir: str, db: Session) -> dict:
+def process_single_book_bulk_cloud_async(file_path: str, static_dir: str, db: Session, content_hash: str = None, document: DocumentAnalysis = None, drive_source: dict = None) -> dict:
     """
     Procesa un libro individual de forma asíncrona para carga masiva de ZIP en modo nube.
     Esta función es específica para el procesamiento masivo y no modifica la carga individual.
+    Con drive_source ({"id", "name", "partial"}) el libro ya está en Drive: se copia con
+    files.copy en lugar de subirlo, y file_path puede ser solo una muestra parcial.
     """
     try:
         file_extension = Path(file_path).suffix.lower()
         
         # VERIFICACIÓN RÁPIDA DE DUPLICADOS (SIN IA) - ANTES DE CUALQUIER PROCESAMIENTO
-        quick_check = quick_duplicate_check(file_path, db)
+        if drive_source and drive_source.get("partial") and not content_hash:
+            # Sin el archivo completo no se puede calcular el hash (Drive no lo informó)
+            quick_check = {"is_duplicate": False, "content_hash": None}
+        else:
+            quick_check = quick_duplicate_check(file_path, db, content_hash=content_hash)
+        content_hash = quick_check.get("content_hash")
         if quick_check["is_duplicate"]:
             return {
                 "success": False,
@@ -3120,26 +3624,45 @@ def process_single_book_bulk_cloud_async(file_path: str, static_dir: str, db: Se
                 "error": f"Archivo no encontrado: {file_path}"
             }
         
-        # Procesar el archivo según su tipo
-        if file_extension == '.pdf':
-            temp_result = process_pdf(file_path, static_dir)
-        elif file_extension == '.epub':
-            temp_result = process_epub(file_path, static_dir)
-        else:
+        # Abrir el documento una sola vez según su tipo
+        if file_extension not in ('.pdf', '.epub'):
             return {"success": False, "file": file_path, "error": "Tipo de archivo no soportado"}
+        if document is None:
+            document = get_document_analysis(file_path, static_dir, content_hash=content_hash)
+        else:
+            # Documento ya parseado en el pool de procesos: solo falta guardar la portada
+            save_cover(document, static_dir)
+        
+        # Misma edición por ISBN (índice): se descarta antes de llamar a la IA
+        existing_by_isbn = crud.get_book_by_isbn(db, document.isbn)
+        if existing_by_isbn:
+            return {
+                "success": False,
+                "file": file_path,
+                "error": "Duplicado detectado (ISBN)",
+                "duplicate_info": {
+                    "is_duplicate": True,
+                    "reason": "isbn",
+                    "existing_book": _existing_book_info(existing_by_isbn),
+                    "message": f"Ya existe un libro con el mismo ISBN ({document.isbn}): '{existing_by_isbn.title}' por {existing_by_isbn.author}"
+                }
+            }
         
-        # Analizar con IA (solo si pasó la verificación rápida)
-        analysis = analyze_with_gemini(temp_result["text"])
+        # Metadatos embebidos o IA (solo si pasó la verificación rápida)
+        analysis = resolve_book_metadata(document)
         
-        # Procesar libro con manejo de portada
-        result = process_book_with_cover(file_path, static_dir, analysis["title"], analysis["author"], should_upload_cover_to_drive=False)
+        # Procesar libro con manejo de portada (reutiliza el análisis, sin volver a parsear)
+        result = process_book_with_cover(file_path, static_dir, analysis["title"], analysis["author"], should_upload_cover_to_drive=False, document=document)
         
         # Verificación final de duplicados con metadatos extraídos
         duplicate_check = crud.is_duplicate_book(
             db=db,
             title=analysis["title"],
             author=analysis["author"],
-            file_path=file_path
+            file_path=file_path,
+            content_hash=content_hash,
+            text_sample=document.text,
+            isbn=document.isbn
         )
         
         if duplicate_check["is_duplicate"]:
@@ -3171,12 +3694,21 @@ def process_single_book_bulk_cloud_async(file_path: str, static_dir: str, db: Se
                     "error": "Google Drive no está configurado"
                 }
             
-            drive_result = drive_manager.upload_book_to_drive(
-                file_path=file_path,
-                title=analysis["title"],
-                author=analysis["author"],
-                category=analysis["category"]
-            )
+            if drive_source:
+                drive_result = drive_manager.copy_book_to_drive(
+                    source_file_id=drive_source["id"],
+                    file_name=drive_source["name"],
+                    title=analysis["title"],
+                    author=analysis["author"],
+                    category=analysis["category"]
+                )
+            else:
+                drive_result = drive_manager.upload_book_to_drive(
+                    file_path=file_path,
+                    title=analysis["title"],
+                    author=analysis["author"],
+                    category=analysis["category"]
+                )
             
             if not drive_result or not drive_result.get('success'):
                 error_msg = drive_result.get('error', 'Error desconocido') if drive_result else 'No se pudo subir a Google Drive'
@@ -3186,7 +3718,7 @@ def process_single_book_bulk_cloud_async(file_path: str, static_dir: str, db: Se
                     "error": f"Error al subir a Google Drive: {error_msg}"
                 }
             
-            print(f"✅ Libro subido a Google Drive: {analysis['title']}")
+            print(f"✅ Libro {'copiado' if drive_source else 'subido'} a Google Drive: {analysis['title']}")
             
         except Exception as e:
             return {
@@ -3211,7 +3743,10 @@ def process_single_book_bulk_cloud_async(file_path: str, static_dir: str, db: Se
             category=analysis["category"],
             cover_image_url=result.get("cover_image_url"),
             drive_info=drive_result['drive_info'],  # Estructura específica para carga masiva
-            file_path=None  # No guardar ruta local en modo nube
+            file_path=None,  # No guardar ruta local en modo nube
+            content_hash=content_hash,
+            text_sample=document.text,
+            isbn=document.isbn
         )
         
         if book_result["success"]:
@@ -3257,7 +3792,7 @@ async def search_cover_online(
         print(f"🔍 Buscando portada online para: '{book.title}' por '{book.author}'")
         
         # Buscar portada online
-        online_cover = cover_search.search_book_cover_online(book.title, book.author, "static/covers")
+        online_cover = cover_search.search_book_cover_online(book.title, book.author, "static/covers", isbn=book.isbn)
         
         if online_cover:
             # Actualizar el libro con la nueva portada
@@ -3384,6 +3919,10 @@ async def update_book(
         if 'category' in book_update:
             book.category = book_update['category']
         
+        # Recalcular la huella de casi-duplicados si cambió el título o el autor
+        if 'title' in book_update or 'author' in book_update:
+            crud.index_book_fingerprint(db, book, commit=False)
+        
         # Si el libro está en Google Drive y se cambió la categoría, mover el archivo
         if (book.drive_file_id and 
             'category' in book_update and 
@@ -3536,7 +4075,7 @@ async def bulk_search_covers(
                     continue
                 
                 # Buscar portada online
-                online_cover = cover_search.search_book_cover_online(book.title, book.author, "static/covers")
+                online_cover = cover_search.search_book_cover_online(book.title, book.author, "static/covers", isbn=book.isbn)
                 
                 if online_cover:
                     # Actualizar el libro
@@ -3740,100 +4279,67 @@ async def cleanup_temp_files():
         logger.error(f"Error durante la limpieza de archivos temporales: {e}")
         raise HTTPException(status_code=500, detail=f"Error durante la limpieza de archivos temporales: {str(e)}")
 
-@app.post("/api/upload-folder-local/", response_model=schemas.BulkUploadResponse)
-async def upload_folder_books_local(
-    folder_path: str = Query(..., description="Ruta de la carpeta a procesar"),
-    db: Session = Depends(get_db)
-):
+def process_drive_book_copy(download_result: dict, book_info: dict, drive_manager, db: Session) -> dict:
     """
-    Carga masiva de libros desde una carpeta específica del sistema (MODO LOCAL)
+    Importa un libro de una carpeta pública de Drive copiándolo en el servidor (files.copy).
+    Los metadatos y la portada salen de la muestra descargada; si la muestra no basta o el
+    archivo no admite copia, se descarga completo y se sube como en el modo "download".
     """
-    try:
-        # Verificar que la carpeta existe
-        if not os.path.exists(folder_path) or not os.path.isdir(folder_path):
-            raise HTTPException(
-                status_code=400, 
-                detail=f"La carpeta especificada no existe o no es un directorio válido: {folder_path}"
-            )
-        
-        # Encontrar todos los archivos de libros y ZIPs que contengan libros
-        all_files = find_book_files(folder_path)
-        
-        # Separar archivos directos de libros y ZIPs
-        direct_books = [f for f in all_files if Path(f).suffix.lower() in {'.pdf', '.epub'}]
-        zip_files = [f for f in all_files if Path(f).suffix.lower() == '.zip']
-        
-        # Procesar ZIPs que contengan libros
-        books_from_zips = []
-        for zip_file in zip_files:
-            extracted_books = process_zip_containing_books(zip_file, folder_path)
-            books_from_zips.extend(extracted_books)
-        
-        # Combinar todos los libros encontrados
-        book_files = direct_books + books_from_zips
-        
-        if not book_files:
-            raise HTTPException(
-                status_code=400, 
-                detail="No se encontraron archivos PDF o EPUB válidos en la carpeta ni en los ZIPs contenidos."
-            )
-        
-        # Configurar el procesamiento concurrente
-        max_workers = min(2, len(book_files))  # Máximo 2 workers concurrentes
-        results = []
-        
-        # Procesar libros en paralelo usando ThreadPoolExecutor
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Crear tareas para cada libro (MODO LOCAL)
-            future_to_file = {
-                executor.submit(process_single_book_local_async, file_path, STATIC_COVERS_DIR, db): file_path
-                for file_path in book_files
-            }
-            
-            # Recolectar resultados
-            for future in as_completed(future_to_file):
-                result = future.result()
-                results.append(result)
-        
-        # Resumen de resultados
-        successful = [r for r in results if r["success"]]
-        failed = [r for r in results if not r["success"] and r.get("error") != "Duplicado detectado (verificación rápida)" and r.get("error") != "Duplicado detectado (verificación final)"]
-        duplicates = [r for r in results if not r["success"] and (r.get("error") == "Duplicado detectado (verificación rápida)" or r.get("error") == "Duplicado detectado (verificación final)")]
-        
-        return {
-            "message": f"Procesamiento completado. {len(successful)} libros procesados exitosamente, {len(failed)} fallaron, {len(duplicates)} duplicados detectados.",
-            "total_files": len(book_files),
-            "successful": len(successful),
-            "failed": len(failed),
-            "duplicates": len(duplicates),
-            "successful_books": successful,
-            "failed_files": failed,
-            "duplicate_files": duplicates,
-            "optimization_stats": {
-                "total_files": len(book_files),
-                "unique_files": len(successful),
-                "duplicate_files": len(duplicates),
-                "saved_ai_calls": len(duplicates)
-            }
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"❌ Error durante la carga de carpeta local: {e}")
-        raise HTTPException(status_code=500, detail=f"Error durante la carga de carpeta local: {str(e)}")
+    file_path = download_result["file_path"]
+    content_hash = download_result.get("sha256")
+    drive_source = {
+        "id": book_info["id"],
+        "name": download_result["file_name"],
+        "partial": download_result.get("partial", False)
+    }
+    
+    def download_full():
+        full_result = drive_manager.download_file_from_drive(book_info["id"], os.path.dirname(file_path))
+        drive_source["partial"] = False
+        return full_result
+    
+    if not download_result.get("can_copy", True):
+        print(f"⚠️ {book_info['name']} no admite copia en Drive, se descarga y se sube")
+        drive_source = None
+        if download_result.get("partial"):
+            full_result = download_full()
+            if not full_result["success"]:
+                return {"success": False, "file": book_info['name'], "error": f"Error al descargar: {full_result['error']}"}
+        return process_single_book_bulk_cloud_async(file_path, STATIC_COVERS_DIR, db, content_hash=content_hash)
+    
+    document = None
+    # Los duplicados por hash se resuelven sin analizar la muestra
+    if drive_source["partial"] and not (content_hash and crud.get_book_by_content_hash(db, content_hash)):
+        try:
+            document = get_document_analysis(file_path, STATIC_COVERS_DIR, content_hash=content_hash)
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            print(f"⚠️ La muestra de {book_info['name']} no basta para analizarlo ({detail}), se descarga completo")
+            full_result = download_full()
+            if not full_result["success"]:
+                return {"success": False, "file": book_info['name'], "error": f"Error al descargar: {full_result['error']}"}
+    
+    return process_single_book_bulk_cloud_async(
+        file_path, STATIC_COVERS_DIR, db, content_hash=content_hash, document=document, drive_source=drive_source
+    )
 
 @app.post("/api/upload-drive-folder/", response_model=schemas.BulkUploadResponse)
-async def upload_drive_folder_books(
+def upload_drive_folder_books(
     folder_data: dict,
     db: Session = Depends(get_db)
 ):
     """
     Carga masiva de libros desde una carpeta pública de Google Drive (MODO NUBE)
+    Con import_mode "copy" los libros se copian en el servidor de Drive (files.copy) y solo
+    se descarga una muestra de cada uno para los metadatos y la portada; con "download" se
+    descargan completos y se vuelven a subir.
     """
     folder_url = folder_data.get('folder_url')
     if not folder_url:
         raise HTTPException(status_code=400, detail="Se requiere la URL de la carpeta de Google Drive")
+    import_mode = folder_data.get('import_mode') or DRIVE_FOLDER_IMPORT_MODE
+    if import_mode not in DRIVE_IMPORT_MODES:
+        raise HTTPException(status_code=400, detail=f"Modo de importación no válido: {import_mode} (use {' o '.join(DRIVE_IMPORT_MODES)})")
     
     # Verificar que Google Drive esté configurado
     try:
@@ -3888,63 +4394,63 @@ async def upload_drive_folder_books(
                 detail="No se encontraron archivos PDF o EPUB válidos en la carpeta pública."
             )
         
-        print(f"📚 Libros encontrados: {len(books_info)}")
+        print(f"📚 Libros encontrados: {len(books_info)} (modo {import_mode})")
         
-        # Descargar y procesar cada libro
+        # Descargar (con anticipación, en paralelo) y procesar cada libro
         results = []
         successful = 0
         failed = 0
         duplicates = 0
         
-        for i, book_info in enumerate(books_info):
-            try:
-                print(f"📖 Procesando libro {i + 1}/{len(books_info)}: {book_info['name']}")
-                
-                # Descargar archivo desde Google Drive
-                download_result = drive_manager.download_file_from_drive(book_info['id'], temp_dir)
-                
-                if not download_result["success"]:
-                    print(f"❌ Error al descargar {book_info['name']}: {download_result['error']}")
+        with DrivePrefetcher(drive_manager, books_info, temp_dir, sample=(import_mode == "copy")) as prefetcher:
+            for i, prefetched in enumerate(prefetcher):
+                book_info = prefetched.book_info
+                try:
+                    print(f"📖 Procesando libro {i + 1}/{len(books_info)}: {book_info['name']}")
+                    
+                    download_result = prefetched.result
+                    if not download_result["success"]:
+                        print(f"❌ Error al descargar {book_info['name']}: {download_result['error']}")
+                        results.append({
+                            "success": False,
+                            "file": book_info['name'],
+                            "error": f"Error al descargar: {download_result['error']}"
+                        })
+                        failed += 1
+                        continue
+                    
+                    file_path = download_result["file_path"]
+                    
+                    # Procesar el libro (modo nube)
+                    if import_mode == "copy":
+                        result = process_drive_book_copy(download_result, book_info, drive_manager, db)
+                    else:
+                        result = process_single_book_bulk_cloud_async(file_path, STATIC_COVERS_DIR, db)
+                    
+                    if result["success"]:
+                        successful += 1
+                        print(f"✅ {book_info['name']} procesado exitosamente")
+                    else:
+                        if "Duplicado detectado" in result.get("error", ""):
+                            duplicates += 1
+                            print(f"⚠️ {book_info['name']} es un duplicado")
+                        else:
+                            failed += 1
+                            print(f"❌ Error procesando {book_info['name']}: {result.get('error')}")
+                    
+                    results.append(result)
+                    
+                except Exception as e:
+                    print(f"❌ Error procesando {book_info['name']}: {e}")
                     results.append({
                         "success": False,
                         "file": book_info['name'],
-                        "error": f"Error al descargar: {download_result['error']}"
+                        "error": f"Error de procesamiento: {str(e)}"
                     })
                     failed += 1
-                    continue
-                
-                file_path = download_result["file_path"]
-                
-                # Procesar el libro (modo nube)
-                result = process_single_book_bulk_cloud_async(file_path, STATIC_COVERS_DIR, db)
-                
-                if result["success"]:
-                    successful += 1
-                    print(f"✅ {book_info['name']} procesado exitosamente")
-                else:
-                    if "Duplicado detectado" in result.get("error", ""):
-                        duplicates += 1
-                        print(f"⚠️ {book_info['name']} es un duplicado")
-                    else:
-                        failed += 1
-                        print(f"❌ Error procesando {book_info['name']}: {result.get('error')}")
-                
-                results.append(result)
-                
-                # Limpiar archivo temporal
-                try:
-                    os.remove(file_path)
-                except:
-                    pass
-                
-            except Exception as e:
-                print(f"❌ Error procesando {book_info['name']}: {e}")
-                results.append({
-                    "success": False,
-                    "file": book_info['name'],
-                    "error": f"Error de procesamiento: {str(e)}"
-                })
-                failed += 1
+                finally:
+                    # Libera el archivo temporal y su espacio para las siguientes descargas
+                    prefetcher.release(prefetched)
         
         # Resumen final
         print(f"🎉 Procesamiento completado: {successful} exitosos, {failed} fallidos, {duplicates} duplicados")
@@ -3979,11 +4485,84 @@ async def upload_drive_folder_books(
             except OSError:
                 pass  # Ignorar errores de limpieza
 
+# Máximo de archivos por verificación previa
+PREFLIGHT_MAX_FILES = int(os.getenv("PREFLIGHT_MAX_FILES", "20000"))
+_SHA256_HEX = re.compile(r"^[0-9a-f]{64}$")
+
+def preflight_folder_files(entries: List[schemas.PreflightFile], db: Session) -> dict:
+    """
+    Decide qué archivos de una carpeta hay que subir a partir de los hashes calculados
+    en el cliente: los que ya están en la biblioteca (o repetidos en la misma carga) no
+    se piden. Mismo criterio que bulk_quick_check, con una sola consulta IN (...).
+    """
+    hashes = {}
+    for index, entry in enumerate(entries):
+        content_hash = (entry.sha256 or "").strip().lower()
+        if _SHA256_HEX.match(content_hash):
+            hashes[index] = content_hash
+    existing_books = crud.get_books_by_content_hashes(db, list(hashes.values()))
+    
+    needed, duplicates, rejected = [], [], []
+    saved_bytes = 0
+    seen_in_batch = {}
+    for index, entry in enumerate(entries):
+        skipped = {"index": index, "name": entry.name}
+        if not entry.name.lower().endswith(('.pdf', '.epub')):
+            rejected.append({**skipped, "reason": "unsupported", "message": "Tipo de archivo no soportado"})
+            continue
+        if entry.size > MAX_UPLOAD_SIZE:
+            rejected.append({**skipped, "reason": "too_large", "message": f"Supera el tamaño máximo permitido ({MAX_UPLOAD_SIZE // (1024 * 1024)} MB)"})
+            continue
+        
+        content_hash = hashes.get(index)
+        existing_book = existing_books.get(content_hash) if content_hash else None
+        if existing_book:
+            duplicates.append({
+                **skipped,
+                "reason": "content_hash",
+                "message": f"Ya existe un libro con el mismo contenido: {entry.name}",
+                "existing_book": {
+                    "id": existing_book.id,
+                    "title": existing_book.title,
+                    "author": existing_book.author,
+                    "category": existing_book.category
+                }
+            })
+        elif content_hash and content_hash in seen_in_batch:
+            duplicates.append({
+                **skipped,
+                "reason": "content_hash_batch",
+                "message": f"Archivo repetido en la misma carga: {entry.name} (igual a {entries[seen_in_batch[content_hash]].name})"
+            })
+        else:
+            if content_hash:
+                seen_in_batch[content_hash] = index
+            needed.append(index)
+            continue
+        saved_bytes += max(entry.size, 0)
+    
+    return {"needed": needed, "duplicates": duplicates, "rejected": rejected, "saved_bytes": saved_bytes}
+
+@app.post("/api/upload-folder-cloud/preflight", response_model=schemas.PreflightResponse)
+def preflight_folder_upload(request: schemas.PreflightRequest, db: Session = Depends(get_db)):
+    """
+    Verificación previa de upload-folder-cloud: el cliente envía nombre, tamaño y SHA-256
+    de cada archivo y recibe los índices de los que el servidor necesita. Los duplicados
+    no se suben; la carga posterior vuelve a comprobar el hash de lo que sí se envía.
+    """
+    if len(request.files) > PREFLIGHT_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"Demasiados archivos en una verificación previa (máximo {PREFLIGHT_MAX_FILES})")
+    result = preflight_folder_files(request.files, db)
+    print(f"🛫 Verificación previa: {len(result['needed'])} de {len(request.files)} archivos necesarios, "
+          f"{len(result['duplicates'])} duplicados ({result['saved_bytes'] / (1024 * 1024):.1f} MB sin subir)")
+    return result
+
 @app.post("/api/upload-folder-cloud/", response_model=schemas.BulkUploadResponse)
-async def upload_folder_books_cloud(
+def upload_folder_books_cloud(
     files: List[UploadFile] = File(description="Archivos de la carpeta"),
     folder_name: str = Form(description="Nombre de la carpeta"),
     total_files: int = Form(description="Total de archivos"),
+    background: bool = Query(False, description="Responder 202 de inmediato y seguir el progreso por /api/import-jobs/{job_id}/events"),
     db: Session = Depends(get_db)
 ):
     """
@@ -4005,20 +4584,21 @@ async def upload_folder_books_cloud(
         )
     
     temp_dir = None
+    job_id = None
     try:
-        # Crear directorio temporal para los archivos
-        temp_dir = "temp_folder_upload"
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Guardar archivos temporalmente
+        # Guardar archivos temporalmente en una sola pasada (el hash se reutiliza en la verificación previa)
+        temp_dir = os.path.join("temp_folder_upload", str(uuid.uuid4()))
         saved_files = []
-        for file in files:
+        file_hashes = {}
+        for index, file in enumerate(files):
             if file.filename.lower().endswith(('.pdf', '.epub')):
-                file_path = os.path.join(temp_dir, file.filename)
-                with open(file_path, 'wb') as f:
-                    content = await file.read()
-                    f.write(content)
-                saved_files.append(file_path)
+                try:
+                    upload = stream_upload_to_disk(file.file, temp_dir, file.filename, prefix=str(index))
+                except UploadTooLargeError as e:
+                    print(f"⚠️ {file.filename}: {e}")
+                    continue
+                saved_files.append(upload.file_path)
+                file_hashes[upload.file_path] = upload.sha256
         
         if not saved_files:
             raise HTTPException(
@@ -4026,78 +4606,11 @@ async def upload_folder_books_cloud(
                 detail="No se encontraron archivos PDF o EPUB válidos en la carpeta."
             )
         
-        # VERIFICACIÓN PREVIA MASIVA DE DUPLICADOS
-        bulk_check_result = bulk_quick_check(saved_files, db)
-        unique_files = bulk_check_result["unique_files"]
-        duplicate_files = bulk_check_result["duplicate_files"]
-        stats = bulk_check_result["stats"]
-        
-        # Procesar solo archivos únicos concurrentemente
-        results = []
-        if unique_files:
-            # Reducir workers para evitar rate limiting de la API de IA
-            max_workers = min(2, len(unique_files))  # Máximo 2 workers concurrentes
-            
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # Crear tareas para cada libro único usando la función específica para carga masiva en modo nube
-                future_to_file = {
-                    executor.submit(process_single_book_bulk_cloud_async, file_path, STATIC_COVERS_DIR, db): file_path
-                    for file_path in unique_files
-                }
-                
-                # Recolectar resultados con delay entre procesamientos
-                for future in as_completed(future_to_file):
-                    result = future.result()
-                    results.append(result)
-                    
-                    # Pequeño delay entre procesamientos para evitar rate limiting
-                    time.sleep(0.5)
-        
-        # Agregar resultados de duplicados detectados en verificación previa
-        for duplicate in duplicate_files:
-            existing_book_dict = None
-            if duplicate.get("existing_book"):
-                existing_book = duplicate["existing_book"]
-                existing_book_dict = {
-                    "id": existing_book.id,
-                    "title": existing_book.title,
-                    "author": existing_book.author,
-                    "category": existing_book.category
-                }
-            
-            results.append({
-                "success": False,
-                "file": duplicate["file"],
-                "error": "Duplicado detectado (verificación previa)",
-                "duplicate_info": {
-                    "is_duplicate": True,
-                    "reason": duplicate.get("reason", "Archivo ya existe en la base de datos"),
-                    "existing_book": existing_book_dict,
-                    "message": duplicate.get("message", "Este archivo ya ha sido procesado anteriormente")
-                }
-            })
-        
-        # Resumen de resultados
-        successful = [r for r in results if r["success"]]
-        failed = [r for r in results if not r["success"] and r.get("error") != "Duplicado detectado (verificación previa)" and r.get("error") != "Duplicado detectado (verificación rápida)" and r.get("error") != "Duplicado detectado (verificación final)"]
-        duplicates = [r for r in results if not r["success"] and (r.get("error") == "Duplicado detectado (verificación previa)" or r.get("error") == "Duplicado detectado (verificación rápida)" or r.get("error") == "Duplicado detectado (verificación final)")]
-        
-        return {
-            "message": f"Procesamiento completado. {len(successful)} libros procesados exitosamente, {len(failed)} fallaron, {len(duplicates)} duplicados detectados.",
-            "total_files": len(saved_files),
-            "successful": len(successful),
-            "failed": len(failed),
-            "duplicates": len(duplicates),
-            "successful_books": successful,
-            "failed_files": failed,
-            "duplicate_files": duplicates,
-            "optimization_stats": {
-                "total_files": len(saved_files),
-                "unique_files": len(successful),
-                "duplicate_files": len(duplicates),
-                "saved_ai_calls": len(duplicates)
-            }
-        }
+        # Trabajo reanudable; los hashes calculados al guardar evitan releer los archivos
+        job_id = _create_bulk_import_job(
+            saved_files, "cloud", source=folder_name, work_dir=temp_dir, file_hashes=file_hashes
+        )
+        return _run_bulk_import(job_id, background)
         
     except HTTPException:
         raise
@@ -4105,8 +4618,8 @@ async def upload_folder_books_cloud(
         print(f"❌ Error durante la carga de carpeta en modo nube: {e}")
         raise HTTPException(status_code=500, detail=f"Error durante la carga de carpeta: {str(e)}")
     finally:
-        # Limpiar archivos temporales
-        if temp_dir and os.path.exists(temp_dir):
+        # Sin trabajo creado se limpia aquí; si no, el trabajo conserva los archivos hasta completarse
+        if job_id is None and temp_dir and os.path.exists(temp_dir):
             try:
                 shutil.rmtree(temp_dir)
             except OSError:
@@ -4121,14 +4634,19 @@ async def upload_book_for_rag(file: UploadFile = File(...), db: Session = Depend
     
     rag_book_id = str(uuid.uuid4())
     file_location = os.path.join(STATIC_TEMP_DIR, f"{rag_book_id}_{file.filename}")
+    existing_book = None
     
+    # El endpoint es async por el procesamiento RAG; el disco, el análisis y las consultas
+    # a la base de datos se ejecutan en el pool de hilos para no bloquear el bucle de eventos
     try:
-        # Guardar archivo temporal
-        with open(file_location, "wb") as f:
-            f.write(await file.read())
+        # Guardar archivo temporal por bloques, fuera del bucle de eventos
+        def _save_temp_file():
+            with open(file_location, "wb") as f:
+                shutil.copyfileobj(file.file, f, 1024 * 1024)
+        await run_in_threadpool(_save_temp_file)
         
         # Verificar si el libro ya existe en la biblioteca
-        existing_book = crud.get_book_by_filename(db, file.filename)
+        existing_book = await run_in_threadpool(crud.get_book_by_filename, db, file.filename)
         
         if existing_book:
             # El libro ya existe en la biblioteca
@@ -4152,7 +4670,7 @@ async def upload_book_for_rag(file: UploadFile = File(...), db: Session = Depend
                 
                 # Actualizar estado RAG en la base de datos
                 chunks_count = result.get("chunks_processed", 0)
-                crud.update_book_rag_status(db, existing_book.id, rag_book_id, chunks_count)
+                await run_in_threadpool(crud.update_book_rag_status, db, existing_book.id, rag_book_id, chunks_count)
                 
                 return {
                     "book_id": rag_book_id,
@@ -4170,7 +4688,8 @@ async def upload_book_for_rag(file: UploadFile = File(...), db: Session = Depend
                 raise HTTPException(status_code=500, detail="No se pudo analizar el contenido del libro")
             
             # Crear libro en la biblioteca
-            new_book = crud.create_local_book(
+            new_book = await run_in_threadpool(
+                crud.create_local_book,
                 db=db,
                 title=book_info["title"],
                 author=book_info["author"],
@@ -4185,7 +4704,7 @@ async def upload_book_for_rag(file: UploadFile = File(...), db: Session = Depend
             
             # Actualizar estado RAG en la base de datos
             chunks_count = result.get("chunks_processed", 0)
-            crud.update_book_rag_status(db, new_book.id, rag_book_id, chunks_count)
+            await run_in_threadpool(crud.update_book_rag_status, db, new_book.id, rag_book_id, chunks_count)
             
             return {
                 "book_id": rag_book_id,
@@ -4201,27 +4720,21 @@ async def upload_book_for_rag(file: UploadFile = File(...), db: Session = Depend
 
 async def analyze_book_content(file_path: str) -> dict:
     """Analiza el contenido de un archivo de libro para extraer título, autor y categoría."""
+    # Parseo y llamadas a Gemini son bloqueantes: se ejecutan en el pool de hilos
+    return await run_in_threadpool(_analyze_book_content_sync, file_path)
+
+def _analyze_book_content_sync(file_path: str) -> dict:
+    """Versión bloqueante de analyze_book_content"""
     try:
         # Extraer texto del archivo según su tipo
         file_extension = os.path.splitext(file_path)[1].lower()
         text = ""
         
-        if file_extension == '.pdf':
-            # Usar la función existente de procesamiento de PDF
-            doc = fitz.open(file_path)
-            max_pages = min(len(doc), 10)
-            for i in range(max_pages):
-                text += doc.load_page(i).get_text("text", sort=True)
-            doc.close()
-            
-        elif file_extension == '.epub':
-            # Usar la función existente de procesamiento de EPUB
-            book = epub.read_epub(file_path)
-            for item in book.get_items_of_type(ebooklib.ITEM_DOCUMENT):
-                soup = BeautifulSoup(item.get_content(), 'html.parser')
-                text += soup.get_text(separator=' ') + "\n"
-                if len(text) > 4500: 
-                    break
+        document = None
+        if file_extension in ('.pdf', '.epub'):
+            # Usar el análisis único del documento (memorizado, sin volver a parsear)
+            document = load_document(file_path)
+            text = document.text
         else:
             # Para otros tipos de archivo, intentar leer como texto
             try:
@@ -4238,31 +4751,11 @@ async def analyze_book_content(file_path: str) -> dict:
         if len(text.strip()) < 100:
             raise ValueError("No se pudo extraer suficiente texto del archivo para su análisis")
         
-        # Usar la función existente de análisis con Gemini
-        book_info = analyze_with_gemini(text)
+        # Metadatos embebidos fiables primero; si no, análisis con Gemini
+        book_info = resolve_book_metadata(document) if document is not None else analyze_with_gemini(text)
         
         # Agregar información de portada si está disponible
-        cover_image_url = None
-        try:
-            if file_extension == '.pdf':
-                # Buscar portada en PDF
-                doc = fitz.open(file_path)
-                if len(doc) > 0:
-                    page_images = doc.get_page_images(0)
-                    if page_images:
-                        # Aquí podrías guardar la imagen y obtener la URL
-                        # Por ahora, solo indicamos que se encontró una imagen
-                        cover_image_url = "portada_detectada"
-                doc.close()
-            elif file_extension == '.epub':
-                # Buscar portada en EPUB
-                book = epub.read_epub(file_path)
-                cover_items = list(book.get_items_of_type(ebooklib.ITEM_COVER))
-                if cover_items:
-                    cover_image_url = "portada_detectada"
-        except Exception as e:
-            print(f"⚠️ Error al buscar portada: {e}")
-            cover_image_url = None
+        cover_image_url = "portada_detectada" if document is not None and document.cover_bytes else None
         
         book_info["cover_image_url"] = cover_image_url
         return book_info
@@ -0,0 +1,207 @@
+"""
+Extracción de metadatos embebidos con puntuación de confianza
+Evalúa el título/autor de doc.metadata (PDF) o del OPF (EPUB: dc:title, dc:creator),
+los contrasta con el texto de las primeras páginas y busca ISBN válidos (con dígito
+de control). Si la confianza es alta no hace falta pedir título y autor a Gemini.
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from near_duplicates import normalize_text
+
+# Confianza mínima para usar título/autor embebidos sin consultar a la IA
+HIGH_CONFIDENCE_THRESHOLD = 0.75
+
+# Valores típicos de metadatos basura generados por editores y conversores
+_JUNK_TITLES = {
+    "untitled", "sin titulo", "unknown", "desconocido", "document", "documento",
+    "title", "titulo", "book", "libro", "ebook", "portada", "cover", "presentacion",
+    "microsoft word", "none", "null", "pdf"
+}
+_JUNK_AUTHORS = {
+    "admin", "administrator", "administrador", "user", "usuario", "owner", "unknown",
+    "desconocido", "author", "autor", "none", "null", "anonymous", "anonimo", "calibre",
+    "adobe", "microsoft", "windows user", "pc", "hp", "dell", "lenovo"
+}
+_JUNK_PATTERNS = [
+    re.compile(r"^microsoft (word|powerpoint|excel)\s*-", re.IGNORECASE),
+    re.compile(r"\.(pdf|docx?|rtf|odt|indd|qxd|tex|txt|epub|html?)\s*$", re.IGNORECASE),
+    re.compile(r"^[\W\d_]+$"),  # Solo números o símbolos
+    re.compile(r"^[a-z]:\\|^/|\\", re.IGNORECASE),  # Rutas de archivo
+]
+
+_ISBN_CANDIDATE = re.compile(r"(?:ISBN(?:-1[03])?:?\s*)?((?:97[89][\s-]?)?(?:\d[\s-]?){9}[\dXx])")
+_ISBN_LABELED = re.compile(r"ISBN(?:-1[03])?[:\s]*((?:97[89][\s-]?)?(?:\d[\s-]?){9}[\dXx])", re.IGNORECASE)
+
+@dataclass
+class EmbeddedMetadata:
+    """Metadatos embebidos evaluados"""
+    title: Optional[str] = None
+    author: Optional[str] = None
+    subject: Optional[str] = None
+    isbns: List[str] = field(default_factory=list)
+    confidence: float = 0.0
+    reasons: List[str] = field(default_factory=list)
+
+    @property
+    def is_trustworthy(self) -> bool:
+        return bool(self.title and self.author) and self.confidence >= HIGH_CONFIDENCE_THRESHOLD
+
+# --- ISBN ---
+
+def is_valid_isbn10(isbn: str) -> bool:
+    if not re.fullmatch(r"\d{9}[\dX]", isbn):
+        return False
+    total = sum((10 - i) * (10 if c == "X" else int(c)) for i, c in enumerate(isbn))
+    return total % 11 == 0
+
+def is_valid_isbn13(isbn: str) -> bool:
+    if not re.fullmatch(r"97[89]\d{10}", isbn):
+        return False
+    total = sum(int(c) * (1 if i % 2 == 0 else 3) for i, c in enumerate(isbn))
+    return total % 10 == 0
+
+def isbn10_to_isbn13(isbn10: str) -> str:
+    core = "978" + isbn10[:9]
+    check = (10 - sum(int(c) * (1 if i % 2 == 0 else 3) for i, c in enumerate(core)) % 10) % 10
+    return core + str(check)
+
+def normalize_isbn(value: Optional[str]) -> Optional[str]:
+    """Devuelve el ISBN-13 normalizado si el valor es un ISBN válido, o None"""
+    if not value:
+        return None
+    digits = re.sub(r"[^\dXx]", "", value).upper()
+    if len(digits) == 13 and is_valid_isbn13(digits):
+        return digits
+    if len(digits) == 10 and is_valid_isbn10(digits):
+        return isbn10_to_isbn13(digits)
+    return None
+
+def extract_isbns(text: Optional[str]) -> List[str]:
+    """ISBN válidos (normalizados a ISBN-13, sin repetir) encontrados en un texto"""
+    if not text:
+        return []
+    found = []
+    for match in _ISBN_CANDIDATE.finditer(text):
+        isbn = normalize_isbn(match.group(1))
+        if isbn and isbn not in found:
+            found.append(isbn)
+    return found
+
+def document_isbn(metadata: Optional[dict], text: Optional[str]) -> Optional[str]:
+    """
+    ISBN-13 que identifica el libro en el catálogo: dc:identifier del OPF, el primer ISBN
+    rotulado ("ISBN ...") de la muestra de texto o, en su defecto, un ISBN-13 sin rótulo.
+    Un número de 10 cifras sin rótulo no se usa: el dígito de control coincide por azar 1 de cada 11 veces.
+    """
+    identifier_isbn = normalize_isbn((metadata or {}).get("identifier"))
+    if identifier_isbn:
+        return identifier_isbn
+    if not text:
+        return None
+    for match in _ISBN_LABELED.finditer(text):
+        isbn = normalize_isbn(match.group(1))
+        if isbn:
+            return isbn
+    for match in _ISBN_CANDIDATE.finditer(text):
+        if len(re.sub(r"[^\dXx]", "", match.group(1))) == 13:
+            isbn = normalize_isbn(match.group(1))
+            if isbn:
+                return isbn
+    return None
+
+# --- Puntuación de título y autor ---
+
+def _clean(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    value = re.sub(r"\s+", " ", str(value)).strip().strip("\"'")
+    return value or None
+
+def _looks_like_junk(value: str, junk_values: set, file_path: Optional[str]) -> bool:
+    normalized = normalize_text(value)
+    if not normalized or normalized in junk_values:
+        return True
+    if any(pattern.search(value) for pattern in _JUNK_PATTERNS):
+        return True
+    if file_path:
+        # Un título igual al nombre técnico del archivo (p. ej. "scan_0042") no aporta nada
+        stem = normalize_text(os.path.splitext(os.path.basename(file_path))[0])
+        if normalized == stem and re.search(r"\d{3,}|[0-9a-f]{8,}", normalized):
+            return True
+    return False
+
+def _appears_in_text(value: str, text_normalized: str) -> bool:
+    """Comprueba si las palabras significativas del valor aparecen en el texto"""
+    words = [w for w in normalize_text(value).split() if len(w) > 2]
+    if not words or not text_normalized:
+        return False
+    hits = sum(1 for w in words if w in text_normalized)
+    return hits / len(words) >= 0.6
+
+def _split_subject(subject: Optional[str]) -> Optional[str]:
+    """Primer tema útil de dc:subject / Subject (p. ej. 'Fiction / Fantasy' → 'Fiction')"""
+    subject = _clean(subject)
+    if not subject:
+        return None
+    first = re.split(r"[;,/|>]", subject)[0].strip()
+    if not first or len(first) > 40 or len(first.split()) > 4:
+        return None
+    if _looks_like_junk(first, _JUNK_TITLES, None):
+        return None
+    return first
+
+def extract_embedded_metadata(file_type: str, metadata: dict, text: str = "", file_path: Optional[str] = None) -> EmbeddedMetadata:
+    """
+    Evalúa los metadatos embebidos de un documento y calcula su confianza (0-1).
+    file_type: "pdf" o "epub"; metadata: doc.metadata (PDF) o campos DC (EPUB).
+    """
+    metadata = metadata or {}
+    result = EmbeddedMetadata()
+    text_normalized = normalize_text((text or "")[:6000])
+
+    title = _clean(metadata.get("title"))
+    # En PDF "creator" es la aplicación que generó el archivo; en EPUB es dc:creator (el autor)
+    author = _clean(metadata.get("author") or (metadata.get("creator") if file_type == "epub" else None))
+    subject = metadata.get("subject") or metadata.get("keywords")
+
+    score = 0.0
+    if title and not _looks_like_junk(title, _JUNK_TITLES, file_path) and 2 <= len(title) <= 200:
+        result.title = title
+        score += 0.4
+        result.reasons.append("título embebido válido")
+        if _appears_in_text(title, text_normalized):
+            score += 0.15
+            result.reasons.append("título presente en el texto")
+
+    if author and not _looks_like_junk(author, _JUNK_AUTHORS, file_path) and 3 <= len(author) <= 120 and "@" not in author:
+        result.author = author
+        score += 0.25
+        result.reasons.append("autor embebido válido")
+        if _appears_in_text(author, text_normalized):
+            score += 0.1
+            result.reasons.append("autor presente en el texto")
+
+    # Los EPUB traen metadatos del OPF escritos por la editorial; los PDF suelen heredar basura del conversor
+    if file_type == "epub" and result.title and result.author:
+        score += 0.1
+        result.reasons.append("metadatos OPF")
+
+    isbns = []
+    identifier_isbn = normalize_isbn(metadata.get("identifier"))
+    if identifier_isbn:
+        isbns.append(identifier_isbn)
+    for isbn in extract_isbns(text):
+        if isbn not in isbns:
+            isbns.append(isbn)
+    result.isbns = isbns
+    if isbns:
+        score += 0.05
+        result.reasons.append("ISBN válido")
+
+    result.subject = _split_subject(subject)
+    result.confidence = round(min(score, 1.0), 2)
+    return result
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Script de migración para agregar el campo content_hash a la tabla books
+y calcular el hash SHA-256 de los libros locales existentes
+"""
+
+import sqlite3
+import os
+import hashlib
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path='../.env')
+load_dotenv(dotenv_path='.env')
+
+BOOKS_PATH = os.getenv("BOOKS_PATH", "books").strip()
+
+def _resolve_book_path(file_path: str):
+    """Resuelve la ruta del archivo igual que get_book_file_path en main.py"""
+    if not file_path:
+        return None
+    if os.path.isabs(file_path):
+        return file_path if os.path.exists(file_path) else None
+    absolute_path = os.path.join(BOOKS_PATH, file_path)
+    if os.path.exists(absolute_path):
+        return absolute_path
+    return file_path if os.path.exists(file_path) else None
+
+def _sha256(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def migrate_add_content_hash():
+    """Agrega content_hash (con índice único) y lo rellena para los libros con archivo local"""
+
+    # Ruta de la base de datos
+    db_path = "../library.db"
+
+    if not os.path.exists(db_path):
+        print("❌ Base de datos no encontrada. Se creará con el esquema actual al iniciar el backend.")
+        return
+
+    print("🔧 Iniciando migración para agregar campo content_hash...")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+
+        cursor.execute("PRAGMA table_info(books)")
+        columns = [column[1] for column in cursor.fetchall()]
+
+        if 'content_hash' not in columns:
+            print("📝 Agregando campo content_hash a la tabla books...")
+            cursor.execute("ALTER TABLE books ADD COLUMN content_hash VARCHAR")
+        else:
+            print("✅ Campo content_hash ya existe en la tabla books")
+
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_books_content_hash ON books (content_hash)")
+        conn.commit()
+
+        # Rellenar hashes de libros locales
+        cursor.execute("SELECT id, file_path FROM books WHERE content_hash IS NULL AND file_path IS NOT NULL")
+        rows = cursor.fetchall()
+        print(f"📊 {len(rows)} libros locales sin hash")
+
+        updated = 0
+        duplicates = 0
+        missing = 0
+        for book_id, file_path in rows:
+            path = _resolve_book_path(file_path)
+            if not path:
+                missing += 1
+                continue
+            content_hash = _sha256(path)
+            try:
+                cursor.execute("UPDATE books SET content_hash = ? WHERE id = ?", (content_hash, book_id))
+                updated += 1
+            except sqlite3.IntegrityError:
+                duplicates += 1
+                print(f"⚠️ Libro {book_id} tiene el mismo contenido que otro libro ya registrado: {file_path}")
+
+        conn.commit()
+        print(f"✅ Hashes calculados: {updated}")
+        print(f"⚠️ Duplicados por contenido (sin hash): {duplicates}")
+        print(f"❌ Archivos no encontrados: {missing}")
+
+    except Exception as e:
+        print(f"❌ Error durante la migración: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_add_content_hash()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, UniqueConstraint
 from sqlalchemy.sql import func
 from database import Base
 
@@ -21,6 +21,12 @@ class Book(Base):
     # Campo opcional para ruta local temporal (solo durante procesamiento)
     file_path = Column(String, nullable=True) # Ruta temporal local (opcional)
     
+    # Hash SHA-256 del contenido del archivo (detección de duplicados por índice único)
+    content_hash = Column(String, nullable=True, unique=True, index=True) # Hash SHA-256 del archivo original
+    
+    # ISBN-13 normalizado (no único: varios archivos pueden ser la misma edición)
+    isbn = Column(String, nullable=True, index=True)
+    
     # Campo para indicar si el libro está sincronizado con Google Drive
     synced_to_drive = Column(Boolean, default=False) # Indica si el libro está sincronizado con Drive
     
@@ -28,4 +34,84 @@ class Book(Base):
     rag_processed = Column(Boolean, default=False) # Indica si el libro ha sido procesado para RAG
     rag_book_id = Column(String, nullable=True) # ID único del libro en el sistema RAG (UUID)
     rag_chunks_count = Column(Integer, nullable=True) # Número de chunks generados para RAG
-    rag_processed_date = Column(DateTime(timezone=True), nullable=True) # Fecha de procesamiento RAG
\ No newline at end of file
+    rag_processed_date = Column(DateTime(timezone=True), nullable=True) # Fecha de procesamiento RAG
+
+class BookFingerprint(Base):
+    """Huella de casi-duplicados de un libro (MinHash de título/autor y SimHash del texto)"""
+    __tablename__ = "book_fingerprints"
+
+    book_id = Column(Integer, ForeignKey("books.id"), primary_key=True)
+    minhash = Column(String, nullable=False) # Firma MinHash codificada en hexadecimal
+    text_simhash = Column(String, nullable=True) # SimHash de las primeras páginas (opcional)
+
+class BookLshBucket(Base):
+    """Buckets LSH para encontrar candidatos a casi-duplicado por índice"""
+    __tablename__ = "book_lsh_buckets"
+
+    id = Column(Integer, primary_key=True)
+    bucket_key = Column(String, nullable=False, index=True) # Banda de la firma (mhN:...) o del SimHash (shN:...)
+    book_id = Column(Integer, ForeignKey("books.id"), nullable=False, index=True)
+
+class AIAnalysisCache(Base):
+    """Resultados de análisis de metadatos con IA, por huella del texto analizado"""
+    __tablename__ = "ai_analysis_cache"
+
+    cache_key = Column(String, primary_key=True) # SHA-256 de versión del prompt + muestra de texto
+    title = Column(String, nullable=True)
+    author = Column(String, nullable=True)
+    category = Column(String, nullable=True)
+    hits = Column(Integer, default=0) # Veces que se reutilizó el resultado
+    created_at = Column(DateTime, nullable=False, index=True) # Fecha (UTC) del análisis original
+    last_used_at = Column(DateTime, nullable=True) # Último uso (UTC)
+
+class ImportJob(Base):
+    """Trabajo de importación masiva (reanudable tras un reinicio)"""
+    __tablename__ = "import_jobs"
+
+    id = Column(String, primary_key=True) # UUID del trabajo
+    mode = Column(String, nullable=False) # "cloud" (Google Drive) o "local"
+    source = Column(String, nullable=True) # Origen: nombre del ZIP, carpeta, etc.
+    work_dir = Column(String, nullable=True) # Directorio temporal con los archivos del trabajo
+    move_to_library = Column(Boolean, default=False) # Modo local: mover los libros registrados a BOOKS_PATH
+    status = Column(String, nullable=False, index=True) # pending, running, completed, completed_with_errors, failed
+    total_items = Column(Integer, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False) # Fechas en UTC
+    updated_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class ImportJobItem(Base):
+    """Archivo de un trabajo de importación con su último punto de control"""
+    __tablename__ = "import_job_items"
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String, ForeignKey("import_jobs.id"), nullable=False, index=True)
+    file_path = Column(String, nullable=False)
+    display_name = Column(String, nullable=True) # Nombre que ve el usuario
+    content_hash = Column(String, nullable=True)
+    state = Column(String, nullable=False, default="pending") # pending, parsed, analyzed, uploaded, committed
+    outcome = Column(String, nullable=True, index=True) # None (sin terminar), success, duplicate, failed
+    title = Column(String, nullable=True) # Resultado del análisis (punto de control "analyzed")
+    author = Column(String, nullable=True)
+    category = Column(String, nullable=True)
+    cover_image_url = Column(String, nullable=True)
+    drive_info = Column(Text, nullable=True) # JSON con la información de Drive (punto de control "uploaded")
+    book_id = Column(Integer, nullable=True)
+    result = Column(Text, nullable=True) # JSON con el resultado final del archivo
+    error = Column(String, nullable=True)
+    attempts = Column(Integer, default=0)
+    updated_at = Column(DateTime, nullable=True)
+
+class FolderScanEntry(Base):
+    """Estado de un archivo en el último escaneo incremental de una carpeta local"""
+    __tablename__ = "folder_scan_entries"
+    __table_args__ = (UniqueConstraint("root", "path", name="uq_folder_scan_entries_root_path"),)
+
+    id = Column(Integer, primary_key=True)
+    root = Column(String, nullable=False, index=True) # Carpeta escaneada (ruta absoluta)
+    path = Column(String, nullable=False) # Ruta del archivo relativa a root
+    size = Column(Integer, nullable=False)
+    mtime = Column(Float, nullable=False) # Fecha de modificación (segundos desde epoch)
+    content_hash = Column(String, nullable=True) # SHA-256 del archivo
+    job_id = Column(String, nullable=True) # Trabajo de importación al que se envió
+    scanned_at = Column(DateTime, nullable=False) # Fecha (UTC) en que se registró este estado
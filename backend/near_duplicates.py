@@ -0,0 +1,164 @@
+"""
+Índice de casi-duplicados para libros
+Combina MinHash de shingles de título/autor normalizados con un SimHash del texto
+de las primeras páginas. Las firmas se reparten en buckets LSH para que la búsqueda
+de candidatos sea una consulta por índice en lugar de un ILIKE sobre toda la tabla.
+"""
+
+import hashlib
+import random
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Set, Tuple
+
+# Parámetros de MinHash / LSH
+MINHASH_PERMUTATIONS = 32  # Tamaño de la firma MinHash
+LSH_BANDS = 8  # 8 bandas de 4 filas: umbral efectivo ~0.6 de similitud de Jaccard
+SHINGLE_SIZE = 3  # Shingles de 3 caracteres
+
+# Parámetros de SimHash (texto de las primeras páginas)
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4  # 4 bandas de 16 bits: distancia <= 3 garantiza compartir al menos una banda
+SIMHASH_MIN_TOKENS = 30  # Textos más cortos no generan huella fiable
+
+# Umbrales de decisión
+NEAR_DUPLICATE_THRESHOLD = 0.6  # Similitud estimada de título/autor
+SIMHASH_MAX_DISTANCE = 3  # Distancia de Hamming máxima entre textos casi idénticos
+TEXT_MATCH_MIN_SIMILARITY = 0.3  # Similitud mínima de título/autor cuando el texto coincide
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Permutaciones deterministas: la misma firma en todos los procesos y reinicios
+_rng = random.Random(20240613)
+_PERMUTATIONS: List[Tuple[int, int]] = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+@dataclass
+class Fingerprint:
+    """Huella de un libro para detección de casi-duplicados"""
+    minhash: List[int] = field(default_factory=list)
+    simhash: Optional[int] = None
+    bucket_keys: List[str] = field(default_factory=list)
+
+def normalize_text(value: Optional[str]) -> str:
+    """Minúsculas, sin acentos ni signos de puntuación y con espacios simples"""
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKD", value)
+    value = "".join(c for c in value if not unicodedata.combining(c))
+    value = re.sub(r"[^\w]+", " ", value.lower())
+    return re.sub(r"\s+", " ", value).strip()
+
+def title_author_shingles(title: Optional[str], author: Optional[str]) -> Set[str]:
+    """Shingles de caracteres del título y el autor normalizados"""
+    shingles = set()
+    for prefix, value in (("t", title), ("a", author)):
+        normalized = normalize_text(value)
+        if not normalized:
+            continue
+        if len(normalized) <= SHINGLE_SIZE:
+            shingles.add(f"{prefix}:{normalized}")
+            continue
+        for i in range(len(normalized) - SHINGLE_SIZE + 1):
+            shingles.add(f"{prefix}:{normalized[i:i + SHINGLE_SIZE]}")
+    return shingles
+
+def _hash32(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest(), "little")
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+def minhash_signature(shingles: Iterable[str]) -> List[int]:
+    """Firma MinHash de un conjunto de shingles"""
+    hashes = [_hash32(s) for s in shingles]
+    if not hashes:
+        return []
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+def estimate_jaccard(signature_a: List[int], signature_b: List[int]) -> float:
+    """Similitud de Jaccard estimada a partir de dos firmas MinHash"""
+    if not signature_a or not signature_b or len(signature_a) != len(signature_b):
+        return 0.0
+    matches = sum(1 for a, b in zip(signature_a, signature_b) if a == b)
+    return matches / len(signature_a)
+
+def simhash(text: Optional[str]) -> Optional[int]:
+    """SimHash de 64 bits sobre trigramas de palabras del texto"""
+    tokens = normalize_text(text).split()
+    if len(tokens) < SIMHASH_MIN_TOKENS:
+        return None
+    weights = [0] * SIMHASH_BITS
+    for i in range(len(tokens) - 2):
+        h = _hash64(" ".join(tokens[i:i + 3]))
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    value = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            value |= 1 << bit
+    return value
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def lsh_bucket_keys(signature: List[int], text_simhash: Optional[int] = None) -> List[str]:
+    """Claves de bucket LSH: bandas de la firma MinHash y bandas de bits del SimHash"""
+    keys = []
+    if signature:
+        rows = len(signature) // LSH_BANDS
+        for band in range(LSH_BANDS):
+            chunk = ",".join(str(v) for v in signature[band * rows:(band + 1) * rows])
+            digest = hashlib.blake2b(chunk.encode("ascii"), digest_size=8).hexdigest()
+            keys.append(f"mh{band}:{digest}")
+    if text_simhash is not None:
+        width = SIMHASH_BITS // SIMHASH_BANDS
+        mask = (1 << width) - 1
+        for band in range(SIMHASH_BANDS):
+            keys.append(f"sh{band}:{(text_simhash >> (band * width)) & mask:04x}")
+    return keys
+
+def compute_fingerprint(title: Optional[str], author: Optional[str], text: Optional[str] = None) -> Fingerprint:
+    """Calcula la huella completa (firma, SimHash y claves LSH) de un libro"""
+    signature = minhash_signature(title_author_shingles(title, author))
+    text_simhash = simhash(text) if text else None
+    return Fingerprint(
+        minhash=signature,
+        simhash=text_simhash,
+        bucket_keys=lsh_bucket_keys(signature, text_simhash)
+    )
+
+def encode_signature(signature: List[int]) -> str:
+    return ",".join(format(v, "x") for v in signature)
+
+def decode_signature(value: Optional[str]) -> List[int]:
+    if not value:
+        return []
+    return [int(v, 16) for v in value.split(",")]
+
+def encode_simhash(value: Optional[int]) -> Optional[str]:
+    return format(value, "016x") if value is not None else None
+
+def decode_simhash(value: Optional[str]) -> Optional[int]:
+    return int(value, 16) if value else None
+
+def near_duplicate_score(fingerprint: Fingerprint, stored_minhash: List[int], stored_simhash: Optional[int]) -> float:
+    """
+    Puntuación de casi-duplicado frente a una huella almacenada (0 si no lo es).
+    Es duplicado si título/autor son muy similares, o si el texto es casi idéntico
+    y título/autor mantienen una similitud mínima.
+    """
+    similarity = estimate_jaccard(fingerprint.minhash, stored_minhash)
+    if similarity >= NEAR_DUPLICATE_THRESHOLD:
+        return similarity
+    if fingerprint.simhash is not None and stored_simhash is not None:
+        if hamming_distance(fingerprint.simhash, stored_simhash) <= SIMHASH_MAX_DISTANCE and similarity >= TEXT_MATCH_MIN_SIMILARITY:
+            return max(similarity, NEAR_DUPLICATE_THRESHOLD)
+    return 0.0
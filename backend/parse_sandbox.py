@@ -0,0 +1,296 @@
+"""
+Parseo aislado de documentos con límites de tiempo y memoria
+Cada documento se parsea en un proceso hijo supervisado. El supervisor vigila el tiempo de
+reloj y la memoria residente (RSS) del hijo mientras espera el resultado: si un PDF patológico
+deja colgado fitz.open/get_text o dispara el consumo de memoria, el proceso se mata, el
+documento se marca como fallido y el hueco se rellena con un proceso nuevo. Los procesos se
+reciclan tras un número fijo de documentos para contener las fugas de memoria de las
+librerías nativas.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Dict, Optional
+import logging
+
+try:
+    import resource  # Solo en sistemas POSIX
+except ImportError:
+    resource = None
+
+try:
+    import psutil  # Medición de memoria multiplataforma (Windows, macOS, Linux)
+except ImportError:
+    psutil = None
+
+from document_analysis import (
+    DocumentAnalysis,
+    extract_document,
+    UnsupportedDocumentError,
+    InsufficientTextError
+)
+from upload_stream import _parse_size
+
+logger = logging.getLogger(__name__)
+
+# Tiempo máximo de parseo de un documento (segundos de reloj)
+PARSE_TIMEOUT_SECONDS = float(os.getenv("PARSE_TIMEOUT_SECONDS", "120"))
+# Memoria residente máxima de un proceso de parseo ("1GB", "800MB"); 0 = sin límite
+PARSE_MAX_RSS = _parse_size(os.getenv("PARSE_MAX_RSS", ""), 1024 ** 3)
+# Límite duro de memoria virtual (setrlimit RLIMIT_AS) dentro del hijo; 0 = sin límite
+PARSE_MAX_VIRTUAL_MEMORY = _parse_size(os.getenv("PARSE_MAX_VIRTUAL_MEMORY", ""), 0)
+# Documentos que parsea un proceso antes de reemplazarlo
+PARSE_MAX_DOCS_PER_WORKER = int(os.getenv("PARSE_MAX_DOCS_PER_WORKER", "50"))
+# Frecuencia con la que el supervisor comprueba tiempo y memoria del hijo
+PARSE_POLL_INTERVAL = 0.1
+# Arranque de los procesos: "spawn" (o "forkserver") y nunca "fork", porque el servidor ya tiene
+# hilos en marcha (vigilantes, reanálisis, pool de SQLAlchemy) y un hijo creado con fork puede
+# heredar un lock tomado (logging, conexión a la base de datos) y quedarse bloqueado
+PARSE_START_METHOD = os.getenv("PARSE_START_METHOD", "spawn")
+
+class DocumentParseError(Exception):
+    """Error de parseo en un proceso hijo (siempre serializable entre procesos)"""
+    pass
+
+class ParseTimeoutError(DocumentParseError):
+    """El documento superó el tiempo máximo de parseo"""
+    pass
+
+class ParseMemoryError(DocumentParseError):
+    """El proceso de parseo superó el límite de memoria"""
+    pass
+
+class ParseWorkerCrashedError(DocumentParseError):
+    """El proceso de parseo terminó de forma inesperada (p. ej. un fallo de la librería nativa)"""
+    pass
+
+# Excepciones que el hijo devuelve por nombre y se vuelven a lanzar tal cual en el supervisor
+_EXPECTED_ERRORS = {
+    "UnsupportedDocumentError": UnsupportedDocumentError,
+    "InsufficientTextError": InsufficientTextError,
+}
+
+def _process_rss(pid: int) -> Optional[int]:
+    """Memoria residente del proceso en bytes (psutil o /proc; None si no se puede medir)"""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except (psutil.Error, OSError):
+            return None
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def _worker_main(conn, max_virtual_memory: int):
+    """Bucle del proceso hijo: recibe rutas por la tubería y devuelve el análisis o el error"""
+    if resource is not None and max_virtual_memory > 0:
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (max_virtual_memory, max_virtual_memory))
+        except (ValueError, OSError) as e:
+            logger.warning(f"No se pudo limitar la memoria del proceso de parseo: {e}")
+    while True:
+        try:
+            file_path = conn.recv()
+        except EOFError:
+            return
+        if file_path is None:
+            return
+        try:
+            conn.send(("ok", extract_document(file_path)))
+        except MemoryError:
+            # Tras agotar la memoria el proceso no es fiable: se informa y se sale
+            conn.send(("memory", "Memoria agotada durante el parseo"))
+            return
+        except Exception as e:
+            name = type(e).__name__
+            conn.send(("error", name, str(e) if name in _EXPECTED_ERRORS else f"{name}: {e}"))
+
+class _SandboxWorker:
+    """Proceso hijo de parseo y su extremo de la tubería"""
+
+    def __init__(self, context, max_virtual_memory: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, max_virtual_memory), daemon=True, name="parse-sandbox"
+        )
+        self.process.start()
+        child_conn.close()
+        self.documents = 0
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def retire(self):
+        """Cierre ordenado (el hijo termina su bucle)"""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        """Cierre forzoso de un hijo colgado o fuera de límites"""
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+class ParseSupervisor:
+    """
+    Pool de procesos de parseo supervisados. parse() bloquea hasta que hay un proceso libre,
+    y lanza ParseTimeoutError / ParseMemoryError / ParseWorkerCrashedError cuando el hijo
+    se sale de los límites (el hijo se reemplaza y el pool sigue funcionando).
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        timeout: float = PARSE_TIMEOUT_SECONDS,
+        max_rss: int = PARSE_MAX_RSS,
+        max_docs_per_worker: int = PARSE_MAX_DOCS_PER_WORKER,
+        max_virtual_memory: int = PARSE_MAX_VIRTUAL_MEMORY
+    ):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_rss = max_rss
+        self.max_docs_per_worker = max_docs_per_worker
+        self.max_virtual_memory = max_virtual_memory
+        # _worker_main está definido a nivel de módulo: el hijo lo importa desde parse_sandbox
+        self._context = multiprocessing.get_context(PARSE_START_METHOD)
+        # Huecos del pool: None = proceso todavía no creado (se arranca al usarlo)
+        self._idle: "queue.Queue[Optional[_SandboxWorker]]" = queue.Queue()
+        for _ in range(self.workers):
+            self._idle.put(None)
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        if self.max_rss > 0 and _process_rss(os.getpid()) is None:
+            logger.warning(
+                "⚠️ No se puede medir la memoria de los procesos de parseo (instala psutil): "
+                "el límite PARSE_MAX_RSS no se aplicará en este sistema"
+            )
+        self.stats = {
+            "parsed": 0,
+            "failed": 0,
+            "timeouts": 0,
+            "memory_kills": 0,
+            "crashes": 0,
+            "workers_started": 0,
+            "workers_recycled": 0,
+            "peak_rss": 0
+        }
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _start_worker(self) -> _SandboxWorker:
+        worker = _SandboxWorker(self._context, self.max_virtual_memory)
+        self._count("workers_started")
+        return worker
+
+    def _wait_result(self, worker: _SandboxWorker, file_path: str) -> tuple:
+        """Espera la respuesta del hijo vigilando el tiempo y la memoria; mata al hijo si se pasa"""
+        name = os.path.basename(file_path)
+        deadline = time.monotonic() + self.timeout if self.timeout > 0 else None
+        while True:
+            try:
+                if worker.conn.poll(PARSE_POLL_INTERVAL):
+                    return worker.conn.recv()
+            except (EOFError, OSError):
+                worker.kill()
+                self._count("crashes")
+                raise ParseWorkerCrashedError(
+                    f"El proceso de parseo terminó inesperadamente con {name} (código {worker.process.exitcode})"
+                )
+            if deadline is not None and time.monotonic() > deadline:
+                worker.kill()
+                self._count("timeouts")
+                raise ParseTimeoutError(f"El parseo de {name} superó {self.timeout:.0f}s")
+            rss = _process_rss(worker.pid)
+            if rss:
+                with self._stats_lock:
+                    self.stats["peak_rss"] = max(self.stats["peak_rss"], rss)
+                if self.max_rss > 0 and rss > self.max_rss:
+                    worker.kill()
+                    self._count("memory_kills")
+                    raise ParseMemoryError(
+                        f"El parseo de {name} superó el límite de memoria "
+                        f"({rss / (1024 * 1024):.0f} MB > {self.max_rss / (1024 * 1024):.0f} MB)"
+                    )
+
+    def parse(self, file_path: str) -> DocumentAnalysis:
+        """Parsea el documento en un proceso hijo supervisado"""
+        if self._closed:
+            raise DocumentParseError("El pool de parseo está cerrado")
+        worker = self._idle.get()
+        keep = False
+        try:
+            if worker is None or not worker.process.is_alive():
+                worker = self._start_worker()
+            worker.conn.send(file_path)
+            message = self._wait_result(worker, file_path)
+            worker.documents += 1
+
+            if message[0] == "ok":
+                self._count("parsed")
+                keep = True
+                return message[1]
+            if message[0] == "memory":
+                # El hijo sale por su cuenta tras un MemoryError
+                worker.kill()
+                self._count("memory_kills")
+                raise ParseMemoryError(f"{message[1]} ({os.path.basename(file_path)})")
+            keep = True
+            _, error_name, error_message = message
+            if error_name not in _EXPECTED_ERRORS:
+                self._count("failed")
+            raise _EXPECTED_ERRORS.get(error_name, DocumentParseError)(error_message)
+        except (ParseTimeoutError, ParseMemoryError, ParseWorkerCrashedError) as e:
+            self._count("failed")
+            logger.warning(f"⛔ {e}")
+            worker = None
+            raise
+        finally:
+            if keep and worker.documents >= self.max_docs_per_worker > 0:
+                # Reciclado: el proceso se reemplaza para liberar la memoria que haya acumulado
+                worker.retire()
+                self._count("workers_recycled")
+                worker = None
+            elif not keep and worker is not None:
+                worker.kill()
+                worker = None
+            if self._closed and worker is not None:
+                worker.retire()
+                worker = None
+            self._idle.put(worker)
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats.update({
+            "workers": self.workers,
+            "timeout_seconds": self.timeout,
+            "max_rss": self.max_rss,
+            "max_docs_per_worker": self.max_docs_per_worker
+        })
+        return stats
+
+    def close(self):
+        """Detiene los procesos libres; los que están parseando se cierran al terminar"""
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.retire()
@@ -3,9 +3,7 @@ import google.generativeai as genai
 from dotenv import load_dotenv
 import chromadb
 from pypdf import PdfReader
-import ebooklib
-from ebooklib import epub
-from bs4 import BeautifulSoup
+from epub_reader import read_epub_text
 import tiktoken
 import asyncio
 from rate_limiter import (
@@ -148,17 +146,11 @@ def extract_text_from_pdf(file_path: str) -> str:
 
 def extract_text_from_epub(file_path: str) -> str:
     """Extracts text from an EPUB file."""
-    text_content = []
     try:
-        book = ebooklib.epub.read_epub(file_path)
-        for item in book.get_items():
-            if item.get_type() == ebooklib.ITEM_DOCUMENT:
-                soup = BeautifulSoup(item.get_content(), 'html.parser')
-                text_content.append(soup.get_text())
+        return read_epub_text(file_path)
     except Exception as e:
         print(f"Error extracting text from EPUB {file_path}: {e}")
         return ""
-    return "\n".join(text_content)
 
 def chunk_text(text: str, max_tokens: int = None) -> list[str]:
     """Chunks text into smaller pieces based on token count with optimized settings."""
@@ -196,16 +188,17 @@ async def process_book_for_rag(file_path: str, book_id: str):
     """Extracts text, chunks it, generates embeddings, and stores in ChromaDB with optimized settings."""
     
     # Verificar si el libro ya existe en RAG
-    if check_book_exists(book_id):
+    if await asyncio.to_thread(check_book_exists, book_id):
         print(f"✅ Libro {book_id} ya existe en RAG. Saltando reprocesamiento.")
         return {"status": "already_exists", "message": "Libro ya procesado anteriormente"}
     
     print(f"🔄 Procesando libro {book_id} para RAG...")
     
+    # Extracción, chunking y embeddings son bloqueantes: se ejecutan en hilos para no frenar el bucle de eventos
     if file_path.lower().endswith(".pdf"):
-        text = extract_text_from_pdf(file_path)
+        text = await asyncio.to_thread(extract_text_from_pdf, file_path)
     elif file_path.lower().endswith(".epub"):
-        text = extract_text_from_epub(file_path)
+        text = await asyncio.to_thread(extract_text_from_epub, file_path)
     else:
         raise ValueError("Unsupported file type. Only PDF and EPUB are supported.")
 
@@ -213,7 +206,7 @@ async def process_book_for_rag(file_path: str, book_id: str):
         raise ValueError("Could not extract text from the book.")
 
     # Usar configuración optimizada para chunking
-    chunks = chunk_text(text, RAG_CONFIG["chunk_size"])
+    chunks = await asyncio.to_thread(chunk_text, text, RAG_CONFIG["chunk_size"])
     if not chunks:
         raise ValueError("Could not chunk text from the book.")
 
@@ -239,9 +232,10 @@ async def process_book_for_rag(file_path: str, book_id: str):
         for i, chunk in enumerate(batch_chunks):
             chunk_index = batch_start + i
             try:
-                embedding = get_embedding(chunk)
+                embedding = await asyncio.to_thread(get_embedding, chunk)
                 if embedding is not None:
-                    collection.add(
+                    await asyncio.to_thread(
+                        collection.add,
                         embeddings=[embedding],
                         documents=[chunk],
                         metadatas=[{"book_id": book_id, "chunk_index": chunk_index}],
@@ -273,7 +267,7 @@ async def process_book_for_rag(file_path: str, book_id: str):
     print(f"✅ Procesado {successful_chunks}/{total_chunks} chunks para libro ID: {book_id}")
     
     # Obtener estadísticas actualizadas
-    stats = get_rag_stats()
+    stats = await asyncio.to_thread(get_rag_stats)
     print(f"📊 Estadísticas RAG actualizadas: {stats}")
     
     return {
@@ -291,7 +285,7 @@ async def query_rag(query: str, book_id: str):
         
         # Generar embedding de la consulta con rate limiting
         try:
-            query_embedding = get_embedding(query)
+            query_embedding = await asyncio.to_thread(get_embedding, query)
             print(f"🔍 Embedding generado: {len(query_embedding) if query_embedding else 0} dimensiones")
             
             if query_embedding is None:
@@ -303,7 +297,8 @@ async def query_rag(query: str, book_id: str):
             return f"⚠️ El sistema está ocupado procesando otras consultas. Por favor, espera un momento e intenta de nuevo. ({e})"
 
         # Buscar chunks relevantes usando configuración optimizada
-        results = collection.query(
+        results = await asyncio.to_thread(
+            collection.query,
             query_embeddings=[query_embedding],
             n_results=CHROMA_CONFIG["max_results"],
             where={"book_id": book_id}
@@ -328,7 +323,7 @@ async def query_rag(query: str, book_id: str):
             response = model.generate_content(prompt)
             return response.text
 
-        return call_gemini_with_limit_sync(_generate_response)
+        return await asyncio.to_thread(call_gemini_with_limit_sync, _generate_response)
         
     except RateLimitExceeded as e:
         return f"⚠️ El sistema está ocupado procesando otras consultas. Por favor, espera un momento e intenta de nuevo. ({e})"
@@ -343,7 +338,7 @@ async def query_rag_global(query: str):
         
         # Generar embedding de la consulta con rate limiting
         try:
-            query_embedding = get_embedding(query)
+            query_embedding = await asyncio.to_thread(get_embedding, query)
             print(f"🔍 Embedding global generado: {len(query_embedding) if query_embedding else 0} dimensiones")
             
             if query_embedding is None:
@@ -355,7 +350,8 @@ async def query_rag_global(query: str):
             return f"⚠️ El sistema está ocupado procesando otras consultas. Por favor, espera un momento e intenta de nuevo. ({e})"
 
         # Buscar chunks relevantes en TODA la base de datos usando configuración optimizada
-        results = collection.query(
+        results = await asyncio.to_thread(
+            collection.query,
             query_embeddings=[query_embedding],
             n_results=CHROMA_CONFIG["max_results"] * 2,  # Más chunks para contexto global
             # Sin where clause = búsqueda en toda la colección
@@ -387,7 +383,7 @@ async def query_rag_global(query: str):
             response = model.generate_content(prompt)
             return response.text
 
-        response_text = call_gemini_with_limit_sync(_generate_response)
+        response_text = await asyncio.to_thread(call_gemini_with_limit_sync, _generate_response)
         
         # Agregar información sobre las fuentes
         if book_sources:
@@ -82,6 +82,7 @@ class RateLimiter:
         self.is_healthy = True
         self.last_error_time = 0
         self.error_count = 0
+        self.last_rate_limited_time = 0.0  # Último 429 / cuota agotada devuelto por la API
 
     def _cleanup_old_calls(self):
         """Limpia llamadas antiguas de las ventanas de tiempo"""
@@ -300,6 +301,7 @@ class RateLimiter:
                         error_msg = str(e).lower()
                         if any(keyword in error_msg for keyword in ["quota", "rate", "limit", "429", "too many"]):
                             self.stats.rate_limited_calls += 1
+                            self.last_rate_limited_time = time.time()
                             logger.warning(f"Rate limit from API ({self.provider.value}): {e}")
                             
                             if retry_count < self.config.max_retries:
@@ -335,6 +337,22 @@ class RateLimiter:
         else:
             raise Exception("Unknown error in call_with_limit_sync")
 
+    def spare_capacity(self, cooldown_seconds: float = 60.0) -> float:
+        """
+        Fracción de cuota libre ahora mismo (0-1): el mínimo entre lo que queda de la ventana
+        de un minuto, de la de una hora y de los huecos de concurrencia. Es 0 durante
+        cooldown_seconds tras un rate limit de la API. Las tareas de baja prioridad solo
+        llaman a la API cuando sobra cuota.
+        """
+        with self.lock:
+            if time.time() - self.last_rate_limited_time < cooldown_seconds:
+                return 0.0
+            self._cleanup_old_calls()
+            minute = 1 - len(self.call_times_minute) / max(1, self.config.max_calls_per_minute)
+            hour = 1 - len(self.call_times_hour) / max(1, self.config.max_calls_per_hour)
+            concurrency = self.thread_semaphore._value / max(1, self.config.max_concurrent_calls)
+            return max(0.0, min(minute, hour, concurrency))
+
     def get_stats(self) -> dict:
         """Obtiene estadísticas del rate limiter"""
         with self.lock:
@@ -364,7 +382,8 @@ class RateLimiter:
                 },
                 "health": {
                     "is_healthy": self.is_healthy,
-                    "error_count": self.error_count
+                    "error_count": self.error_count,
+                    "last_rate_limited_time": self.last_rate_limited_time
                 }
             }
 
@@ -430,6 +449,10 @@ def call_gemini_embeddings_with_limit_sync(func: Callable, *args, **kwargs):
     """Wrapper síncrono para llamadas a embeddings de Gemini con rate limiting"""
     return gemini_embeddings_limiter.call_with_limit_sync(func, *args, **kwargs)
 
+def get_gemini_spare_capacity() -> float:
+    """Cuota libre (0-1) del limitador de análisis con Gemini"""
+    return gemini_limiter.spare_capacity()
+
 def get_all_rate_limit_stats() -> dict:
     """Obtiene estadísticas de todos los rate limiters"""
     return {
@@ -0,0 +1,271 @@
+"""
+Reanálisis en segundo plano de libros con metadatos de relleno
+Cuando Gemini está limitado, el análisis devuelve valores de relleno ("Título no detectado",
+"Sistema ocupado", ...) que quedan guardados en la biblioteca. Este trabajo de baja prioridad
+busca esos libros, vuelve a analizarlos por lotes solo cuando el limitador de Gemini tiene
+cuota libre (para no competir con las subidas) y actualiza las filas en una transacción por lote.
+Los libros que vuelven a fallar se reintentan con espera exponencial.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+import crud
+import database
+from gemini_config import get_batch_analysis_config
+from rate_limiter import get_gemini_spare_capacity
+
+logger = logging.getLogger(__name__)
+
+# Valores de relleno que dejan analyze_with_gemini y las subidas cuando la IA falla
+PLACEHOLDER_TITLES = ["Título no detectado", "Sistema ocupado", "Error de análisis"]
+PLACEHOLDER_AUTHORS = ["Autor no detectado", "Sistema ocupado", "Error de análisis"]
+PLACEHOLDER_CATEGORIES = ["Error"]
+
+# Reanálisis automático al iniciar el servidor
+REANALYSIS_ENABLED = os.getenv("REANALYSIS_ENABLED", "true").lower() == "true"
+# Segundos entre pasadas
+REANALYSIS_INTERVAL = int(os.getenv("REANALYSIS_INTERVAL", "600"))
+# Libros por lote (una llamada a Gemini por lote)
+REANALYSIS_BATCH_SIZE = int(os.getenv("REANALYSIS_BATCH_SIZE", "0")) or get_batch_analysis_config()["batch_size"]
+# Cuota libre mínima del limitador (0-1) para lanzar un lote
+REANALYSIS_MIN_SPARE_CAPACITY = float(os.getenv("REANALYSIS_MIN_SPARE_CAPACITY", "0.5"))
+# Pausa entre lotes de una misma pasada
+REANALYSIS_BATCH_PAUSE = float(os.getenv("REANALYSIS_BATCH_PAUSE", "5"))
+# Reintentos por libro (con espera exponencial desde REANALYSIS_RETRY_DELAY segundos)
+REANALYSIS_MAX_ATTEMPTS = int(os.getenv("REANALYSIS_MAX_ATTEMPTS", "5"))
+REANALYSIS_RETRY_DELAY = int(os.getenv("REANALYSIS_RETRY_DELAY", "900"))
+
+@dataclass
+class BookSnapshot:
+    """Datos del libro necesarios fuera de la sesión de base de datos"""
+    id: int
+    title: str
+    author: str
+    category: str
+    file_path: Optional[str]
+    drive_file_id: Optional[str]
+
+    @classmethod
+    def from_book(cls, book) -> "BookSnapshot":
+        return cls(book.id, book.title, book.author, book.category, book.file_path, book.drive_file_id)
+
+def merge_analysis(book: BookSnapshot, analysis: Optional[dict]) -> Optional[dict]:
+    """
+    Campos a actualizar con el nuevo análisis, o None si el análisis volvió a fallar.
+    Solo se sustituyen los valores de relleno; un "Desconocido" de la IA no pisa un valor real.
+    El título también se sustituye cuando el autor es de relleno: las subidas guardan entonces
+    el nombre del archivo como título.
+    """
+    if not analysis or analysis.get("title") in PLACEHOLDER_TITLES or analysis.get("author") in PLACEHOLDER_AUTHORS:
+        return None
+    fields = {}
+    for key, placeholders in (("title", PLACEHOLDER_TITLES), ("author", PLACEHOLDER_AUTHORS), ("category", PLACEHOLDER_CATEGORIES)):
+        value = (analysis.get(key) or "").strip()
+        current = getattr(book, key)
+        if not value or value in placeholders or value == current:
+            continue
+        filename_title = key == "title" and book.author == "Autor no detectado" and value != "Desconocido"
+        if current not in placeholders and not filename_title:
+            continue
+        fields[key] = value
+    return fields
+
+class MetadataReanalyzer:
+    """Trabajo periódico que reanaliza los libros con metadatos de relleno"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._pass_lock = threading.Lock()
+        self._loader: Optional[Callable[[BookSnapshot], Any]] = None
+        self._analyzer: Optional[Callable[[Dict[int, Any]], Dict[int, dict]]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._attempts: Dict[int, Tuple[int, float]] = {}  # Libro -> (intentos fallidos, próximo intento)
+        self.interval = REANALYSIS_INTERVAL
+        self.last_pass_at: Optional[datetime] = None
+        self.last_pass: Optional[dict] = None
+        self.stats = {"passes": 0, "batches": 0, "updated": 0, "failed": 0, "skipped_busy": 0}
+
+    def configure(self, loader: Callable[[BookSnapshot], Any], analyzer: Callable[[Dict[int, Any]], Dict[int, dict]]):
+        """
+        loader(libro) devuelve el documento analizado (con .text) o None si el archivo no está
+        disponible; analyzer({id: documento}) devuelve {id: {"title", "author", "category"}}.
+        Ambos se definen en main.
+        """
+        self._loader = loader
+        self._analyzer = analyzer
+
+    # --- Ciclo de vida ---
+
+    def start(self, interval: int = REANALYSIS_INTERVAL):
+        with self.lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.interval = max(30, interval)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="metadata-reanalysis")
+            self._thread.start()
+        print(f"🔁 Reanálisis de metadatos en segundo plano activo (cada {self.interval}s)")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def trigger(self):
+        """Lanza una pasada ahora (sin esperar al intervalo)"""
+        with self.lock:
+            alive = self._thread is not None and self._thread.is_alive()
+        if alive:
+            self._wake.set()
+        else:
+            threading.Thread(target=self.run_pass, daemon=True, name="metadata-reanalysis-once").start()
+
+    def _loop(self):
+        # Primera pasada tras un intervalo: el arranque ya tiene bastante trabajo
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.run_pass()
+            except Exception as e:
+                logger.warning(f"Error en la pasada de reanálisis: {e}")
+
+    # --- Reanálisis ---
+
+    def _excluded_ids(self) -> List[int]:
+        now = time.time()
+        with self.lock:
+            return [
+                book_id for book_id, (attempts, next_try) in self._attempts.items()
+                if attempts >= REANALYSIS_MAX_ATTEMPTS or next_try > now
+            ]
+
+    def _record_failure(self, book_id: int):
+        with self.lock:
+            attempts = self._attempts.get(book_id, (0, 0.0))[0] + 1
+            self._attempts[book_id] = (attempts, time.time() + REANALYSIS_RETRY_DELAY * 2 ** (attempts - 1))
+            self.stats["failed"] += 1
+
+    def _next_batch(self) -> List[BookSnapshot]:
+        db = database.SessionLocal()
+        try:
+            books = crud.get_books_with_placeholder_metadata(
+                db, PLACEHOLDER_TITLES, PLACEHOLDER_AUTHORS, PLACEHOLDER_CATEGORIES,
+                exclude_ids=self._excluded_ids(), limit=REANALYSIS_BATCH_SIZE
+            )
+            return [BookSnapshot.from_book(book) for book in books]
+        finally:
+            db.close()
+
+    def _process_batch(self, books: List[BookSnapshot]) -> int:
+        documents = {}
+        for book in books:
+            try:
+                document = self._loader(book)
+            except Exception as e:
+                logger.warning(f"No se pudo leer el libro {book.id} para reanalizarlo: {e}")
+                document = None
+            if document is None:
+                self._record_failure(book.id)
+            else:
+                documents[book.id] = document
+        if not documents:
+            return 0
+
+        analyses = self._analyzer(documents)
+        updates, text_samples = [], {}
+        for book in books:
+            if book.id not in documents:
+                continue
+            fields = merge_analysis(book, analyses.get(book.id))
+            if not fields:
+                # Análisis fallido o sin nada que corregir: se reintenta más tarde
+                self._record_failure(book.id)
+                continue
+            with self.lock:
+                self._attempts.pop(book.id, None)
+            updates.append({"id": book.id, **fields})
+            text_samples[book.id] = documents[book.id].text
+
+        db = database.SessionLocal()
+        try:
+            updated = crud.update_books_metadata(db, updates, text_samples)
+        finally:
+            db.close()
+        with self.lock:
+            self.stats["batches"] += 1
+            self.stats["updated"] += updated
+        print(f"🔁 Reanálisis: {updated}/{len(books)} libros actualizados en el lote")
+        return updated
+
+    def run_pass(self) -> dict:
+        """Procesa lotes mientras haya libros pendientes y cuota libre en el limitador de Gemini"""
+        if self._loader is None or self._analyzer is None:
+            raise RuntimeError("El reanálisis no está configurado")
+        if not self._pass_lock.acquire(blocking=False):
+            return {"skipped": True, "reason": "Ya hay una pasada en curso"}
+        summary = {"batches": 0, "updated": 0, "stopped_by": None}
+        try:
+            while not self._stop.is_set():
+                spare = get_gemini_spare_capacity()
+                if spare < REANALYSIS_MIN_SPARE_CAPACITY:
+                    with self.lock:
+                        self.stats["skipped_busy"] += 1
+                    summary["stopped_by"] = f"cuota libre {spare:.0%}"
+                    break
+                books = self._next_batch()
+                if not books:
+                    summary["stopped_by"] = "sin libros pendientes"
+                    break
+                summary["updated"] += self._process_batch(books)
+                summary["batches"] += 1
+                self._stop.wait(REANALYSIS_BATCH_PAUSE)
+        finally:
+            with self.lock:
+                self.stats["passes"] += 1
+                self.last_pass_at = datetime.utcnow()
+                self.last_pass = summary
+            self._pass_lock.release()
+        return summary
+
+    def get_status(self) -> dict:
+        db = database.SessionLocal()
+        try:
+            pending = crud.count_books_with_placeholder_metadata(db, PLACEHOLDER_TITLES, PLACEHOLDER_AUTHORS, PLACEHOLDER_CATEGORIES)
+        finally:
+            db.close()
+        with self.lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "interval_seconds": self.interval,
+                "batch_size": REANALYSIS_BATCH_SIZE,
+                "min_spare_capacity": REANALYSIS_MIN_SPARE_CAPACITY,
+                "spare_capacity": round(get_gemini_spare_capacity(), 2),
+                "pending": pending,
+                "retrying": sum(1 for attempts, _ in self._attempts.values() if attempts < REANALYSIS_MAX_ATTEMPTS),
+                "given_up": sum(1 for attempts, _ in self._attempts.values() if attempts >= REANALYSIS_MAX_ATTEMPTS),
+                "last_pass_at": self.last_pass_at.isoformat() if self.last_pass_at else None,
+                "last_pass": self.last_pass,
+                **self.stats
+            }
+
+    def reset_attempts(self):
+        """Olvida los intentos fallidos: todos los libros vuelven a ser candidatos"""
+        with self.lock:
+            self._attempts.clear()
+
+# Instancia global del reanálisis de metadatos
+metadata_reanalyzer = MetadataReanalyzer()
+
+def get_metadata_reanalyzer() -> MetadataReanalyzer:
+    """Obtiene la instancia global del reanálisis de metadatos"""
+    return metadata_reanalyzer
@@ -18,6 +18,11 @@ class Book(BookBase):
     drive_letter_folder: Optional[str] = None
     drive_filename: Optional[str] = None
     
+    # Hash SHA-256 del contenido del archivo
+    content_hash: Optional[str] = None
+    # ISBN-13 detectado en el documento
+    isbn: Optional[str] = None
+    
     # Campos para RAG (Retrieval-Augmented Generation)
     rag_processed: Optional[bool] = False
     rag_book_id: Optional[str] = None
@@ -66,6 +71,37 @@ class BulkUploadResponse(BaseModel):
     failed_files: List[BulkUploadResult]
     duplicate_files: List[BulkUploadResult]
     optimization_stats: OptimizationStats
+    job_id: Optional[str] = None  # Trabajo de importación reanudable
+
+# Subida por partes reanudable
+class ChunkedUploadCreate(BaseModel):
+    filename: str
+    size: int
+    mode: str = "cloud"  # "local" (BOOKS_PATH) o "cloud" (Google Drive)
+    sha256: Optional[str] = None  # SHA-256 del archivo completo, se verifica al finalizar
+    chunk_size: Optional[int] = None
+
+# Verificación previa de carga de carpeta (hashes calculados en el navegador)
+class PreflightFile(BaseModel):
+    name: str
+    size: int
+    sha256: Optional[str] = None  # Sin hash el servidor siempre pide el archivo
+
+class PreflightRequest(BaseModel):
+    files: List[PreflightFile]
+
+class PreflightSkippedFile(BaseModel):
+    index: int
+    name: str
+    reason: str  # "content_hash", "content_hash_batch", "unsupported" o "too_large"
+    message: str
+    existing_book: Optional[dict] = None
+
+class PreflightResponse(BaseModel):
+    needed: List[int]  # Índices (en la lista enviada) de los archivos que hay que subir
+    duplicates: List[PreflightSkippedFile]
+    rejected: List[PreflightSkippedFile]
+    saved_bytes: int  # Bytes que no hace falta subir por ser duplicados
 
 # Esquemas de paginación
 class PaginationInfo(BaseModel):
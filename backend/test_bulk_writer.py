@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para verificar la escritura por lotes de libros
+(duplicados dentro del mismo lote y repetición fila por fila si la transacción falla)
+"""
+
+from sqlalchemy.exc import IntegrityError
+
+import crud
+import database
+import models
+from bulk_writer import PendingBook, get_bulk_write_stats, write_books
+from testing_database import temporary_database
+
+def _row(key, title, author, **fields) -> PendingBook:
+    return PendingBook(title=title, author=author, category="Novela", file_path=f"{key}.pdf", key=key, **fields)
+
+def test_duplicates_within_one_batch():
+    """Cada fila ve las anteriores del mismo lote: hash, ISBN y título/autor repetidos son duplicados"""
+    print("🧪 Probando duplicados dentro de un lote...")
+    with temporary_database():
+        crud._fingerprint_index_ready = False
+        db = database.SessionLocal()
+        try:
+            before = get_bulk_write_stats()
+            results = write_books(db, [
+                _row("a", "Rayuela", "Julio Cortázar", content_hash="h1", isbn="9788437604572"),
+                _row("b", "Rayuela (copia)", "Julio Cortázar", content_hash="h1"),
+                _row("c", "Rayuela, otra edición", "J. Cortázar", isbn="9788437604572"),
+                _row("d", "Rayuela", "Julio Cortázar"),
+                _row("e", "Ficciones", "Jorge Luis Borges", content_hash="h2"),
+            ])
+            after = get_bulk_write_stats()
+
+            assert [result.key for result in results] == ["a", "b", "c", "d", "e"]
+            assert [result.success for result in results] == [True, False, False, False, True]
+            assert [result.duplicate_info["reason"] for result in results[1:4]] == ["content_hash", "isbn", "title_author_exact"]
+            assert all(result.duplicate_info["existing_book"].id == results[0].book.id for result in results[1:4])
+            assert "Ya existe" in results[1].message
+
+            # Un solo commit para todo el lote, con huellas para el índice de casi-duplicados
+            assert after["commits"] - before["commits"] == 1
+            assert after["duplicates"] - before["duplicates"] == 3
+            assert db.query(models.Book).count() == 2
+            assert db.query(models.BookFingerprint).count() == 2
+        finally:
+            db.close()
+
+def test_failed_batch_falls_back_to_rows():
+    """Si el commit del lote falla, se repite fila por fila y no se pierde ningún libro"""
+    print("🧪 Probando repetición fila por fila...")
+    with temporary_database():
+        crud._fingerprint_index_ready = False
+        db = database.SessionLocal()
+        original_commit = db.commit
+        calls = []
+
+        def failing_once_commit():
+            calls.append(1)
+            if len(calls) == 1:
+                raise IntegrityError("INSERT INTO books", {}, Exception("UNIQUE constraint failed"))
+            original_commit()
+
+        try:
+            db.commit = failing_once_commit
+            before = get_bulk_write_stats()
+            results = write_books(db, [
+                _row("a", "Pedro Páramo", "Juan Rulfo"),
+                _row("b", "El llano en llamas", "Juan Rulfo"),
+                _row("c", "Pedro Páramo", "Juan Rulfo"),
+            ])
+            after = get_bulk_write_stats()
+
+            assert [result.success for result in results] == [True, True, False]
+            assert results[2].duplicate_info["reason"] == "title_author_exact"
+            assert after["fallbacks"] - before["fallbacks"] == 1
+            assert after["commits"] - before["commits"] == 3  # Una transacción por fila
+            assert db.query(models.Book).count() == 2
+        finally:
+            db.commit = original_commit
+            db.close()
+
+def test_empty_batch():
+    """Un lote vacío no abre transacción"""
+    print("🧪 Probando lote vacío...")
+    assert write_books(None, []) == []
+
+def main():
+    """Función principal de pruebas"""
+    print("🚀 INICIANDO PRUEBAS DE ESCRITURA POR LOTES")
+    print("=" * 60)
+    test_duplicates_within_one_batch()
+    test_failed_batch_falls_back_to_rows()
+    test_empty_batch()
+    print("\n✅ PRUEBAS COMPLETADAS")
+
+if __name__ == "__main__":
+    main()
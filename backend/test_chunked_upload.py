@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para verificar las subidas por partes reanudables
+(partes desordenadas o repetidas, sumas de control y partes dañadas al finalizar)
+"""
+
+import hashlib
+import os
+import random
+import shutil
+import tempfile
+
+from chunked_upload import (
+    ChunkChecksumError,
+    ChunkedUploadError,
+    ChunkedUploadManager,
+    IncompleteUploadError,
+    UploadSessionNotFoundError,
+    MIN_CHUNK_SIZE,
+)
+
+CHUNK = MIN_CHUNK_SIZE
+CONTENT = random.Random(0).randbytes(CHUNK * 5 // 2)  # Dos partes completas y media
+
+def _parts(data: bytes) -> list:
+    return [data[start:start + CHUNK] for start in range(0, len(data), CHUNK)]
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+class _TempDirs:
+    def __enter__(self):
+        self.base = tempfile.mkdtemp(prefix="chunked_test_")
+        self.sessions = os.path.join(self.base, "sesiones")
+        self.dest = os.path.join(self.base, "destino")
+        return self
+
+    def __exit__(self, *exc):
+        shutil.rmtree(self.base, ignore_errors=True)
+
+def test_out_of_order_and_repeated_parts():
+    """Las partes pueden llegar en cualquier orden o repetirse; el archivo final es el original"""
+    print("🧪 Probando partes desordenadas y repetidas...")
+    with _TempDirs() as dirs:
+        manager = ChunkedUploadManager(dirs.sessions)
+        session = manager.create_session("libro.pdf", len(CONTENT), "local", chunk_size=CHUNK, sha256=_sha256(CONTENT))
+        parts = _parts(CONTENT)
+        assert session.total_chunks == 3 and len(parts[-1]) == CHUNK // 2
+
+        manager.write_chunk(session.id, 2, parts[2], _sha256(parts[2]))
+        manager.write_chunk(session.id, 0, parts[0])
+        manager.write_chunk(session.id, 0, parts[0], _sha256(parts[0]))  # Reintento del cliente
+        state = manager.get_session(session.id).to_dict()
+        assert state["missing_chunks"] == [1] and not state["complete"]
+        assert state["received_bytes"] == len(parts[0]) + len(parts[2])
+
+        try:
+            manager.finalize(session.id, dirs.dest)
+        except IncompleteUploadError as e:
+            assert e.missing == [1]
+        else:
+            raise AssertionError("Se esperaba IncompleteUploadError")
+
+        # Un gestor nuevo (reinicio del servidor) continúa la misma sesión desde disco
+        manager = ChunkedUploadManager(dirs.sessions)
+        manager.write_chunk(session.id, 1, parts[1], _sha256(parts[1]))
+        upload = manager.finalize(session.id, dirs.dest, prefix="abc")
+
+        assert os.path.basename(upload.file_path) == "abc_libro.pdf"
+        assert upload.sha256 == _sha256(CONTENT) and upload.size == len(CONTENT)
+        with open(upload.file_path, "rb") as f:
+            assert f.read() == CONTENT
+        # La sesión desaparece al finalizar
+        assert not os.listdir(dirs.sessions)
+        try:
+            manager.get_session(session.id)
+        except UploadSessionNotFoundError:
+            pass
+        else:
+            raise AssertionError("Se esperaba UploadSessionNotFoundError")
+
+def test_invalid_parts_are_rejected():
+    """Suma de control, longitud o índice incorrectos no marcan la parte como recibida"""
+    print("🧪 Probando partes no válidas...")
+    with _TempDirs() as dirs:
+        manager = ChunkedUploadManager(dirs.sessions)
+        session = manager.create_session("libro.epub", len(CONTENT), "cloud", chunk_size=CHUNK)
+        parts = _parts(CONTENT)
+        for index, data, checksum, error in [
+            (0, parts[0], _sha256(parts[1]), ChunkChecksumError),
+            (0, parts[0][:-1], None, ChunkedUploadError),
+            (3, parts[2], None, ChunkedUploadError),
+        ]:
+            try:
+                manager.write_chunk(session.id, index, data, checksum)
+            except error:
+                pass
+            else:
+                raise AssertionError(f"Se esperaba {error.__name__}")
+        assert manager.get_session(session.id).missing_chunks() == [0, 1, 2]
+
+        for bad_session in [("libro.txt", 10, "local"), ("libro.pdf", 0, "local"), ("libro.pdf", 10, "ftp")]:
+            try:
+                manager.create_session(*bad_session)
+            except ChunkedUploadError:
+                pass
+            else:
+                raise AssertionError(f"Se esperaba ChunkedUploadError para {bad_session}")
+        try:
+            manager.get_session("../../etc")
+        except UploadSessionNotFoundError:
+            pass
+        else:
+            raise AssertionError("Se esperaba UploadSessionNotFoundError")
+
+def test_corrupt_part_is_requested_again():
+    """Una parte dañada en disco se detecta al finalizar y vuelve a quedar pendiente"""
+    print("🧪 Probando parte dañada al finalizar...")
+    with _TempDirs() as dirs:
+        manager = ChunkedUploadManager(dirs.sessions)
+        session = manager.create_session("libro.pdf", len(CONTENT), "local", chunk_size=CHUNK)
+        parts = _parts(CONTENT)
+        for index, data in enumerate(parts):
+            manager.write_chunk(session.id, index, data, _sha256(data))
+
+        with open(os.path.join(dirs.sessions, session.id, "data.part"), "r+b") as f:
+            f.seek(CHUNK + 10)
+            f.write(b"\xff\xff\xff")
+        try:
+            manager.finalize(session.id, dirs.dest)
+        except ChunkChecksumError:
+            pass
+        else:
+            raise AssertionError("Se esperaba ChunkChecksumError")
+        assert manager.get_session(session.id).missing_chunks() == [1]
+
+        manager.write_chunk(session.id, 1, parts[1], _sha256(parts[1]))
+        assert manager.finalize(session.id, dirs.dest).sha256 == _sha256(CONTENT)
+
+def test_declared_file_checksum_mismatch():
+    """Si el SHA-256 declarado del archivo no coincide, no se entrega el archivo"""
+    print("🧪 Probando SHA-256 del archivo completo...")
+    with _TempDirs() as dirs:
+        manager = ChunkedUploadManager(dirs.sessions)
+        session = manager.create_session("libro.pdf", len(CONTENT), "local", chunk_size=CHUNK, sha256="0" * 64)
+        for index, data in enumerate(_parts(CONTENT)):
+            manager.write_chunk(session.id, index, data)
+        try:
+            manager.finalize(session.id, dirs.dest)
+        except ChunkChecksumError:
+            pass
+        else:
+            raise AssertionError("Se esperaba ChunkChecksumError")
+        assert not os.path.exists(dirs.dest)
+        assert manager.abort(session.id) and not manager.abort(session.id)
+
+def main():
+    """Función principal de pruebas"""
+    print("🚀 INICIANDO PRUEBAS DE SUBIDAS POR PARTES")
+    print("=" * 60)
+    test_out_of_order_and_repeated_parts()
+    test_invalid_parts_are_rejected()
+    test_corrupt_part_is_requested_again()
+    test_declared_file_checksum_mismatch()
+    print("\n✅ PRUEBAS COMPLETADAS")
+
+if __name__ == "__main__":
+    main()
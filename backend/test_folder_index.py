@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para verificar el escaneo incremental de carpetas
+(archivos nuevos, modificados, sin cambios, diferidos y eliminados)
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+import crud
+import database
+from folder_index import get_folder_index, normalize_root
+from import_jobs import ImportJobManager, JobStatus
+from testing_database import temporary_database
+
+def _write(root: str, relative_path: str, data: bytes, age_seconds: float = 3600) -> str:
+    full_path = os.path.join(root, relative_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "wb") as f:
+        f.write(data)
+    mtime = time.time() - age_seconds
+    os.utime(full_path, (mtime, mtime))
+    return full_path
+
+def test_incremental_scan():
+    """Solo lo nuevo o modificado se devuelve (con hash); lo registrado sin cambios se cuenta"""
+    print("🧪 Probando escaneo incremental...")
+    folder = tempfile.mkdtemp(prefix="folder_test_")
+    try:
+        with temporary_database():
+            index = get_folder_index()
+            root = normalize_root(folder)
+            _write(root, "a.pdf", b"%PDF a")
+            _write(root, "novelas/b.epub", b"epub b")
+            _write(root, "notas.txt", b"no indexable")
+
+            first = index.scan(root)
+            assert sorted(state.path for state in first.changed) == ["a.pdf", "novelas/b.epub"]
+            assert all(state.content_hash for state in first.changed)
+            assert first.unchanged == 0 and first.removed == []
+
+            # Sin registrar, el siguiente escaneo vuelve a ver los mismos archivos
+            assert len(index.scan(root).changed) == 2
+            index.record(first, job_id="job-1")
+            assert index.scan(root).to_dict()["changed"] == 0
+
+            _write(root, "a.pdf", b"%PDF a modificado")
+            os.remove(os.path.join(root, "novelas", "b.epub"))
+            _write(root, "c.pdf", b"%PDF c")
+            _write(root, "copiando.pdf", b"%PDF a medias", age_seconds=0)
+
+            second = index.scan(root, min_age_seconds=60)
+            assert sorted(state.path for state in second.changed) == ["a.pdf", "c.pdf"]
+            assert second.removed == ["novelas/b.epub"]
+            assert second.deferred == 1 and second.unchanged == 0
+
+            index.record(second, job_id="job-2")
+            third = index.scan(root, min_age_seconds=60)
+            assert third.changed == [] and third.removed == []
+            assert third.unchanged == 2 and third.deferred == 1
+
+            assert index.forget(root) == 2
+            assert len(index.scan(root).changed) == 3
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+def test_failed_files_are_released():
+    """Al terminar el trabajo, los archivos que no se importaron vuelven a aparecer como cambiados"""
+    print("🧪 Probando liberación de archivos fallidos...")
+    folder = tempfile.mkdtemp(prefix="folder_test_")
+    try:
+        with temporary_database():
+            index = get_folder_index()
+            root = normalize_root(folder)
+            ok_path = _write(root, "ok.pdf", b"%PDF ok")
+            bad_path = _write(root, "mal.pdf", b"%PDF mal")
+            _write(root, "lote.zip", b"zip")
+
+            scan = index.scan(root)
+            manager = ImportJobManager()
+            job_id = manager.create_job("local", [
+                (ok_path, "ok.pdf", None),
+                (bad_path, "mal.pdf", None),
+                ("/tmp/trabajo/z1_libro.pdf", "lote.zip!/libro.pdf", None),
+            ], source=root)
+            index.record(scan, job_id)
+
+            db = database.SessionLocal()
+            try:
+                items = crud.get_import_job_items(db, job_id)
+            finally:
+                db.close()
+            manager.finish_item(items[0].id, {"success": True, "file": "ok.pdf"})
+            manager.finish_item(items[1].id, {"success": False, "file": "mal.pdf", "error": "Cuota agotada"})
+            manager.finish_item(items[2].id, {"success": False, "file": "lote.zip!/libro.pdf", "error": "PDF dañado"})
+
+            # Un trabajo pendiente se reanudará: todavía no se libera nada
+            index._release_failed_entries(job_id, JobStatus.PENDING.value)
+            assert index.scan(root).changed == []
+
+            index._release_failed_entries(job_id, JobStatus.COMPLETED_WITH_ERRORS.value)
+            assert sorted(state.path for state in index.scan(root).changed) == ["lote.zip", "mal.pdf"]
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+def main():
+    """Función principal de pruebas"""
+    print("🚀 INICIANDO PRUEBAS DEL ESCANEO INCREMENTAL DE CARPETAS")
+    print("=" * 60)
+    test_incremental_scan()
+    test_failed_files_are_released()
+    print("\n✅ PRUEBAS COMPLETADAS")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para verificar la reanudación de los trabajos de importación
+desde el último punto de control de cada archivo
+"""
+
+import crud
+import database
+from import_jobs import ImportJobManager, ItemOutcome, ItemState, JobStatus
+from testing_database import temporary_database
+
+FILES = [(f"/tmp/libro_{i}.pdf", f"libro_{i}.pdf", f"hash{i}") for i in range(3)]
+
+def _unfinished_items(job_id: str) -> list:
+    db = database.SessionLocal()
+    try:
+        return crud.get_import_job_items(db, job_id, unfinished_only=True)
+    finally:
+        db.close()
+
+class FakeStages:
+    """Simula el pipeline: análisis con IA y registro, con un corte opcional tras analizar un archivo"""
+
+    def __init__(self, manager: ImportJobManager, crash_after: str = None, fail: str = None):
+        self.manager = manager
+        self.crash_after = crash_after
+        self.fail = fail
+        self.analyzed = []
+        self.committed = []
+
+    def __call__(self, job_id: str):
+        for item in _unfinished_items(job_id):
+            title = item.title
+            if item.state == ItemState.PENDING.value:
+                self.analyzed.append(item.display_name)
+                title = item.display_name.replace(".pdf", "").title()
+                self.manager.checkpoint(item.id, ItemState.ANALYZED, title=title, author="Autor")
+            if item.display_name == self.crash_after:
+                return  # Corte (reinicio del servidor): el elemento queda sin resultado
+            if item.display_name == self.fail:
+                self.manager.finish_item(item.id, {"success": False, "file": item.display_name, "error": "Error de Drive"})
+                continue
+            self.committed.append((item.display_name, title))
+            self.manager.finish_item(item.id, {"success": True, "file": item.display_name, "book": {"id": item.id}})
+
+def test_interrupted_job_resumes_from_checkpoint():
+    """Tras un corte, el trabajo queda pendiente y al reanudarlo no repite el análisis ya guardado"""
+    print("🧪 Probando reanudación desde el punto de control...")
+    with temporary_database():
+        manager = ImportJobManager()
+        job_id = manager.create_job("local", FILES, source="prueba.zip")
+
+        first_run = FakeStages(manager, crash_after="libro_1.pdf")
+        manager.set_runner(first_run)
+        assert manager.start_job(job_id, wait=True)
+        job = manager.get_job(job_id)
+        assert job["status"] == JobStatus.PENDING.value
+        assert job["successful"] == 1 and job["pending"] == 2
+        assert first_run.analyzed == ["libro_0.pdf", "libro_1.pdf"]
+
+        second_run = FakeStages(manager)
+        manager.set_runner(second_run)
+        assert manager.resume_unfinished_jobs() == [job_id]
+        for thread in list(manager._running.values()):
+            thread.join(10)
+
+        # libro_1 ya estaba analizado: solo se analiza libro_2, y libro_1 conserva el título guardado
+        assert second_run.analyzed == ["libro_2.pdf"]
+        assert ("libro_1.pdf", "Libro_1") in second_run.committed
+        job = manager.get_job(job_id)
+        assert job["status"] == JobStatus.COMPLETED.value
+        assert job["successful"] == 3 and job["pending"] == 0 and job["finished_at"]
+        assert {item["state"] for item in manager.get_items(job_id)} == {ItemState.COMMITTED.value}
+
+def test_retry_failed_keeps_checkpoint():
+    """Reintentar solo vuelve a poner en cola los fallidos, sin repetir sus etapas ya hechas"""
+    print("🧪 Probando reintento de elementos fallidos...")
+    with temporary_database():
+        manager = ImportJobManager()
+        finished = []
+        manager.add_finished_listener(lambda job_id, status: finished.append(status))
+        job_id = manager.create_job("cloud", FILES)
+
+        manager.set_runner(FakeStages(manager, fail="libro_2.pdf"))
+        manager.start_job(job_id, wait=True)
+        job = manager.get_job(job_id)
+        assert job["status"] == JobStatus.COMPLETED_WITH_ERRORS.value and job["failed"] == 1
+        assert [result["file"] for result in manager.get_results(job_id) if not result["success"]] == ["libro_2.pdf"]
+
+        assert manager.retry_failed(job_id) == 1
+        assert manager.get_job(job_id)["status"] == JobStatus.PENDING.value
+        retry = FakeStages(manager)
+        manager.set_runner(retry)
+        manager.start_job(job_id, wait=True)
+
+        assert retry.analyzed == [] and [name for name, _ in retry.committed] == ["libro_2.pdf"]
+        items = manager.get_items(job_id)
+        assert all(item["outcome"] == ItemOutcome.SUCCESS.value for item in items)
+        assert [item["attempts"] for item in items] == [0, 0, 1]
+        assert finished == [JobStatus.COMPLETED_WITH_ERRORS.value, JobStatus.COMPLETED.value]
+
+def test_runner_error_marks_job_failed():
+    """Un error inesperado del procesamiento deja el trabajo como fallido con el mensaje"""
+    print("🧪 Probando trabajo fallido...")
+    with temporary_database():
+        manager = ImportJobManager()
+        job_id = manager.create_job("local", FILES[:1])
+
+        def broken_runner(job_id):
+            raise RuntimeError("disco lleno")
+        manager.set_runner(broken_runner)
+        manager.start_job(job_id, wait=True)
+        job = manager.get_job(job_id)
+        assert job["status"] == JobStatus.FAILED.value and job["error"] == "disco lleno"
+        assert not manager.is_running(job_id)
+
+def main():
+    """Función principal de pruebas"""
+    print("🚀 INICIANDO PRUEBAS DE TRABAJOS DE IMPORTACIÓN")
+    print("=" * 60)
+    test_interrupted_job_resumes_from_checkpoint()
+    test_retry_failed_keeps_checkpoint()
+    test_runner_error_marks_job_failed()
+    print("\n✅ PRUEBAS COMPLETADAS")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para verificar el pipeline de ingesta por etapas
+(propagación de la parada, errores, resultados anticipados y lotes)
+"""
+
+import threading
+import time
+
+from ingestion_pipeline import IngestionPipeline, PipelineStage
+
+def _run_with_timeout(pipeline: IngestionPipeline, items: list, timeout: float = 10.0) -> list:
+    """Ejecuta el pipeline en otro hilo: si la parada no se propaga, la prueba falla en lugar de colgarse"""
+    results = []
+    thread = threading.Thread(target=lambda: results.extend(pipeline.run(iter(items))), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "El pipeline no terminó: la parada no llegó a todas las etapas"
+    return results
+
+def _items(count: int) -> list:
+    return [{"file": f"libro_{i}.pdf", "n": i} for i in range(count)]
+
+def _store(context: dict):
+    context["result"] = {"success": True, "file": context["file"], "n": context["n"]}
+
+def test_all_items_reach_the_end():
+    """Con varios hilos por etapa, todos los elementos terminan y el pipeline se detiene"""
+    print("🧪 Probando recorrido completo con varias etapas concurrentes...")
+    visited = []
+    lock = threading.Lock()
+
+    def parse(context):
+        with lock:
+            visited.append(("parse", context["n"]))
+
+    pipeline = IngestionPipeline("test", [
+        PipelineStage("parse", parse, concurrency=3, queue_size=2),
+        PipelineStage("ai", lambda context: time.sleep(0.001), concurrency=2, queue_size=2),
+        PipelineStage("db", _store, concurrency=1, queue_size=2),
+    ])
+    results = _run_with_timeout(pipeline, _items(25))
+
+    assert sorted(result["n"] for result in results) == list(range(25))
+    assert len(visited) == 25
+    stats = pipeline.get_stats()
+    assert stats["status"] == "finished" and stats["completed_items"] == 25
+    assert all(stage["processed"] == 25 for stage in stats["stages"])
+
+def test_early_result_skips_later_stages():
+    """Un resultado asignado en una etapa (p. ej. duplicado) termina el elemento ahí"""
+    print("🧪 Probando terminación anticipada de elementos...")
+    reached_db = []
+
+    def check(context):
+        if context["n"] % 2:
+            context["result"] = {"success": False, "file": context["file"], "error": "Duplicado detectado"}
+
+    def db(context):
+        reached_db.append(context["n"])
+        _store(context)
+
+    pipeline = IngestionPipeline("test", [PipelineStage("check", check), PipelineStage("db", db)])
+    results = _run_with_timeout(pipeline, _items(10))
+
+    assert len(results) == 10
+    assert sorted(reached_db) == [0, 2, 4, 6, 8]
+    assert sum(1 for result in results if result.get("error") == "Duplicado detectado") == 5
+
+def test_stage_error_becomes_item_result():
+    """Una excepción en una etapa marca el elemento como fallido sin detener a los demás"""
+    print("🧪 Probando propagación de errores de etapa...")
+    def ai(context):
+        if context["n"] == 3:
+            raise RuntimeError("cuota agotada")
+
+    done = []
+    pipeline = IngestionPipeline(
+        "test",
+        [PipelineStage("ai", ai, concurrency=2), PipelineStage("db", _store)],
+        on_item_done=lambda context: done.append(context["n"])
+    )
+    results = _run_with_timeout(pipeline, _items(6))
+
+    failed = [result for result in results if not result["success"]]
+    assert len(results) == 6 and len(failed) == 1
+    assert failed[0]["file"] == "libro_3.pdf" and "Error en etapa ai: cuota agotada" in failed[0]["error"]
+    assert sorted(done) == list(range(6))
+    assert pipeline.get_stats()["stages"][0]["failed"] == 1
+
+def test_last_stage_without_result():
+    """Si ninguna etapa asigna resultado, el elemento termina como error (no se pierde)"""
+    print("🧪 Probando elementos sin resultado...")
+    pipeline = IngestionPipeline("test", [PipelineStage("noop", lambda context: None)])
+    results = _run_with_timeout(pipeline, _items(2))
+    assert [result["error"] for result in results] == ["El pipeline terminó sin resultado"] * 2
+
+def test_batched_stage():
+    """Una etapa con batch_size recibe listas de como máximo ese tamaño"""
+    print("🧪 Probando etapas por lotes...")
+    batches = []
+
+    def ai_batch(batch):
+        batches.append(len(batch))
+        for context in batch:
+            _store(context)
+
+    pipeline = IngestionPipeline("test", [
+        PipelineStage("parse", lambda context: None, queue_size=10),
+        PipelineStage("ai", ai_batch, queue_size=10, batch_size=4, batch_wait=0.2),
+    ])
+    results = _run_with_timeout(pipeline, _items(10))
+
+    assert len(results) == 10 and all(result["success"] for result in results)
+    assert sum(batches) == 10 and max(batches) <= 4
+    assert len(batches) < 10  # Se agruparon al menos algunos
+
+def test_batch_error_fails_whole_batch():
+    """Un error en una etapa por lotes marca solo los elementos sin resultado de ese lote"""
+    print("🧪 Probando errores en etapas por lotes...")
+    def ai_batch(batch):
+        batch[0]["result"] = {"success": True, "file": batch[0]["file"]}
+        raise RuntimeError("respuesta inválida")
+
+    pipeline = IngestionPipeline("test", [PipelineStage("ai", ai_batch, queue_size=10, batch_size=3, batch_wait=0.5)])
+    results = _run_with_timeout(pipeline, _items(3))
+    assert sum(1 for result in results if result["success"]) == 1
+    assert sum(1 for result in results if not result["success"]) == 2
+
+def test_requires_stages():
+    """Un pipeline sin etapas es un error de configuración"""
+    print("🧪 Probando validación de etapas...")
+    try:
+        IngestionPipeline("test", [])
+    except ValueError:
+        return
+    raise AssertionError("Se esperaba ValueError")
+
+def main():
+    """Función principal de pruebas"""
+    print("🚀 INICIANDO PRUEBAS DEL PIPELINE DE INGESTA")
+    print("=" * 60)
+    test_all_items_reach_the_end()
+    test_early_result_skips_later_stages()
+    test_stage_error_becomes_item_result()
+    test_last_stage_without_result()
+    test_batched_stage()
+    test_batch_error_fails_whole_batch()
+    test_requires_stages()
+    print("\n✅ PRUEBAS COMPLETADAS")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para verificar la evaluación de metadatos embebidos
+(confianza de título/autor de PDF y EPUB antes de consultar a la IA) y de los ISBN
+"""
+
+from metadata_extractor import (
+    document_isbn,
+    extract_embedded_metadata,
+    extract_isbns,
+    is_valid_isbn10,
+    is_valid_isbn13,
+    normalize_isbn,
+    HIGH_CONFIDENCE_THRESHOLD,
+)
+
+FIRST_PAGES = (
+    "Gabriel García Márquez. Cien años de soledad. Muchos años después, frente al pelotón "
+    "de fusilamiento, el coronel Aureliano Buendía había de recordar aquella tarde remota."
+)
+
+def test_epub_with_matching_text_is_trustworthy():
+    """Título y autor del OPF que aparecen en el texto: no hace falta preguntar a la IA"""
+    print("🧪 Probando metadatos OPF fiables...")
+    result = extract_embedded_metadata(
+        "epub",
+        {"title": "Cien años de soledad", "creator": "Gabriel García Márquez", "subject": "Fiction / Magical realism"},
+        FIRST_PAGES
+    )
+    assert result.title == "Cien años de soledad" and result.author == "Gabriel García Márquez"
+    assert result.is_trustworthy and result.confidence >= HIGH_CONFIDENCE_THRESHOLD
+    assert "metadatos OPF" in result.reasons
+    assert result.subject == "Fiction"
+
+def test_pdf_creator_is_not_the_author():
+    """En PDF, "creator" es la aplicación que generó el archivo"""
+    print("🧪 Probando que el creator de PDF no se use como autor...")
+    result = extract_embedded_metadata("pdf", {"title": "Cien años de soledad", "creator": "Microsoft Word"}, FIRST_PAGES)
+    assert result.title == "Cien años de soledad"
+    assert result.author is None
+    assert not result.is_trustworthy
+
+def test_junk_values_are_discarded():
+    """Metadatos basura de conversores y nombres técnicos de archivo no cuentan"""
+    print("🧪 Probando descarte de metadatos basura...")
+    cases = [
+        {"title": "Untitled", "author": "Administrator"},
+        {"title": "Microsoft Word - tesis_final.docx", "author": "user"},
+        {"title": "C:\\Users\\pc\\Desktop\\libro", "author": "HP"},
+        {"title": "0042-1234", "author": "pepe@example.com"},
+    ]
+    for metadata in cases:
+        result = extract_embedded_metadata("pdf", metadata, FIRST_PAGES)
+        assert result.title is None and result.author is None, metadata
+        assert result.confidence == 0.0
+
+    scan = extract_embedded_metadata("pdf", {"title": "scan_20230415"}, "", file_path="/libros/scan_20230415.pdf")
+    assert scan.title is None
+
+def test_pdf_without_text_evidence_is_not_trustworthy():
+    """Título y autor plausibles que no aparecen en el texto no superan el umbral en PDF"""
+    print("🧪 Probando PDF sin confirmación en el texto...")
+    result = extract_embedded_metadata("pdf", {"title": "Informe anual", "author": "Ana Pérez"}, "texto sin relación alguna")
+    assert result.title and result.author
+    assert result.confidence < HIGH_CONFIDENCE_THRESHOLD and not result.is_trustworthy
+
+    confirmed = extract_embedded_metadata("pdf", {"title": "Cien años de soledad", "author": "Gabriel García Márquez"}, FIRST_PAGES)
+    assert confirmed.is_trustworthy
+
+def test_missing_metadata():
+    """Sin metadatos no hay título, autor ni confianza"""
+    print("🧪 Probando documento sin metadatos...")
+    result = extract_embedded_metadata("pdf", None, "")
+    assert result.title is None and result.author is None and result.isbns == []
+    assert result.confidence == 0.0 and not result.is_trustworthy
+
+def test_isbn_check_digits():
+    """Solo se aceptan ISBN con dígito de control correcto"""
+    print("🧪 Probando dígitos de control de ISBN...")
+    assert is_valid_isbn10("0306406152") and is_valid_isbn10("080442957X")
+    assert not is_valid_isbn10("0306406153") and not is_valid_isbn10("030640615")
+    assert is_valid_isbn13("9780306406157") and is_valid_isbn13("9791090636071")
+    assert not is_valid_isbn13("9780306406158") and not is_valid_isbn13("1234567890128")
+
+def test_normalize_isbn():
+    """Guiones y espacios se ignoran; los ISBN-10 se convierten a ISBN-13"""
+    print("🧪 Probando normalización de ISBN...")
+    assert normalize_isbn("0-306-40615-2") == "9780306406157"
+    assert normalize_isbn("978 0 306 40615 7") == "9780306406157"
+    assert normalize_isbn("urn:isbn:080442957x") == "9780804429573"
+    assert normalize_isbn("9780306406158") is None
+    assert normalize_isbn("") is None and normalize_isbn(None) is None
+    assert extract_isbns("ISBN 0-306-40615-2 y también 978-0-306-40615-7") == ["9780306406157"]
+
+def test_document_isbn():
+    """dc:identifier primero, luego ISBN rotulados; un número de 10 cifras sin rótulo no cuenta"""
+    print("🧪 Probando ISBN del documento...")
+    assert document_isbn({"identifier": "urn:isbn:9780306406157"}, "ISBN 080442957X") == "9780306406157"
+    assert document_isbn({"identifier": "urn:uuid:1234"}, "ISBN: 080442957X") == "9780804429573"
+    assert document_isbn(None, "Página 0306406152 del catálogo") is None
+    assert document_isbn(None, "Ref. 978-0-306-40615-7") == "9780306406157"
+    assert document_isbn(None, "") is None
+
+    # El ISBN del documento también se incluye en los metadatos evaluados
+    result = extract_embedded_metadata("epub", {"title": "Rayuela", "identifier": "0-306-40615-2"}, "")
+    assert result.isbns == ["9780306406157"] and "ISBN válido" in result.reasons
+
+def main():
+    """Función principal de pruebas"""
+    print("🚀 INICIANDO PRUEBAS DE METADATOS EMBEBIDOS")
+    print("=" * 60)
+    test_epub_with_matching_text_is_trustworthy()
+    test_pdf_creator_is_not_the_author()
+    test_junk_values_are_discarded()
+    test_pdf_without_text_evidence_is_not_trustworthy()
+    test_missing_metadata()
+    test_isbn_check_digits()
+    test_normalize_isbn()
+    test_document_isbn()
+    print("\n✅ PRUEBAS COMPLETADAS")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para verificar el índice de casi-duplicados (MinHash / SimHash / LSH)
+y su uso en la verificación de duplicados de crud
+"""
+
+import time
+
+import crud
+import database
+import models
+from near_duplicates import (
+    compute_fingerprint,
+    decode_signature,
+    decode_simhash,
+    encode_signature,
+    encode_simhash,
+    estimate_jaccard,
+    hamming_distance,
+    minhash_signature,
+    near_duplicate_score,
+    normalize_text,
+    simhash,
+    title_author_shingles,
+    MINHASH_PERMUTATIONS,
+    NEAR_DUPLICATE_THRESHOLD,
+)
+from testing_database import temporary_database
+
+SAMPLE_TEXT = " ".join(
+    f"capitulo {i} la familia buendia vivio en macondo durante cien años de soledad y lluvia"
+    for i in range(20)
+)
+
+def test_normalize_text():
+    """Minúsculas, sin acentos ni puntuación"""
+    print("🧪 Probando normalización de texto...")
+    assert normalize_text("  Cien Años de  Soledad!! ") == "cien anos de soledad"
+    assert normalize_text("García-Márquez, Gabriel") == "garcia marquez gabriel"
+    assert normalize_text(None) == ""
+
+def test_minhash_is_deterministic():
+    """La misma entrada produce la misma firma (necesario para comparar entre reinicios)"""
+    print("🧪 Probando firmas MinHash deterministas...")
+    shingles = title_author_shingles("Cien años de soledad", "Gabriel García Márquez")
+    assert minhash_signature(shingles) == minhash_signature(set(shingles))
+    assert len(minhash_signature(shingles)) == MINHASH_PERMUTATIONS
+    assert minhash_signature([]) == []
+
+def test_similar_titles_are_near_duplicates():
+    """Variaciones de acentos y puntuación se detectan; libros distintos no"""
+    print("🧪 Probando detección de casi-duplicados por título y autor...")
+    original = compute_fingerprint("Cien años de soledad", "Gabriel García Márquez")
+    variant = compute_fingerprint("Cien Anos de Soledad.", "Gabriel Garcia Marquez")
+    other = compute_fingerprint("El nombre del viento", "Patrick Rothfuss")
+
+    assert estimate_jaccard(original.minhash, variant.minhash) == 1.0
+    assert estimate_jaccard(original.minhash, other.minhash) < NEAR_DUPLICATE_THRESHOLD
+    assert near_duplicate_score(variant, original.minhash, None) >= NEAR_DUPLICATE_THRESHOLD
+    assert near_duplicate_score(other, original.minhash, None) == 0.0
+
+def test_similar_books_share_lsh_buckets():
+    """Los casi-duplicados comparten al menos un bucket: la consulta por índice los encuentra"""
+    print("🧪 Probando buckets LSH...")
+    original = compute_fingerprint("Cien años de soledad", "Gabriel García Márquez")
+    variant = compute_fingerprint("Cien años de soledad (edición conmemorativa)", "Gabriel García Márquez")
+    other = compute_fingerprint("El nombre del viento", "Patrick Rothfuss")
+
+    assert set(original.bucket_keys) & set(variant.bucket_keys)
+    assert not set(original.bucket_keys) & set(other.bucket_keys)
+
+def test_simhash_matches_same_text():
+    """Texto casi idéntico con título distinto: duplicado si título/autor conservan algo en común"""
+    print("🧪 Probando SimHash del texto...")
+    assert simhash("muy corto") is None
+    edited = SAMPLE_TEXT.replace("capitulo 19", "capitulo diecinueve")
+    assert hamming_distance(simhash(SAMPLE_TEXT), simhash(edited)) <= 3
+
+    stored = compute_fingerprint("Cien años de soledad", "G. García Márquez", SAMPLE_TEXT)
+    renamed = compute_fingerprint("Cien años (scan)", "Garcia Marquez", edited)
+    assert estimate_jaccard(stored.minhash, renamed.minhash) < NEAR_DUPLICATE_THRESHOLD
+    assert near_duplicate_score(renamed, stored.minhash, stored.simhash) >= NEAR_DUPLICATE_THRESHOLD
+    # Los buckets del SimHash también permiten encontrarlo como candidato
+    assert {key for key in stored.bucket_keys if key.startswith("sh")} & set(renamed.bucket_keys)
+
+def test_encoding_round_trip():
+    """Las firmas se guardan como texto en book_fingerprints"""
+    print("🧪 Probando codificación de firmas...")
+    fingerprint = compute_fingerprint("Rayuela", "Julio Cortázar", SAMPLE_TEXT)
+    assert decode_signature(encode_signature(fingerprint.minhash)) == fingerprint.minhash
+    assert decode_simhash(encode_simhash(fingerprint.simhash)) == fingerprint.simhash
+    assert decode_signature(None) == [] and decode_simhash(None) is None
+
+def test_fuzzy_lookup_uses_index_after_backfill():
+    """Antes del relleno se usa ILIKE; después, los buckets LSH (que toleran acentos)"""
+    print("🧪 Probando búsqueda aproximada con el índice...")
+    with temporary_database():
+        crud._fingerprint_index_ready = False
+        db = database.SessionLocal()
+        try:
+            # Libro anterior al índice: sin huella
+            db.add(models.Book(title="Cien años de soledad", author="Gabriel García Márquez", category="Novela", file_path="cien.pdf"))
+            db.commit()
+            assert crud.get_book_by_title_author_fuzzy(db, "Cien Anos de Soledad", "Gabriel Garcia Marquez") is None
+
+            assert crud.backfill_fingerprint_index(db) == 1
+            assert crud.fingerprint_index_ready()
+            found = crud.get_book_by_title_author_fuzzy(db, "Cien Anos de Soledad", "Gabriel Garcia Marquez")
+            assert found is not None and found.file_path == "cien.pdf"
+            assert crud.get_book_by_title_author_fuzzy(db, "Rayuela", "Julio Cortázar") is None
+        finally:
+            db.close()
+            crud._fingerprint_index_ready = False
+
+def test_failed_indexing_is_retried_in_background():
+    """Si la huella de un libro nuevo falla, el índice deja de estar completo y el relleno lo recoge"""
+    print("🧪 Probando reintento de huellas fallidas...")
+    original_index = crud.index_book_fingerprint
+    original_delay = crud.FINGERPRINT_BACKFILL_RETRY_SECONDS
+    with temporary_database():
+        db = database.SessionLocal()
+        try:
+            crud._fingerprint_index_ready = False
+            crud.backfill_fingerprint_index(db)
+            assert crud.fingerprint_index_ready()
+
+            def failing_index(*args, **kwargs):
+                raise RuntimeError("database is locked")
+            crud.index_book_fingerprint = failing_index
+            crud.FINGERPRINT_BACKFILL_RETRY_SECONDS = 0
+            book = crud.create_local_book(db, "Rayuela", "Julio Cortázar", "Novela", None, "rayuela.pdf")
+            crud.index_book_fingerprint = original_index
+            assert book.id is not None
+
+            deadline = time.time() + 5
+            while not crud.fingerprint_index_ready() and time.time() < deadline:
+                time.sleep(0.05)
+            assert crud.fingerprint_index_ready()
+            assert db.query(models.BookFingerprint).filter(models.BookFingerprint.book_id == book.id).count() == 1
+        finally:
+            crud.index_book_fingerprint = original_index
+            crud.FINGERPRINT_BACKFILL_RETRY_SECONDS = original_delay
+            crud._fingerprint_index_ready = False
+            db.close()
+
+def main():
+    """Función principal de pruebas"""
+    print("🚀 INICIANDO PRUEBAS DEL ÍNDICE DE CASI-DUPLICADOS")
+    print("=" * 60)
+    test_normalize_text()
+    test_minhash_is_deterministic()
+    test_similar_titles_are_near_duplicates()
+    test_similar_books_share_lsh_buckets()
+    test_simhash_matches_same_text()
+    test_encoding_round_trip()
+    test_fuzzy_lookup_uses_index_after_backfill()
+    test_failed_indexing_is_retried_in_background()
+    print("\n✅ PRUEBAS COMPLETADAS")
+
+if __name__ == "__main__":
+    main()
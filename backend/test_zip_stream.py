@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para verificar la lectura de ZIPs miembro a miembro
+(ZIPs anidados, límite de profundidad y tamaño total de extracción)
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+
+import zip_stream
+from zip_stream import MEMBER_SEPARATOR, ZipExtractLimitError, extract_zip_books, iter_zip_books
+
+def _zip_bytes(members: dict) -> bytes:
+    """ZIP en memoria: {nombre: bytes}"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for name, data in members.items():
+            zip_file.writestr(name, data)
+    return buffer.getvalue()
+
+def _nested_zip(levels: int) -> bytes:
+    """ZIP con un libro por nivel y el siguiente nivel anidado dentro"""
+    data = _zip_bytes({f"nivel{levels}.pdf": f"%PDF nivel {levels}".encode()})
+    for level in range(levels - 1, -1, -1):
+        data = _zip_bytes({f"nivel{level}.pdf": f"%PDF nivel {level}".encode(), f"interno{level + 1}.zip": data})
+    return data
+
+def test_books_and_ignored_members():
+    """Solo se copian los .pdf/.epub; carpetas, __MACOSX y ocultos se ignoran"""
+    print("🧪 Probando selección de miembros del ZIP...")
+    dest_dir = tempfile.mkdtemp(prefix="zip_test_")
+    try:
+        source = io.BytesIO(_zip_bytes({
+            "novelas/rayuela.EPUB": b"epub",
+            "novelas/notas.txt": b"texto",
+            "__MACOSX/novelas/._rayuela.epub": b"basura",
+            "novelas/.oculto.pdf": b"oculto",
+            "../../fuera.pdf": b"%PDF zip-slip",
+        }))
+        books = extract_zip_books(source, dest_dir, "libros.zip" + MEMBER_SEPARATOR)
+
+        assert sorted(book.member_path for book in books) == [
+            "libros.zip!/../../fuera.pdf", "libros.zip!/novelas/rayuela.EPUB"
+        ]
+        for book in books:
+            # Los nombres de las entradas nunca se usan como rutas
+            assert os.path.dirname(os.path.abspath(book.file_path)) == os.path.abspath(dest_dir)
+        slip = next(book for book in books if book.member_path.endswith("fuera.pdf"))
+        assert slip.size == len(b"%PDF zip-slip")
+        assert slip.sha256 == hashlib.sha256(b"%PDF zip-slip").hexdigest()
+    finally:
+        shutil.rmtree(dest_dir, ignore_errors=True)
+
+def test_nested_zips_are_walked_and_removed():
+    """Los ZIPs anidados se recorren y su copia temporal se elimina al terminar"""
+    print("🧪 Probando ZIPs anidados...")
+    dest_dir = tempfile.mkdtemp(prefix="zip_test_")
+    try:
+        books = list(iter_zip_books(io.BytesIO(_nested_zip(2)), dest_dir, max_depth=3))
+        assert [book.member_path for book in books] == [
+            "nivel0.pdf",
+            "interno1.zip!/nivel1.pdf",
+            "interno1.zip!/interno2.zip!/nivel2.pdf",
+        ]
+        assert sorted(os.listdir(dest_dir)) == sorted(os.path.basename(book.file_path) for book in books)
+    finally:
+        shutil.rmtree(dest_dir, ignore_errors=True)
+
+def test_depth_limit():
+    """Los ZIPs más profundos que max_depth se omiten sin cortar el resto"""
+    print("🧪 Probando límite de profundidad...")
+    dest_dir = tempfile.mkdtemp(prefix="zip_test_")
+    try:
+        books = list(iter_zip_books(io.BytesIO(_nested_zip(3)), dest_dir, max_depth=1))
+        assert [book.member_path for book in books] == ["nivel0.pdf", "interno1.zip!/nivel1.pdf"]
+
+        flat = list(iter_zip_books(io.BytesIO(_nested_zip(1)), dest_dir, max_depth=0))
+        assert [book.member_path for book in flat] == ["nivel0.pdf"]
+    finally:
+        shutil.rmtree(dest_dir, ignore_errors=True)
+
+def test_extract_budget():
+    """El total de bytes extraídos (también dentro de ZIPs anidados) está limitado"""
+    print("🧪 Probando límite de tamaño total de extracción...")
+    original_limit = zip_stream.MAX_ZIP_EXTRACT_SIZE
+    dest_dir = tempfile.mkdtemp(prefix="zip_test_")
+    try:
+        nested = _zip_bytes({"a.pdf": b"x" * 600})
+        source = _zip_bytes({"b.pdf": b"y" * 600, "interno.zip": nested})
+
+        zip_stream.MAX_ZIP_EXTRACT_SIZE = 2000
+        assert len(list(iter_zip_books(io.BytesIO(source), dest_dir))) == 2
+
+        zip_stream.MAX_ZIP_EXTRACT_SIZE = 1000
+        try:
+            list(iter_zip_books(io.BytesIO(source), dest_dir))
+        except ZipExtractLimitError:
+            pass
+        else:
+            raise AssertionError("Se esperaba ZipExtractLimitError")
+    finally:
+        zip_stream.MAX_ZIP_EXTRACT_SIZE = original_limit
+        shutil.rmtree(dest_dir, ignore_errors=True)
+
+def test_corrupt_nested_zip_is_skipped():
+    """Un ZIP anidado dañado se omite y el resto del ZIP sigue procesándose"""
+    print("🧪 Probando ZIP anidado dañado...")
+    dest_dir = tempfile.mkdtemp(prefix="zip_test_")
+    try:
+        source = _zip_bytes({"roto.zip": b"no es un zip", "bueno.pdf": b"%PDF"})
+        books = list(iter_zip_books(io.BytesIO(source), dest_dir))
+        assert [book.member_path for book in books] == ["bueno.pdf"]
+        assert len(os.listdir(dest_dir)) == 1
+    finally:
+        shutil.rmtree(dest_dir, ignore_errors=True)
+
+def main():
+    """Función principal de pruebas"""
+    print("🚀 INICIANDO PRUEBAS DE LECTURA DE ZIPS")
+    print("=" * 60)
+    test_books_and_ignored_members()
+    test_nested_zips_are_walked_and_removed()
+    test_depth_limit()
+    test_extract_budget()
+    test_corrupt_nested_zip_is_skipped()
+    print("\n✅ PRUEBAS COMPLETADAS")
+
+if __name__ == "__main__":
+    main()
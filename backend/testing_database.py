@@ -0,0 +1,31 @@
+"""
+Base de datos SQLite temporal para los scripts de prueba
+database.SessionLocal apunta a ../library.db: las pruebas lo reasignan a un archivo temporal
+para no tocar la biblioteca real, y lo restauran al terminar.
+"""
+
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine
+
+import database
+import models
+
+@contextmanager
+def temporary_database():
+    """Crea las tablas en una base de datos temporal y enlaza SessionLocal con ella"""
+    temp_dir = tempfile.mkdtemp(prefix="biblioteca_test_")
+    engine = create_engine(
+        f"sqlite:///{os.path.join(temp_dir, 'test.db')}", connect_args={"check_same_thread": False}
+    )
+    models.Base.metadata.create_all(bind=engine)
+    database.SessionLocal.configure(bind=engine)
+    try:
+        yield engine
+    finally:
+        database.SessionLocal.configure(bind=database.engine)
+        engine.dispose()
+        shutil.rmtree(temp_dir, ignore_errors=True)
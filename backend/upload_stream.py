@@ -0,0 +1,122 @@
+"""
+Recepción de archivos subidos en una sola pasada
+Lee el archivo por bloques, calcula el hash SHA-256, valida el tamaño máximo
+y escribe directamente en la ubicación definitiva, sin copias intermedias
+"""
+
+import hashlib
+import os
+import re
+import uuid
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de bloque para lectura/escritura (1 MB)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def _parse_size(value: str, default: int) -> int:
+    """Convierte valores como '100MB', '2GB' o '1048576' a bytes"""
+    if not value:
+        return default
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)?\s*$', value.strip(), re.IGNORECASE)
+    if not match:
+        logger.warning(f"Valor de tamaño no válido: {value}, usando {default} bytes")
+        return default
+    number = float(match.group(1))
+    unit = (match.group(2) or '').upper().rstrip('B')
+    multiplier = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}[unit]
+    return int(number * multiplier)
+
+# Tamaño máximo permitido por archivo (configurable con MAX_FILE_SIZE en .env)
+MAX_UPLOAD_SIZE = _parse_size(os.getenv("MAX_FILE_SIZE", ""), 500 * 1024 * 1024)
+
+class UploadTooLargeError(Exception):
+    """El archivo subido supera el tamaño máximo permitido"""
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"El archivo supera el tamaño máximo permitido ({max_size // (1024 * 1024)} MB)")
+
+@dataclass
+class StreamedUpload:
+    """Resultado de guardar un archivo subido en una sola pasada"""
+    file_path: str
+    original_filename: str
+    size: int
+    sha256: str
+
+def safe_upload_filename(filename: str) -> str:
+    """Obtiene un nombre de archivo seguro (sin rutas) a partir del nombre enviado por el cliente"""
+    name = os.path.basename((filename or '').replace('\\', '/'))
+    return name or f"archivo_{uuid.uuid4().hex}"
+
+def stream_upload_to_disk(
+    source: BinaryIO,
+    dest_dir: str,
+    filename: str,
+    prefix: Optional[str] = None,
+    max_size: int = MAX_UPLOAD_SIZE
+) -> StreamedUpload:
+    """
+    Copia el contenido de 'source' a 'dest_dir' en una sola pasada.
+    Mientras escribe calcula el SHA-256 y controla el tamaño máximo.
+    El archivo se escribe como '.part' y se renombra al terminar (operación atómica
+    dentro del mismo directorio), por lo que nunca queda un archivo a medias con el nombre final.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    original_filename = safe_upload_filename(filename)
+    final_name = f"{prefix or uuid.uuid4()}_{original_filename}"
+    final_path = os.path.join(dest_dir, final_name)
+    partial_path = final_path + ".part"
+
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(partial_path, "wb") as buffer:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size and size > max_size:
+                    raise UploadTooLargeError(max_size)
+                hasher.update(chunk)
+                buffer.write(chunk)
+        os.replace(partial_path, final_path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            try:
+                os.remove(partial_path)
+            except OSError:
+                pass
+        raise
+
+    print(f"💾 Archivo recibido en una pasada: {final_path} ({size} bytes, sha256 {hasher.hexdigest()[:12]}...)")
+    return StreamedUpload(
+        file_path=final_path,
+        original_filename=original_filename,
+        size=size,
+        sha256=hasher.hexdigest()
+    )
+
+def discard_upload(file_path: Optional[str]) -> None:
+    """Elimina un archivo recibido que no llegó a registrarse (duplicado o error)"""
+    if file_path and os.path.exists(file_path):
+        try:
+            os.remove(file_path)
+            print(f"🗑️ Archivo descartado: {file_path}")
+        except OSError as e:
+            logger.warning(f"No se pudo eliminar {file_path}: {e}")
+
+def compute_file_sha256(file_path: str) -> str:
+    """Calcula el SHA-256 de un archivo ya guardado, leyendo por bloques"""
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
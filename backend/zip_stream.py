@@ -0,0 +1,130 @@
+"""
+Lectura de ZIPs miembro a miembro para la carga masiva
+En lugar de extractall + rglob, recorre el índice del ZIP y copia por bloques solo las
+entradas .pdf/.epub (calculando su SHA-256 en la misma pasada). Los ZIPs anidados se copian
+de uno en uno a un archivo temporal, se recorren y se eliminan antes de seguir, así el disco
+solo guarda los libros y, como mucho, un ZIP anidado por nivel de profundidad.
+Los nombres de las entradas nunca se usan como rutas (sin riesgo de zip-slip).
+"""
+
+import os
+import zipfile
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, Optional, Union
+import logging
+
+from upload_stream import _parse_size, stream_upload_to_disk, UploadTooLargeError, MAX_UPLOAD_SIZE
+
+logger = logging.getLogger(__name__)
+
+BOOK_EXTENSIONS = ('.pdf', '.epub')
+# Profundidad máxima de ZIPs dentro de ZIPs
+MAX_ZIP_DEPTH = int(os.getenv("MAX_ZIP_DEPTH", "3"))
+# Total de bytes de libros que se extraen de un mismo ZIP (protección frente a ZIPs bomba)
+MAX_ZIP_EXTRACT_SIZE = _parse_size(os.getenv("MAX_ZIP_EXTRACT_SIZE", ""), 20 * 1024 ** 3)
+# Separador entre el ZIP y la ruta de la entrada en los nombres mostrados ("libros.zip!/novelas/a.pdf")
+MEMBER_SEPARATOR = "!/"
+
+class ZipExtractLimitError(Exception):
+    """El contenido del ZIP supera el tamaño total permitido"""
+
+@dataclass
+class ZipBook:
+    """Libro copiado desde un ZIP"""
+    file_path: str  # Copia en disco
+    member_path: str  # Ruta dentro del ZIP (con "!/" por cada nivel de anidamiento)
+    size: int
+    sha256: str
+
+class _Budget:
+    """Bytes restantes para todo el recorrido (incluidos los ZIPs anidados)"""
+    def __init__(self, limit: int):
+        self.remaining = limit
+
+    def take(self, amount: int):
+        self.remaining -= amount
+        if self.remaining < 0:
+            raise ZipExtractLimitError(
+                f"El ZIP supera el tamaño total de extracción permitido ({MAX_ZIP_EXTRACT_SIZE // (1024 * 1024)} MB)"
+            )
+
+def is_book_member(name: str) -> bool:
+    return name.lower().endswith(BOOK_EXTENSIONS)
+
+def _is_ignored_member(info: zipfile.ZipInfo) -> bool:
+    # Directorios, metadatos de macOS y archivos ocultos
+    name = info.filename
+    base = os.path.basename(name.rstrip("/"))
+    return info.is_dir() or name.startswith("__MACOSX/") or "/__MACOSX/" in name or base.startswith(".")
+
+def iter_zip_books(
+    source: Union[str, BinaryIO],
+    dest_dir: str,
+    display_prefix: str = "",
+    max_depth: int = MAX_ZIP_DEPTH,
+    _depth: int = 0,
+    _budget: Optional[_Budget] = None,
+    _counter: Optional[list] = None
+) -> Iterator[ZipBook]:
+    """
+    Recorre un ZIP (ruta o archivo abierto con seek) y va copiando sus libros a dest_dir.
+    Los ZIPs anidados se recorren hasta max_depth niveles.
+    """
+    budget = _budget or _Budget(MAX_ZIP_EXTRACT_SIZE)
+    counter = _counter if _counter is not None else [0]
+    os.makedirs(dest_dir, exist_ok=True)
+
+    with zipfile.ZipFile(source, 'r') as zip_ref:
+        for info in zip_ref.infolist():
+            if _is_ignored_member(info):
+                continue
+            member_path = f"{display_prefix}{info.filename}"
+            name = info.filename.lower()
+
+            if is_book_member(name):
+                if info.file_size > MAX_UPLOAD_SIZE:
+                    print(f"⚠️ {member_path}: supera el tamaño máximo permitido, se omite")
+                    continue
+                budget.take(info.file_size)
+                counter[0] += 1
+                try:
+                    with zip_ref.open(info) as member:
+                        upload = stream_upload_to_disk(member, dest_dir, info.filename, prefix=f"z{counter[0]}")
+                except UploadTooLargeError as e:
+                    # El tamaño declarado en el índice no coincidía con el real
+                    print(f"⚠️ {member_path}: {e}")
+                    continue
+                except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError, OSError) as e:
+                    print(f"⚠️ No se pudo extraer {member_path}: {e}")
+                    continue
+                yield ZipBook(upload.file_path, member_path, upload.size, upload.sha256)
+
+            elif name.endswith(".zip"):
+                if _depth + 1 > max_depth:
+                    print(f"⚠️ {member_path}: ZIP anidado demasiado profundo, se omite")
+                    continue
+                budget.take(info.file_size)
+                counter[0] += 1
+                nested_path = None
+                try:
+                    with zip_ref.open(info) as member:
+                        nested_path = stream_upload_to_disk(
+                            member, dest_dir, info.filename, prefix=f"nested{counter[0]}", max_size=budget.remaining + info.file_size
+                        ).file_path
+                    yield from iter_zip_books(
+                        nested_path, dest_dir, f"{member_path}{MEMBER_SEPARATOR}",
+                        max_depth, _depth + 1, budget, counter
+                    )
+                except (zipfile.BadZipFile, UploadTooLargeError, NotImplementedError, OSError) as e:
+                    print(f"⚠️ No se pudo procesar el ZIP anidado {member_path}: {e}")
+                finally:
+                    # El ZIP anidado solo ocupa disco mientras se recorre
+                    if nested_path and os.path.exists(nested_path):
+                        os.remove(nested_path)
+                    budget.take(-info.file_size)
+
+def extract_zip_books(source: Union[str, BinaryIO], dest_dir: str, display_prefix: str = "") -> list:
+    """Copia todos los libros del ZIP (y de sus ZIPs anidados) y devuelve la lista de ZipBook"""
+    books = list(iter_zip_books(source, dest_dir, display_prefix))
+    print(f"📦 {len(books)} libros extraídos del ZIP {display_prefix or source}")
+    return books
@@ -4,14 +4,185 @@ import { useDriveStatus } from './hooks/useDriveStatus';
 import { useBookService } from './hooks/useBookService';
 import { useAppMode } from './contexts/AppModeContext';
 import { getBackendUrl } from './config/api';
+import { sha256File } from './utils/sha256';
 import Button from './components/Button';
 import './UploadView.css';
 
+// Formatea segundos como "1 h 5 min", "3 min 20 s" o "45 s"
+const formatEta = (seconds) => {
+  if (seconds === null || seconds === undefined) return 'calculando...';
+  const total = Math.round(seconds);
+  const hours = Math.floor(total / 3600);
+  const minutes = Math.floor((total % 3600) / 60);
+  if (hours > 0) return `${hours} h ${minutes} min`;
+  if (minutes > 0) return `${minutes} min ${total % 60} s`;
+  return `${total} s`;
+};
+
+// Archivos más grandes no se hashean en el navegador: el hash se calcula por trozos (memoria
+// acotada), pero el tiempo crece con el tamaño y en móviles se nota
+const PREFLIGHT_HASH_MAX_BYTES = 256 * 1024 * 1024;
+
+// Verificación previa de una carga de carpeta: calcula el SHA-256 de cada archivo y pregunta al
+// servidor cuáles necesita. Devuelve los archivos a subir y los duplicados que se evitan.
+// Si el servidor falla, se suben todos.
+const preflightFolderFiles = async (files, onProgress) => {
+  const entries = [];
+  for (let i = 0; i < files.length; i++) {
+    const file = files[i];
+    onProgress({ current: i + 1, total: files.length, message: `Comprobando duplicados: ${file.name}` });
+    let sha256 = null;
+    if (file.size <= PREFLIGHT_HASH_MAX_BYTES) {
+      try {
+        sha256 = await sha256File(file);
+      } catch (error) {
+        console.warn(`⚠️ No se pudo calcular el hash de ${file.name}:`, error);
+      }
+    }
+    entries.push({ name: file.webkitRelativePath || file.name, size: file.size, sha256 });
+  }
+
+  try {
+    const response = await fetch(`${getBackendUrl()}/api/upload-folder-cloud/preflight`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ files: entries })
+    });
+    if (!response.ok) {
+      throw new Error(`Error del servidor: ${response.status}`);
+    }
+    const result = await response.json();
+    console.log(`🛫 Verificación previa: ${result.needed.length}/${files.length} archivos necesarios, ${result.duplicates.length} duplicados`);
+    return {
+      files: result.needed.map((index) => files[index]),
+      duplicates: result.duplicates,
+      savedBytes: result.saved_bytes
+    };
+  } catch (error) {
+    console.warn('⚠️ Falló la verificación previa, se suben todos los archivos:', error);
+    return { files, duplicates: [], savedBytes: 0 };
+  }
+};
+
+// Errores seguidos del stream de eventos antes de pasar a consultar el estado del trabajo
+const IMPORT_JOB_MAX_STREAM_ERRORS = 3;
+const IMPORT_JOB_POLL_INTERVAL_MS = 3000;
+// Consultas fallidas seguidas (servidor caído) antes de abandonar el seguimiento
+const IMPORT_JOB_MAX_POLL_ERRORS = 20;
+
+// Sigue un trabajo de importación por Server-Sent Events y devuelve su resumen final.
+// Si el stream se cierra o falla repetidamente, consulta /api/import-jobs/{id} hasta que el
+// trabajo termine (o rechaza si el trabajo no existe o falló)
+const followImportJob = (jobId, onProgress) => new Promise((resolve, reject) => {
+  const events = new EventSource(`${getBackendUrl()}/api/import-jobs/${jobId}/events`);
+  let lastFile = '';
+  let settled = false;
+  let streamErrors = 0;
+  let pollErrors = 0;
+  let pollTimer = null;
+
+  const settle = (callback, value) => {
+    if (settled) return;
+    settled = true;
+    events.close();
+    clearTimeout(pollTimer);
+    callback(value);
+  };
+
+  const fetchSummary = async () => {
+    events.close();
+    try {
+      const response = await fetch(`${getBackendUrl()}/api/import-jobs/${jobId}/summary`);
+      if (!response.ok) {
+        throw new Error(`Error al obtener el resumen: ${response.status}`);
+      }
+      settle(resolve, await response.json());
+    } catch (error) {
+      settle(reject, error);
+    }
+  };
+
+  const pollJob = async () => {
+    if (settled) return;
+    try {
+      const response = await fetch(`${getBackendUrl()}/api/import-jobs/${jobId}`);
+      if (response.status === 404) {
+        settle(reject, new Error('El trabajo de importación ya no existe en el servidor'));
+        return;
+      }
+      if (!response.ok) {
+        throw new Error(`Error al consultar el trabajo: ${response.status}`);
+      }
+      const job = await response.json();
+      pollErrors = 0;
+      if (job.status === 'failed') {
+        settle(reject, new Error(job.error || 'El trabajo de importación falló'));
+        return;
+      }
+      if (job.status === 'completed' || job.status === 'completed_with_errors') {
+        await fetchSummary();
+        return;
+      }
+      const completed = job.total_items - job.pending;
+      onProgress({ current: completed, total: job.total_items, message: `${completed}/${job.total_items} archivos...` });
+    } catch (error) {
+      pollErrors += 1;
+      console.warn(`⚠️ No se pudo consultar el trabajo (${pollErrors}/${IMPORT_JOB_MAX_POLL_ERRORS}):`, error);
+      if (pollErrors >= IMPORT_JOB_MAX_POLL_ERRORS) {
+        settle(reject, new Error('Se perdió la conexión con el servidor durante la importación'));
+        return;
+      }
+    }
+    pollTimer = setTimeout(pollJob, IMPORT_JOB_POLL_INTERVAL_MS);
+  };
+
+  events.onopen = () => {
+    streamErrors = 0;
+  };
+
+  events.addEventListener('item', (event) => {
+    const data = JSON.parse(event.data);
+    const icon = data.outcome === 'success' ? '✅' : data.outcome === 'duplicate' ? '⚠️' : '❌';
+    lastFile = `${icon} ${data.file}`;
+  });
+
+  events.addEventListener('progress', (event) => {
+    const data = JSON.parse(event.data);
+    onProgress({
+      current: data.completed,
+      total: data.total,
+      message: `${data.completed}/${data.total} archivos · ${data.throughput_per_minute} libros/min · tiempo restante: ${formatEta(data.eta_seconds)}${lastFile ? ` · ${lastFile}` : ''}`
+    });
+  });
+
+  events.addEventListener('started', (event) => {
+    const data = JSON.parse(event.data);
+    onProgress({ current: data.completed, total: data.total, message: `Procesando ${data.total} archivos...` });
+  });
+
+  events.addEventListener('finished', fetchSummary);
+
+  // EventSource reconecta solo (con Last-Event-ID); si el trabajo ya terminó, el servidor
+  // responde con el evento "finished". Si el stream queda cerrado (p. ej. 404) o sigue
+  // fallando, se pasa a consultar el estado del trabajo
+  events.onerror = () => {
+    streamErrors += 1;
+    if (events.readyState === EventSource.CLOSED || streamErrors >= IMPORT_JOB_MAX_STREAM_ERRORS) {
+      console.warn('⚠️ Conexión de progreso perdida, consultando el estado del trabajo...');
+      events.close();
+      if (!pollTimer && !settled) pollJob();
+      return;
+    }
+    console.warn('⚠️ Conexión de progreso interrumpida, reintentando...');
+  };
+});
+
 function UploadView() {
   const [selectedFile, setSelectedFile] = useState(null);
   const [selectedZip, setSelectedZip] = useState(null);
   const [selectedFolder, setSelectedFolder] = useState(null);
   const [driveFolderUrl, setDriveFolderUrl] = useState('');
+  const [driveServerCopy, setDriveServerCopy] = useState(false); // files.copy en Drive en lugar de descargar y subir
   const [uploadMode, setUploadMode] = useState('single'); // 'single', 'bulk', 'folder', o 'drive-folder'
   const [message, setMessage] = useState('');
   const [isLoading, setIsLoading] = useState(false);
@@ -99,7 +270,7 @@ function UploadView() {
       
       const endpoint = appMode === 'local' 
         ? `${getBackendUrl()}/api/upload-folder-local/`
-        : `${getBackendUrl()}/api/upload-folder-cloud/`;
+        : `${getBackendUrl()}/api/upload-folder-cloud/?background=true`;
       
       console.log(`🔗 Enviando carpeta a: ${endpoint}`);
       
@@ -112,7 +283,10 @@ function UploadView() {
         throw new Error(`Error del servidor: ${response.status}`);
       }
       
-      const result = await response.json();
+      let result = await response.json();
+      if (response.status === 202 && result.job_id) {
+        result = await followImportJob(result.job_id, setProgress);
+      }
       setMessage(`✅ ${result.message || 'Carpeta cargada exitosamente'}`);
       
       // Actualizar lista de libros
@@ -284,8 +458,8 @@ function UploadView() {
     try {
       // Determinar el endpoint según el modo de la aplicación
       const endpoint = appMode === 'local' 
-        ? `${getBackendUrl()}/api/upload-bulk-local/`
-        : `${getBackendUrl()}/upload-bulk/`;
+        ? `${getBackendUrl()}/api/upload-bulk-local/?background=true`
+        : `${getBackendUrl()}/upload-bulk/?background=true`;
       
       setProgress({ current: 0, total: 0, message: `Procesando en modo ${appMode === 'local' ? 'local' : 'nube'}...` });
       
@@ -335,7 +509,12 @@ function UploadView() {
       
       setProgress({ current: 0, total: 0, message: 'Procesando archivos...' });
       
-      const responseData = await response.json();
+      // En segundo plano el servidor responde 202 con el trabajo y el progreso llega por eventos;
+      // si no, la respuesta ya es el resumen
+      let responseData = await response.json();
+      if (response.status === 202 && responseData.job_id) {
+        responseData = await followImportJob(responseData.job_id, setProgress);
+      }
       
       if (responseData.successful > 0 || responseData.total_files > 0) {
         setProgress({
@@ -465,40 +644,47 @@ function UploadView() {
           navigate('/', { replace: true });
         }, 5000);
       } else if (appMode === 'drive') {
-        // Modo nube: enviar carpeta completa al backend
+        // Modo nube: enviar al backend solo los archivos que no están ya en la biblioteca
         console.log('☁️ Procesando carpeta en modo nube...');
         
-        // Crear un FormData con los archivos
-        const formData = new FormData();
-        
-        // Agregar cada archivo al FormData
-        for (let i = 0; i < files.length; i++) {
-          const file = files[i];
-          formData.append('files', file);
-        }
-        
-        // Agregar información de la carpeta
-        formData.append('folder_name', selectedFolder.name);
-        formData.append('total_files', files.length.toString());
-        
-        setProgress({ current: 0, total: files.length, message: 'Enviando archivos al servidor...' });
-        
         try {
-          const response = await fetch(`${getBackendUrl()}/api/upload-folder-cloud/`, {
-            method: 'POST',
-            body: formData
-          });
+          const preflight = await preflightFolderFiles(files, setProgress);
+          const skippedDuplicates = preflight.duplicates.length;
           
-          if (!response.ok) {
-            const errorText = await response.text();
-            throw new Error(`Error del servidor: ${response.status} - ${errorText}`);
+          let result = { total_files: 0, successful: 0, failed: 0, duplicates: 0 };
+          if (preflight.files.length > 0) {
+            // Crear un FormData con los archivos necesarios
+            const formData = new FormData();
+            for (let i = 0; i < preflight.files.length; i++) {
+              formData.append('files', preflight.files[i]);
+            }
+            
+            // Agregar información de la carpeta
+            formData.append('folder_name', selectedFolder.name);
+            formData.append('total_files', preflight.files.length.toString());
+            
+            setProgress({ current: 0, total: preflight.files.length, message: 'Enviando archivos al servidor...' });
+            
+            const response = await fetch(`${getBackendUrl()}/api/upload-folder-cloud/?background=true`, {
+              method: 'POST',
+              body: formData
+            });
+            
+            if (!response.ok) {
+              const errorText = await response.text();
+              throw new Error(`Error del servidor: ${response.status} - ${errorText}`);
+            }
+            
+            result = await response.json();
+            if (response.status === 202 && result.job_id) {
+              result = await followImportJob(result.job_id, setProgress);
+            }
           }
           
-          const result = await response.json();
-          
           console.log('✅ Resultado del procesamiento:', result);
           
-          const detailedMessage = `✅ Procesamiento completado.\n\n📋 Resumen:\n• Total de archivos: ${result.total_files}\n• Libros procesados: ${result.successful}\n• Errores: ${result.failed}\n• Duplicados detectados: ${result.duplicates}`;
+          const savedMb = (preflight.savedBytes / (1024 * 1024)).toFixed(1);
+          const detailedMessage = `✅ Procesamiento completado.\n\n📋 Resumen:\n• Total de archivos: ${result.total_files + skippedDuplicates}\n• Libros procesados: ${result.successful}\n• Errores: ${result.failed}\n• Duplicados detectados: ${result.duplicates + skippedDuplicates}${skippedDuplicates ? ` (${skippedDuplicates} sin subir, ${savedMb} MB ahorrados)` : ''}`;
           
           setMessage(detailedMessage);
           setSelectedFolder(null);
@@ -570,7 +756,7 @@ function UploadView() {
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ folder_url: driveFolderUrl }),
+        body: JSON.stringify({ folder_url: driveFolderUrl, import_mode: driveServerCopy ? 'copy' : 'download' }),
         signal: controller.signal
       });
       
@@ -892,6 +1078,15 @@ function UploadView() {
                 {isLoading ? 'Procesando...' : 'Analizar y Guardar Libros de Google Drive'}
               </button>
             </div>
+            <label className="drive-copy-option">
+              <input
+                type="checkbox"
+                checked={driveServerCopy}
+                onChange={(e) => setDriveServerCopy(e.target.checked)}
+                disabled={isLoading}
+              />
+              Copiar dentro de Google Drive (solo se descarga una muestra de cada libro)
+            </label>
           </div>
         </div>
       )}
@@ -2,6 +2,89 @@ import { useCallback } from 'react';
 import { useAppMode } from '../contexts/AppModeContext';
 import { getBackendUrl, checkBackendHealth } from '../config/api';
 
+// Los archivos más grandes se suben por partes reanudables (/api/uploads)
+const CHUNKED_UPLOAD_THRESHOLD = 32 * 1024 * 1024;
+const CHUNK_UPLOAD_RETRIES = 5;
+
+const sha256Hex = async (buffer) => {
+  const digest = await crypto.subtle.digest('SHA-256', buffer);
+  return Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, '0')).join('');
+};
+
+// La sesión se recuerda por archivo: si la subida se corta, el siguiente intento
+// pregunta qué partes faltan y continúa desde ahí
+const chunkedUploadKey = (file, mode) => `chunked-upload:${mode}:${file.name}:${file.size}:${file.lastModified}`;
+
+const uploadInChunks = async (backendUrl, file, mode) => {
+  const key = chunkedUploadKey(file, mode);
+  let session = null;
+
+  const savedId = localStorage.getItem(key);
+  if (savedId) {
+    const response = await fetch(`${backendUrl}/api/uploads/${savedId}`);
+    if (response.ok) {
+      session = await response.json();
+      console.log(`🔁 Reanudando subida de ${file.name}: ${session.received_chunks}/${session.total_chunks} partes`);
+    } else {
+      localStorage.removeItem(key);
+    }
+  }
+
+  if (!session) {
+    const response = await fetch(`${backendUrl}/api/uploads`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ filename: file.name, size: file.size, mode })
+    });
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(errorData.detail || `Error ${response.status}: ${response.statusText}`);
+    }
+    session = await response.json();
+    localStorage.setItem(key, session.upload_id);
+  }
+
+  for (const index of session.missing_chunks) {
+    const start = index * session.chunk_size;
+    const buffer = await file.slice(start, Math.min(file.size, start + session.chunk_size)).arrayBuffer();
+    const headers = { 'Content-Type': 'application/octet-stream' };
+    if (window.crypto?.subtle) {
+      headers['X-Chunk-SHA256'] = await sha256Hex(buffer);
+    }
+
+    for (let attempt = 1; ; attempt++) {
+      let response = null;
+      try {
+        response = await fetch(`${backendUrl}/api/uploads/${session.upload_id}/chunks/${index}`, {
+          method: 'PUT',
+          headers,
+          body: buffer
+        });
+      } catch (error) {
+        // Corte de red: se reintenta la misma parte
+        console.warn(`⚠️ Parte ${index + 1}/${session.total_chunks} interrumpida (intento ${attempt}):`, error);
+      }
+      if (response && response.ok) break;
+      if (response && response.status === 404) {
+        localStorage.removeItem(key);
+        throw new Error('La sesión de subida expiró, vuelve a intentarlo');
+      }
+      if (attempt >= CHUNK_UPLOAD_RETRIES) {
+        throw new Error(`No se pudo subir la parte ${index + 1}/${session.total_chunks}`);
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** (attempt - 1)));
+    }
+  }
+
+  const response = await fetch(`${backendUrl}/api/uploads/${session.upload_id}/finalize`, { method: 'POST' });
+  // Con partes pendientes o dañadas (409 con missing_chunks, 422) la sesión sigue abierta para reanudar
+  const errorData = response.ok ? null : await response.clone().json().catch(() => ({}));
+  if (response.ok || !(response.status === 422 || errorData?.detail?.missing_chunks)) {
+    localStorage.removeItem(key);
+  }
+  return response;
+};
+
 export const useBookService = () => {
   const { appMode, isLocalMode, isDriveMode } = useAppMode();
 
@@ -83,10 +166,12 @@ export const useBookService = () => {
 
       if (isLocalMode) {
         const url = backendUrl ? `${backendUrl}/api/upload-book-local/` : '/api/upload-book-local/';
-        const response = await fetch(url, {
-          method: 'POST',
-          body: formData,
-        });
+        const response = file.size > CHUNKED_UPLOAD_THRESHOLD
+          ? await uploadInChunks(backendUrl, file, 'local')
+          : await fetch(url, {
+            method: 'POST',
+            body: formData,
+          });
         
         if (response.status === 409) {
           // Libro duplicado
@@ -108,10 +193,12 @@ export const useBookService = () => {
         return await response.json();
       } else if (isDriveMode) {
         const url = backendUrl ? `${backendUrl}/api/drive/books/upload` : '/api/drive/books/upload';
-        const response = await fetch(url, {
-          method: 'POST',
-          body: formData,
-        });
+        const response = file.size > CHUNKED_UPLOAD_THRESHOLD
+          ? await uploadInChunks(backendUrl, file, 'cloud')
+          : await fetch(url, {
+            method: 'POST',
+            body: formData,
+          });
         
         if (response.status === 409) {
           // Libro duplicado